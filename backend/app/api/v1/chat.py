@@ -9,8 +9,9 @@ import structlog
 
 from app.core.config import get_settings
 from app.models.chat import ChatRequest, ChatResponse, ChatMessage, ChatHistory, DebugInfo
-from app.models.ws import WSStatus, WSError, WSChatMessage
+from app.models.ws import WSStatus, WSError, WSChatMessage, WSFileStatus
 from app.services.chat_service import ChatService
+from app.services.ingestion import get_ingestion_queue
 
 router = APIRouter()
 logger = structlog.get_logger()
@@ -143,6 +144,8 @@ async def get_chat_history(
 async def websocket_chat(websocket: WebSocket, session_id: str):
     """WebSocket endpoint for real-time chat"""
     logger.info("websocket_connection_attempt", session_id=session_id)
+    file_status_task = None
+    file_status_queue = None
     
     try:
         # Accept WebSocket connection
@@ -162,6 +165,21 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
         status = WSStatus(session_id=session_id, data="connected")
         await websocket.send_json(jsonable_encoder(status))
         logger.info("websocket_setup_complete", session_id=session_id)
+
+        # Push background ingestion progress for this session's files
+        file_status_queue = get_ingestion_queue().subscribe(session_id)
+
+        async def _forward_file_status():
+            while True:
+                status_update = await file_status_queue.get()
+                try:
+                    ws_status = WSFileStatus(session_id=session_id, data=status_update)
+                    await websocket.send_json(jsonable_encoder(ws_status))
+                except Exception as fe:  # noqa: BLE001
+                    logger.warning("websocket_file_status_send_failed", session_id=session_id, error=str(fe))
+                    return
+
+        file_status_task = asyncio.create_task(_forward_file_status())
         
         # Main message loop
         while True:
@@ -249,4 +267,8 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
             error_type=type(e).__name__
         )
     finally:
+        if file_status_task is not None:
+            file_status_task.cancel()
+        if file_status_queue is not None:
+            get_ingestion_queue().unsubscribe(session_id, file_status_queue)
         logger.info("websocket_connection_ended", session_id=session_id)
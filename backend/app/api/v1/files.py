@@ -1,49 +1,74 @@
 """File upload and processing API endpoints"""
 import os
 import time
-from typing import List
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
 import structlog
 
 from app.core.config import get_settings
-from app.models.files import FileUploadResponse, UploadedFile
+from app.models.files import (
+    BatchUploadItem,
+    BatchUploadResponse,
+    FileContentResponse,
+    FileStatusResponse,
+    FileUploadResponse,
+    TableRowsResponse,
+    UploadedFile,
+)
+from app.services.extractors.registry import supported_extensions
 from app.services.file_service import FileService
 
 router = APIRouter()
 logger = structlog.get_logger()
 
 
+async def _validate_upload(file: UploadFile, settings) -> str:
+    """Validate size and type of an upload; returns its lowercase extension.
+
+    Raises HTTPException (413/400) when the file is not acceptable.
+    """
+    # Validate file size (fallback to reading when size is unavailable)
+    size_bytes = getattr(file, "size", None)
+    if not size_bytes or size_bytes == 0:
+        # read to determine size, then rewind for downstream processing
+        peek = await file.read()
+        size_bytes = len(peek)
+        await file.seek(0)
+    if size_bytes > settings.max_file_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"ファイルサイズが上限を超えています（最大: {settings.max_file_size / 1024 / 1024:.1f}MB）"
+        )
+
+    # Validate file type
+    file_extension = os.path.splitext(file.filename or "")[1].lower()
+    allowed = supported_extensions()
+    if file_extension not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"サポートされていないファイル形式です。対応形式: {', '.join(allowed)}"
+        )
+    return file_extension
+
+
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(
     file: UploadFile = File(...),
     session_id: str = Form(None),
+    background: Optional[bool] = Form(None),
     file_service: FileService = Depends()
 ) -> FileUploadResponse:
-    """Upload and process a file"""
+    """Upload and process a file
+
+    With `background=true` (or `INGEST_BACKGROUND_UPLOADS=true`) the response
+    is returned immediately with `status="processing"`; poll
+    `GET /files/{file_id}/status` for completion.
+    """
     start_time = time.time()
     settings = get_settings()
     
     try:
-        # Validate file size (fallback to reading when size is unavailable)
-        size_bytes = getattr(file, "size", None)
-        if not size_bytes or size_bytes == 0:
-            # read to determine size, then rewind for downstream processing
-            peek = await file.read()
-            size_bytes = len(peek)
-            await file.seek(0)
-        if size_bytes > settings.max_file_size:
-            raise HTTPException(
-                status_code=413,
-                detail=f"ファイルサイズが上限を超えています（最大: {settings.max_file_size / 1024 / 1024:.1f}MB）"
-            )
-        
-        # Validate file type
-        file_extension = os.path.splitext(file.filename or "")[1].lower()
-        if file_extension not in settings.supported_file_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"サポートされていないファイル形式です。対応形式: {', '.join(settings.supported_file_types)}"
-            )
+        file_extension = await _validate_upload(file, settings)
         
         logger.info(
             "file_upload_started",
@@ -53,6 +78,23 @@ async def upload_file(
             session_id=session_id
         )
         
+        use_background = settings.ingest_background_uploads if background is None else background
+        if use_background:
+            uploaded_file = await file_service.submit_uploaded_file(
+                file=file,
+                session_id=session_id or "default"
+            )
+            logger.info(
+                "file_upload_queued",
+                file_id=uploaded_file.id,
+                filename=uploaded_file.filename,
+                processing_time=time.time() - start_time,
+            )
+            return FileUploadResponse(
+                file=uploaded_file,
+                message=f"ファイル '{uploaded_file.original_filename}' を受け付けました（処理中）"
+            )
+
         # Process the uploaded file
         uploaded_file = await file_service.process_uploaded_file(
             file=file,
@@ -66,7 +108,7 @@ async def upload_file(
             file_id=uploaded_file.id,
             filename=uploaded_file.filename,
             processing_time=processing_time,
-            content_length=len(uploaded_file.content or "")
+            content_length=uploaded_file.content_length
         )
         
         return FileUploadResponse(
@@ -88,6 +130,90 @@ async def upload_file(
         raise HTTPException(status_code=500, detail=f"ファイル処理エラー: {str(e)}")
 
 
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_files_batch(
+    files: List[UploadFile] = File(...),
+    session_id: str = Form(None),
+    file_service: FileService = Depends()
+) -> BatchUploadResponse:
+    """Upload several files and extract them concurrently
+
+    All files are validated up front; invalid ones are reported per file and
+    the rest are processed. The request only fails as a whole when the batch
+    itself is too large.
+    """
+    start_time = time.time()
+    settings = get_settings()
+
+    if len(files) > settings.batch_upload_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度にアップロードできるファイル数は最大 {settings.batch_upload_max_files} 件です"
+        )
+
+    try:
+        results: List[Optional[BatchUploadItem]] = [None] * len(files)
+        accepted: List[int] = []
+        for i, file in enumerate(files):
+            try:
+                await _validate_upload(file, settings)
+                accepted.append(i)
+            except HTTPException as he:
+                results[i] = BatchUploadItem(
+                    filename=file.filename or "unknown",
+                    success=False,
+                    status_code=he.status_code,
+                    error=str(he.detail),
+                )
+
+        logger.info(
+            "file_batch_upload_started",
+            file_count=len(files),
+            accepted_count=len(accepted),
+            session_id=session_id,
+        )
+
+        processed = await file_service.process_uploaded_files(
+            [files[i] for i in accepted],
+            session_id=session_id or "default",
+            concurrency=settings.batch_upload_concurrency,
+        )
+        for i, outcome in zip(accepted, processed):
+            if isinstance(outcome, Exception):
+                results[i] = BatchUploadItem(
+                    filename=files[i].filename or "unknown",
+                    success=False,
+                    status_code=500,
+                    error=f"ファイル処理エラー: {str(outcome)}",
+                )
+            else:
+                results[i] = BatchUploadItem(
+                    filename=outcome.original_filename,
+                    success=True,
+                    status_code=200,
+                    file=outcome,
+                )
+
+        items = [r for r in results if r is not None]
+        succeeded = sum(1 for r in items if r.success)
+        processing_time = time.time() - start_time
+        logger.info(
+            "file_batch_upload_completed",
+            succeeded=succeeded,
+            failed=len(items) - succeeded,
+            processing_time=processing_time,
+        )
+        return BatchUploadResponse(
+            results=items,
+            succeeded=succeeded,
+            failed=len(items) - succeeded,
+            processing_time=processing_time,
+        )
+    except Exception as e:
+        logger.error("file_batch_upload_error", error=str(e), processing_time=time.time() - start_time)
+        raise HTTPException(status_code=500, detail=f"ファイル処理エラー: {str(e)}")
+
+
 @router.get("/{file_id}")
 async def get_file_info(
     file_id: str,
@@ -107,6 +233,46 @@ async def get_file_info(
         raise HTTPException(status_code=500, detail=f"ファイル情報取得エラー: {str(e)}")
 
 
+@router.get("/{file_id}/content", response_model=FileContentResponse)
+async def get_file_content(
+    file_id: str,
+    offset: int = Query(0, ge=0, description="開始位置（UTF-8バイト）"),
+    length: int = Query(64 * 1024, ge=1, le=1024 * 1024, description="取得サイズ（バイト）"),
+    file_service: FileService = Depends()
+) -> FileContentResponse:
+    """Get a byte range of the extracted text"""
+    try:
+        content = await file_service.read_content_range(file_id, offset=offset, length=length)
+        if content is None:
+            raise HTTPException(status_code=404, detail="ファイルが見つかりません")
+        return content
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error("get_file_content_error", file_id=file_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"ファイル内容取得エラー: {str(e)}")
+
+
+@router.get("/{file_id}/rows", response_model=TableRowsResponse)
+async def get_table_rows(
+    file_id: str,
+    offset: int = Query(0, ge=0, description="開始行（0始まり）"),
+    limit: int = Query(100, ge=1, le=1000, description="取得行数"),
+    file_service: FileService = Depends()
+) -> TableRowsResponse:
+    """Get exact rows of an uploaded CSV/XLSX file"""
+    try:
+        rows = await file_service.get_table_rows(file_id, offset=offset, limit=limit)
+        if rows is None:
+            raise HTTPException(status_code=404, detail="表データが見つかりません")
+        return rows
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error("get_table_rows_error", file_id=file_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"表データ取得エラー: {str(e)}")
+
+
 @router.get("/session/{session_id}")
 async def get_session_files(
     session_id: str,
@@ -121,6 +287,24 @@ async def get_session_files(
         raise HTTPException(status_code=500, detail=f"セッションファイル取得エラー: {str(e)}")
 
 
+@router.get("/{file_id}/status", response_model=FileStatusResponse)
+async def get_file_status(
+    file_id: str,
+    file_service: FileService = Depends()
+) -> FileStatusResponse:
+    """Get extraction status of an uploaded file"""
+    try:
+        status = await file_service.get_file_status(file_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="ファイルが見つかりません")
+        return status
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error("get_file_status_error", file_id=file_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"処理状態取得エラー: {str(e)}")
+
+
 @router.delete("/{file_id}")
 async def delete_file(
     file_id: str,
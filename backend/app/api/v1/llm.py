@@ -0,0 +1,34 @@
+"""LLM provider API endpoints"""
+from fastapi import APIRouter, HTTPException
+
+from app.models.llm import LLMMetricsResponse, UsageTotals
+from app.services.llm.breaker import get_circuit_breakers
+from app.services.llm.hedging import get_llm_hedger
+from app.services.llm.prefix_cache import get_prefix_cache
+from app.services.llm.retry import get_retry_budget
+from app.services.llm.speculation import get_speculation_tracker
+from app.services.llm.usage import get_usage_tracker
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_model=LLMMetricsResponse)
+async def get_llm_metrics() -> LLMMetricsResponse:
+    """Hedged request counters, breakers, token usage, prefix cache, retries and speculation"""
+    return LLMMetricsResponse(
+        hedging=get_llm_hedger().stats(),
+        breakers=get_circuit_breakers().stats(),
+        usage=get_usage_tracker().stats(),
+        prefix_cache=get_prefix_cache().stats(),
+        retries=get_retry_budget().stats(),
+        speculation=get_speculation_tracker().stats(),
+    )
+
+
+@router.get("/usage/{session_id}", response_model=UsageTotals)
+async def get_session_usage(session_id: str) -> UsageTotals:
+    """Token usage totals of one chat session"""
+    totals = get_usage_tracker().session(session_id)
+    if totals is None:
+        raise HTTPException(status_code=404, detail="セッションの使用量が見つかりません")
+    return totals
@@ -0,0 +1,13 @@
+"""Tool execution API endpoints"""
+from fastapi import APIRouter
+
+from app.models.tools import ToolMetricsResponse
+from app.services.tools.executors import get_tool_executors
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_model=ToolMetricsResponse)
+async def get_tool_metrics() -> ToolMetricsResponse:
+    """Occupancy and queue wait of the per-tool executor pools"""
+    return ToolMetricsResponse(pools=get_tool_executors().stats())
@@ -22,18 +22,120 @@ class Settings(BaseSettings):
     gemini_api_key: str = ""
     gemini_model: str = "gemini-1.5-pro"
     gemini_fallback_model: Optional[str] = "gemini-1.5-flash"
+    # "sdk" (google-generativeai transport) or "rest" (shared pooled HTTP/2 client, see LLM_HTTP_*)
+    gemini_transport: str = "sdk"
+    gemini_api_base_url: str = "https://generativelanguage.googleapis.com/v1beta"
     gemini_max_retries: int = 3
-    gemini_retry_backoff_seconds: float = 2.0
+    gemini_retry_backoff_seconds: float = 2.0  # base of the jittered backoff on 429
+    gemini_retry_max_backoff_seconds: float = 30.0  # longer waits (incl. server hints) are not retried
+    # Process-wide retry budget: retries at most this fraction of requests (plus a small trickle)
+    llm_retry_budget_ratio: float = 0.1
+    llm_retry_budget_min_per_second: float = 0.2
+    # Route and pick tools in one function-calling round trip (when the provider supports it)
+    llm_function_calling: bool = True
+    # Hedge slow primary calls with the fallback model; first successful answer wins
+    llm_hedging: bool = False
+    llm_hedge_quantile: float = 0.95  # hedge after this quantile of recent primary latency
+    llm_hedge_initial_delay_seconds: float = 2.0  # until enough latency samples are seen
+    llm_hedge_min_delay_seconds: float = 0.5
+    llm_hedge_max_delay_seconds: float = 10.0
+    llm_hedge_max_rate: float = 0.1  # at most this fraction of requests is sent twice
+    # Circuit breaker for the primary model: open on a high rolling failure/slow-call rate
+    llm_circuit_breaker: bool = True
+    llm_breaker_window_seconds: float = 60.0
+    llm_breaker_min_calls: int = 10
+    llm_breaker_failure_rate: float = 0.5
+    llm_breaker_slow_call_seconds: float = 15.0
+    llm_breaker_open_seconds: float = 30.0
+    llm_breaker_probe_interval_seconds: float = 5.0  # half-open: one probe at a time, at most this often
+    # LLM backends behind the router: gemini, local (OpenAI-compatible server), fake (deterministic)
+    llm_backends: str = "gemini"
+    # Preferred backends per task ("classification", agent types), e.g. "classification=local:gemini"
+    llm_routes: str = ""
+    # How to pick among a task's available backends: order | latency | cost
+    llm_routing_strategy: str = "order"
+    # Relative cost per 1k prompt characters, e.g. "gemini=1.0,local=0"
+    llm_backend_costs: str = "gemini=1.0,local=0,fake=0"
+    local_llm_base_url: str = ""  # e.g. http://localhost:8080/v1 (llama.cpp server, vLLM)
+    local_llm_model: str = "local"
+    local_llm_api_key: str = ""
+    local_llm_max_prompt_chars: int = 8000  # longer prompts go to other backends
+    fake_llm_latency_ms: int = 0
+    # Micro-batch concurrent classification prompts into one request (batch size 1 disables)
+    llm_classification_batch_size: int = 8
+    llm_classification_batch_wait_ms: float = 5.0
+    llm_classification_batch_max_chars: int = 500
+    # Start the keyword-predicted agent's answer while classification runs; kept only if they agree
+    llm_speculation: bool = False
+    llm_speculation_min_hit_rate: float = 0.6  # below this (recent window) speculation pauses
+    llm_speculation_window: int = 50
+    llm_speculation_min_samples: int = 20
+    llm_speculation_cooldown_seconds: float = 300.0  # longer questions are classified alone
+    # Prompt token budget per agent ("agent=tokens"), opt-in; history/file/tool context is trimmed to fit.
+    # Size it from the model's context window; 0 (default) leaves the prompt untrimmed.
+    llm_prompt_token_budgets: str = ""
+    llm_prompt_token_budget_default: int = 0
+    # Upload the stable prompt prefix (instructions + file context) once per session/file set
+    llm_prefix_cache: bool = True
+    llm_prefix_cache_ttl_seconds: float = 900.0
+    # Smaller prefixes are sent inline; Gemini 1.5 models need at least 32768 (applied per model)
+    llm_prefix_cache_min_tokens: int = 4096
     langsmith_api_key: Optional[str] = None
     langsmith_project: str = "manufacturing-ai-assistant"
     
     # File Processing
     max_file_size: int = 10 * 1024 * 1024  # 10MB
     upload_dir: str = "/tmp/uploads"
-    supported_file_types: list[str] = [".pdf", ".docx", ".txt", ".csv", ".xlsx"]
+    # Accepted extensions come from the extractor registry (extractors.registry.supported_extensions)
+    # Extracted text is stored under upload_dir/text; responses carry a preview only
+    file_preview_chars: int = 500
+    # Spreadsheet ingestion (streamed in chunks; rows cached under upload_dir/tables)
+    spreadsheet_chunk_rows: int = 50_000
+    spreadsheet_top_k: int = 5
+    spreadsheet_sample_rows: int = 5
+    # Background ingestion (upload returns immediately; poll /files/{id}/status)
+    ingest_background_uploads: bool = False
+    ingest_workers: int = 4
+    # Finished job statuses are kept this long, then served from the file record
+    ingest_job_retention_seconds: float = 3600.0
+    # Extractor placement by estimated cost (see extractors.registry.choose_placement);
+    # 0 process workers runs CPU-heavy extractors on the thread pool instead
+    ingest_process_workers: int = 2
+    extract_inline_max_cost: float = 0.05
+    extract_process_min_cost: float = 2.0
+    # Batch upload (/files/upload/batch): files per request and extraction concurrency
+    batch_upload_max_files: int = 20
+    batch_upload_concurrency: int = 4
+    # How long a chat request waits for files that are still processing
+    ingest_chat_wait_seconds: float = 5.0
     
+    # SQL tool (read-only). Comma separated "name=path"; the first entry is the default.
+    # Paths ending in .duckdb/.ddb use DuckDB (optional dependency), others SQLite.
+    sql_databases: str = ""
+    sql_pool_size: int = 4
+    sql_max_rows: int = 10_000  # total rows reachable through paging
+    sql_timeout_seconds: float = 5.0
+    # Paged results: rows/bytes per page and how long an open result handle lives
+    sql_page_rows: int = 50
+    sql_page_max_bytes: int = 64 * 1024
+    sql_result_ttl_seconds: float = 300.0
+    # SQLite databases not in WAL mode: remaining rows are buffered up to this size
+    # and the cursor closed after the first page (an open cursor blocks writers)
+    sql_buffer_max_bytes: int = 4 * 1024 * 1024
+    # Cache of complete results, invalidated when the database file changes (0 disables)
+    sql_cache_max_bytes: int = 16 * 1024 * 1024
+
+    # Local document search for the web:/search: tool (build with `python -m app.services.search build`)
+    search_index_path: str = ""
+    search_top_k: int = 5
+    search_snippet_chars: int = 120
+
     # Session Management
     session_timeout: int = 3600  # 1 hour in seconds
+    # Recent tool results kept per session for follow-up turns (byte budget across sessions)
+    tool_memo_max_bytes: int = 8 * 1024 * 1024
+    tool_memo_results_per_session: int = 5
+    tool_memo_context_chars: int = 2000
     
     # CORS Configuration
     cors_origins: str = "http://localhost:3002,http://frontend:3002,http://localhost:5175"
@@ -43,6 +145,69 @@ class Settings(BaseSettings):
         if isinstance(self.cors_origins, str):
             return [origin.strip() for origin in self.cors_origins.split(",")]
         return self.cors_origins
+
+    def get_sql_databases(self) -> dict[str, str]:
+        """Parse SQL database string into an ordered name -> path mapping"""
+        databases: dict[str, str] = {}
+        for entry in (self.sql_databases or "").split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            name, sep, path = entry.partition("=")
+            if not sep:
+                name, path = "default", entry
+            databases[name.strip()] = path.strip()
+        return databases
+
+    def get_tool_pools(self) -> dict[str, tuple[int, int]]:
+        """Parse tool pool string into tool -> (workers, queue)"""
+        pools: dict[str, tuple[int, int]] = {}
+        for entry in (self.tool_pools or "").split(","):
+            name, sep, size = entry.strip().partition("=")
+            if not sep or not name.strip():
+                continue
+            workers, _, queue = size.partition(":")
+            pools[name.strip().lower()] = (
+                int(workers),
+                int(queue) if queue.strip() else self.tool_pool_default_queue,
+            )
+        return pools
+
+    def get_tool_process_pool_tools(self) -> list[str]:
+        """Parse process-pool tool names into a list"""
+        return [t.strip().lower() for t in (self.tool_process_pool_tools or "").split(",") if t.strip()]
+
+    def get_llm_backends(self) -> list[str]:
+        """Parse enabled LLM backend names into a list"""
+        return [b.strip().lower() for b in (self.llm_backends or "").split(",") if b.strip()]
+
+    def get_llm_routes(self) -> dict[str, list[str]]:
+        """Parse LLM routes into task -> ordered backend names"""
+        routes: dict[str, list[str]] = {}
+        for entry in (self.llm_routes or "").split(","):
+            task, sep, backends = entry.strip().partition("=")
+            if not sep or not task.strip():
+                continue
+            routes[task.strip().lower()] = [b.strip().lower() for b in backends.split(":") if b.strip()]
+        return routes
+
+    def get_llm_prompt_token_budgets(self) -> dict[str, int]:
+        """Parse prompt token budgets into agent -> tokens"""
+        budgets: dict[str, int] = {}
+        for entry in (self.llm_prompt_token_budgets or "").split(","):
+            name, sep, tokens = entry.strip().partition("=")
+            if sep and name.strip():
+                budgets[name.strip().lower()] = int(tokens)
+        return budgets
+
+    def get_llm_backend_costs(self) -> dict[str, float]:
+        """Parse LLM backend costs into backend -> relative cost"""
+        costs: dict[str, float] = {}
+        for entry in (self.llm_backend_costs or "").split(","):
+            name, sep, cost = entry.strip().partition("=")
+            if sep and name.strip():
+                costs[name.strip().lower()] = float(cost)
+        return costs
     
     # Logging
     log_level: str = "INFO"
@@ -72,7 +237,23 @@ class Settings(BaseSettings):
     
     # Timeouts
     llm_generate_timeout_seconds: float = 30.0
+    # Shared HTTP client of LLM backends: keep-alive pool limits, HTTP/2 when h2 is installed
+    llm_http2: bool = True
+    llm_http_max_connections: int = 100
+    llm_http_max_keepalive_connections: int = 20
+    llm_http_keepalive_expiry_seconds: float = 30.0
+    llm_http_connect_timeout_seconds: float = 5.0
     workflow_invoke_timeout_seconds: float = 60.0
+    # Tool execution: per-call timeout, and the shared deadline for a multi-tool plan
+    tool_timeout_seconds: float = 5.0
+    tool_plan_timeout_seconds: float = 10.0
+    tool_plan_max_calls: int = 4
+    # Per-tool executor pools: "tool=workers[:queue]" comma separated; others use the defaults
+    tool_pools: str = "sql=4:8,web=2:8"
+    tool_pool_default_workers: int = 2
+    tool_pool_default_queue: int = 8
+    # Tools run on a process pool instead of threads (CPU-bound runners)
+    tool_process_pool_tools: str = ""
     
     model_config = {
         "env_file": ["/app/.env"],
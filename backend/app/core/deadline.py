@@ -0,0 +1,58 @@
+"""Request-scoped deadline shared by every layer of a request.
+
+`process_query` opens a deadline for the whole workflow; LLM providers and
+tools clamp their own per-attempt timeouts and retry backoff to the time
+left (`clamp_timeout()`), and stop starting new work once it has passed
+(`DeadlineExceeded`). The deadline lives in a context variable, so it
+follows the request into the tasks LangGraph and the providers spawn, and
+nested deadlines can only shorten it.
+
+    with request_deadline(60):
+        await workflow.ainvoke(state)
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_DEADLINE: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's deadline passed before the work could start or finish."""
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[float]:
+    """Run the block under a deadline `seconds` from now (or the enclosing one, if sooner)."""
+    at = time.monotonic() + max(0.0, float(seconds))
+    outer = _DEADLINE.get()
+    if outer is not None:
+        at = min(at, outer)
+    token = _DEADLINE.set(at)
+    try:
+        yield at
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left until the current deadline (never negative), or None without one."""
+    at = _DEADLINE.get()
+    return None if at is None else max(0.0, at - time.monotonic())
+
+
+def clamp_timeout(timeout_s: float) -> float:
+    """`timeout_s` cut to the time left; raises `DeadlineExceeded` once it has passed."""
+    left = remaining_time()
+    if left is None:
+        return timeout_s
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return min(timeout_s, left)
+
+
+__all__ = ["DeadlineExceeded", "request_deadline", "remaining_time", "clamp_timeout"]
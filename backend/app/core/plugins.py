@@ -0,0 +1,183 @@
+"""Lazy plugin registries for tools and agents.
+
+A registry maps names to callables without importing them up front. Entries
+come from built-in `PluginSpec`s and from installed packages via entry
+points, discovered on first access:
+
+    [project.entry-points."aiconsal.tools"]
+    duckdb = "plant_tools.plugin:DUCKDB_TOOL"
+
+Discovery only lists entry point names; each entry point is loaded on the
+first lookup of its name. It may name a `PluginSpec` (kept in a lightweight
+module; its `target` is imported only when the plugin is first used) or the
+callable itself. Loaded callables are cached. The registry behaves like a mutable
+dict, so callers and tests can still assign callables directly.
+"""
+from __future__ import annotations
+
+import importlib
+import threading
+from dataclasses import dataclass, field
+from importlib.metadata import EntryPoint, entry_points
+from typing import Any, Callable, Dict, Iterator, Literal, MutableMapping, Optional, Tuple, Union
+
+import structlog
+
+logger = structlog.get_logger()
+
+TOOL_PLUGIN_GROUP = "aiconsal.tools"
+AGENT_PLUGIN_GROUP = "aiconsal.agents"
+
+
+@dataclass(frozen=True)
+class PluginSpec:
+    """Where a plugin lives and how it should be run."""
+
+    name: str
+    target: str  # "package.module:attribute", imported on first use
+    timeout_s: Optional[float] = None  # upper bound per call
+    executor: Literal["thread", "process"] = "thread"
+    max_concurrency: Optional[int] = None  # pool size when not configured explicitly
+    definition: Optional[str] = None  # tools: "module:attribute" of a ToolDefinition factory
+    aliases: Tuple[str, ...] = ()  # tools: extra prefixes that select this tool (e.g. "search")
+    # Discovered but not yet loaded: the real spec/callable comes from this entry point
+    entry_point: Optional[EntryPoint] = field(default=None, compare=False, repr=False)
+
+
+def load_target(target: str) -> Any:
+    """Import "module:attribute" (attribute may be dotted)."""
+    module_name, _, attr = target.partition(":")
+    obj: Any = importlib.import_module(module_name)
+    for part in filter(None, attr.split(".")):
+        obj = getattr(obj, part)
+    return obj
+
+
+Entry = Union[PluginSpec, Callable[..., Any]]
+
+
+class LazyPluginRegistry(MutableMapping[str, Callable[..., Any]]):
+    """Name -> callable mapping that imports plugins on first lookup."""
+
+    def __init__(self, group: str, builtins: Dict[str, PluginSpec]):
+        self.group = group
+        self._builtins = dict(builtins)
+        self._entries: Optional[Dict[str, Entry]] = None
+        self._loaded: Dict[str, Callable[..., Any]] = {}
+        self._lock = threading.RLock()
+        # Bumped whenever the set of names may change (lets callers cache derived tables)
+        self.version = 0
+
+    # --- Discovery ---
+    def _discovered(self) -> Dict[str, Entry]:
+        with self._lock:
+            if self._entries is None:
+                entries: Dict[str, Entry] = dict(self._builtins)
+                for ep in entry_points(group=self.group):
+                    entries[ep.name] = PluginSpec(name=ep.name, target=ep.value, entry_point=ep)
+                self._entries = entries
+                self.version += 1
+                logger.info("plugins_discovered", group=self.group, names=sorted(entries))
+            return self._entries
+
+    def _entry(self, name: str) -> Entry:
+        """The entry for `name`, loading its entry point on first lookup."""
+        entry = self._discovered()[name]
+        if not (isinstance(entry, PluginSpec) and entry.entry_point is not None):
+            return entry
+        with self._lock:
+            entry = self._discovered()[name]
+            if not (isinstance(entry, PluginSpec) and entry.entry_point is not None):
+                return entry
+            try:
+                obj = entry.entry_point.load()
+            except Exception as e:  # noqa: BLE001
+                logger.error("plugin_discovery_failed", group=self.group, name=name, error=str(e))
+                raise KeyError(name) from e
+            if isinstance(obj, PluginSpec) or callable(obj):
+                self._discovered()[name] = obj
+                return obj
+            logger.warning("plugin_ignored", group=self.group, name=name)
+            del self._discovered()[name]
+            self.version += 1
+            raise KeyError(name)
+
+    def spec(self, name: str) -> Optional[PluginSpec]:
+        """Metadata of a plugin (None for directly assigned callables)."""
+        try:
+            entry = self._entry(name)
+        except KeyError:
+            return None
+        return entry if isinstance(entry, PluginSpec) else None
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded or callable(self._discovered().get(name))
+
+    # --- Mapping interface ---
+    def __getitem__(self, name: str) -> Callable[..., Any]:
+        entry = self._entry(name)
+        if not isinstance(entry, PluginSpec):
+            return entry
+        with self._lock:
+            fn = self._loaded.get(name)
+            if fn is None:
+                try:
+                    fn = load_target(entry.target)
+                except Exception as e:  # noqa: BLE001
+                    logger.error("plugin_load_failed", group=self.group, name=name, target=entry.target, error=str(e))
+                    raise KeyError(name) from e
+                self._loaded[name] = fn
+                logger.info("plugin_loaded", group=self.group, name=name, target=entry.target)
+            return fn
+
+    def __setitem__(self, name: str, fn: Callable[..., Any]) -> None:
+        with self._lock:
+            self._discovered()[name] = fn
+            self._loaded.pop(name, None)
+            self.version += 1
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            del self._discovered()[name]
+            self._loaded.pop(name, None)
+            self.version += 1
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._discovered()))
+
+    def __len__(self) -> int:
+        return len(self._discovered())
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._discovered()
+
+    # Snapshot/restore without importing anything (used by tests)
+    def clear(self) -> None:
+        with self._lock:
+            self._discovered().clear()
+            self._loaded.clear()
+            self.version += 1
+
+    def copy(self) -> "LazyPluginRegistry":
+        clone = LazyPluginRegistry(self.group, self._builtins)
+        clone._entries = dict(self._discovered())
+        clone._loaded = dict(self._loaded)
+        return clone
+
+    def update(self, other: Any = (), **kwargs: Any) -> None:  # type: ignore[override]
+        if isinstance(other, LazyPluginRegistry):
+            with self._lock:
+                self._discovered().update(other._discovered())
+                self._loaded.update(other._loaded)
+                self.version += 1
+            other = ()
+        super().update(other, **kwargs)
+
+
+__all__ = [
+    "TOOL_PLUGIN_GROUP",
+    "AGENT_PLUGIN_GROUP",
+    "PluginSpec",
+    "LazyPluginRegistry",
+    "load_target",
+]
@@ -4,8 +4,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import structlog
 
-from app.api.v1 import chat, files
+from app.api.v1 import chat, files, llm, tools
 from app.core.config import get_settings
+from app.services.ingestion import shutdown_ingestion_queue
+from app.services.llm.http import close_llm_http_client, open_llm_http_client
+from app.services.tools.executors import shutdown_tool_executors
+from app.services.tools.sql_pool import get_sql_pool_manager, shutdown_sql_pools
+from app.services.tools.sql_results import get_sql_result_registry
 
 # Configure structured logging
 structlog.configure(
@@ -34,8 +39,17 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     logger.info("Starting Manufacturing AI Assistant API")
+    get_sql_pool_manager()
+    settings = get_settings()
+    if settings.gemini_transport == "rest" or "local" in settings.get_llm_backends():
+        open_llm_http_client()
     yield
     # Shutdown
+    await close_llm_http_client()
+    shutdown_ingestion_queue()
+    get_sql_result_registry().close_all()
+    shutdown_sql_pools()
+    shutdown_tool_executors()
     logger.info("Shutting down Manufacturing AI Assistant API")
 
 
@@ -63,6 +77,8 @@ def create_app() -> FastAPI:
     # Include routers
     app.include_router(chat.router, prefix=f"{settings.api_v1_str}/chat", tags=["chat"])
     app.include_router(files.router, prefix=f"{settings.api_v1_str}/files", tags=["files"])
+    app.include_router(tools.router, prefix=f"{settings.api_v1_str}/tools", tags=["tools"])
+    app.include_router(llm.router, prefix=f"{settings.api_v1_str}/llm", tags=["llm"])
     
     @app.get("/health")
     @app.get(f"{settings.api_v1_str}/health")
@@ -34,6 +34,7 @@ class DebugTraceEvent(BaseModel):
     tool_input: Optional[str] = Field(None, description="ツール入力（必要に応じて短縮）")
     took_ms: Optional[int] = Field(None, description="処理時間 (ms)")
     error: Optional[str] = Field(None, description="エラー情報（あれば）")
+    cached: Optional[bool] = Field(None, description="キャッシュから応答したか（ツール実行時）")
 
 
 class DebugInfo(BaseModel):
@@ -1,10 +1,13 @@
 """File processing data models"""
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional, Union
 from uuid import uuid4
 from pydantic import BaseModel, Field
 
 
+FileStatus = Literal["processing", "completed", "failed"]
+
+
 class UploadedFile(BaseModel):
     """Uploaded file model"""
     id: str = Field(default_factory=lambda: str(uuid4()), description="ファイルID")
@@ -12,9 +15,12 @@ class UploadedFile(BaseModel):
     original_filename: str = Field(..., description="元のファイル名")
     file_type: str = Field(..., description="ファイル形式")
     file_size: int = Field(..., description="ファイルサイズ（バイト）")
-    content: Optional[str] = Field(None, description="抽出されたテキスト内容")
+    content_preview: Optional[str] = Field(None, description="抽出テキストの先頭プレビュー")
+    content_length: int = Field(0, description="抽出テキストのサイズ（UTF-8バイト）")
     upload_time: datetime = Field(default_factory=datetime.now, description="アップロード時刻")
     session_id: str = Field(..., description="関連セッションID")
+    status: FileStatus = Field("completed", description="抽出処理状態")
+    table_summary: Optional["TableSummary"] = Field(None, description="表形式データの列統計（CSV/XLSXのみ）")
 
 
 class FileUploadRequest(BaseModel):
@@ -28,6 +34,42 @@ class FileUploadResponse(BaseModel):
     message: str = Field(..., description="処理結果メッセージ")
 
 
+class FileContentResponse(BaseModel):
+    """Ranged read of extracted text"""
+    file_id: str = Field(..., description="ファイルID")
+    offset: int = Field(..., description="実際の開始位置（UTF-8バイト、文字境界に整列）")
+    next_offset: int = Field(..., description="続きを取得する際の offset")
+    total_bytes: int = Field(..., description="抽出テキスト全体のサイズ（バイト）")
+    content: str = Field(..., description="抽出テキスト（指定範囲）")
+
+
+class FileStatusResponse(BaseModel):
+    """Background ingestion status"""
+    file_id: str = Field(..., description="ファイルID")
+    session_id: str = Field(..., description="関連セッションID")
+    status: FileStatus = Field(..., description="抽出処理状態")
+    progress: float = Field(0.0, ge=0.0, le=1.0, description="進捗（0.0〜1.0）")
+    error: Optional[str] = Field(None, description="エラーメッセージ")
+    updated_at: datetime = Field(default_factory=datetime.now, description="最終更新時刻")
+
+
+class BatchUploadItem(BaseModel):
+    """Per-file result of a batch upload"""
+    filename: str = Field(..., description="元のファイル名")
+    success: bool = Field(..., description="処理成功フラグ")
+    status_code: int = Field(..., description="単体アップロード時と同等のHTTPステータス")
+    file: Optional[UploadedFile] = Field(None, description="アップロードされたファイル情報")
+    error: Optional[str] = Field(None, description="エラーメッセージ")
+
+
+class BatchUploadResponse(BaseModel):
+    """Batch upload response model (partial failures allowed)"""
+    results: List[BatchUploadItem] = Field(default_factory=list, description="ファイルごとの結果（送信順）")
+    succeeded: int = Field(0, description="成功件数")
+    failed: int = Field(0, description="失敗件数")
+    processing_time: float = Field(..., description="処理時間（秒）")
+
+
 class FileProcessingResult(BaseModel):
     """File processing result model"""
     file_id: str = Field(..., description="ファイルID")
@@ -35,3 +77,41 @@ class FileProcessingResult(BaseModel):
     extracted_text: Optional[str] = Field(None, description="抽出されたテキスト")
     error_message: Optional[str] = Field(None, description="エラーメッセージ")
     processing_time: float = Field(..., description="処理時間（秒）")
+
+
+class ValueCount(BaseModel):
+    """Frequent value with its occurrence count"""
+    value: str = Field(..., description="値")
+    count: int = Field(..., description="出現回数")
+
+
+class ColumnSummary(BaseModel):
+    """Per-column statistics for tabular files"""
+    name: str = Field(..., description="列名")
+    dtype: str = Field(..., description="推定型 (numeric / text)")
+    non_null: int = Field(0, description="非null件数")
+    nulls: int = Field(0, description="null件数")
+    min: Optional[Union[float, str]] = Field(None, description="最小値")
+    max: Optional[Union[float, str]] = Field(None, description="最大値")
+    mean: Optional[float] = Field(None, description="平均値（数値列のみ）")
+    top_values: List[ValueCount] = Field(default_factory=list, description="頻出値（近似）")
+
+
+class TableSummary(BaseModel):
+    """Schema and statistics summary of a spreadsheet"""
+    row_count: int = Field(0, description="行数")
+    column_count: int = Field(0, description="列数")
+    columns: List[ColumnSummary] = Field(default_factory=list, description="列ごとの統計")
+    sample_rows: List[List[Optional[str]]] = Field(default_factory=list, description="先頭行のサンプル")
+
+
+class TableRowsResponse(BaseModel):
+    """Exact rows fetched from the columnar cache"""
+    file_id: str = Field(..., description="ファイルID")
+    offset: int = Field(..., description="開始行（0始まり）")
+    columns: List[str] = Field(default_factory=list, description="列名")
+    rows: List[List[Optional[Union[float, str]]]] = Field(default_factory=list, description="行データ")
+    total_rows: int = Field(0, description="総行数")
+
+
+UploadedFile.model_rebuild()
@@ -0,0 +1,85 @@
+"""LLM provider metrics data models"""
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class HedgeStats(BaseModel):
+    """Hedged requests between the primary and fallback model"""
+    enabled: bool = Field(..., description="ヘッジ実行が有効か")
+    requests: int = Field(0, description="ヘッジ対象のリクエスト数")
+    hedged: int = Field(0, description="フォールバックモデルにも送ったリクエスト数")
+    hedge_wins: int = Field(0, description="ヘッジ側が先に応答したリクエスト数")
+    fallbacks: int = Field(0, description="プライマリ失敗後にフォールバックしたリクエスト数")
+    budget_skipped: int = Field(0, description="上限によりヘッジを見送ったリクエスト数")
+    hedge_rate: float = Field(0.0, description="ヘッジ率（hedged / requests）")
+    max_rate: float = Field(0.0, description="ヘッジ率の上限")
+    delay_ms: float = Field(0.0, description="現在のヘッジ開始遅延（ミリ秒）")
+    primary_p95_ms: Optional[float] = Field(None, description="プライマリ応答時間のp95（直近、ミリ秒）")
+
+
+class BreakerStats(BaseModel):
+    """Circuit breaker of one model"""
+    model: str = Field(..., description="モデル名")
+    state: Literal["closed", "open", "half_open"] = Field(..., description="ブレーカーの状態")
+    calls: int = Field(0, description="集計期間内の呼び出し数")
+    failure_rate: float = Field(0.0, description="集計期間内の失敗・遅延の割合")
+    opened: int = Field(0, description="オープンになった回数")
+    rejected: int = Field(0, description="オープン中に送らなかった呼び出し数")
+
+
+class RetryStats(BaseModel):
+    """Rate-limit retry budget counters"""
+    requests: int = Field(0, description="プライマリモデルへのリクエスト数")
+    retries: int = Field(0, description="再試行した回数")
+    exhausted: int = Field(0, description="上限により再試行を見送った回数")
+    retry_rate: float = Field(0.0, description="再試行率（retries / requests）")
+    ratio: float = Field(0.0, description="再試行率の上限")
+
+
+class SpeculationStats(BaseModel):
+    """Speculative classify-and-answer counters"""
+    enabled: bool = Field(False, description="投機実行が有効か")
+    paused: bool = Field(False, description="的中率の低下により一時停止中か")
+    started: int = Field(0, description="投機実行を開始した回数")
+    hits: int = Field(0, description="分類と一致し回答を採用した回数")
+    misses: int = Field(0, description="分類と不一致で破棄した回数")
+    skipped: int = Field(0, description="一時停止中のため投機しなかった回数")
+    hit_rate: float = Field(0.0, description="的中率（累計）")
+    recent_hit_rate: Optional[float] = Field(None, description="的中率（直近の集計窓）")
+    saved_ms_total: float = Field(0.0, description="短縮した待ち時間の合計（ミリ秒）")
+    saved_ms_avg: float = Field(0.0, description="的中1回あたりの短縮時間（ミリ秒）")
+
+
+class UsageTotals(BaseModel):
+    """Token usage totals of one agent or session"""
+    key: str = Field(..., description="エージェント種別またはセッションID")
+    requests: int = Field(0, description="LLM呼び出し数")
+    prompt_tokens: int = Field(0, description="入力トークン数の合計")
+    output_tokens: int = Field(0, description="出力トークン数の合計")
+    prompt_tokens_avg: float = Field(0.0, description="1回あたりの入力トークン数")
+    latency_ms_avg: float = Field(0.0, description="1回あたりの応答時間（ミリ秒）")
+
+
+class UsageStats(BaseModel):
+    """Token usage by agent and by session"""
+    agents: List[UsageTotals] = Field(default_factory=list, description="エージェント（タスク）別の合計")
+    sessions: List[UsageTotals] = Field(default_factory=list, description="セッション別の合計（直近のもの）")
+
+
+class PrefixCacheStats(BaseModel):
+    """Cached prompt prefixes (file context) shared across turns"""
+    entries: int = Field(0, description="保持中のキャッシュ数")
+    hits: int = Field(0, description="再利用した回数")
+    misses: int = Field(0, description="新規にアップロードした回数")
+    evictions: int = Field(0, description="期限切れ・無効化で破棄した数")
+    failed: int = Field(0, description="作成に失敗し、TTLの間は再作成しないキーの数")
+
+
+class LLMMetricsResponse(BaseModel):
+    """LLM provider metrics"""
+    hedging: HedgeStats = Field(..., description="ヘッジ実行の状況")
+    breakers: List[BreakerStats] = Field(default_factory=list, description="モデルごとのサーキットブレーカー")
+    usage: UsageStats = Field(default_factory=UsageStats, description="トークン使用量")
+    prefix_cache: PrefixCacheStats = Field(default_factory=PrefixCacheStats, description="プロンプト接頭辞キャッシュ")
+    retries: RetryStats = Field(default_factory=RetryStats, description="レート制限時の再試行")
+    speculation: SpeculationStats = Field(default_factory=SpeculationStats, description="分類と回答の投機的並列実行")
@@ -0,0 +1,22 @@
+"""Tool execution data models"""
+from typing import List, Literal
+from pydantic import BaseModel, Field
+
+
+class ToolPoolStats(BaseModel):
+    """Occupancy of one tool executor pool"""
+    tool: str = Field(..., description="ツール名")
+    kind: Literal["thread", "process"] = Field(..., description="実行プールの種類")
+    max_workers: int = Field(..., description="ワーカー数")
+    max_queue: int = Field(..., description="待ち行列の上限")
+    active: int = Field(..., description="実行中の呼び出し数")
+    queued: int = Field(..., description="待機中の呼び出し数")
+    completed: int = Field(0, description="完了した呼び出し数")
+    rejected: int = Field(0, description="満杯のため拒否した呼び出し数")
+    queue_wait_ms_avg: float = Field(0.0, description="待ち時間の平均（直近、ミリ秒）")
+    queue_wait_ms_p95: float = Field(0.0, description="待ち時間のp95（直近、ミリ秒）")
+
+
+class ToolMetricsResponse(BaseModel):
+    """Tool executor metrics"""
+    pools: List[ToolPoolStats] = Field(default_factory=list, description="ツールごとの実行プール状況")
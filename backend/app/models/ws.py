@@ -5,9 +5,10 @@ from typing import Literal, Union
 from pydantic import BaseModel, Field
 
 from app.models.chat import ChatMessage
+from app.models.files import FileStatusResponse
 
 
-WSMessageType = Literal["status", "message", "error"]
+WSMessageType = Literal["status", "message", "error", "file_status"]
 
 
 class WSStatus(BaseModel):
@@ -28,4 +29,10 @@ class WSChatMessage(BaseModel):
     data: ChatMessage
 
 
-WSMessage = Union[WSStatus, WSError, WSChatMessage]
+class WSFileStatus(BaseModel):
+    type: Literal["file_status"] = Field("file_status")
+    session_id: str
+    data: FileStatusResponse
+
+
+WSMessage = Union[WSStatus, WSError, WSChatMessage, WSFileStatus]
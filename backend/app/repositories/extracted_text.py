@@ -0,0 +1,97 @@
+"""Disk-backed storage for extracted file text with mmap-based range reads"""
+from __future__ import annotations
+
+import mmap
+import os
+from typing import NamedTuple, Optional
+
+import structlog
+
+
+logger = structlog.get_logger()
+
+
+class TextSlice(NamedTuple):
+    text: str
+    start: int  # byte offset actually used (aligned to a UTF-8 boundary)
+    end: int  # exclusive byte offset
+    total_bytes: int
+
+
+def _is_continuation(byte: int) -> bool:
+    return (byte & 0xC0) == 0x80
+
+
+class ExtractedTextStore:
+    """Stores extracted text as UTF-8 files under `root_dir`.
+
+    Only metadata stays in memory; reads slice the file through `mmap` so a
+    ranged read touches just the requested pages.
+    """
+
+    def __init__(self, root_dir: str) -> None:
+        self._root = root_dir
+
+    def path_for(self, file_id: str) -> str:
+        return os.path.join(self._root, f"{os.path.basename(file_id)}.txt")
+
+    def write(self, file_id: str, text: str) -> int:
+        """Persist text and return its size in bytes."""
+        os.makedirs(self._root, exist_ok=True)
+        data = text.encode("utf-8")
+        path = self.path_for(file_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def exists(self, file_id: str) -> bool:
+        return os.path.exists(self.path_for(file_id))
+
+    def read_range(self, file_id: str, offset: int, length: int) -> Optional[TextSlice]:
+        """Read about `length` bytes starting at `offset`.
+
+        Offsets are moved to UTF-8 character boundaries so multi-byte
+        characters are never split; use `TextSlice.end` as the next offset.
+        """
+        path = self.path_for(file_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return TextSlice("", 0, 0, 0)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = min(max(offset, 0), size)
+                while start < size and _is_continuation(mm[start]):
+                    start += 1
+                end = min(start + max(length, 0), size)
+                while start < end < size and _is_continuation(mm[end]):
+                    end -= 1
+                if end == start and start < size:
+                    # Requested window is smaller than one character: return it whole
+                    end = start + 1
+                    while end < size and _is_continuation(mm[end]):
+                        end += 1
+                data = mm[start:end]
+        return TextSlice(data.decode("utf-8", errors="replace"), start, end, size)
+
+    def read_all(self, file_id: str) -> Optional[str]:
+        path = self.path_for(file_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[:].decode("utf-8", errors="replace")
+
+    def delete(self, file_id: str) -> None:
+        path = self.path_for(file_id)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("extracted_text_delete_failed", file_id=file_id, error=str(e))
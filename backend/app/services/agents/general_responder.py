@@ -9,41 +9,33 @@ from typing import Optional
 import structlog
 
 from app.services.llm.base import LLMProvider
+from app.services.agents.prompting import generate_answer, register_template
 from app.services.agents.types import AgentInput, AgentOutput
 
 logger = structlog.get_logger()
 
 
-async def run_v2(llm: Optional[LLMProvider], inp: AgentInput) -> AgentOutput:
-    """New I/F: AgentInput -> AgentOutput.
+_ROLE = """以下の質問に対して、親切で丁寧な回答を提供してください："""
 
-    旧I/F互換のためのラッパーは `run()` に実装。こちらが実体。
-    """
-    log = logger.bind(agent="general", agent_io_version="v2")
+_GUIDELINES = """製造業とPython技術指導を専門とするAIアシスタントとして、
+可能であれば専門分野との関連性も含めて回答してください。
+日本語で回答してください。"""
 
-    context_info = ""
-    if inp.conversation_history:
-        context_info += f"\n\n過去の会話:\n{inp.conversation_history}"
-    if inp.file_context:
-        context_info += f"\n\n関連ファイル:\n{inp.file_context}"
 
-    prompt = f"""
-    以下の質問に対して、親切で丁寧な回答を提供してください：
+register_template("general", _ROLE, _GUIDELINES)
 
-    質問: {inp.user_query}
-    {context_info}
 
-    製造業とPython技術指導を専門とするAIアシスタントとして、
-    可能であれば専門分野との関連性も含めて回答してください。
-    日本語で回答してください。
+async def run_v2(llm: Optional[LLMProvider], inp: AgentInput) -> AgentOutput:
+    """New I/F: AgentInput -> AgentOutput.
 
-    回答:
+    旧I/F互換のためのラッパーは `run()` に実装。こちらが実体。
     """
+    log = logger.bind(agent="general", agent_io_version="v2")
 
     try:
         log.info("agent_started")
         if getattr(llm, "is_configured", False):
-            content = await llm.generate(prompt)
+            content = await generate_answer(llm, _ROLE, _GUIDELINES, inp)
             log.info("agent_completed")
             return AgentOutput(content=content)
         fallback = (
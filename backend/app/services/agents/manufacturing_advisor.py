@@ -9,42 +9,34 @@ from typing import Optional
 import structlog
 
 from app.services.llm.base import LLMProvider
+from app.services.agents.prompting import generate_answer, register_template
 from app.services.agents.types import AgentInput, AgentOutput
 
 logger = structlog.get_logger()
 
 
-async def run_v2(llm: Optional[LLMProvider], inp: AgentInput) -> AgentOutput:
-    """New I/F: AgentInput -> AgentOutput for Manufacturing advisor."""
-    log = logger.bind(agent="manufacturing", agent_io_version="v2")
+_ROLE = """あなたは製造業の改善活動を専門とするAIコンサルタントです。
+以下の質問に対して、実践的で具体的なアドバイスを提供してください。"""
 
-    context_info = ""
-    if inp.conversation_history:
-        context_info += f"\n\n過去の会話:\n{inp.conversation_history}"
-    if inp.file_context:
-        context_info += f"\n\n関連ファイル:\n{inp.file_context}"
+_GUIDELINES = """回答の際は以下の点を考慮してください：
+- 製造業の現場で実際に適用できる実践的な提案
+- 改善活動のステップを具体的に説明
+- 可能であれば数値目標や測定方法も含める
+- リスクや注意点も言及する
+- 日本語で丁寧に回答する"""
 
-    prompt = f"""
-    あなたは製造業の改善活動を専門とするAIコンサルタントです。
-    以下の質問に対して、実践的で具体的なアドバイスを提供してください。
 
-    質問: {inp.user_query}
-    {context_info}
+register_template("manufacturing", _ROLE, _GUIDELINES)
 
-    回答の際は以下の点を考慮してください：
-    - 製造業の現場で実際に適用できる実践的な提案
-    - 改善活動のステップを具体的に説明
-    - 可能であれば数値目標や測定方法も含める
-    - リスクや注意点も言及する
-    - 日本語で丁寧に回答する
 
-    回答:
-    """
+async def run_v2(llm: Optional[LLMProvider], inp: AgentInput) -> AgentOutput:
+    """New I/F: AgentInput -> AgentOutput for Manufacturing advisor."""
+    log = logger.bind(agent="manufacturing", agent_io_version="v2")
 
     try:
         log.info("agent_started")
         if getattr(llm, "is_configured", False):
-            content = await llm.generate(prompt)
+            content = await generate_answer(llm, _ROLE, _GUIDELINES, inp)
             log.info("agent_completed")
             return AgentOutput(content=content)
         fallback = "申し訳ございません。現在LLMプロバイダが設定されていないため、製造業に関する詳細なアドバイスを提供できません。API設定を確認してください。"
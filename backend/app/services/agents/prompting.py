@@ -0,0 +1,61 @@
+"""Prompt assembly shared by the agents.
+
+An agent prompt is its role line, the question with its context, and the
+answer guidelines. When files are attached and the provider supports prefix
+caching, the stable part (role, guidelines and file context) is sent as a
+cached prefix and only the question, history and tool results vary per turn.
+
+Agents register their role and guidelines with `register_template()`, so the
+workflow's token budgets account for the real size of the fixed text.
+"""
+from __future__ import annotations
+
+from typing import Dict
+
+from app.services.agents.types import AgentInput
+from app.services.llm.base import LLMProvider, PrefixCachingLLMProvider
+from app.services.llm.usage import estimate_tokens
+
+# Fixed prompt tokens (role, guidelines, section headers) by agent name
+_TEMPLATE_TOKENS: Dict[str, int] = {}
+# Every context section present but empty: only the headers count
+_HEADERS_ONLY = AgentInput(user_query="", conversation_history="\n", file_context="\n", tool_context="\n")
+
+
+def context_info(inp: AgentInput, include_files: bool = True) -> str:
+    """History, file and tool context sections of the prompt."""
+    info = ""
+    if inp.conversation_history:
+        info += f"\n\n過去の会話:\n{inp.conversation_history}"
+    if include_files and inp.file_context:
+        info += f"\n\n関連ファイル:\n{inp.file_context}"
+    if inp.tool_context:
+        info += f"\n\n直近のツール結果（#番号で参照）:\n{inp.tool_context}"
+    return info
+
+
+def build_prompt(role: str, guidelines: str, inp: AgentInput) -> str:
+    """Whole prompt in one piece."""
+    return f"{role}\n\n質問: {inp.user_query}{context_info(inp)}\n\n{guidelines}\n\n回答:\n"
+
+
+async def generate_answer(llm: LLMProvider, role: str, guidelines: str, inp: AgentInput) -> str:
+    """Generate the agent's answer, reusing the file context as a cached prefix when possible."""
+    if inp.file_context and isinstance(llm, PrefixCachingLLMProvider):
+        prefix = f"{role}\n\n{guidelines}\n\n関連ファイル:\n{inp.file_context}"
+        prompt = f"質問: {inp.user_query}{context_info(inp, include_files=False)}\n\n回答:\n"
+        return await llm.generate_with_prefix(prefix, prompt)
+    return await llm.generate(build_prompt(role, guidelines, inp))
+
+
+def register_template(agent: str, role: str, guidelines: str) -> None:
+    """Record the fixed prompt size of `agent` (called by the agent module on import)."""
+    _TEMPLATE_TOKENS[agent] = estimate_tokens(build_prompt(role, guidelines, _HEADERS_ONLY))
+
+
+def template_tokens(agent: str) -> int:
+    """Fixed prompt tokens of `agent`; the largest known template for unregistered (plugin) agents."""
+    return _TEMPLATE_TOKENS.get(agent, max(_TEMPLATE_TOKENS.values(), default=0))
+
+
+__all__ = ["context_info", "build_prompt", "generate_answer", "register_template", "template_tokens"]
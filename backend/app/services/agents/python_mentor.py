@@ -9,43 +9,35 @@ from typing import Optional
 import structlog
 
 from app.services.llm.base import LLMProvider
+from app.services.agents.prompting import generate_answer, register_template
 from app.services.agents.types import AgentInput, AgentOutput
 
 logger = structlog.get_logger()
 
 
-async def run_v2(llm: Optional[LLMProvider], inp: AgentInput) -> AgentOutput:
-    """New I/F: AgentInput -> AgentOutput for Python mentor."""
-    log = logger.bind(agent="python", agent_io_version="v2")
+_ROLE = """あなたは製造業で使用するPythonの専門講師です。
+以下の質問に対して、実用的で理解しやすい回答を提供してください。"""
 
-    context_info = ""
-    if inp.conversation_history:
-        context_info += f"\n\n過去の会話:\n{inp.conversation_history}"
-    if inp.file_context:
-        context_info += f"\n\n関連ファイル:\n{inp.file_context}"
+_GUIDELINES = """回答の際は以下の点を考慮してください：
+- 製造業の現場で活用できるPythonの使い方
+- 具体的なコード例を含める（可能な場合）
+- 初心者にも理解しやすい説明
+- データ分析や自動化への応用も含める
+- セキュリティや効率性も考慮する
+- 日本語で丁寧に回答する"""
 
-    prompt = f"""
-    あなたは製造業で使用するPythonの専門講師です。
-    以下の質問に対して、実用的で理解しやすい回答を提供してください。
 
-    質問: {inp.user_query}
-    {context_info}
+register_template("python", _ROLE, _GUIDELINES)
 
-    回答の際は以下の点を考慮してください：
-    - 製造業の現場で活用できるPythonの使い方
-    - 具体的なコード例を含める（可能な場合）
-    - 初心者にも理解しやすい説明
-    - データ分析や自動化への応用も含める
-    - セキュリティや効率性も考慮する
-    - 日本語で丁寧に回答する
 
-    回答:
-    """
+async def run_v2(llm: Optional[LLMProvider], inp: AgentInput) -> AgentOutput:
+    """New I/F: AgentInput -> AgentOutput for Python mentor."""
+    log = logger.bind(agent="python", agent_io_version="v2")
 
     try:
         log.info("agent_started")
         if getattr(llm, "is_configured", False):
-            content = await llm.generate(prompt)
+            content = await generate_answer(llm, _ROLE, _GUIDELINES, inp)
             log.info("agent_completed")
             return AgentOutput(content=content)
         fallback = "申し訳ございません。現在LLMプロバイダが設定されていないため、Python技術指導を提供できません。API設定を確認してください。"
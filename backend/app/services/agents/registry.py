@@ -2,25 +2,30 @@
 
 Provides a central mapping from logical agent names to their async `run` callables.
 This enables easy addition/replacement of agents without changing callers.
+Agents are imported on first use; more are discovered from the
+"aiconsal.agents" entry point group.
 """
 from __future__ import annotations
 
-from typing import Dict, Optional
+from typing import Optional
+
+from app.core.plugins import AGENT_PLUGIN_GROUP, LazyPluginRegistry, PluginSpec
 
 from .types import AgentFnV2
-from . import manufacturing_advisor, python_mentor, general_responder
 
 
 # V2-only: legacy registry removed. All agents must implement run_v2.
 
 
 # Optional v2 registry for structured I/O (AgentInput/AgentOutput)
-_REGISTRY_V2: Dict[str, AgentFnV2] = {
-    # Adopt v2 incrementally starting with general agent
-    "general": general_responder.run_v2,
-    "python": python_mentor.run_v2,
-    "manufacturing": manufacturing_advisor.run_v2,
-}
+_REGISTRY_V2: LazyPluginRegistry = LazyPluginRegistry(
+    AGENT_PLUGIN_GROUP,
+    {
+        "general": PluginSpec(name="general", target="app.services.agents.general_responder:run_v2"),
+        "python": PluginSpec(name="python", target="app.services.agents.python_mentor:run_v2"),
+        "manufacturing": PluginSpec(name="manufacturing", target="app.services.agents.manufacturing_advisor:run_v2"),
+    },
+)
 
 
 def get_agent_v2(name: str) -> Optional[AgentFnV2]:
@@ -31,4 +36,9 @@ def get_agent_v2(name: str) -> Optional[AgentFnV2]:
     return _REGISTRY_V2.get(name)
 
 
-__all__ = ["get_agent_v2"]
+def get_agent_spec(name: str) -> Optional[PluginSpec]:
+    """Metadata of an agent plugin (timeout etc.), if declared."""
+    return _REGISTRY_V2.spec(name)
+
+
+__all__ = ["get_agent_v2", "get_agent_spec"]
@@ -18,6 +18,7 @@ class AgentInput(BaseModel):
     user_query: str
     conversation_history: str = ""
     file_context: str = ""
+    tool_context: str = ""  # summaries of recent tool results in the session
 
 
 class AgentOutput(BaseModel):
@@ -2,9 +2,11 @@
 from typing import List, Optional
 import structlog
 
+from app.core.config import get_settings
 from app.models.chat import ChatMessage, ChatHistory, SessionInfo
 from app.services.langgraph_service import LangGraphService
 from app.services.file_service import FileService
+from app.services.ingestion import get_ingestion_queue
 from app.repositories.chat_history import (
     ChatHistoryRepository,
     InMemoryChatHistoryRepository,
@@ -121,13 +123,32 @@ class ChatService:
         return "\n".join(context_lines)
     
     async def _get_file_context(self, file_ids: List[str]) -> str:
-        """Get context from uploaded files"""
+        """Get context from uploaded files
+
+        Files still being extracted in the background are waited for up to
+        `ingest_chat_wait_seconds`; any that are not ready by then are skipped.
+        """
+        file_infos = [await self._file_service.get_file_info(file_id) for file_id in file_ids]
+
+        processing = [f.id for f in file_infos if f and f.status == "processing"]
+        if processing:
+            wait_s = float(get_settings().ingest_chat_wait_seconds)
+            still_processing = await get_ingestion_queue().wait(processing, timeout=wait_s)
+            if still_processing:
+                logger.info(
+                    "file_context_skipped_processing",
+                    file_ids=still_processing,
+                    waited_s=wait_s,
+                )
+            file_infos = [await self._file_service.get_file_info(file_id) for file_id in file_ids]
+
         file_contexts = []
-        
-        for file_id in file_ids:
-            file_info = await self._file_service.get_file_info(file_id)
-            if file_info and file_info.content:
-                file_contexts.append(f"ファイル '{file_info.original_filename}':\n{file_info.content}")
+        for file_info in file_infos:
+            if not file_info or file_info.status == "processing":
+                continue
+            content = await self._file_service.read_content(file_info.id)
+            if content:
+                file_contexts.append(f"ファイル '{file_info.original_filename}':\n{content}")
         
         return "\n\n".join(file_contexts)
     
@@ -0,0 +1,5 @@
+"""Extractors package
+
+Format-specific text/data extraction used by `FileService`.
+"""
+from __future__ import annotations
@@ -0,0 +1,35 @@
+"""Binary document extractors (PDF/DOCX)."""
+from __future__ import annotations
+
+from .types import ExtractionContext, ExtractionResult
+
+
+def extract_pdf(file_path: str, ctx: ExtractionContext) -> ExtractionResult:
+    try:
+        import PyPDF2
+        text_content = []
+
+        with open(file_path, 'rb') as f:
+            pdf_reader = PyPDF2.PdfReader(f)
+            for page in pdf_reader.pages:
+                text_content.append(page.extract_text())
+
+        return ExtractionResult(text='\n'.join(text_content))
+    except ImportError:
+        return ExtractionResult(text="PDFファイルの処理にはPyPDF2が必要です")
+    except Exception as e:
+        return ExtractionResult(text=f"PDFファイルの読み取りエラー: {str(e)}")
+
+
+def extract_docx(file_path: str, ctx: ExtractionContext) -> ExtractionResult:
+    try:
+        from docx import Document
+        doc = Document(file_path)
+        return ExtractionResult(text='\n'.join([paragraph.text for paragraph in doc.paragraphs]))
+    except ImportError:
+        return ExtractionResult(text="DOCXファイルの処理にはpython-docxが必要です")
+    except Exception as e:
+        return ExtractionResult(text=f"DOCXファイルの読み取りエラー: {str(e)}")
+
+
+__all__ = ["extract_pdf", "extract_docx"]
@@ -0,0 +1,164 @@
+"""Extractor registry and format sniffing.
+
+Maps formats to extractors and resolves the extractor for an uploaded file
+from its magic bytes, using the extension only to disambiguate text formats.
+Each extractor declares whether it streams, whether it benefits from a
+process pool, and a relative cost used by `choose_placement`.
+"""
+from __future__ import annotations
+
+import json
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from .documents import extract_docx, extract_pdf
+from .spreadsheet import extract_spreadsheet
+from .text import extract_html, extract_json, extract_plain_text
+from .types import ExtractorFn
+
+
+@dataclass(frozen=True)
+class Extractor:
+    name: str
+    extensions: Tuple[str, ...]
+    func: ExtractorFn
+    # Reads the file incrementally (memory bounded regardless of size); the
+    # I/O grows with the file, so these never run inline on the event loop
+    streaming: bool = False
+    # CPU-bound in pure Python; large inputs should go to a process pool
+    process_pool: bool = False
+    # Relative cost per MiB of input (roughly seconds on a single core)
+    cost_per_mb: float = 0.01
+
+    def estimate_cost(self, size_bytes: int) -> float:
+        return self.cost_per_mb * max(size_bytes, 1) / (1024 * 1024)
+
+
+EXTRACTORS: Dict[str, Extractor] = {
+    "txt": Extractor("txt", (".txt",), extract_plain_text, cost_per_mb=0.01),
+    "log": Extractor("log", (".log",), extract_plain_text, cost_per_mb=0.01),
+    "md": Extractor("md", (".md", ".markdown"), extract_plain_text, cost_per_mb=0.01),
+    "json": Extractor("json", (".json",), extract_json, cost_per_mb=0.05),
+    "html": Extractor("html", (".html", ".htm"), extract_html, cost_per_mb=0.1),
+    "csv": Extractor("csv", (".csv",), extract_spreadsheet, streaming=True, cost_per_mb=0.2),
+    "xlsx": Extractor("xlsx", (".xlsx",), extract_spreadsheet, streaming=True, process_pool=True, cost_per_mb=1.0),
+    "pdf": Extractor("pdf", (".pdf",), extract_pdf, process_pool=True, cost_per_mb=2.0),
+    "docx": Extractor("docx", (".docx",), extract_docx, process_pool=True, cost_per_mb=0.5),
+}
+
+_BY_EXTENSION: Dict[str, str] = {
+    ext: name for name, extractor in EXTRACTORS.items() for ext in extractor.extensions
+}
+
+# Formats whose content is text; the extension picks among them
+_TEXT_FORMATS = {"txt", "log", "md", "json", "html", "csv"}
+
+_SNIFF_BYTES = 8 * 1024
+
+
+def supported_extensions() -> Tuple[str, ...]:
+    """Upload extensions accepted by the registry (the upload allow-list)."""
+    return tuple(sorted(_BY_EXTENSION))
+
+
+def _sniff_zip(file_path: str) -> Optional[str]:
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            names = set(zf.namelist())
+    except (zipfile.BadZipFile, OSError):
+        return None
+    if "word/document.xml" in names:
+        return "docx"
+    if "xl/workbook.xml" in names:
+        return "xlsx"
+    return None
+
+
+def _looks_binary(head: bytes) -> bool:
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return False  # UTF-16 text with BOM
+    return b"\x00" in head
+
+
+def _sniff_text_format(head: bytes) -> str:
+    stripped = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if stripped.startswith((b"<!doctype html", b"<html")):
+        return "html"
+    if stripped[:1] in (b"{", b"["):
+        try:
+            json.loads(head.decode("utf-8"))
+            return "json"
+        except (UnicodeDecodeError, ValueError):
+            pass
+    return "txt"
+
+
+def sniff_format(file_path: str, declared_type: str) -> str:
+    """Resolve the extractor name for a file.
+
+    Magic bytes win over the extension for binary formats (a `.txt` that is
+    really a PDF is read as PDF). For text content, the declared extension
+    selects the text format, falling back to content sniffing when it names
+    a binary format. Raises ValueError for unknown or unsupported content.
+    """
+    declared = _BY_EXTENSION.get((declared_type or "").lower())
+    if declared is None:
+        raise ValueError(f"Unsupported file type: {declared_type}")
+
+    with open(file_path, "rb") as f:
+        head = f.read(_SNIFF_BYTES)
+
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        sniffed = _sniff_zip(file_path)
+        if sniffed:
+            return sniffed
+        if declared in ("docx", "xlsx"):
+            return declared  # corrupt container: let the extractor report it
+        raise ValueError(f"Unsupported archive content for {declared_type}")
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        raise ValueError("Legacy Office (OLE) files are not supported; save as .docx/.xlsx")
+    if _looks_binary(head):
+        if declared in _TEXT_FORMATS:
+            raise ValueError(f"Binary content does not match {declared_type}")
+        return declared
+
+    if declared in _TEXT_FORMATS:
+        return declared
+    return _sniff_text_format(head)
+
+
+def resolve_extractor(file_path: str, declared_type: str) -> Extractor:
+    return EXTRACTORS[sniff_format(file_path, declared_type)]
+
+
+def choose_placement(
+    extractor: Extractor,
+    size_bytes: int,
+    inline_max_cost: float,
+    process_min_cost: float,
+) -> str:
+    """Decide where to run an extractor: `inline`, `thread`, or `process`.
+
+    Only cheap, non-streaming extractors run inline; streaming ones read in
+    chunks until EOF (and spreadsheets write their row cache), so they always
+    leave the event loop.
+    """
+    cost = extractor.estimate_cost(size_bytes)
+    if extractor.process_pool and cost >= process_min_cost:
+        return "process"
+    if cost <= inline_max_cost and not extractor.streaming:
+        return "inline"
+    return "thread"
+
+
+__all__ = [
+    "Extractor",
+    "EXTRACTORS",
+    "supported_extensions",
+    "sniff_format",
+    "resolve_extractor",
+    "choose_placement",
+]
@@ -0,0 +1,431 @@
+"""Columnar spreadsheet ingestion.
+
+Streams CSV/XLSX files in fixed-size chunks with explicit dtypes, accumulates
+per-column statistics, and writes the rows to a compact columnar cache so that
+exact rows can be fetched later without keeping the DataFrame in memory.
+
+The cache is Parquet when `pyarrow` is installed and gzip-compressed CSV
+otherwise. Memory use is bounded by `chunk_rows` plus the (capped) top-k
+counters, independent of the file size.
+"""
+from __future__ import annotations
+
+import os
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import structlog
+
+from app.models.files import ColumnSummary, TableSummary, ValueCount
+
+from .text import detect_encoding
+from .types import ExtractionContext, ExtractionResult
+
+logger = structlog.get_logger()
+
+# Rows used to infer column kinds before streaming the whole file
+_SAMPLE_ROWS_FOR_INFERENCE = 1000
+# Upper bound of distinct values tracked per column for top-k (approximate)
+_MAX_TRACKED_VALUES = 1000
+# Longest value kept in the top-k counters / sample rows
+_MAX_VALUE_CHARS = 80
+
+
+def _clip(value: str) -> str:
+    return value if len(value) <= _MAX_VALUE_CHARS else value[:_MAX_VALUE_CHARS] + "..."
+
+
+class _ColumnAccumulator:
+    """Streaming statistics for a single column."""
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.non_null = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.counter: Counter = Counter()
+
+    def update(self, series) -> None:
+        non_null = series.dropna()
+        self.non_null += int(non_null.size)
+        self.nulls += int(series.size - non_null.size)
+        if non_null.empty:
+            return
+
+        if self.kind == "numeric":
+            lo, hi = float(non_null.min()), float(non_null.max())
+            self.total += float(non_null.sum())
+        else:
+            lo, hi = str(non_null.min()), str(non_null.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+        for value, count in non_null.value_counts().items():
+            key = _fmt_number(value) if self.kind == "numeric" else _clip(str(value))
+            self.counter[key] += int(count)
+        if len(self.counter) > _MAX_TRACKED_VALUES:
+            # Keep the heavy hitters only; counts of evicted values are lost,
+            # so top-k is approximate for high-cardinality columns.
+            self.counter = Counter(dict(self.counter.most_common(_MAX_TRACKED_VALUES // 2)))
+
+    def summary(self, top_k: int) -> ColumnSummary:
+        mean = None
+        if self.kind == "numeric" and self.non_null:
+            mean = self.total / self.non_null
+        return ColumnSummary(
+            name=self.name,
+            dtype=self.kind,
+            non_null=self.non_null,
+            nulls=self.nulls,
+            min=self.min,
+            max=self.max,
+            mean=mean,
+            top_values=[ValueCount(value=v, count=c) for v, c in self.counter.most_common(top_k)],
+        )
+
+
+class _NonNumericValue(Exception):
+    """A column inferred as numeric holds a value that does not parse."""
+
+    def __init__(self, column: str):
+        super().__init__(column)
+        self.column = column
+
+
+def _infer_kinds(sample, text_columns: frozenset = frozenset()) -> Dict[str, str]:
+    """Infer `numeric` / `text` per column from a string-typed sample.
+
+    A column is numeric only when every non-null sample value parses, so
+    values like "N/A" are never coerced away.
+    """
+    import pandas as pd
+
+    kinds: Dict[str, str] = {}
+    for col in sample.columns:
+        values = sample[col].dropna()
+        if values.empty or col in text_columns:
+            kinds[col] = "text"
+            continue
+        parsed = pd.to_numeric(values, errors="coerce")
+        kinds[col] = "numeric" if parsed.notna().all() else "text"
+    return kinds
+
+
+def _apply_kinds(chunk, kinds: Dict[str, str]):
+    """Convert a string-typed chunk to the explicit dtypes chosen up front.
+
+    Raises `_NonNumericValue` when a numeric column holds a value that does
+    not parse, instead of silently turning it into NaN.
+    """
+    import pandas as pd
+
+    for col, kind in kinds.items():
+        if kind == "numeric":
+            parsed = pd.to_numeric(chunk[col], errors="coerce")
+            if (parsed.isna() & chunk[col].notna()).any():
+                raise _NonNumericValue(col)
+            chunk[col] = parsed.astype("float64")
+        else:
+            chunk[col] = chunk[col].astype("object")
+    return chunk
+
+
+def _iter_csv_chunks(file_path: str, chunk_rows: int) -> Iterator:
+    import pandas as pd
+
+    with open(file_path, "rb") as f:
+        encoding = detect_encoding(f.read(64 * 1024))
+    if encoding == "utf-8":
+        encoding = "utf-8-sig"
+    # Only empty cells are null; markers such as "N/A" are kept as written
+    reader = pd.read_csv(
+        file_path,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+        chunksize=chunk_rows,
+        encoding=encoding,
+        encoding_errors="replace",
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _iter_xlsx_chunks(file_path: str, chunk_rows: int) -> Iterator:
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h) if h is not None else f"column_{i + 1}" for i, h in enumerate(header)]
+        buf: List[List[Optional[str]]] = []
+        for row in rows:
+            values = [None if v is None else str(v) for v in row[: len(columns)]]
+            values.extend([None] * (len(columns) - len(values)))
+            buf.append(values)
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame(buf, columns=columns, dtype=object)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=columns, dtype=object)
+    finally:
+        wb.close()
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _ColumnarCacheWriter:
+    """Append-only chunk writer (Parquet when available, gzip CSV otherwise)."""
+
+    def __init__(self, base_path: str):
+        self._parquet = _has_pyarrow()
+        self.path = base_path + (".parquet" if self._parquet else ".csv.gz")
+        self._writer = None
+        self._header_written = False
+
+    def write(self, chunk, kinds: Dict[str, str]) -> None:
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Fixed schema so all-null chunks cannot change a column's type
+            schema = pa.schema([
+                (c, pa.float64() if kinds[c] == "numeric" else pa.string()) for c in chunk.columns
+            ])
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+            self._writer.write_table(table)
+        else:
+            if not self._header_written:
+                # The first row after the header records the column kinds so
+                # that reads do not re-infer (and coerce) the types.
+                import pandas as pd
+
+                kinds_row = pd.DataFrame([[kinds[c] for c in chunk.columns]], columns=chunk.columns)
+                kinds_row.to_csv(self.path, mode="w", index=False, compression="gzip")
+                self._header_written = True
+            chunk.to_csv(self.path, mode="a", header=False, index=False, compression="gzip")
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def ingest_spreadsheet(
+    file_path: str,
+    file_type: str,
+    cache_base_path: Optional[str] = None,
+    chunk_rows: int = 50_000,
+    top_k: int = 5,
+    sample_rows: int = 5,
+) -> Tuple[TableSummary, Optional[str]]:
+    """Stream a CSV/XLSX file and build its schema/statistics summary.
+
+    When `cache_base_path` is given, rows are also written to a columnar cache
+    and the resulting path (with its format extension) is returned.
+
+    If a later chunk holds a value that does not parse in a column inferred as
+    numeric, the file is streamed again with that column kept as text.
+    """
+    if file_type not in (".csv", ".xlsx"):
+        raise ValueError(f"Unsupported spreadsheet type: {file_type}")
+
+    text_columns: frozenset = frozenset()
+    while True:
+        try:
+            return _ingest_once(
+                file_path, file_type, cache_base_path, chunk_rows, top_k, sample_rows, text_columns
+            )
+        except _NonNumericValue as e:
+            logger.info("spreadsheet_column_downgraded_to_text", file_path=file_path, column=e.column)
+            text_columns = text_columns | {e.column}
+
+
+def _ingest_once(
+    file_path: str,
+    file_type: str,
+    cache_base_path: Optional[str],
+    chunk_rows: int,
+    top_k: int,
+    sample_rows: int,
+    text_columns: frozenset,
+) -> Tuple[TableSummary, Optional[str]]:
+    if file_type == ".csv":
+        chunks = _iter_csv_chunks(file_path, chunk_rows)
+    else:
+        chunks = _iter_xlsx_chunks(file_path, chunk_rows)
+
+    writer = _ColumnarCacheWriter(cache_base_path) if cache_base_path else None
+    kinds: Optional[Dict[str, str]] = None
+    accumulators: List[_ColumnAccumulator] = []
+    samples: List[List[Optional[str]]] = []
+    row_count = 0
+
+    try:
+        for chunk in chunks:
+            chunk.columns = [str(c) for c in chunk.columns]
+            if kinds is None:
+                kinds = _infer_kinds(chunk.head(_SAMPLE_ROWS_FOR_INFERENCE), text_columns)
+                accumulators = [_ColumnAccumulator(c, kinds[c]) for c in chunk.columns]
+            if len(samples) < sample_rows:
+                head = chunk.head(sample_rows - len(samples))
+                for row in head.itertuples(index=False):
+                    samples.append([None if v is None or v != v else _clip(str(v)) for v in row])
+            chunk = _apply_kinds(chunk, kinds)
+            for acc in accumulators:
+                acc.update(chunk[acc.name])
+            row_count += len(chunk)
+            if writer is not None:
+                writer.write(chunk, kinds)
+    finally:
+        chunks.close()
+        if writer is not None:
+            writer.close()
+
+    summary = TableSummary(
+        row_count=row_count,
+        column_count=len(accumulators),
+        columns=[acc.summary(top_k) for acc in accumulators],
+        sample_rows=samples,
+    )
+    cache_path = writer.path if writer is not None and row_count else None
+    if writer is not None and not row_count and os.path.exists(writer.path):
+        os.unlink(writer.path)
+    return summary, cache_path
+
+
+def _fmt_number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def render_table_summary(summary: TableSummary, rows_hint: Optional[str] = None) -> str:
+    """Render a compact, LLM-friendly schema/statistics summary."""
+    lines = [f"[表形式データ概要] 行数: {summary.row_count:,} / 列数: {summary.column_count}", "列:"]
+    for col in summary.columns:
+        parts = [f"非null {col.non_null:,}", f"null {col.nulls:,}"]
+        if col.dtype == "numeric" and col.non_null:
+            parts.append(f"min {_fmt_number(col.min)}")
+            parts.append(f"max {_fmt_number(col.max)}")
+            parts.append(f"mean {_fmt_number(col.mean)}")
+        if col.top_values:
+            top = ", ".join(f"{tv.value}({tv.count})" for tv in col.top_values)
+            parts.append(f"上位: {top}")
+        lines.append(f"- {col.name} ({col.dtype}): " + ", ".join(parts))
+    if summary.sample_rows:
+        lines.append(f"サンプル行 (先頭{len(summary.sample_rows)}行):")
+        lines.append(" | ".join(c.name for c in summary.columns))
+        for row in summary.sample_rows:
+            lines.append(" | ".join("" if v is None else v for v in row))
+    if rows_hint:
+        lines.append(rows_hint)
+    return "\n".join(lines)
+
+
+def extract_spreadsheet(file_path: str, ctx: ExtractionContext) -> ExtractionResult:
+    """Extractor entry point: stream the sheet and return its rendered summary."""
+    try:
+        import pandas  # noqa: F401
+
+        cache_base = None
+        if ctx.tables_dir and ctx.file_id:
+            os.makedirs(ctx.tables_dir, exist_ok=True)
+            cache_base = os.path.join(ctx.tables_dir, ctx.file_id)
+
+        summary, cache_path = ingest_spreadsheet(
+            file_path,
+            ctx.file_type,
+            cache_base,
+            ctx.spreadsheet_chunk_rows,
+            ctx.spreadsheet_top_k,
+            ctx.spreadsheet_sample_rows,
+        )
+        rows_hint = ctx.rows_hint if cache_path else None
+        return ExtractionResult(
+            text=render_table_summary(summary, rows_hint=rows_hint),
+            table_summary=summary,
+        )
+    except ImportError:
+        return ExtractionResult(text=f"{ctx.file_type}ファイルの処理にはpandasが必要です")
+    except Exception as e:
+        return ExtractionResult(text=f"{ctx.file_type}ファイルの読み取りエラー: {str(e)}")
+
+
+def read_table_rows(cache_path: str, offset: int, limit: int) -> Tuple[List[str], List[list], int]:
+    """Read `limit` rows starting at `offset` from a columnar cache.
+
+    Returns (columns, rows, total_rows). Only the row groups/chunks overlapping
+    the requested window are materialized.
+    """
+    import pandas as pd
+
+    if cache_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(cache_path)
+        columns = list(pf.schema_arrow.names)
+        total = pf.metadata.num_rows
+        frames = []
+        start = 0
+        for i in range(pf.num_row_groups):
+            n = pf.metadata.row_group(i).num_rows
+            end = start + n
+            if end > offset and start < offset + limit:
+                df = pf.read_row_group(i).to_pandas()
+                lo = max(offset - start, 0)
+                hi = min(offset + limit - start, n)
+                frames.append(df.iloc[lo:hi])
+            start = end
+            if start >= offset + limit:
+                break
+        window = pd.concat(frames) if frames else pd.DataFrame(columns=columns)
+    else:
+        kinds_row = pd.read_csv(cache_path, nrows=1, dtype=str, compression="gzip")
+        columns = list(kinds_row.columns)
+        dtypes = {c: "float64" if kinds_row[c].iloc[0] == "numeric" else str for c in columns}
+        reader = pd.read_csv(
+            cache_path,
+            dtype=dtypes,
+            skiprows=[1],
+            keep_default_na=False,
+            na_values=[""],
+            chunksize=10_000,
+            compression="gzip",
+        )
+        total = 0
+        frames = []
+        for chunk in reader:
+            n = len(chunk)
+            if total + n > offset and total < offset + limit:
+                lo = max(offset - total, 0)
+                hi = min(offset + limit - total, n)
+                frames.append(chunk.iloc[lo:hi])
+            total += n
+        window = pd.concat(frames) if frames else pd.DataFrame(columns=columns)
+
+    rows = window.astype(object).where(window.notna(), None).values.tolist()
+    return columns, rows, int(total)
+
+
+__all__ = ["ingest_spreadsheet", "extract_spreadsheet", "render_table_summary", "read_table_rows"]
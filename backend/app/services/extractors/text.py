@@ -0,0 +1,120 @@
+"""Plain-text family extractors (txt/log/md/json/html) with encoding sniffing."""
+from __future__ import annotations
+
+import codecs
+import json
+from html.parser import HTMLParser
+from typing import List, Optional
+
+from .types import ExtractionContext, ExtractionResult
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# Tried in order after BOM detection; Japanese legacy encodings are common on plant PCs
+_CANDIDATE_ENCODINGS = ("utf-8", "cp932", "euc-jp")
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Best-effort encoding detection for a byte sample."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    for encoding in _CANDIDATE_ENCODINGS:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # A multi-byte sequence cut off at the end of the sample is fine
+            if encoding == "utf-8" and e.start >= len(sample) - 3 and e.reason == "unexpected end of data":
+                return encoding
+            continue
+    try:
+        from charset_normalizer import from_bytes  # optional
+
+        best = from_bytes(sample).best()
+        if best is not None and best.encoding:
+            return best.encoding
+    except ImportError:
+        pass
+    return "utf-8"
+
+
+def read_text(file_path: str, sample_size: int = 64 * 1024) -> str:
+    with open(file_path, "rb") as f:
+        data = f.read()
+    encoding = detect_encoding(data[:sample_size])
+    return data.decode(encoding, errors="replace")
+
+
+def extract_plain_text(file_path: str, ctx: ExtractionContext) -> ExtractionResult:
+    return ExtractionResult(text=read_text(file_path))
+
+
+def extract_json(file_path: str, ctx: ExtractionContext) -> ExtractionResult:
+    raw = read_text(file_path)
+    try:
+        # Normalize (and unescape \\uXXXX) so the LLM sees readable Japanese
+        return ExtractionResult(text=json.dumps(json.loads(raw), ensure_ascii=False, indent=1))
+    except ValueError:
+        # JSON Lines or invalid JSON: keep as text
+        return ExtractionResult(text=raw)
+
+
+class _HTMLTextParser(HTMLParser):
+    _SKIP = {"script", "style", "noscript", "template"}
+    _BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "table"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._skip_depth = 0
+        self.title: Optional[str] = None
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self._BLOCK:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self._BLOCK:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title = (self.title or "") + data.strip()
+            return
+        self._parts.append(data)
+
+    def text(self) -> str:
+        lines = [" ".join(line.split()) for line in "".join(self._parts).splitlines()]
+        body = "\n".join(line for line in lines if line)
+        return f"{self.title}\n\n{body}" if self.title else body
+
+
+def extract_html(file_path: str, ctx: ExtractionContext) -> ExtractionResult:
+    parser = _HTMLTextParser()
+    parser.feed(read_text(file_path))
+    parser.close()
+    return ExtractionResult(text=parser.text())
+
+
+__all__ = [
+    "detect_encoding",
+    "read_text",
+    "extract_plain_text",
+    "extract_json",
+    "extract_html",
+]
@@ -0,0 +1,37 @@
+"""Extractor types.
+
+Extractors are blocking callables `(file_path, ctx) -> ExtractionResult` so the
+scheduler can run them inline, on a thread, or on a process pool. Both types
+are picklable for the process-pool case.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from app.models.files import TableSummary
+
+
+@dataclass(frozen=True)
+class ExtractionContext:
+    file_type: str
+    file_id: Optional[str] = None
+    # Directory for the spreadsheet columnar cache (None disables caching)
+    tables_dir: Optional[str] = None
+    spreadsheet_chunk_rows: int = 50_000
+    spreadsheet_top_k: int = 5
+    spreadsheet_sample_rows: int = 5
+    # Hint appended to spreadsheet summaries when a row cache exists
+    rows_hint: Optional[str] = None
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    table_summary: Optional[TableSummary] = None
+
+
+ExtractorFn = Callable[[str, ExtractionContext], ExtractionResult]
+
+
+__all__ = ["ExtractionContext", "ExtractionResult", "ExtractorFn"]
@@ -1,23 +1,45 @@
 """File processing service for handling file uploads and text extraction"""
+import asyncio
+import glob
 import os
+import shutil
 import tempfile
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 from uuid import uuid4
-import aiofiles
 import structlog
 from fastapi import UploadFile
 
 from app.core.config import get_settings
-from app.models.files import UploadedFile, FileProcessingResult
+from app.models.files import (
+    FileContentResponse,
+    FileStatusResponse,
+    UploadedFile,
+    FileProcessingResult,
+    TableRowsResponse,
+    TableSummary,
+)
+from app.services.extractors.registry import Extractor, choose_placement, resolve_extractor
+from app.services.extractors.spreadsheet import read_table_rows
+from app.services.extractors.types import ExtractionContext
+from app.repositories.extracted_text import ExtractedTextStore
+from app.services.ingestion import get_ingestion_queue
+from app.services.llm.prefix_cache import get_prefix_cache
 
 logger = structlog.get_logger()
 
+# Shared in-memory file store so request-scoped services (and background
+# ingestion jobs) see the same records
+_DEFAULT_FILES: Dict[str, UploadedFile] = {}
+
+_SPOOL_CHUNK_BYTES = 1024 * 1024
+
 
 class FileService:
     """Service for managing file uploads and processing"""
     
     def __init__(self):
-        self._files: Dict[str, UploadedFile] = {}
+        self._files: Dict[str, UploadedFile] = _DEFAULT_FILES
+        self._tables: Dict[str, TableSummary] = {}
         self._settings = get_settings()
     
     async def process_uploaded_file(
@@ -41,17 +63,24 @@ class FileService:
             
             try:
                 # Extract text based on file type
-                extracted_text = await self._extract_text_from_file(temp_file_path, file_extension)
+                extracted_text = await self._extract_text_from_file(
+                    temp_file_path, file_extension, file_id=file_id
+                )
                 
-                # Create file record
+                # Persist text on disk; keep only metadata and a preview in memory
+                content_length = await asyncio.to_thread(
+                    self._text_store.write, file_id, extracted_text or ""
+                )
                 uploaded_file = UploadedFile(
                     id=file_id,
                     filename=f"{file_id}{file_extension}",
                     original_filename=file.filename or "unknown",
                     file_type=file_extension,
                     file_size=len(content),
-                    content=extracted_text,
-                    session_id=session_id
+                    content_preview=self._preview(extracted_text),
+                    content_length=content_length,
+                    session_id=session_id,
+                    table_summary=self._tables.pop(file_id, None),
                 )
                 
                 # Store in memory
@@ -81,75 +110,314 @@ class FileService:
                 error=str(e)
             )
             raise e
-    
-    async def _extract_text_from_file(self, file_path: str, file_type: str) -> str:
-        """Extract text from different file types"""
+
+    async def submit_uploaded_file(
+        self,
+        file: UploadFile,
+        session_id: str
+    ) -> UploadedFile:
+        """Register an uploaded file and extract its text in the background.
+
+        Returns immediately with `status="processing"`; progress is available
+        via `get_file_status`.
+        """
+        file_id = str(uuid4())
+        content = await file.read()
+        file_extension = os.path.splitext(file.filename or "")[1].lower()
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
+            temp_file.write(content)
+            temp_file_path = temp_file.name
+
+        uploaded_file = UploadedFile(
+            id=file_id,
+            filename=f"{file_id}{file_extension}",
+            original_filename=file.filename or "unknown",
+            file_type=file_extension,
+            file_size=len(content),
+            session_id=session_id,
+            status="processing",
+        )
+        self._files[file_id] = uploaded_file
+
+        get_ingestion_queue().submit(
+            file_id,
+            session_id,
+            lambda: self._run_extraction_job(file_id, temp_file_path, file_extension),
+        )
+        return uploaded_file
+
+    def _extract_blocking(self, file_id: str, temp_file_path: str, file_extension: str) -> str:
+        """Run extraction synchronously (on a worker thread) and remove the temp file."""
         try:
-            if file_type == '.txt':
-                return await self._extract_from_txt(file_path)
-            elif file_type == '.pdf':
-                return await self._extract_from_pdf(file_path)
-            elif file_type == '.docx':
-                return await self._extract_from_docx(file_path)
-            elif file_type in ['.csv', '.xlsx']:
-                return await self._extract_from_spreadsheet(file_path, file_type)
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
-                
-        except Exception as e:
-            logger.error("text_extraction_error", file_path=file_path, file_type=file_type, error=str(e))
-            return f"ファイルの内容を読み取れませんでした: {str(e)}"
-    
-    async def _extract_from_txt(self, file_path: str) -> str:
-        """Extract text from TXT file"""
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-            return await f.read()
-    
-    async def _extract_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
+            return self._extract_text_sync(temp_file_path, file_extension, file_id=file_id)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.unlink(temp_file_path)
+
+    def _run_extraction_job(self, file_id: str, temp_file_path: str, file_extension: str) -> None:
+        """Blocking extraction job executed on the ingestion worker pool."""
         try:
-            import PyPDF2
-            text_content = []
-            
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                for page in pdf_reader.pages:
-                    text_content.append(page.extract_text())
-            
-            return '\n'.join(text_content)
-        except ImportError:
-            return "PDFファイルの処理にはPyPDF2が必要です"
+            extracted_text = self._extract_blocking(file_id, temp_file_path, file_extension)
         except Exception as e:
-            return f"PDFファイルの読み取りエラー: {str(e)}"
+            current = self._files.get(file_id)
+            if current is not None:
+                self._files[file_id] = current.model_copy(update={"status": "failed"})
+            raise e
+
+        content_length = self._text_store.write(file_id, extracted_text or "")
+        current = self._files.get(file_id)
+        table_summary = self._tables.pop(file_id, None)
+        if current is None:
+            # Deleted while processing
+            self._remove_table_cache(file_id)
+            self._text_store.delete(file_id)
+            return
+        self._files[file_id] = current.model_copy(update={
+            "content_preview": self._preview(extracted_text),
+            "content_length": content_length,
+            "status": "completed",
+            "table_summary": table_summary,
+        })
+        logger.info(
+            "file_processed",
+            file_id=file_id,
+            file_type=file_extension,
+            content_length=len(extracted_text or ""),
+            session_id=current.session_id,
+            background=True,
+        )
+
+    async def process_uploaded_files(
+        self,
+        files: List[UploadFile],
+        session_id: str,
+        concurrency: int = 4,
+    ) -> List[Union[UploadedFile, Exception]]:
+        """Process several uploads concurrently on the ingestion worker pool.
+
+        At most `concurrency` files of this batch are extracted at once. The
+        result list is aligned with `files`; failed entries hold the exception.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        queue = get_ingestion_queue()
+
+        async def _process_one(file: UploadFile) -> UploadedFile:
+            file_id = str(uuid4())
+            file_extension = os.path.splitext(file.filename or "")[1].lower()
+
+            # Spool inside the semaphore so at most `concurrency` uploads are
+            # copied at once, in chunks and off the event loop
+            async with semaphore:
+                temp_file_path, file_size = await asyncio.to_thread(
+                    self._spool_upload, file.file, file_extension
+                )
+                extracted_text = await queue.run(
+                    self._extract_blocking, file_id, temp_file_path, file_extension
+                )
+                content_length = await queue.run(
+                    self._text_store.write, file_id, extracted_text or ""
+                )
+
+            uploaded_file = UploadedFile(
+                id=file_id,
+                filename=f"{file_id}{file_extension}",
+                original_filename=file.filename or "unknown",
+                file_type=file_extension,
+                file_size=file_size,
+                content_preview=self._preview(extracted_text),
+                content_length=content_length,
+                session_id=session_id,
+                table_summary=self._tables.pop(file_id, None),
+            )
+            self._files[file_id] = uploaded_file
+            logger.info(
+                "file_processed",
+                file_id=file_id,
+                filename=file.filename,
+                file_type=file_extension,
+                content_length=len(extracted_text or ""),
+                session_id=session_id,
+                batch=True,
+            )
+            return uploaded_file
+
+        results = await asyncio.gather(*(_process_one(f) for f in files), return_exceptions=True)
+        for file, result in zip(files, results):
+            if isinstance(result, Exception):
+                logger.error("file_processing_error", filename=file.filename, error=str(result), batch=True)
+        return list(results)
+
+    @staticmethod
+    def _spool_upload(source: BinaryIO, suffix: str) -> Tuple[str, int]:
+        """Copy an upload to a temporary file in chunks; returns (path, size)."""
+        source.seek(0)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            shutil.copyfileobj(source, temp_file, _SPOOL_CHUNK_BYTES)
+            return temp_file.name, temp_file.tell()
+
+    @property
+    def _text_store(self) -> ExtractedTextStore:
+        return ExtractedTextStore(os.path.join(self._settings.upload_dir, "text"))
+
+    def _preview(self, text: Optional[str]) -> Optional[str]:
+        if text is None:
+            return None
+        limit = self._settings.file_preview_chars
+        return text if len(text) <= limit else text[:limit] + "..."
+
+    async def read_content(self, file_id: str) -> Optional[str]:
+        """Read the full extracted text of a file from disk"""
+        if file_id not in self._files:
+            return None
+        return await asyncio.to_thread(self._text_store.read_all, file_id)
+
+    async def read_content_range(
+        self, file_id: str, offset: int = 0, length: int = 64 * 1024
+    ) -> Optional[FileContentResponse]:
+        """Read a byte range of the extracted text (aligned to UTF-8 characters)"""
+        if file_id not in self._files:
+            return None
+        text_slice = await asyncio.to_thread(self._text_store.read_range, file_id, offset, length)
+        if text_slice is None:
+            return None
+        return FileContentResponse(
+            file_id=file_id,
+            offset=text_slice.start,
+            next_offset=text_slice.end,
+            total_bytes=text_slice.total_bytes,
+            content=text_slice.text,
+        )
+
+    async def get_file_status(self, file_id: str) -> Optional[FileStatusResponse]:
+        """Get extraction status of a file (background jobs or completed uploads)"""
+        status = get_ingestion_queue().get_status(file_id)
+        if status is not None:
+            return status
+        file_info = self._files.get(file_id)
+        if file_info is None:
+            return None
+        return FileStatusResponse(
+            file_id=file_id,
+            session_id=file_info.session_id,
+            status=file_info.status,
+            progress=1.0 if file_info.status != "processing" else 0.0,
+        )
     
-    async def _extract_from_docx(self, file_path: str) -> str:
-        """Extract text from DOCX file"""
+    def _plan_extraction(
+        self, file_path: str, file_type: str, file_id: Optional[str]
+    ) -> Tuple[Extractor, ExtractionContext, str]:
+        """Resolve the extractor from the file's content and decide where it runs."""
+        extractor = resolve_extractor(file_path, file_type)
+        ctx = ExtractionContext(
+            file_type=extractor.extensions[0],
+            file_id=file_id,
+            tables_dir=self._tables_dir() if file_id else None,
+            spreadsheet_chunk_rows=self._settings.spreadsheet_chunk_rows,
+            spreadsheet_top_k=self._settings.spreadsheet_top_k,
+            spreadsheet_sample_rows=self._settings.spreadsheet_sample_rows,
+            rows_hint=(
+                f"※ 全行は GET {self._settings.api_v1_str}/files/{file_id}/rows で参照できます"
+                if file_id else None
+            ),
+        )
+        placement = choose_placement(
+            extractor,
+            os.path.getsize(file_path),
+            self._settings.extract_inline_max_cost,
+            self._settings.extract_process_min_cost,
+        )
+        return extractor, ctx, placement
+
+    def _run_extractor(
+        self,
+        extractor: Extractor,
+        ctx: ExtractionContext,
+        placement: str,
+        file_path: str,
+        file_type: str,
+        file_id: Optional[str],
+    ) -> str:
+        """Run the extractor on the calling thread (or the process pool) and keep its table summary."""
+        if placement == "process":
+            result = get_ingestion_queue().run_in_process_blocking(extractor.func, file_path, ctx)
+        else:
+            result = extractor.func(file_path, ctx)
+        if file_id and result.table_summary is not None:
+            self._tables[file_id] = result.table_summary
+        logger.debug(
+            "text_extracted",
+            file_id=file_id,
+            extractor=extractor.name,
+            declared_type=file_type,
+            placement=placement,
+        )
+        return result.text
+
+    def _extract_text_sync(self, file_path: str, file_type: str, file_id: Optional[str] = None) -> str:
+        """Extract text synchronously; used on ingestion workers, which are already off the event loop.
+
+        Extraction errors propagate so the ingestion job is marked `failed`.
+        """
         try:
-            from docx import Document
-            doc = Document(file_path)
-            return '\n'.join([paragraph.text for paragraph in doc.paragraphs])
-        except ImportError:
-            return "DOCXファイルの処理にはpython-docxが必要です"
+            extractor, ctx, placement = self._plan_extraction(file_path, file_type, file_id)
+            return self._run_extractor(extractor, ctx, placement, file_path, file_type, file_id)
         except Exception as e:
-            return f"DOCXファイルの読み取りエラー: {str(e)}"
-    
-    async def _extract_from_spreadsheet(self, file_path: str, file_type: str) -> str:
-        """Extract text from CSV/XLSX file"""
+            logger.error("text_extraction_error", file_path=file_path, file_type=file_type, error=str(e))
+            raise
+
+    async def _extract_text_from_file(
+        self, file_path: str, file_type: str, file_id: Optional[str] = None
+    ) -> str:
+        """Extract text using the extractor resolved from the file's content.
+
+        Cheap extractors run inline, the rest on a thread; CPU-heavy ones on
+        large inputs go to the ingestion process pool. Used by the synchronous
+        upload, which reports extraction errors as the file's text.
+        """
         try:
-            import pandas as pd
-            
-            if file_type == '.csv':
-                df = pd.read_csv(file_path)
-            else:  # .xlsx
-                df = pd.read_excel(file_path)
-            
-            # Convert to string representation
-            return df.to_string(index=False, max_rows=100)  # Limit rows for performance
-            
-        except ImportError:
-            return f"{file_type}ファイルの処理にはpandasが必要です"
+            extractor, ctx, placement = self._plan_extraction(file_path, file_type, file_id)
+            if placement == "inline":
+                return self._run_extractor(extractor, ctx, placement, file_path, file_type, file_id)
+            return await asyncio.to_thread(
+                self._run_extractor, extractor, ctx, placement, file_path, file_type, file_id
+            )
         except Exception as e:
-            return f"{file_type}ファイルの読み取りエラー: {str(e)}"
+            logger.error("text_extraction_error", file_path=file_path, file_type=file_type, error=str(e))
+            return f"ファイルの内容を読み取れませんでした: {str(e)}"
+
+    def _tables_dir(self) -> str:
+        return os.path.join(self._settings.upload_dir, "tables")
+
+    def _table_cache_path(self, file_id: str) -> Optional[str]:
+        matches = glob.glob(os.path.join(self._tables_dir(), f"{glob.escape(file_id)}.*"))
+        return matches[0] if matches else None
+
+    def _remove_table_cache(self, file_id: str) -> None:
+        path = self._table_cache_path(file_id)
+        if path:
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.warning("table_cache_remove_failed", file_id=file_id, error=str(e))
+
+    async def get_table_rows(
+        self, file_id: str, offset: int = 0, limit: int = 100
+    ) -> Optional[TableRowsResponse]:
+        """Get exact rows of a spreadsheet from its columnar cache"""
+        if file_id not in self._files:
+            return None
+        cache_path = self._table_cache_path(file_id)
+        if not cache_path:
+            return None
+        columns, rows, total = await asyncio.to_thread(read_table_rows, cache_path, offset, limit)
+        return TableRowsResponse(
+            file_id=file_id,
+            offset=offset,
+            columns=columns,
+            rows=rows,
+            total_rows=total,
+        )
     
     async def get_file_info(self, file_id: str) -> Optional[UploadedFile]:
         """Get information about a file"""
@@ -158,14 +426,19 @@ class FileService:
     async def get_session_files(self, session_id: str) -> List[UploadedFile]:
         """Get all files for a session"""
         return [
-            file_info for file_info in self._files.values() 
+            file_info for file_info in list(self._files.values())
             if file_info.session_id == session_id
         ]
     
     async def delete_file(self, file_id: str) -> bool:
         """Delete a file"""
         if file_id in self._files:
-            del self._files[file_id]
+            file_info = self._files.pop(file_id)
+            self._remove_table_cache(file_id)
+            self._text_store.delete(file_id)
+            get_ingestion_queue().forget(file_id)
+            # The session's cached file context no longer matches its files
+            get_prefix_cache().invalidate_session(file_info.session_id)
             logger.info("file_deleted", file_id=file_id)
             return True
         return False
@@ -177,12 +450,16 @@ class FileService:
         cutoff_time = datetime.datetime.now() - datetime.timedelta(hours=max_age_hours)
         files_to_remove = []
         
-        for file_id, file_info in self._files.items():
+        for file_id, file_info in list(self._files.items()):
             if file_info.upload_time < cutoff_time:
                 files_to_remove.append(file_id)
         
         for file_id in files_to_remove:
-            del self._files[file_id]
+            file_info = self._files.pop(file_id)
+            self._remove_table_cache(file_id)
+            self._text_store.delete(file_id)
+            get_ingestion_queue().forget(file_id)
+            get_prefix_cache().invalidate_session(file_info.session_id)
         
         if files_to_remove:
             logger.info(
@@ -0,0 +1,190 @@
+"""Background ingestion queue.
+
+Runs file extraction on a bounded worker pool so uploads can return
+immediately. Job status is tracked in-process and can be polled
+(`get_status`), awaited with a timeout (`wait`), or pushed to per-session
+subscribers (used by the WebSocket endpoint). Finished jobs are kept for
+`retention_s` and pruned on the next submit; after that the status is
+served from the file record.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import get_settings
+from app.models.files import FileStatusResponse
+
+logger = structlog.get_logger()
+
+
+class IngestionQueue:
+    """Bounded extraction worker pool with job status tracking."""
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        process_workers: int = 0,
+        retention_s: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(max_workers)),
+            thread_name_prefix="ingest",
+        )
+        # CPU-heavy extractors (PDF, DOCX, XLSX) run here; created on first use
+        self._process_workers = max(0, int(process_workers))
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, FileStatusResponse] = {}
+        self._futures: Dict[str, Future] = {}
+        # file_id -> clock() when the job finished
+        self._finished: Dict[str, float] = {}
+        self._retention_s = max(0.0, float(retention_s))
+        self._clock = clock
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    # --- Job lifecycle ---
+    def submit(self, file_id: str, session_id: str, fn: Callable[[], None]) -> FileStatusResponse:
+        """Queue `fn` (a blocking extraction job) for `file_id`."""
+        status = FileStatusResponse(file_id=file_id, session_id=session_id, status="processing")
+        with self._lock:
+            self._prune_locked()
+            self._jobs[file_id] = status
+        future = self._executor.submit(self._run_job, file_id, fn)
+        with self._lock:
+            self._futures[file_id] = future
+        logger.info("ingestion_job_submitted", file_id=file_id, session_id=session_id)
+        return status
+
+    def _run_job(self, file_id: str, fn: Callable[[], None]) -> None:
+        self._update(file_id, progress=0.1)
+        try:
+            fn()
+        except Exception as e:  # noqa: BLE001
+            logger.error("ingestion_job_failed", file_id=file_id, error=str(e))
+            self._update(file_id, status="failed", error=str(e))
+        else:
+            self._update(file_id, status="completed", progress=1.0)
+            logger.info("ingestion_job_completed", file_id=file_id)
+        with self._lock:
+            if file_id in self._jobs:
+                self._finished[file_id] = self._clock()
+
+    def _prune_locked(self) -> None:
+        """Drop jobs that finished more than `retention_s` ago (caller holds the lock)."""
+        cutoff = self._clock() - self._retention_s
+        expired = [fid for fid, done_at in self._finished.items() if done_at <= cutoff]
+        for fid in expired:
+            self._finished.pop(fid, None)
+            self._jobs.pop(fid, None)
+            self._futures.pop(fid, None)
+        if expired:
+            logger.debug("ingestion_jobs_pruned", count=len(expired), remaining=len(self._jobs))
+
+    async def run(self, fn: Callable, *args):
+        """Run a blocking callable on the worker pool and await its result."""
+        return await asyncio.wrap_future(self._executor.submit(fn, *args))
+
+    def run_in_process_blocking(self, fn: Callable, *args):
+        """Run a picklable callable in the process pool and block for the result.
+
+        Falls back to calling `fn` directly when no process workers are
+        configured, so callers never need to branch on configuration.
+        """
+        if self._process_workers <= 0:
+            return fn(*args)
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self._process_workers)
+            pool = self._process_pool
+        return pool.submit(fn, *args).result()
+
+    def get_status(self, file_id: str) -> Optional[FileStatusResponse]:
+        with self._lock:
+            return self._jobs.get(file_id)
+
+    def forget(self, file_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(file_id, None)
+            self._futures.pop(file_id, None)
+            self._finished.pop(file_id, None)
+
+    async def wait(self, file_ids: Iterable[str], timeout: float) -> List[str]:
+        """Wait up to `timeout` seconds for the given jobs.
+
+        Returns the ids that are still processing afterwards.
+        """
+        with self._lock:
+            pending = {fid: self._futures[fid] for fid in file_ids if fid in self._futures}
+        waitables = [asyncio.wrap_future(f) for f in pending.values() if not f.done()]
+        if waitables and timeout > 0:
+            await asyncio.wait(waitables, timeout=timeout)
+        return [fid for fid, f in pending.items() if not f.done()]
+
+    def _update(self, file_id: str, **changes) -> None:
+        with self._lock:
+            current = self._jobs.get(file_id)
+            if current is None:
+                return
+            updated = current.model_copy(update={**changes, "updated_at": datetime.now()})
+            self._jobs[file_id] = updated
+            subscribers = list(self._subscribers.get(updated.session_id, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, updated)
+            except RuntimeError:
+                # Subscriber's loop is gone (connection closed without unsubscribe)
+                self.unsubscribe(updated.session_id, queue)
+
+    # --- Notifications ---
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        """Receive status updates for jobs of `session_id` on the current loop."""
+        queue: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(session_id, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = [s for s in self._subscribers.get(session_id, []) if s[1] is not queue]
+            if subs:
+                self._subscribers[session_id] = subs
+            else:
+                self._subscribers.pop(session_id, None)
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+@lru_cache()
+def get_ingestion_queue() -> IngestionQueue:
+    """Get the process-wide ingestion queue"""
+    settings = get_settings()
+    return IngestionQueue(
+        max_workers=settings.ingest_workers,
+        process_workers=settings.ingest_process_workers,
+        retention_s=settings.ingest_job_retention_seconds,
+    )
+
+
+def shutdown_ingestion_queue() -> None:
+    """Stop the ingestion workers if the queue was ever created."""
+    if get_ingestion_queue.cache_info().currsize:
+        get_ingestion_queue().shutdown()
+        get_ingestion_queue.cache_clear()
+
+
+__all__ = ["IngestionQueue", "get_ingestion_queue", "shutdown_ingestion_queue"]
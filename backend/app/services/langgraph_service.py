@@ -1,5 +1,7 @@
 """LangGraph service for AI workflow management"""
-from typing import Dict, List, Optional, TypedDict, Annotated
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, TypedDict, Annotated
 from typing_extensions import NotRequired
 import time
 import asyncio
@@ -8,11 +10,27 @@ from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 
 from app.core.config import get_settings
-from app.services.llm.base import LLMProvider
-from app.services.llm.gemini import GeminiProvider
-from app.services.tools import detect_tool_request, async_execute_tool
-from app.services.agents.registry import get_agent_v2
-from app.services.agents.types import AgentInput
+from app.core.deadline import clamp_timeout, request_deadline
+from app.services.llm.base import FunctionCallingLLMProvider, LLMProvider, PrefixCachingLLMProvider
+from app.services.llm.batching import ClassificationBatcher
+from app.services.llm.context import llm_task
+from app.services.llm.router import get_llm_provider
+from app.services.llm.speculation import get_speculation_tracker, predict_category
+from app.services.llm.usage import estimate_tokens, trim_to_tokens
+from app.services.tools import (
+    ToolCall,
+    ToolResult,
+    ToolRoute,
+    async_execute_plan,
+    async_execute_tool,
+    detect_tool_route,
+    get_tool_definitions,
+    tool_call_from_arguments,
+)
+from app.services.tools.memo import get_tool_memo, references
+from app.services.agents.prompting import template_tokens
+from app.services.agents.registry import get_agent_spec, get_agent_v2
+from app.services.agents.types import AgentFnV2, AgentInput, AgentOutput
 
 logger = structlog.get_logger()
 
@@ -30,6 +48,10 @@ class WorkflowState(TypedDict):
     # Future tools support (optional)
     tool_name: NotRequired[Optional[str]]
     tool_input: NotRequired[Optional[str]]
+    # Routing decided once per turn in analyze_query (ToolRoute.model_dump())
+    routing: NotRequired[Optional[dict]]
+    # Speculative agent answer that matched the classification ({"agent", "output"})
+    speculation: NotRequired[Optional[dict]]
     # Messages with reducer (best practice). We keep string history for now.
     messages: NotRequired[Annotated[List[dict], add_messages]]
     # Debug/trace (optional)
@@ -39,13 +61,60 @@ class WorkflowState(TypedDict):
 # Backward-compat alias during naming migration
 ManufacturingState = WorkflowState
 
+# Query categories for classification (batched prompts list them from here)
+QUERY_CATEGORIES = {
+    "manufacturing": "製造業、改善活動、品質管理、効率化に関する質問",
+    "python": "Pythonプログラミング、コード、技術に関する質問",
+    "general": "その他の一般的な質問",
+}
+# Extra label when the provider can pick tools; only queries classified as
+# "tool" go on to the (per-query) function-calling request
+TOOL_CATEGORY = "tool"
+TOOL_CATEGORY_DESCRIPTION = "社内データベースの集計や社内文書の参照が必要な質問"
+
+
+def _analysis_prompt(query: str, categories: Dict[str, str]) -> str:
+    listed = "\n".join(f"- {name}: {desc}" for name, desc in categories.items())
+    return (
+        "以下のユーザーの質問を分析し、カテゴリを判定してください：\n\n"
+        f"質問: {query}\n\n"
+        f"カテゴリ:\n{listed}\n\n"
+        "カテゴリ名のみを回答してください。\n"
+    )
+
+
+@lru_cache(maxsize=16)
+def get_classification_batcher(llm: LLMProvider) -> ClassificationBatcher:
+    """Get the process-wide classification batcher of a provider"""
+    settings = get_settings()
+    categories = dict(QUERY_CATEGORIES)
+    if isinstance(llm, FunctionCallingLLMProvider) and settings.llm_function_calling:
+        categories[TOOL_CATEGORY] = TOOL_CATEGORY_DESCRIPTION
+    return ClassificationBatcher(
+        llm,
+        categories,
+        max_batch=settings.llm_classification_batch_size,
+        max_wait_s=settings.llm_classification_batch_wait_ms / 1000,
+        max_question_chars=settings.llm_classification_batch_max_chars,
+    )
+
+
+@dataclass
+class _Speculation:
+    """Agent answer started before classification finished."""
+    agent: str
+    task: "asyncio.Task[Tuple[Optional[AgentOutput], float]]"
+    started: float
+
 
 class LangGraphService:
     """Service for managing LangGraph AI workflows"""
     
     def __init__(self, llm_provider: Optional[LLMProvider] = None):
         self._settings = get_settings()
-        self._llm: LLMProvider = llm_provider or GeminiProvider(self._settings)
+        self._llm: LLMProvider = llm_provider or get_llm_provider()
+        self._classifier = get_classification_batcher(self._llm)
+        self._speculation = get_speculation_tracker()
         self._workflow = self._build_workflow()
         self._last_debug_info: Optional[dict] = None
     
@@ -186,9 +255,11 @@ class LangGraphService:
                 thread_id=thread_id,
                 debug=bool(debug),
                 decision_trace=[],
+                routing=None,
+                speculation=None,
             )
 
-            # Enforce workflow-level timeout
+            # Enforce workflow-level timeout; LLM calls and tools inside see the same deadline
             timeout_s = float(getattr(self._settings, "workflow_invoke_timeout_seconds", 60.0))
             try:
                 # If durable execution enabled and thread_id provided, pass it in config
@@ -200,7 +271,8 @@ class LangGraphService:
                 else:
                     invoke_coro = self._workflow.ainvoke(initial_state)
 
-                result = await asyncio.wait_for(invoke_coro, timeout=timeout_s)
+                with request_deadline(timeout_s):
+                    result = await asyncio.wait_for(invoke_coro, timeout=timeout_s)
             except asyncio.TimeoutError:
                 log.error("workflow_timeout", timeout_s=timeout_s)
                 return "処理がタイムアウトしました。時間をおいて再度お試しください。"
@@ -273,7 +345,9 @@ class LangGraphService:
                     "payload": {"node": "analyze_query", "note": "pre-node breakpoint"},
                 }
 
-            async for ev in astream:
+            # Same workflow bound as process_query
+            timeout_s = float(getattr(self._settings, "workflow_invoke_timeout_seconds", 60.0))
+            async for ev in self._within_deadline(astream, timeout_s, log):
                 # Sanitize event object for transport (avoid leaking inputs/state)
                 try:
                     event_type = (
@@ -308,47 +382,61 @@ class LangGraphService:
         except Exception as e:  # noqa: BLE001
             log.error("stream_events_error", error=str(e))
             return
+
+    @staticmethod
+    async def _within_deadline(astream, timeout_s: float, log):
+        """Events of `astream` until `timeout_s` has passed.
+
+        Each step runs under the time left, so LLM calls and tools inside see
+        the deadline as in process_query, without it leaking into the consumer
+        between events.
+        """
+        deadline = time.monotonic() + timeout_s
+        try:
+            while True:
+                left = max(0.0, deadline - time.monotonic())
+                with request_deadline(left):
+                    try:
+                        ev = await asyncio.wait_for(anext(astream), timeout=left)
+                    except StopAsyncIteration:
+                        return
+                yield ev
+        except asyncio.TimeoutError:
+            log.error("workflow_timeout", timeout_s=timeout_s, stream=True)
+        finally:
+            await astream.aclose()
     
     async def _analyze_query(self, state: WorkflowState) -> WorkflowState:
         """Analyze user query to determine type"""
         try:
             log = logger.bind(thread_id=state.get('thread_id'))
-            analysis_prompt = f"""
-            以下のユーザーの質問を分析し、カテゴリを判定してください：
-
-            質問: {state['user_query']}
+            analysis_prompt = _analysis_prompt(state['user_query'], QUERY_CATEGORIES)
             
-            カテゴリ:
-            - manufacturing: 製造業、改善活動、品質管理、効率化に関する質問
-            - python: Pythonプログラミング、コード、技術に関する質問  
-            - general: その他の一般的な質問
-
-            カテゴリ名のみを回答してください。
-            """
-            
-            # Detect explicit tool usage prefix first (e.g., "sql:", "web:")
-            tool_name, tool_arg = detect_tool_request(state['user_query'])
-            if tool_name:
+            # Detect explicit tool usage prefix first (e.g., "sql:", "web:"); the
+            # route is stored so later nodes never re-parse the message
+            route = detect_tool_route(state['user_query'])
+            state['routing'] = route.model_dump()
+            if route.kind == "tool":
                 state['query_type'] = "tool"
-                state['tool_name'] = tool_name
-                state['tool_input'] = tool_arg
+                state['tool_name'] = route.tool
+                state['tool_input'] = route.input
                 if state.get('debug'):
                     self._append_trace(state, {
                         "type": "tool_detected",
-                        "name": tool_name,
+                        "name": route.tool,
                         "reason": "明示的なツール指定",
+                        "calls": [c.tool for c in route.calls],
                         "ts": self._now_ms(),
                     })
-                log.info("query_analyzed_tool", tool=tool_name)
+                log.info("query_analyzed_tool", tool=route.tool, calls=len(route.calls))
                 return state
 
             # Generic "tool:" prefix (no known subtool): still route to tool handler
-            raw = state['user_query'].strip().lower()
-            if raw.startswith("tool:"):
+            if route.kind == "generic":
                 state['query_type'] = "tool"
                 # Keep tool_name unset; pass the raw argument after 'tool:'
                 state['tool_name'] = None
-                state['tool_input'] = state['user_query'][5:].strip()
+                state['tool_input'] = route.input
                 if state.get('debug'):
                     self._append_trace(state, {
                         "type": "tool_detected",
@@ -359,26 +447,19 @@ class LangGraphService:
                 log.info("query_analyzed_tool", tool="unknown")
                 return state
 
-            reason: Optional[str] = None
-            if getattr(self, "_llm", None) and getattr(self._llm, "is_configured", False):
-                text = await self._llm.generate(analysis_prompt)
-                query_type = text.strip().lower()
-                
-                if query_type not in ["manufacturing", "python", "general"]:
-                    query_type = "general"
-                reason = "LLM分類結果"
-            else:
-                # Fallback logic without LLM provider
-                query_lower = state['user_query'].lower()
-                if any(word in query_lower for word in ["改善", "品質", "製造", "効率", "生産"]):
-                    query_type = "manufacturing"
-                elif any(word in query_lower for word in ["python", "プログラム", "コード", "スクリプト"]):
-                    query_type = "python"
-                elif detect_tool_request(state['user_query'])[0]:
-                    query_type = "tool"
-                else:
-                    query_type = "general"
-                reason = "キーワード検出"
+            # Optionally start the predicted agent's answer while classifying
+            state['speculation'] = None
+            speculation = self._start_speculation(state)
+            try:
+                query_type, reason = await self._classify(state, analysis_prompt)
+            except BaseException:
+                if speculation is not None:
+                    speculation.task.cancel()
+                raise
+            if speculation is not None:
+                await self._settle_speculation(state, speculation, query_type)
+            if query_type == "tool":
+                return state
             
             state['query_type'] = query_type
             log.info("query_analyzed", query_type=query_type)
@@ -400,7 +481,198 @@ class LangGraphService:
             state['query_type'] = "general"
         
         return state
-    
+
+    async def _classify(self, state: WorkflowState, analysis_prompt: str) -> Tuple[str, str]:
+        """Query category ("tool" when function calling picked tools) and the reason.
+
+        Every query goes through the shared batcher; only those it labels
+        "tool" are sent on to function calling to pick the tools.
+        """
+        if not (getattr(self, "_llm", None) and getattr(self._llm, "is_configured", False)):
+            # Fallback logic without LLM provider
+            return predict_category(state['user_query']), "キーワード検出"
+        categories = self._classifier.categories
+        with llm_task("classification", state.get('thread_id')):
+            text = await self._classifier.classify(
+                state['user_query'], _analysis_prompt(state['user_query'], categories)
+            )
+        query_type = text.strip().lower()
+        if query_type == TOOL_CATEGORY and TOOL_CATEGORY in categories:
+            with llm_task("classification", state.get('thread_id')):
+                query_type = await self._route_with_tools(state, analysis_prompt)
+            if query_type:
+                return query_type, "LLM分類結果"
+            return predict_category(state['user_query']), "キーワード検出"
+        if query_type not in QUERY_CATEGORIES:
+            query_type = "general"
+        return query_type, "LLM分類結果"
+
+    def _start_speculation(self, state: WorkflowState) -> Optional[_Speculation]:
+        """Start the keyword-predicted agent's answer (LLM_SPECULATION), unless paused."""
+        if not getattr(self._llm, "is_configured", False) or not self._speculation.allow():
+            return None
+        agent = predict_category(state['user_query'])
+        snapshot = WorkflowState(**state)  # the agent node would see the same fields
+        started = time.perf_counter()
+
+        async def answer() -> Tuple[Optional[AgentOutput], float]:
+            agent_v2 = get_agent_v2(agent)
+            out = await self._invoke_agent(agent, snapshot, agent_v2) if agent_v2 is not None else None
+            return out, time.perf_counter() - started
+
+        return _Speculation(agent=agent, task=asyncio.ensure_future(answer()), started=started)
+
+    async def _settle_speculation(self, state: WorkflowState, spec: _Speculation, query_type: str) -> None:
+        """Keep the speculative answer if the classification agrees, else cancel it."""
+        log = logger.bind(thread_id=state.get('thread_id'))
+        classified_s = time.perf_counter() - spec.started
+        out: Optional[AgentOutput] = None
+        answered_s = 0.0
+        if query_type == spec.agent:
+            try:
+                out, answered_s = await spec.task
+            except Exception as e:  # noqa: BLE001
+                log.warning("llm_speculation_failed", agent=spec.agent, error=str(e))
+        else:
+            spec.task.cancel()
+        hit = out is not None
+        # Sequential would take classification + answer; in parallel the shorter one is hidden
+        saved_s = min(classified_s, answered_s) if hit else 0.0
+        self._speculation.record(hit, saved_s)
+        if hit:
+            state['speculation'] = {"agent": spec.agent, "output": out.model_dump()}
+        log.info(
+            "llm_speculation_settled",
+            predicted=spec.agent,
+            query_type=query_type,
+            hit=hit,
+            saved_ms=round(saved_s * 1000, 1),
+        )
+        if state.get('debug'):
+            self._append_trace(state, {
+                "type": "speculation",
+                "name": spec.agent,
+                "hit": hit,
+                "saved_ms": round(saved_s * 1000, 1),
+                "ts": self._now_ms(),
+            })
+
+    async def _agent_output(self, agent: str, state: WorkflowState, agent_v2: AgentFnV2) -> AgentOutput:
+        """The speculative answer when it was for this agent, else a fresh run."""
+        spec = state.get('speculation')
+        if spec and spec.get('agent') == agent:
+            return AgentOutput.model_validate(spec['output'])
+        return await self._invoke_agent(agent, state, agent_v2)
+
+    async def _invoke_agent(self, agent: str, state: WorkflowState, agent_v2: AgentFnV2) -> AgentOutput:
+        inp = AgentInput(
+            user_query=state['user_query'],
+            conversation_history=state['conversation_history'],
+            file_context=state.get('file_context', ""),
+            tool_context=self._tool_context(state),
+        )
+        inp = self._fit_agent_input(agent, inp)
+        spec = get_agent_spec(agent)
+        with llm_task(agent, state.get('thread_id')):
+            if spec is None or not spec.timeout_s:
+                return await agent_v2(self._llm, inp)
+            # The plugin's own bound: its LLM calls clamp to it, and the call is cut off at it
+            with request_deadline(spec.timeout_s):
+                return await asyncio.wait_for(agent_v2(self._llm, inp), timeout=clamp_timeout(spec.timeout_s))
+
+    def _fit_agent_input(self, agent: str, inp: AgentInput) -> AgentInput:
+        """Trim context so the agent prompt stays within the agent's token budget.
+
+        The oldest conversation history goes first, then the end of the file
+        context, then tool summaries; the user query is never trimmed. Agents
+        without a budget (the default) are passed through untouched. File
+        context that goes into a cached prefix still counts but is not cut:
+        trimming it would change the prefix every turn and defeat the cache.
+        """
+        budget = self._settings.get_llm_prompt_token_budgets().get(
+            agent, self._settings.llm_prompt_token_budget_default
+        )
+        if budget <= 0:
+            return inp
+        available = max(0, budget - template_tokens(agent) - estimate_tokens(inp.user_query))
+        sizes = {
+            name: estimate_tokens(getattr(inp, name))
+            for name in ("conversation_history", "file_context", "tool_context")
+        }
+        excess = sum(sizes.values()) - available
+        if excess <= 0:
+            return inp
+        order = [("conversation_history", "tail"), ("file_context", "head"), ("tool_context", "head")]
+        if isinstance(self._llm, PrefixCachingLLMProvider) and self._settings.llm_prefix_cache:
+            order.remove(("file_context", "head"))
+        updates: Dict[str, str] = {}
+        for name, keep in order:
+            if excess <= 0:
+                break
+            if not sizes[name]:
+                continue
+            trimmed = trim_to_tokens(getattr(inp, name), max(0, sizes[name] - excess), keep=keep)
+            excess -= sizes[name] - estimate_tokens(trimmed)
+            updates[name] = trimmed
+        logger.info(
+            "agent_prompt_trimmed",
+            agent=agent,
+            budget=budget,
+            before=sum(sizes.values()),
+            after=sum(estimate_tokens(updates.get(n, getattr(inp, n))) for n in sizes),
+        )
+        return inp.model_copy(update=updates)
+
+    async def _route_with_tools(self, state: WorkflowState, analysis_prompt: str) -> Optional[str]:
+        """Pick tools (or a category) in a function-calling request.
+
+        Returns "tool" (state updated with the calls), a category name, or
+        None when function calling is unavailable or failed, in which case
+        the caller falls back to keyword detection.
+        """
+        llm = getattr(self, "_llm", None)
+        if not (
+            isinstance(llm, FunctionCallingLLMProvider)
+            and getattr(llm, "is_configured", False)
+            and getattr(self._settings, "llm_function_calling", True)
+        ):
+            return None
+        # Definition factories may stat files and query DB catalogs: keep them off the loop
+        definitions = await asyncio.to_thread(get_tool_definitions)
+        if not definitions:
+            return None
+        log = logger.bind(thread_id=state.get('thread_id'))
+        prompt = (
+            analysis_prompt
+            + "\n社内データベースの集計や社内文書の参照が必要な場合は、"
+            "カテゴリ名の代わりに該当するツールを呼び出してください（複数可）。\n"
+        )
+        result = await llm.generate_with_tools(prompt, definitions)
+        if result.error:
+            log.warning("function_calling_failed", error=result.error)
+            return None
+        known = {d.name for d in definitions}
+        calls = [tool_call_from_arguments(c.name, c.arguments) for c in result.calls if c.name in known]
+        if calls:
+            state['query_type'] = "tool"
+            state['tool_name'] = calls[0].tool
+            state['tool_input'] = calls[0].input
+            state['routing'] = ToolRoute(
+                kind="tool", tool=calls[0].tool, input=calls[0].input, calls=calls, source="function_calling"
+            ).model_dump()
+            if state.get('debug'):
+                self._append_trace(state, {
+                    "type": "tool_detected",
+                    "name": calls[0].tool,
+                    "reason": "LLMによるツール選択",
+                    "calls": [c.tool for c in calls],
+                    "ts": self._now_ms(),
+                })
+            log.info("query_analyzed_tool", tool=calls[0].tool, calls=len(calls), source="function_calling")
+            return "tool"
+        query_type = result.text.strip().lower()
+        return query_type if query_type in ("manufacturing", "python", "general") else "general"
+
     def _route_query(self, state: WorkflowState) -> str:
         """Route query to appropriate handler"""
         return state['query_type']
@@ -415,12 +687,7 @@ class LangGraphService:
                 state['error'] = "agent_not_registered"
                 state['response'] = "エージェントが登録されていません。"
             else:
-                inp = AgentInput(
-                    user_query=state['user_query'],
-                    conversation_history=state['conversation_history'],
-                    file_context=state['file_context'],
-                )
-                out = await agent_v2(self._llm, inp)
+                out = await self._agent_output("manufacturing", state, agent_v2)
                 state['response'] = out.content
             # Append messages via reducer: user + assistant
             state['messages'] = [
@@ -444,12 +711,7 @@ class LangGraphService:
                 state['error'] = "agent_not_registered"
                 state['response'] = "エージェントが登録されていません。"
             else:
-                inp = AgentInput(
-                    user_query=state['user_query'],
-                    conversation_history=state['conversation_history'],
-                    file_context=state['file_context'],
-                )
-                out = await agent_v2(self._llm, inp)
+                out = await self._agent_output("python", state, agent_v2)
                 state['response'] = out.content
             state['messages'] = [
                 {"role": "user", "content": state['user_query']},
@@ -473,12 +735,7 @@ class LangGraphService:
                 state['error'] = "agent_not_registered"
                 state['response'] = "エージェントが登録されていません。"
             else:
-                inp = AgentInput(
-                    user_query=state['user_query'],
-                    conversation_history=state['conversation_history'],
-                    file_context=state.get('file_context', ""),
-                )
-                out = await agent_v2(self._llm, inp)
+                out = await self._agent_output("general", state, agent_v2)
                 state['response'] = out.content
             state['messages'] = [
                 {"role": "user", "content": state['user_query']},
@@ -492,53 +749,108 @@ class LangGraphService:
         return state
 
     async def _process_tool_query(self, state: WorkflowState) -> WorkflowState:
-        """Execute simple tool actions (scaffold for future tools)."""
+        """Execute the detected tool call(s).
+
+        Several calls in one message run concurrently under a shared deadline
+        (`tool_plan_timeout_seconds`); their results are merged into one
+        response, one section per tool.
+        """
         try:
             log = logger.bind(thread_id=state.get('thread_id'))
-            tool = state.get('tool_name')
-            arg = state.get('tool_input') or state['user_query']
-            if not tool:
-                # Detect again defensively
-                tool, arg = detect_tool_request(state['user_query'])
-            if tool:
-                log = log.bind(tool=tool)
-                tr = await async_execute_tool(tool, (arg or ""), timeout_s=5.0)
-                if state.get('debug'):
-                    tool_input_short = (arg or "")
-                    if len(tool_input_short) > 120:
-                        tool_input_short = tool_input_short[:120] + "..."
-                    self._append_trace(state, {
-                        "type": "tool_invoked",
-                        "name": tr.tool,
-                        "tool_input": tool_input_short,
-                        "took_ms": tr.took_ms,
-                        "error": tr.error,
-                        "ts": self._now_ms(),
-                    })
-                if tr.error:
-                    state['response'] = (
-                        f"[tool:{tr.tool}] エラー: {tr.error} (took {tr.took_ms}ms)"
-                    )
+            routing = state.get('routing')
+            if routing:
+                calls = ToolRoute(**routing).calls
+            elif state.get('tool_name'):
+                calls = [ToolCall(tool=state['tool_name'], input=state.get('tool_input') or "")]
+            else:
+                # Invoked without analyze_query (e.g. directly): detect here
+                calls = detect_tool_route(state['user_query']).calls
+            max_calls = int(getattr(self._settings, "tool_plan_max_calls", 4))
+            if len(calls) > max_calls:
+                state['response'] = f"ツール呼び出しは1メッセージあたり最大{max_calls}件までです。"
+                log.info("tool_plan_rejected", calls=len(calls), max_calls=max_calls)
+            elif calls:
+                log = log.bind(tool=",".join(c.tool for c in calls))
+                timeout_s = float(getattr(self._settings, "tool_timeout_seconds", 5.0))
+                start = time.perf_counter()
+                if len(calls) == 1:
+                    results = [await async_execute_tool(
+                        calls[0].tool, calls[0].input, timeout_s=timeout_s, session_id=state.get('thread_id'),
+                    )]
                 else:
-                    took = f" (took {tr.took_ms}ms)" if tr.took_ms is not None else ""
-                    state['response'] = f"[tool:{tr.tool}] 実行結果{took}:\n{tr.output}"
-                state['messages'] = [
-                    {"role": "user", "content": state['user_query']},
-                    {"role": "assistant", "content": state['response']},
-                ]
-                log.info("tool_executed", took_ms=tr.took_ms, error=tr.error is not None)
+                    results = await async_execute_plan(
+                        calls,
+                        deadline_s=float(getattr(self._settings, "tool_plan_timeout_seconds", 10.0)),
+                        timeout_s=timeout_s,
+                        session_id=state.get('thread_id'),
+                    )
+                for tr in results:
+                    if state.get('debug'):
+                        tool_input_short = tr.input or ""
+                        if len(tool_input_short) > 120:
+                            tool_input_short = tool_input_short[:120] + "..."
+                        self._append_trace(state, {
+                            "type": "tool_invoked",
+                            "name": tr.tool,
+                            "tool_input": tool_input_short,
+                            "took_ms": tr.took_ms,
+                            "error": tr.error,
+                            "cached": tr.cached,
+                            "ts": self._now_ms(),
+                        })
+                    log.info(
+                        "tool_executed",
+                        name=tr.tool,
+                        took_ms=tr.took_ms,
+                        error=tr.error is not None,
+                        cached=tr.cached,
+                    )
+                sections = []
+                for tr in results:
+                    section = self._format_tool_result(tr)
+                    entry = get_tool_memo().put(state.get('thread_id') or "", tr)
+                    if entry is not None:
+                        section += f"\n※ 後続の質問では #{entry.ref} でこの結果を参照できます"
+                    sections.append(section)
+                state['response'] = "\n\n".join(sections)
+                if len(results) > 1:
+                    log.info(
+                        "tool_plan_executed",
+                        calls=len(results),
+                        took_ms=int((time.perf_counter() - start) * 1000),
+                        errors=sum(1 for tr in results if tr.error),
+                    )
             else:
                 state['response'] = "ツール実行リクエストを認識できませんでした。"
-                state['messages'] = [
-                    {"role": "user", "content": state['user_query']},
-                    {"role": "assistant", "content": state['response']},
-                ]
                 log.info("tool_not_recognized")
+            state['messages'] = [
+                {"role": "user", "content": state['user_query']},
+                {"role": "assistant", "content": state['response']},
+            ]
         except Exception as e:
             log.error("tool_processing_error", error=str(e))
             state['error'] = str(e)
         return state
 
+    def _tool_context(self, state: WorkflowState) -> str:
+        """Summaries of this session's recent tool results for agent prompts."""
+        try:
+            return get_tool_memo().context(
+                state.get('thread_id'),
+                max_chars=int(getattr(self._settings, "tool_memo_context_chars", 2000)),
+                expand=references(state['user_query']),
+            )
+        except Exception as e:  # noqa: BLE001
+            logger.warning("tool_context_error", error=str(e))
+            return ""
+
+    @staticmethod
+    def _format_tool_result(tr: ToolResult) -> str:
+        if tr.error:
+            return f"[tool:{tr.tool}] エラー: {tr.error} (took {tr.took_ms}ms)"
+        took = f" (took {tr.took_ms}ms)" if tr.took_ms is not None else ""
+        return f"[tool:{tr.tool}] 実行結果{took}:\n{tr.output}"
+
     # --- Debug helpers ---
     def _now_ms(self) -> int:
         return int(time.time() * 1000)
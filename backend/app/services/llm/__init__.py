@@ -1,5 +1,27 @@
 """LLM provider package."""
-from .base import LLMProvider
+from .base import FunctionCallingLLMProvider, LLMProvider, PrefixCachingLLMProvider
+from .context import current_llm_task, llm_task
+from .fake import FakeLLMProvider
 from .gemini import GeminiProvider
+from .openai_compat import OpenAICompatibleProvider
+from .prefix_cache import PrefixCache, get_prefix_cache
+from .router import RoutingLLMProvider, build_llm_provider, get_llm_provider
+from .types import FunctionCall, FunctionCallingResponse
 
-__all__ = ["LLMProvider", "GeminiProvider"]
+__all__ = [
+    "LLMProvider",
+    "FunctionCallingLLMProvider",
+    "PrefixCachingLLMProvider",
+    "GeminiProvider",
+    "OpenAICompatibleProvider",
+    "FakeLLMProvider",
+    "RoutingLLMProvider",
+    "build_llm_provider",
+    "get_llm_provider",
+    "PrefixCache",
+    "get_prefix_cache",
+    "llm_task",
+    "current_llm_task",
+    "FunctionCall",
+    "FunctionCallingResponse",
+]
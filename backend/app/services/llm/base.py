@@ -1,5 +1,8 @@
 """LLM provider interfaces for AI generation"""
-from typing import Protocol, runtime_checkable
+from typing import List, Protocol, runtime_checkable
+
+from app.services.llm.types import FunctionCallingResponse
+from app.services.tools.types import ToolDefinition
 
 
 @runtime_checkable
@@ -19,3 +22,33 @@ class LLMProvider(Protocol):
         user-facing message on rate-limit or failure instead of raising.
         """
         ...
+
+
+@runtime_checkable
+class FunctionCallingLLMProvider(LLMProvider, Protocol):
+    """LLM provider that can also choose tools (native function calling)"""
+
+    async def generate_with_tools(
+        self, prompt: str, tools: List[ToolDefinition]
+    ) -> FunctionCallingResponse:
+        """Let the model either answer in text or call one or more tools.
+
+        Should not raise; failures are reported via `error` so callers can
+        fall back to plain `generate`.
+        """
+        ...
+
+
+@runtime_checkable
+class PrefixCachingLLMProvider(LLMProvider, Protocol):
+    """LLM provider that can reuse a long, stable prompt prefix across calls"""
+
+    async def generate_with_prefix(self, prefix: str, prompt: str) -> str:
+        """Generate for `prefix` + `prompt`, uploading `prefix` once and referencing it afterwards.
+
+        The prefix (instructions plus file context) is cached per session
+        (`llm_task()`) and content; providers fall back to a plain
+        `generate(prefix + prompt)` when caching does not apply. Same error
+        contract as `generate`.
+        """
+        ...
@@ -0,0 +1,185 @@
+"""Micro-batching of short classification prompts.
+
+Under bursts (e.g. at shift change) many requests each send a tiny
+classification prompt. `ClassificationBatcher` holds them for up to a few
+milliseconds or `max_batch` items, asks the model once for a JSON list of
+labels, and hands each waiter its label. When the combined answer cannot be
+parsed, every request falls back to its own prompt, so results never get
+worse than without batching; only requests per minute go down.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from app.services.llm.base import LLMProvider
+from app.services.llm.context import capture_llm_failure, llm_task, report_llm_failure
+
+logger = structlog.get_logger()
+
+_BATCH_HEADER = "質問一覧:"
+_NUMBERED = re.compile(r"^\s*\d+\.\s?(.*)$")
+
+
+@dataclass
+class _Pending:
+    question: str
+    prompt: str
+    future: "asyncio.Future[str]"
+    failure: Optional[str] = None  # reason when the result is a provider failure message
+
+
+def batch_questions(prompt: str) -> List[str]:
+    """Questions of a combined classification prompt ([] for other prompts)."""
+    _, sep, rest = (prompt or "").partition(_BATCH_HEADER)
+    if not sep:
+        return []
+    questions: List[str] = []
+    for line in rest.strip().splitlines():
+        m = _NUMBERED.match(line)
+        if not m:
+            break
+        questions.append(m.group(1))
+    return questions
+
+
+def parse_labels(text: str, expected: int) -> Optional[List[str]]:
+    """JSON list of `expected` labels from the model's answer, or None."""
+    start, end = (text or "").find("["), (text or "").rfind("]")
+    if start < 0 or end <= start:
+        return None
+    try:
+        labels = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(labels, list) or len(labels) != expected or not all(isinstance(x, str) for x in labels):
+        return None
+    return [label.strip().lower() for label in labels]
+
+
+class ClassificationBatcher:
+    """Coalesces concurrent classification calls into one prompt."""
+
+    def __init__(
+        self,
+        llm: LLMProvider,
+        categories: Dict[str, str],
+        max_batch: int = 8,
+        max_wait_s: float = 0.005,
+        max_question_chars: int = 500,
+    ):
+        self._llm = llm
+        self._categories = dict(categories)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_s))
+        self.max_question_chars = int(max_question_chars)
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set["asyncio.Task[None]"] = set()
+        self.batches = 0
+        self.batched = 0
+        self.fallbacks = 0
+
+    @property
+    def categories(self) -> Dict[str, str]:
+        """Labels (and descriptions) the combined prompt asks for."""
+        return dict(self._categories)
+
+    async def classify(self, question: str, prompt: str) -> str:
+        """Raw label text for `question`; `prompt` is its standalone prompt."""
+        if self.max_batch == 1 or len(question) > self.max_question_chars:
+            return await self._llm.generate(prompt)
+        loop = asyncio.get_running_loop()
+        pending = _Pending(" ".join(question.split()), prompt, loop.create_future())
+        self._pending.append(pending)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+        text = await pending.future
+        if pending.failure:
+            report_llm_failure(pending.failure)  # in the caller's context, not the batch task's
+        return text
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        batch = [p for p in batch if not p.future.done()]  # waiters may have been cancelled
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    def _batch_prompt(self, questions: List[str]) -> str:
+        numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+        categories = "\n".join(f"- {name}: {desc}" for name, desc in self._categories.items())
+        example = json.dumps(list(self._categories)[:2], ensure_ascii=False)
+        return (
+            "以下の各質問を分析し、それぞれのカテゴリを判定してください：\n\n"
+            f"{_BATCH_HEADER}\n{numbered}\n\n"
+            f"カテゴリ:\n{categories}\n\n"
+            f"質問と同じ順番で、カテゴリ名のJSON配列のみを回答してください（例: {example}）。\n"
+        )
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        with llm_task("classification"):
+            if len(batch) == 1:
+                await self._individual(batch)
+                return
+            try:
+                text, failure = await self._generate(self._batch_prompt([p.question for p in batch]))
+            except Exception as e:  # noqa: BLE001
+                logger.warning("llm_classification_batch_error", size=len(batch), error=str(e))
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                return
+            if failure:
+                # Throttled or down: individual prompts would only add load
+                logger.warning("llm_classification_batch_failed", size=len(batch), reason=failure)
+                for pending in batch:
+                    self._resolve(pending, text, failure)
+                return
+            labels = parse_labels(text, len(batch))
+            if labels is None:
+                self.fallbacks += 1
+                logger.warning("llm_classification_batch_fallback", size=len(batch))
+                await self._individual(batch)
+                return
+            self.batches += 1
+            self.batched += len(batch)
+            logger.info("llm_classification_batched", size=len(batch))
+            for pending, label in zip(batch, labels):
+                self._resolve(pending, label)
+
+    async def _generate(self, prompt: str) -> Tuple[str, Optional[str]]:
+        """Answer text and the provider's failure reason (None on success)."""
+        with capture_llm_failure() as failure:
+            text = await self._llm.generate(prompt)
+        return text, failure.reason
+
+    async def _individual(self, batch: List[_Pending]) -> None:
+        results = await asyncio.gather(*(self._generate(p.prompt) for p in batch), return_exceptions=True)
+        for pending, result in zip(batch, results):
+            if pending.future.done():
+                continue
+            if isinstance(result, BaseException):
+                pending.future.set_exception(result)
+            else:
+                self._resolve(pending, *result)
+
+    @staticmethod
+    def _resolve(pending: _Pending, text: str, failure: Optional[str] = None) -> None:
+        if not pending.future.done():
+            pending.failure = failure
+            pending.future.set_result(text)
+
+__all__ = ["ClassificationBatcher", "batch_questions", "parse_labels"]
@@ -0,0 +1,182 @@
+"""Per-model circuit breakers.
+
+A breaker watches the outcomes of calls to one model over a rolling time
+window. When enough calls were seen and the share of failed or slow calls
+reaches the threshold, it opens: callers skip the model (and its retries and
+backoff sleeps) and go straight to the fallback. After `open_seconds` it is
+half-open and lets a single probe call through at a time, at most one per
+`probe_interval_seconds`; a successful probe closes it, a failed one opens
+it again.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Deque, Dict, List, Literal, Optional, Tuple
+
+import structlog
+
+from app.core.config import get_settings
+from app.models.llm import BreakerStats
+
+logger = structlog.get_logger()
+
+State = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by rolling failure and slow-call rates."""
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 60.0,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 15.0,
+        open_seconds: float = 30.0,
+        probe_interval_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window_seconds = float(window_seconds)
+        self.min_calls = max(1, int(min_calls))
+        self.failure_rate = float(failure_rate)
+        self.slow_call_seconds = float(slow_call_seconds)
+        self.open_seconds = float(open_seconds)
+        self.probe_interval_seconds = float(probe_interval_seconds)
+        self._clock = clock
+        self._calls: Deque[Tuple[float, bool]] = deque()  # (timestamp, failed or slow)
+        self._state: State = "closed"
+        self._opened_at = 0.0
+        self._last_probe_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> State:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now (a granted half-open probe must be recorded)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == "closed":
+                return True
+            if self._state == "half_open" and not self._probe_in_flight:
+                now = self._clock()
+                if self._last_probe_at is None or now - self._last_probe_at >= self.probe_interval_seconds:
+                    self._probe_in_flight = True
+                    self._last_probe_at = now
+                    logger.info("llm_circuit_probe", model=self.name)
+                    return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool, seconds: float = 0.0) -> None:
+        """Outcome of an allowed call; slow successes count as failures."""
+        bad = (not ok) or seconds >= self.slow_call_seconds
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_in_flight = False
+                self._transition("open" if bad else "closed")
+                return
+            if self._state == "open":
+                return  # a call started before the breaker opened
+            now = self._clock()
+            self._calls.append((now, bad))
+            self._trim(now)
+            total = len(self._calls)
+            failures = sum(1 for _, b in self._calls if b)
+            if total >= self.min_calls and failures / total >= self.failure_rate:
+                self._transition("open", failure_rate=round(failures / total, 3), calls=total)
+
+    def release(self) -> None:
+        """Give back a half-open probe slot without an outcome (e.g. the call was cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _maybe_half_open(self) -> None:
+        if self._state == "open" and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition("half_open")
+
+    def _transition(self, state: State, **fields: object) -> None:
+        if state == self._state:
+            return
+        previous, self._state = self._state, state
+        if state == "open":
+            self._opened_at = self._clock()
+            self.opened += 1
+        if state in ("open", "closed"):
+            self._calls.clear()
+        log = logger.warning if state == "open" else logger.info
+        log("llm_circuit_state_changed", model=self.name, previous=previous, state=state, **fields)
+
+    def stats(self) -> BreakerStats:
+        with self._lock:
+            self._maybe_half_open()
+            self._trim(self._clock())
+            total = len(self._calls)
+            failures = sum(1 for _, b in self._calls if b)
+            return BreakerStats(
+                model=self.name,
+                state=self._state,
+                calls=total,
+                failure_rate=round(failures / total, 4) if total else 0.0,
+                opened=self.opened,
+                rejected=self.rejected,
+            )
+
+
+class CircuitBreakerRegistry:
+    """One breaker per model name, created on first use."""
+
+    def __init__(self, **options: float):
+        self._options = options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(model, **self._options)  # type: ignore[arg-type]
+                self._breakers[model] = breaker
+            return breaker
+
+    def stats(self) -> List[BreakerStats]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [b.stats() for b in breakers]
+
+
+@lru_cache()
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """Get the process-wide per-model circuit breakers"""
+    settings = get_settings()
+    return CircuitBreakerRegistry(
+        window_seconds=settings.llm_breaker_window_seconds,
+        min_calls=settings.llm_breaker_min_calls,
+        failure_rate=settings.llm_breaker_failure_rate,
+        slow_call_seconds=settings.llm_breaker_slow_call_seconds,
+        open_seconds=settings.llm_breaker_open_seconds,
+        probe_interval_seconds=settings.llm_breaker_probe_interval_seconds,
+    )
+
+
+__all__ = ["CircuitOpenError", "CircuitBreaker", "CircuitBreakerRegistry", "get_circuit_breakers"]
@@ -0,0 +1,86 @@
+"""Per-request LLM call context.
+
+`LLMProvider.generate(prompt)` carries no metadata, so callers label the
+work they are about to do with `llm_task()` (and the chat session it belongs
+to) and providers that care (the router, the fake backend, usage accounting)
+read it back with `current_llm_task()` / `current_llm_session()`. Context
+variables follow the asyncio task, so concurrent requests do not mix.
+
+`generate()` also never raises: on failure providers return a friendly
+message. They flag it with `report_llm_failure()`, so callers that need to
+tell an apology from an answer (router failover, classification batching)
+wrap the call in `capture_llm_failure()`.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# "classification" or an agent type ("manufacturing", "python", "general")
+_LLM_TASK: ContextVar[Optional[str]] = ContextVar("llm_task", default=None)
+_LLM_SESSION: ContextVar[Optional[str]] = ContextVar("llm_session", default=None)
+
+
+class LLMFailure:
+    """Failure reported by a provider inside `capture_llm_failure()`."""
+
+    def __init__(self) -> None:
+        # "not_configured", "unavailable", "rate_limited", "timeout" or "error"
+        self.reason: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.reason is not None
+
+
+_LLM_FAILURE: ContextVar[Optional[LLMFailure]] = ContextVar("llm_failure", default=None)
+
+
+@contextmanager
+def llm_task(name: str, session_id: Optional[str] = None) -> Iterator[None]:
+    """Label LLM calls made inside the block with a task name (and session)."""
+    token = _LLM_TASK.set(name)
+    session_token = _LLM_SESSION.set(session_id) if session_id is not None else None
+    try:
+        yield
+    finally:
+        if session_token is not None:
+            _LLM_SESSION.reset(session_token)
+        _LLM_TASK.reset(token)
+
+
+def current_llm_task() -> Optional[str]:
+    return _LLM_TASK.get()
+
+
+def current_llm_session() -> Optional[str]:
+    return _LLM_SESSION.get()
+
+
+@contextmanager
+def capture_llm_failure() -> Iterator[LLMFailure]:
+    """Record whether the LLM call made inside the block returned a failure message."""
+    failure = LLMFailure()
+    token = _LLM_FAILURE.set(failure)
+    try:
+        yield failure
+    finally:
+        _LLM_FAILURE.reset(token)
+
+
+def report_llm_failure(reason: str) -> None:
+    """Flag the text being returned as a failure message (no-op outside a capture)."""
+    failure = _LLM_FAILURE.get()
+    if failure is not None:
+        failure.reason = reason
+
+
+__all__ = [
+    "llm_task",
+    "current_llm_task",
+    "current_llm_session",
+    "LLMFailure",
+    "capture_llm_failure",
+    "report_llm_failure",
+]
@@ -0,0 +1,75 @@
+"""Deterministic fake LLM backend for load tests and offline runs.
+
+Answers depend only on the prompt (and the routed task), never on the
+network: classification prompts get a keyword-based category (a JSON list
+for batched prompts), everything else a short digest of the prompt. An
+optional fixed latency emulates a real backend without its variance.
+
+`generate_with_prefix()` goes through the shared `PrefixCache` like Gemini
+does, so prefix reuse and invalidation can be exercised offline; a cached
+prefix cuts the emulated latency in proportion to its share of the prompt.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+
+from app.services.llm.base import PrefixCachingLLMProvider
+from app.services.llm.batching import batch_questions
+from app.services.llm.context import current_llm_session, current_llm_task
+from app.services.llm.prefix_cache import get_prefix_cache, prefix_key
+from app.services.llm.speculation import predict_category
+from app.services.llm.usage import estimate_tokens, record_usage
+
+
+class FakeLLMProvider(PrefixCachingLLMProvider):
+    """Always configured; same prompt, same answer."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = max(0.0, float(latency_s))
+        self.calls = 0
+        self.prefix_uploads = 0
+
+    @property
+    def is_configured(self) -> bool:
+        return True
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        text = self._answer(prompt)
+        record_usage("fake", "fake", prompt, text, self.latency_s)
+        return text
+
+    async def generate_with_prefix(self, prefix: str, prompt: str) -> str:
+        """Same answer as `generate(prefix + prompt)`; the prefix is "uploaded" once."""
+        self.calls += 1
+        await get_prefix_cache().get_or_create(
+            prefix_key("fake", "fake", prefix), current_llm_session(), self._upload_prefix
+        )
+        full_prompt = f"{prefix}\n\n{prompt}"
+        latency_s = self.latency_s * len(prompt) / max(1, len(full_prompt))
+        if latency_s:
+            await asyncio.sleep(latency_s)
+        text = self._answer(full_prompt)
+        record_usage("fake", "fake", full_prompt, text, latency_s, cached_tokens=estimate_tokens(prefix))
+        return text
+
+    async def _upload_prefix(self) -> str:
+        self.prefix_uploads += 1
+        return f"cachedContents/fake-{self.prefix_uploads}"
+
+    def _answer(self, prompt: str) -> str:
+        if current_llm_task() == "classification":
+            questions = batch_questions(prompt)
+            if questions:
+                return json.dumps([predict_category(q) for q in questions])
+            # Single classification prompts embed the question as `質問: ...`
+            return predict_category(prompt.split("質問:", 1)[-1].split("\n", 1)[0])
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"[fake:{digest}] {len(prompt)}文字のプロンプトを受け付けました。"
+
+
+__all__ = ["FakeLLMProvider"]
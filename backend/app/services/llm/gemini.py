@@ -2,33 +2,148 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+import datetime
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
 import structlog
 
 import google.generativeai as genai
+from google.generativeai import caching
 
 try:
     # Precise 429 detection when available
     from google.api_core.exceptions import ResourceExhausted  # type: ignore
 except Exception:  # pragma: no cover - fallback when dependency shape changes
     ResourceExhausted = Exception  # type: ignore
+try:
+    from google.api_core.exceptions import NotFound  # type: ignore
+except Exception:  # pragma: no cover - never matches; the message check still applies
+    NotFound = ()  # type: ignore
 
 from app.core.config import Settings
-from app.services.llm.base import LLMProvider
+from app.core.deadline import DeadlineExceeded, clamp_timeout, remaining_time
+from app.services.llm.base import FunctionCallingLLMProvider, PrefixCachingLLMProvider
+from app.services.llm.breaker import CircuitBreaker, CircuitOpenError, get_circuit_breakers
+from app.services.llm.context import current_llm_session, report_llm_failure
+from app.services.llm.gemini_rest import DEFAULT_BASE_URL, GeminiRESTModel
+from app.services.llm.hedging import Hedger, get_llm_hedger
+from app.services.llm.prefix_cache import PrefixCacheError, get_prefix_cache, prefix_key
+from app.services.llm.retry import RetryBudget, decorrelated_jitter, get_retry_budget, retry_after_seconds
+from app.services.llm.types import FunctionCall, FunctionCallingResponse
+from app.services.llm.usage import estimate_tokens, record_usage
+from app.services.tools.types import ToolDefinition
 
 
 logger = structlog.get_logger()
 
+# Smallest prefix the API accepts as cached content, by model family
+# (other models use LLM_PREFIX_CACHE_MIN_TOKENS alone)
+_CACHE_MIN_TOKENS = (
+    ("gemini-1.5", 32768),
+)
+
+
+def _function_args(function_call: Any) -> Dict[str, Any]:
+    """Plain dict of a Gemini FunctionCall's args (proto Struct -> dict)."""
+    try:
+        return dict(type(function_call).to_dict(function_call).get("args") or {})
+    except Exception:  # noqa: BLE001
+        return dict(getattr(function_call, "args", None) or {})
+
+
+def _usage_counts(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt, output) token counts reported by Gemini, None when absent."""
+    meta = getattr(response, "usage_metadata", None)
+    prompt = getattr(meta, "prompt_token_count", None)
+    output = getattr(meta, "candidates_token_count", None)
+    return (
+        prompt if isinstance(prompt, int) else None,
+        output if isinstance(output, int) else None,
+    )
+
+
+def _cached_tokens(response: Any) -> int:
+    count = getattr(getattr(response, "usage_metadata", None), "cached_content_token_count", None)
+    return count if isinstance(count, int) else 0
+
+
+def cache_min_tokens(model_name: str, configured: int) -> int:
+    """Smallest prefix worth caching for `model_name`: the configured floor or the API's minimum."""
+    name = model_name.rsplit("/", 1)[-1]
+    for family, minimum in _CACHE_MIN_TOKENS:
+        if name.startswith(family):
+            return max(configured, minimum)
+    return configured
+
+
+def _is_cache_missing_error(e: Exception) -> bool:
+    """The cached content behind a cached model is gone (expired or deleted)."""
+    if isinstance(e, NotFound) or getattr(e, "status_code", None) == 404:
+        return True
+    text = str(e).lower()
+    return ("cachedcontent" in text or "cached content" in text) and any(
+        word in text for word in ("not found", "expired", "permission denied")
+    )
+
+
+def _delete_cached_content(model: Any) -> None:
+    """Release callback: delete the remote cache behind a cached model (off the event loop)."""
+    name = getattr(model, "cached_content", None)
+    if not name:
+        return
+
+    def delete() -> None:
+        try:
+            caching.CachedContent.get(name).delete()
+        except Exception as e:  # noqa: BLE001 - it expires on its own anyway
+            logger.warning("gemini_cached_content_delete_failed", name=name, error=str(e))
+
+    try:
+        asyncio.get_running_loop().run_in_executor(None, delete)
+    except RuntimeError:
+        delete()
+
+
+class _EmptyResponse(ValueError):
+    """The model answered without text."""
 
-class GeminiProvider(LLMProvider):
+
+class GeminiProvider(FunctionCallingLLMProvider, PrefixCachingLLMProvider):
     """Google Gemini provider with built-in retries and fallback model."""
 
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        model: Any = None,
+        fallback_model: Any = None,
+        hedger: Optional[Hedger] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retry_budget: Optional[RetryBudget] = None,
+    ):
+        """Models are built from the settings unless `model` (and `fallback_model`) are given.
+
+        Injected models need no API key; the hedger, breaker and retry budget
+        default to the process-wide ones the settings enable.
+        """
         self._settings = settings
-        self._configured = bool(getattr(settings, "gemini_api_key", ""))
-        self._model = None
-        self._fallback_model = None
+        self._configured = model is not None or bool(getattr(settings, "gemini_api_key", ""))
+        self._model = model
+        self._fallback_model = fallback_model
+        self._rest = getattr(settings, "gemini_transport", "sdk") == "rest"
+        # Hedge slow primary calls with the fallback model (opt-in)
+        self._hedger: Optional[Hedger] = hedger
+        if hedger is None and getattr(settings, "llm_hedging", False):
+            self._hedger = get_llm_hedger()
+        # Skip the primary model (and its retries) while it is failing
+        self._breaker: Optional[CircuitBreaker] = breaker
+        if breaker is None and getattr(settings, "llm_circuit_breaker", False):
+            self._breaker = get_circuit_breakers().get(getattr(settings, "gemini_model", "gemini-1.5-pro"))
+        # Rate-limit retries across all requests stay within a fraction of traffic
+        self._retry_budget: Optional[RetryBudget] = retry_budget or get_retry_budget()
 
+        if model is not None:
+            return
         if not self._configured:
             logger.warning("gemini_not_configured")
             return
@@ -36,7 +151,7 @@ class GeminiProvider(LLMProvider):
         try:
             genai.configure(api_key=self._settings.gemini_api_key)
             model_name = getattr(self._settings, "gemini_model", "gemini-1.5-pro")
-            self._model = genai.GenerativeModel(model_name)
+            self._model = self._new_model(model_name)
         except Exception as e:  # pragma: no cover
             logger.error("gemini_model_init_error", error=str(e))
             self._configured = False
@@ -46,16 +161,34 @@ class GeminiProvider(LLMProvider):
         fallback_name = getattr(self._settings, "gemini_fallback_model", None)
         if fallback_name:
             try:
-                self._fallback_model = genai.GenerativeModel(fallback_name)
+                self._fallback_model = self._new_model(fallback_name)
             except Exception as e:  # pragma: no cover
                 logger.warning("gemini_fallback_init_failed", error=str(e), model=fallback_name)
                 self._fallback_model = None
 
+    def _new_model(self, model_name: str, cached_content: Optional[str] = None) -> Any:
+        """SDK model, or its REST counterpart on the shared HTTP client (`GEMINI_TRANSPORT=rest`)."""
+        if self._rest:
+            return GeminiRESTModel(
+                model_name,
+                self._settings.gemini_api_key,
+                base_url=getattr(self._settings, "gemini_api_base_url", DEFAULT_BASE_URL),
+                cached_content=cached_content,
+            )
+        return genai.GenerativeModel(model_name)
+
     @property
     def is_configured(self) -> bool:
         return bool(self._configured and self._model is not None)
 
+    @property
+    def is_available(self) -> bool:
+        """False while the primary model's circuit breaker is open."""
+        return self.is_configured and (self._breaker is None or self._breaker.state != "open")
+
     def _is_rate_limit_error(self, e: Exception) -> bool:
+        if isinstance(e, asyncio.TimeoutError):  # incl. DeadlineExceeded ("...exceeded")
+            return False
         text = str(e).lower()
         return (
             isinstance(e, ResourceExhausted)
@@ -68,80 +201,324 @@ class GeminiProvider(LLMProvider):
     async def generate(self, prompt: str) -> str:
         """Generate text using Gemini with retries and fallback.
 
-        Always returns a string; friendly messages are returned on failure.
+        With `LLM_HEDGING`, a slow primary call is hedged with the fallback
+        model instead of waiting for it to fail. Always returns a string;
+        friendly messages are returned on failure.
         """
         if not self.is_configured:
+            report_llm_failure("not_configured")
             return "申し訳ございません。現在Gemini APIが設定されていないため、回答を提供できません。API設定を確認してください。"
 
+        if self._hedger is not None and self._fallback_model is not None:
+            try:
+                text, _winner = await self._hedger.run(
+                    lambda: self._generate_primary(prompt),
+                    lambda: self._generate_fallback(prompt),
+                )
+                return text
+            except Exception as e:  # noqa: BLE001
+                return self._failure_message(e)
+
+        last_err: Optional[Exception] = None
+        try:
+            return await self._generate_primary(prompt)
+        except Exception as e:  # noqa: BLE001
+            last_err = e
+
+        # Fallback model
+        if self._fallback_model is not None:
+            try:
+                return await self._generate_fallback(prompt)
+            except _EmptyResponse:
+                pass
+            except Exception as e2:  # noqa: BLE001
+                last_err = e2
+        return self._failure_message(last_err)
+
+    async def _generate_primary(self, prompt: str, model: Any = None, usage_prompt: Optional[str] = None) -> str:
+        """Primary model (or `model`, e.g. bound to cached content) behind its circuit breaker; raises the last error."""
+        breaker = self._breaker
+        if breaker is None:
+            return await self._generate_primary_with_retries(prompt, model, usage_prompt)
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open for {breaker.name}")
+        started = time.perf_counter()
+        try:
+            text = await self._generate_primary_with_retries(prompt, model, usage_prompt)
+        except _EmptyResponse:
+            self._record_primary(True, started)
+            raise
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # Out of time on our side: says nothing about the model's health
+            breaker.release()
+            raise
+        except Exception:
+            self._record_primary(False, started)
+            raise
+        self._record_primary(True, started)
+        return text
+
+    async def _generate_primary_with_retries(
+        self, prompt: str, model: Any = None, usage_prompt: Optional[str] = None
+    ) -> str:
+        """Primary model with rate-limit retries; raises the last error.
+
+        Backoff uses decorrelated jitter, or the server's retry hint when it
+        sends one, and each retry needs a token from the process-wide retry
+        budget. Each attempt's timeout and each backoff are clamped to the
+        request deadline; a retry that could not finish before it is not started.
+        `model` replaces the primary model (same name and breaker), and usage
+        is recorded against `usage_prompt` when given.
+        """
+        model = model or self._model
         max_retries = getattr(self._settings, "gemini_max_retries", 3)
         base_backoff = float(getattr(self._settings, "gemini_retry_backoff_seconds", 2.0))
+        max_backoff = float(getattr(self._settings, "gemini_retry_max_backoff_seconds", 30.0))
         timeout_s = float(getattr(self._settings, "llm_generate_timeout_seconds", 30.0))
+        if self._retry_budget is not None:
+            self._retry_budget.record_request()
 
-        last_err: Optional[Exception] = None
+        backoff = base_backoff
+        last_err: Exception = RuntimeError("no attempt made")
         for attempt in range(max_retries):
+            attempt_timeout_s = clamp_timeout(timeout_s)
+            started = time.perf_counter()
             try:
                 response = await asyncio.wait_for(
-                    self._model.generate_content_async(prompt),  # type: ignore[union-attr]
-                    timeout=timeout_s,
+                    model.generate_content_async(prompt),  # type: ignore[union-attr]
+                    timeout=attempt_timeout_s,
                 )
                 text = getattr(response, "text", "")
                 text = text.strip() if isinstance(text, str) else ""
                 if not text:
                     logger.warning("gemini_empty_text", attempt=attempt + 1)
-                    last_err = ValueError("empty response text")
-                    break
+                    raise _EmptyResponse("empty response text")
+                record_usage(
+                    "gemini",
+                    getattr(self._settings, "gemini_model", ""),
+                    usage_prompt or prompt,
+                    text,
+                    time.perf_counter() - started,
+                    *_usage_counts(response),
+                    cached_tokens=_cached_tokens(response),
+                )
                 return text
+            except _EmptyResponse:
+                raise
             except asyncio.TimeoutError:
-                logger.error("gemini_generate_timeout", attempt=attempt + 1, timeout_s=timeout_s)
-                last_err = asyncio.TimeoutError(f"timeout after {timeout_s}s")
-                break
+                logger.error("gemini_generate_timeout", attempt=attempt + 1, timeout_s=attempt_timeout_s)
+                raise asyncio.TimeoutError(f"timeout after {attempt_timeout_s}s")
             except Exception as e:  # Broad catch to ensure graceful degradation
                 last_err = e
                 if self._is_rate_limit_error(e):
-                    backoff = base_backoff * (2 ** attempt)
+                    if self._breaker is not None and self._breaker.state == "open":
+                        # Other requests already tripped the breaker: stop retrying
+                        raise
+                    if attempt + 1 >= max_retries:
+                        raise
+                    hint = retry_after_seconds(e)
+                    if hint is not None and hint > max_backoff:
+                        logger.warning("gemini_retry_hint_too_long", attempt=attempt + 1, retry_after_s=hint)
+                        raise
+                    # The hint is a minimum; jitter on top keeps hinted retries from landing together
+                    backoff = (
+                        hint + random.uniform(0, base_backoff) if hint is not None
+                        else decorrelated_jitter(backoff, base_backoff, max_backoff)
+                    )
+                    left = remaining_time()
+                    if left is not None and backoff >= left:
+                        # The retry could not start (let alone finish) before the deadline
+                        logger.warning("gemini_retry_skipped_deadline", attempt=attempt + 1, remaining_s=round(left, 3))
+                        raise
+                    if self._retry_budget is not None and not self._retry_budget.try_retry():
+                        logger.warning("gemini_retry_budget_exhausted", attempt=attempt + 1)
+                        raise
                     logger.warning(
                         "gemini_rate_limited",
                         attempt=attempt + 1,
-                        backoff=backoff,
+                        backoff=round(backoff, 3),
+                        retry_after_s=hint,
                         error=str(e),
                     )
                     await asyncio.sleep(backoff)
                     continue
-                else:
-                    logger.error("gemini_generate_error", attempt=attempt + 1, error=str(e))
-                    break
+                logger.error("gemini_generate_error", attempt=attempt + 1, error=str(e))
+                raise
+        raise last_err
 
-        # Fallback model
+    async def _generate_fallback(self, prompt: str) -> str:
+        """Single call to the fallback model; raises on failure or empty text."""
+        timeout_s = clamp_timeout(float(getattr(self._settings, "llm_generate_timeout_seconds", 30.0)))
+        model_name = getattr(self._settings, "gemini_fallback_model", None)
+        started = time.perf_counter()
+        try:
+            logger.info("gemini_fallback_try", model=model_name)
+            response = await asyncio.wait_for(
+                self._fallback_model.generate_content_async(prompt),  # type: ignore[union-attr]
+                timeout=timeout_s,
+            )
+        except asyncio.TimeoutError:
+            logger.error("gemini_fallback_timeout", timeout_s=timeout_s)
+            raise asyncio.TimeoutError(f"timeout after {timeout_s}s")
+        except Exception as e2:
+            logger.error("gemini_fallback_error", error=str(e2))
+            raise
+        logger.info("gemini_fallback_used", model=model_name)
+        fb_text = getattr(response, "text", "")
+        fb_text = fb_text.strip() if isinstance(fb_text, str) else ""
+        if not fb_text:
+            logger.warning("gemini_fallback_empty_text")
+            raise _EmptyResponse("empty response text")
+        record_usage("gemini", model_name or "", prompt, fb_text, time.perf_counter() - started, *_usage_counts(response))
+        return fb_text
+
+    async def generate_with_prefix(self, prefix: str, prompt: str) -> str:
+        """Generate with `prefix` held in a Gemini cached content.
+
+        The cache is created once per session and prefix (see `PrefixCache`)
+        and referenced on later turns, so only `prompt` is sent and billed at
+        the full input rate. Prefixes below the model's minimum (see
+        `cache_min_tokens`; Gemini rejects small caches), an open circuit
+        breaker, a failed cache creation (not retried until the cache TTL
+        passes) or a cache that is gone fall back to `generate(prefix + prompt)`.
+        Other errors go through the same breaker, retries and fallback model
+        as `generate`, keeping the cache.
+        """
+        full_prompt = f"{prefix}\n\n{prompt}"
+        model_name = getattr(self._settings, "gemini_model", "gemini-1.5-pro")
+        min_tokens = cache_min_tokens(model_name, int(getattr(self._settings, "llm_prefix_cache_min_tokens", 4096)))
+        if (
+            not self.is_configured
+            or not getattr(self._settings, "llm_prefix_cache", False)
+            or estimate_tokens(prefix) < min_tokens
+            or not self.is_available
+        ):
+            return await self.generate(full_prompt)
+
+        key = prefix_key("gemini", model_name, prefix)
+        cache = get_prefix_cache()
+        try:
+            model = await cache.get_or_create(
+                key,
+                current_llm_session(),
+                lambda: self._create_cached_model(model_name, prefix),
+                release=_delete_cached_content,
+            )
+        except PrefixCacheError:
+            return await self.generate(full_prompt)  # failed recently; logged when it failed
+        except Exception as e:  # noqa: BLE001
+            logger.warning("gemini_cached_content_create_failed", model=model_name, error=str(e))
+            return await self.generate(full_prompt)
+
+        try:
+            return await self._generate_primary(prompt, model, usage_prompt=full_prompt)
+        except Exception as e:  # noqa: BLE001
+            if _is_cache_missing_error(e):
+                logger.warning("gemini_cached_content_missing", model=model_name, error=str(e))
+                cache.invalidate(key)
+                return await self.generate(full_prompt)
+            last_err: Optional[Exception] = e
         if self._fallback_model is not None:
             try:
-                logger.info(
-                    "gemini_fallback_try",
-                    model=getattr(self._settings, "gemini_fallback_model", None),
-                )
-                response = await asyncio.wait_for(
-                    self._fallback_model.generate_content_async(prompt),  # type: ignore[attr-defined]
-                    timeout=timeout_s,
-                )
-                logger.info(
-                    "gemini_fallback_used",
-                    model=getattr(self._settings, "gemini_fallback_model", None),
-                )
-                fb_text = getattr(response, "text", "")
-                fb_text = fb_text.strip() if isinstance(fb_text, str) else ""
-                if not fb_text:
-                    logger.warning("gemini_fallback_empty_text")
-                else:
-                    return fb_text
-            except asyncio.TimeoutError:
-                logger.error("gemini_fallback_timeout", timeout_s=timeout_s)
-                last_err = asyncio.TimeoutError(f"timeout after {timeout_s}s")
-            except Exception as e2:
-                logger.error("gemini_fallback_error", error=str(e2))
+                return await self._generate_fallback(full_prompt)
+            except _EmptyResponse:
+                pass
+            except Exception as e2:  # noqa: BLE001
                 last_err = e2
+        return self._failure_message(last_err)
+
+    async def _create_cached_model(self, model_name: str, prefix: str) -> Any:
+        """Upload `prefix` as cached content and return a model bound to it."""
+        # Outlive our own TTL a little so a handle never points at a deleted cache
+        ttl = datetime.timedelta(seconds=float(getattr(self._settings, "llm_prefix_cache_ttl_seconds", 900.0)) + 60)
 
-        # Friendly message when throttled or failed
+        def create() -> Any:
+            cached = caching.CachedContent.create(model=model_name, contents=[prefix], ttl=ttl)
+            if self._rest:
+                return self._new_model(model_name, cached_content=cached.name)
+            return genai.GenerativeModel.from_cached_content(cached)
+
+        # The upload cannot be cancelled in its thread, but the request stops waiting at its deadline
+        timeout_s = clamp_timeout(float(getattr(self._settings, "llm_generate_timeout_seconds", 30.0)))
+        model = await asyncio.wait_for(asyncio.to_thread(create), timeout=timeout_s)
+        logger.info("gemini_cached_content_created", model=model_name, prefix_tokens=estimate_tokens(prefix))
+        return model
+
+    def _record_primary(self, ok: bool, started: float) -> None:
+        if self._breaker is not None:
+            self._breaker.record(ok, time.perf_counter() - started)
+
+    def _failure_message(self, last_err: Optional[Exception]) -> str:
+        """Friendly message when throttled or failed (reported as a failure)"""
         if last_err and self._is_rate_limit_error(last_err):
+            report_llm_failure("rate_limited")
             return "現在リクエストが集中しているため回答できません。数十秒後に再度お試しください。"
         if isinstance(last_err, asyncio.TimeoutError):
+            report_llm_failure("timeout")
             return "LLMの応答に時間がかかっています。しばらくしてから再度お試しください。"
+        report_llm_failure("unavailable" if isinstance(last_err, CircuitOpenError) else "error")
         return "申し訳ございません。現在回答を生成できませんでした。しばらくしてからお試しください。"
+
+    async def generate_with_tools(
+        self, prompt: str, tools: List[ToolDefinition]
+    ) -> FunctionCallingResponse:
+        """Single function-calling round trip; errors are returned, not raised.
+
+        No retries or fallback model here: on failure the caller falls back to
+        plain `generate`, which has them.
+        """
+        if not self.is_configured:
+            return FunctionCallingResponse(error="not_configured")
+        try:
+            timeout_s = clamp_timeout(float(getattr(self._settings, "llm_generate_timeout_seconds", 30.0)))
+        except DeadlineExceeded:
+            return FunctionCallingResponse(error="deadline_exceeded")
+        if self._breaker is not None and not self._breaker.allow():
+            return FunctionCallingResponse(error="circuit_open")
+
+        declarations = [
+            {"name": t.name, "description": t.description, "parameters": t.parameters} for t in tools
+        ]
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self._model.generate_content_async(  # type: ignore[union-attr]
+                    prompt,
+                    tools=[{"function_declarations": declarations}],
+                ),
+                timeout=timeout_s,
+            )
+        except asyncio.TimeoutError:
+            logger.error("gemini_function_calling_timeout", timeout_s=timeout_s)
+            self._record_primary(False, started)
+            return FunctionCallingResponse(error=f"timeout after {timeout_s}s")
+        except asyncio.CancelledError:
+            if self._breaker is not None:
+                self._breaker.release()
+            raise
+        except Exception as e:  # noqa: BLE001
+            logger.error("gemini_function_calling_error", error=str(e))
+            self._record_primary(False, started)
+            return FunctionCallingResponse(error=str(e))
+        self._record_primary(True, started)
+
+        calls: List[FunctionCall] = []
+        texts: List[str] = []
+        candidates = getattr(response, "candidates", None) or []
+        if candidates:
+            for part in getattr(candidates[0].content, "parts", None) or []:
+                function_call = getattr(part, "function_call", None)
+                if function_call is not None and getattr(function_call, "name", ""):
+                    calls.append(FunctionCall(name=function_call.name, arguments=_function_args(function_call)))
+                elif getattr(part, "text", ""):
+                    texts.append(part.text)
+        result = FunctionCallingResponse(text="".join(texts).strip(), calls=calls)
+        record_usage(
+            "gemini",
+            getattr(self._settings, "gemini_model", ""),
+            prompt,
+            result.text + "".join(c.model_dump_json() for c in calls),
+            time.perf_counter() - started,
+            *_usage_counts(response),
+        )
+        return result
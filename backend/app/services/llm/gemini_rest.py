@@ -0,0 +1,164 @@
+"""Gemini REST transport over the shared pooled HTTP client.
+
+`GEMINI_TRANSPORT=rest` replaces the SDK's own transport for content
+generation with direct calls to `models/{model}:generateContent` on the
+process-wide `httpx.AsyncClient` (`llm/http.py`: keep-alive pool, HTTP/2).
+`GeminiRESTModel` mirrors the part of `genai.GenerativeModel` the provider
+uses (`generate_content_async()` returning `.text`, `.candidates` and
+`.usage_metadata`), so retries, fallback, hedging and the circuit breaker
+work unchanged. API errors raise `GeminiAPIError` with the HTTP status and
+the server's retry hint.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from app.services.llm.http import get_llm_http_client
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+
+class GeminiAPIError(Exception):
+    """Non-2xx answer from the Gemini REST API."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class FunctionCall:
+    name: str
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Part:
+    text: str = ""
+    function_call: Optional[FunctionCall] = None
+
+
+@dataclass
+class Content:
+    parts: List[Part] = field(default_factory=list)
+
+
+@dataclass
+class Candidate:
+    content: Content
+
+
+@dataclass
+class UsageMetadata:
+    prompt_token_count: Optional[int] = None
+    candidates_token_count: Optional[int] = None
+    cached_content_token_count: Optional[int] = None
+
+
+@dataclass
+class GenerateContentResponse:
+    candidates: List[Candidate]
+    usage_metadata: UsageMetadata
+
+    @property
+    def text(self) -> str:
+        if not self.candidates:
+            return ""
+        return "".join(p.text for p in self.candidates[0].content.parts if p.text)
+
+    @classmethod
+    def from_json(cls, body: Dict[str, Any]) -> "GenerateContentResponse":
+        candidates = []
+        for candidate in body.get("candidates") or []:
+            parts = []
+            for part in (candidate.get("content") or {}).get("parts") or []:
+                call = part.get("functionCall")
+                parts.append(Part(
+                    text=part.get("text") or "",
+                    function_call=FunctionCall(call.get("name", ""), dict(call.get("args") or {})) if call else None,
+                ))
+            candidates.append(Candidate(Content(parts)))
+        usage = body.get("usageMetadata") or {}
+        return cls(
+            candidates=candidates,
+            usage_metadata=UsageMetadata(
+                prompt_token_count=usage.get("promptTokenCount"),
+                candidates_token_count=usage.get("candidatesTokenCount"),
+                cached_content_token_count=usage.get("cachedContentTokenCount"),
+            ),
+        )
+
+
+def _duration(value: Any) -> Optional[float]:
+    """Seconds of a protobuf JSON duration ("12s", "0.5s")."""
+    if isinstance(value, str) and value.endswith("s"):
+        try:
+            return float(value[:-1])
+        except ValueError:
+            return None
+    return None
+
+
+def _api_error(response: httpx.Response) -> GeminiAPIError:
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        error = {}
+    retry_after = None
+    for detail in error.get("details") or []:
+        retry_after = _duration(detail.get("retryDelay")) if isinstance(detail, dict) else None
+        if retry_after is not None:
+            break
+    if retry_after is None and response.headers.get("retry-after"):
+        try:
+            retry_after = float(response.headers["retry-after"])
+        except ValueError:
+            pass
+    message = error.get("message") or response.reason_phrase or "Gemini API error"
+    return GeminiAPIError(response.status_code, f"{error.get('status', '')} {message}".strip(), retry_after)
+
+
+def _tools_json(tools: Optional[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    """SDK-style tool dicts (`function_declarations`) in REST field names."""
+    if not tools:
+        return None
+    return [{"functionDeclarations": t.get("function_declarations") or t.get("functionDeclarations") or []} for t in tools]
+
+
+class GeminiRESTModel:
+    """`generate_content_async()` of one model over the shared HTTP client."""
+
+    def __init__(
+        self,
+        model_name: str,
+        api_key: str,
+        base_url: str = DEFAULT_BASE_URL,
+        cached_content: Optional[str] = None,
+        client: Callable[[], httpx.AsyncClient] = get_llm_http_client,
+    ):
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.cached_content = cached_content
+        self._api_key = api_key
+        self._url = f"{base_url.rstrip('/')}/{self.model_name}:generateContent"
+        self._client = client
+
+    async def generate_content_async(
+        self, prompt: str, tools: Optional[List[Dict[str, Any]]] = None
+    ) -> GenerateContentResponse:
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        tools_json = _tools_json(tools)
+        if tools_json:
+            body["tools"] = tools_json
+        if self.cached_content:
+            body["cachedContent"] = self.cached_content
+        response = await self._client().post(self._url, json=body, headers={"x-goog-api-key": self._api_key})
+        if response.status_code >= 400:
+            raise _api_error(response)
+        return GenerateContentResponse.from_json(response.json())
+
+
+__all__ = ["GeminiRESTModel", "GeminiAPIError", "GenerateContentResponse", "DEFAULT_BASE_URL"]
@@ -0,0 +1,188 @@
+"""Hedged requests to a primary and a backup model, for tail latency.
+
+The primary call starts first. If it has not answered after the hedge delay
+(the recent p95 of successful primary calls, clamped to a configured range),
+the backup call starts too; the first successful answer wins and the other
+call is cancelled. A primary that fails early falls back to the backup
+immediately, as before. Hedges are capped by a token bucket: every request
+earns `max_rate` tokens (at most one banked) and a hedge spends one, so at
+most that fraction of requests is sent twice.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+
+import structlog
+
+from app.core.config import get_settings
+from app.models.llm import HedgeStats
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+_LATENCY_SAMPLES = 256
+_MIN_SAMPLES = 20
+
+
+class Hedger:
+    """Runs a primary call and, when it is slow, a backup call in parallel."""
+
+    def __init__(
+        self,
+        initial_delay_s: float,
+        min_delay_s: float,
+        max_delay_s: float,
+        max_rate: float,
+        quantile: float = 0.95,
+        enabled: bool = True,
+    ):
+        self.initial_delay_s = float(initial_delay_s)
+        self.min_delay_s = max(0.0, float(min_delay_s))
+        self.max_delay_s = max(self.min_delay_s, float(max_delay_s))
+        self.max_rate = min(1.0, max(0.0, float(max_rate)))
+        self.quantile = min(1.0, max(0.0, float(quantile)))
+        self.enabled = enabled
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._tokens = 1.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.budget_skipped = 0
+
+    # --- Delay and budget ---
+    def _percentile(self) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < _MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.quantile))]
+
+    def delay(self) -> float:
+        """Seconds to wait for the primary before hedging."""
+        observed = self._percentile()
+        delay = self.initial_delay_s if observed is None else observed
+        return min(self.max_delay_s, max(self.min_delay_s, delay))
+
+    def record_primary(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _admit(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(1.0, self._tokens + self.max_rate)
+
+    def _take_hedge_token(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.hedged += 1
+                return True
+            self.budget_skipped += 1
+            return False
+
+    # --- Execution ---
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        backup: Callable[[], Awaitable[T]],
+    ) -> Tuple[T, str]:
+        """First successful result and who produced it ("primary" or "backup").
+
+        Raises the last error when both calls fail.
+        """
+        self._admit()
+        started = time.perf_counter()
+        primary_task = asyncio.ensure_future(primary())
+        delay = self.delay()
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if not done:
+                if self._take_hedge_token():
+                    logger.info("llm_hedge_started", delay_ms=round(delay * 1000, 1))
+                    return await self._race(primary_task, asyncio.ensure_future(backup()), started)
+                await asyncio.wait({primary_task})
+        except asyncio.CancelledError:
+            primary_task.cancel()
+            raise
+
+        try:
+            result = primary_task.result()
+        except Exception as e:  # noqa: BLE001
+            logger.info("llm_hedge_fallback", error=str(e))
+            with self._lock:
+                self.fallbacks += 1
+            return await backup(), "backup"
+        self.record_primary(time.perf_counter() - started)
+        return result, "primary"
+
+    async def _race(
+        self, primary_task: "asyncio.Future[T]", backup_task: "asyncio.Future[T]", started: float
+    ) -> Tuple[T, str]:
+        names = {primary_task: "primary", backup_task: "backup"}
+        pending = set(names)
+        last_err: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    err = task.exception()
+                    if err is not None:
+                        last_err = err
+                        continue
+                    winner = names[task]
+                    if winner == "primary":
+                        self.record_primary(time.perf_counter() - started)
+                    else:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    logger.info("llm_hedge_won", winner=winner, took_ms=int((time.perf_counter() - started) * 1000))
+                    return task.result(), winner
+        finally:
+            for task in pending:
+                task.cancel()
+        assert last_err is not None
+        raise last_err
+
+    def stats(self) -> HedgeStats:
+        observed = self._percentile()
+        delay = self.delay()
+        with self._lock:
+            requests, hedged = self.requests, self.hedged
+            return HedgeStats(
+                enabled=self.enabled,
+                requests=requests,
+                hedged=hedged,
+                hedge_wins=self.hedge_wins,
+                fallbacks=self.fallbacks,
+                budget_skipped=self.budget_skipped,
+                hedge_rate=round(hedged / requests, 4) if requests else 0.0,
+                max_rate=self.max_rate,
+                delay_ms=round(delay * 1000, 1),
+                primary_p95_ms=round(observed * 1000, 1) if observed is not None else None,
+            )
+
+
+@lru_cache()
+def get_llm_hedger() -> Hedger:
+    """Get the process-wide hedger for primary/fallback model calls"""
+    settings = get_settings()
+    return Hedger(
+        initial_delay_s=settings.llm_hedge_initial_delay_seconds,
+        min_delay_s=settings.llm_hedge_min_delay_seconds,
+        max_delay_s=settings.llm_hedge_max_delay_seconds,
+        max_rate=settings.llm_hedge_max_rate,
+        quantile=settings.llm_hedge_quantile,
+        enabled=settings.llm_hedging,
+    )
+
+
+__all__ = ["Hedger", "get_llm_hedger"]
@@ -0,0 +1,70 @@
+"""Shared async HTTP client for LLM backends.
+
+One `httpx.AsyncClient` per process keeps a pool of keep-alive connections
+(and multiplexes requests over HTTP/2 when `h2` is installed), so bursts of
+LLM calls reuse warm TLS connections instead of opening new ones. Pool
+limits come from `LLM_HTTP_*`. The client is opened in the app lifespan and
+closed on shutdown; `get_llm_http_client()` also opens it on first use
+(tests, scripts).
+"""
+from __future__ import annotations
+
+import importlib.util
+from typing import Optional
+
+import httpx
+import structlog
+
+from app.core.config import Settings, get_settings
+
+logger = structlog.get_logger()
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def open_llm_http_client(settings: Optional[Settings] = None) -> httpx.AsyncClient:
+    """Create the shared client (idempotent)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        return _client
+    settings = settings or get_settings()
+    http2 = settings.llm_http2 and _http2_available()
+    if settings.llm_http2 and not http2:
+        logger.warning("llm_http2_unavailable", note="install httpx[http2]; using HTTP/1.1 keep-alive")
+    _client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+            keepalive_expiry=settings.llm_http_keepalive_expiry_seconds,
+        ),
+        timeout=httpx.Timeout(settings.llm_generate_timeout_seconds, connect=settings.llm_http_connect_timeout_seconds),
+    )
+    logger.info(
+        "llm_http_client_opened",
+        http2=http2,
+        max_connections=settings.llm_http_max_connections,
+        max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+    )
+    return _client
+
+
+def get_llm_http_client() -> httpx.AsyncClient:
+    """The shared client, opened on first use."""
+    return open_llm_http_client()
+
+
+async def close_llm_http_client() -> None:
+    """Close the shared client and its pooled connections (app shutdown)."""
+    global _client
+    client, _client = _client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+        logger.info("llm_http_client_closed")
+
+
+__all__ = ["open_llm_http_client", "get_llm_http_client", "close_llm_http_client"]
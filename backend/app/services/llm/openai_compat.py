@@ -0,0 +1,115 @@
+"""Provider for a local OpenAI-compatible chat completions server.
+
+Targets llama.cpp's `server`, vLLM, Ollama and similar (`POST
+{base_url}/chat/completions`), so cheap tasks and Gemini outages can be served
+without leaving the host. Requests use the shared keep-alive client
+(`llm/http.py`), and go through the model's circuit breaker, so an
+unreachable server is skipped by the router until it recovers.
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+import structlog
+
+from app.core.config import Settings
+from app.core.deadline import DeadlineExceeded, clamp_timeout
+from app.services.llm.base import LLMProvider
+from app.services.llm.breaker import CircuitBreaker, get_circuit_breakers
+from app.services.llm.context import report_llm_failure
+from app.services.llm.http import get_llm_http_client
+from app.services.llm.usage import record_usage
+
+logger = structlog.get_logger()
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """LLMProvider over an OpenAI-compatible HTTP endpoint."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        client: Callable[[], httpx.AsyncClient] = get_llm_http_client,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._settings = settings
+        self._base_url = (settings.local_llm_base_url or "").rstrip("/")
+        self.model = settings.local_llm_model
+        self.max_prompt_chars = settings.local_llm_max_prompt_chars
+        self._timeout_s = float(settings.llm_generate_timeout_seconds)
+        self._headers: Dict[str, str] = (
+            {"Authorization": f"Bearer {settings.local_llm_api_key}"} if settings.local_llm_api_key else {}
+        )
+        self._client = client
+        self._breaker = breaker
+        if breaker is None and settings.llm_circuit_breaker:
+            self._breaker = get_circuit_breakers().get(f"local:{self.model}")
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self._base_url)
+
+    @property
+    def is_available(self) -> bool:
+        """False while the breaker is open (the router then skips this backend)."""
+        return self.is_configured and (self._breaker is None or self._breaker.state != "open")
+
+    async def generate(self, prompt: str) -> str:
+        if not self.is_configured:
+            report_llm_failure("not_configured")
+            return "申し訳ございません。ローカルLLMが設定されていないため、回答を提供できません。"
+        try:
+            timeout_s = clamp_timeout(self._timeout_s)
+        except DeadlineExceeded:
+            logger.warning("local_llm_deadline_exceeded", model=self.model)
+            report_llm_failure("timeout")
+            return "LLMの応答に時間がかかっています。しばらくしてから再度お試しください。"
+        if self._breaker is not None and not self._breaker.allow():
+            report_llm_failure("unavailable")
+            return "申し訳ございません。現在ローカルLLMに接続できません。しばらくしてからお試しください。"
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await self._client().post(
+                f"{self._base_url}/chat/completions",
+                json={"model": self.model, "messages": [{"role": "user", "content": prompt}]},
+                headers=self._headers,
+                timeout=timeout_s,
+            )
+            response.raise_for_status()
+            body = response.json()
+            choices = body.get("choices") or []
+            text = ((choices[0].get("message") or {}).get("content") or "").strip() if choices else ""
+            ok = True
+            if not text:
+                logger.warning("local_llm_empty_text", model=self.model)
+                report_llm_failure("error")
+                return "申し訳ございません。現在回答を生成できませんでした。しばらくしてからお試しください。"
+            usage = body.get("usage") or {}
+            record_usage(
+                "local",
+                self.model,
+                prompt,
+                text,
+                time.perf_counter() - started,
+                usage.get("prompt_tokens"),
+                usage.get("completion_tokens"),
+            )
+            return text
+        except httpx.TimeoutException:
+            logger.error("local_llm_timeout", model=self.model, timeout_s=timeout_s)
+            report_llm_failure("timeout")
+            return "LLMの応答に時間がかかっています。しばらくしてから再度お試しください。"
+        except Exception as e:  # noqa: BLE001
+            logger.error("local_llm_error", model=self.model, error=str(e))
+            report_llm_failure("error")
+            return "申し訳ございません。現在回答を生成できませんでした。しばらくしてからお試しください。"
+        finally:
+            if self._breaker is not None:
+                self._breaker.record(ok, time.perf_counter() - started)
+
+
+__all__ = ["OpenAICompatibleProvider"]
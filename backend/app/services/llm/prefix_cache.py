@@ -0,0 +1,189 @@
+"""Handles of cached prompt prefixes (e.g. Gemini cached contents).
+
+A session asking repeatedly about the same large files would otherwise
+resend and reprocess the whole file context every turn. Providers upload the
+stable prefix once and keep the returned handle here, keyed by provider,
+model and a hash of the prefix. Each session holds at most one handle: a new
+file set replaces the previous one. Handles expire after the TTL and are
+dropped when the session's files change (`invalidate_session`); dropping a
+handle calls its `release` callback (e.g. deleting the remote cache).
+
+A failed creation is remembered for the TTL too: later calls for that key
+raise `PrefixCacheError` at once instead of retrying the upload every turn.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import get_settings
+from app.models.llm import PrefixCacheStats
+
+logger = structlog.get_logger()
+
+Release = Callable[[Any], None]
+
+
+def prefix_key(provider: str, model: str, prefix: str) -> str:
+    digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:32]
+    return f"{provider}:{model}:{digest}"
+
+
+class PrefixCacheError(RuntimeError):
+    """Creating this prefix failed recently; it is not retried until the TTL passes."""
+
+
+@dataclass
+class _Entry:
+    handle: Any
+    session_id: Optional[str]
+    expires_at: float
+    release: Optional[Release]
+
+
+class PrefixCache:
+    """Prefix handles with TTL, one per session, with single-flight creation."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._entries: Dict[str, _Entry] = {}
+        self._creating: Dict[str, "asyncio.Future[Any]"] = {}
+        self._failed: Dict[str, Tuple[float, str]] = {}  # key -> (retry after, error)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get_or_create(
+        self,
+        key: str,
+        session_id: Optional[str],
+        create: Callable[[], Awaitable[Any]],
+        release: Optional[Release] = None,
+    ) -> Any:
+        """Handle for `key`, creating it once (concurrent callers share the creation).
+
+        Raises the creation error, or `PrefixCacheError` while a recent
+        failure for `key` is remembered.
+        """
+        dropped: List[_Entry] = []
+        with self._lock:
+            self._expire(dropped)
+            entry = self._entries.get(key)
+            failed = self._failed.get(key)
+            pending = None
+            if entry is not None:
+                self.hits += 1
+            elif failed is None:
+                self.misses += 1
+                pending = self._creating.get(key)
+        self._release(dropped)
+        dropped = []
+        if entry is not None:
+            return entry.handle
+        if failed is not None:
+            raise PrefixCacheError(f"prefix creation failed recently: {failed[1]}")
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._creating[key] = future
+        try:
+            handle = await create()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: waiters re-raise, nobody else has to
+            if isinstance(e, Exception) and not isinstance(e, asyncio.TimeoutError):  # slow is not rejected
+                with self._lock:
+                    self._failed[key] = (self._clock() + self.ttl_seconds, str(e))
+                logger.warning("llm_prefix_create_failed", key=key, retry_after_s=self.ttl_seconds, error=str(e))
+            raise
+        finally:
+            with self._lock:
+                self._creating.pop(key, None)
+        future.set_result(handle)
+        with self._lock:
+            if session_id:
+                # A session keeps one prefix: its previous file set is no longer needed
+                for other, e in list(self._entries.items()):
+                    if e.session_id == session_id:
+                        dropped.append(self._entries.pop(other))
+            self._entries[key] = _Entry(handle, session_id, self._clock() + self.ttl_seconds, release)
+            while len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k].expires_at)
+                dropped.append(self._entries.pop(oldest))
+        self._release(dropped)
+        logger.info("llm_prefix_cached", key=key, session_id=session_id)
+        return handle
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._failed.pop(key, None)
+            entry = self._entries.pop(key, None)
+        self._release([entry] if entry else [])
+
+    def invalidate_session(self, session_id: str) -> int:
+        """Drop the session's handles (its files changed); returns how many."""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e.session_id == session_id]
+            dropped = [self._entries.pop(k) for k in keys]
+        self._release(dropped)
+        if dropped:
+            logger.info("llm_prefix_invalidated", session_id=session_id, count=len(dropped))
+        return len(dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            dropped = list(self._entries.values())
+            self._entries.clear()
+            self._failed.clear()
+        self._release(dropped)
+
+    def _expire(self, dropped: List[_Entry]) -> None:
+        now = self._clock()
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            dropped.append(self._entries.pop(key))
+        for key in [k for k, (retry_after, _) in self._failed.items() if retry_after <= now]:
+            del self._failed[key]
+
+    def _release(self, entries: List[_Entry]) -> None:
+        for entry in entries:
+            self.evictions += 1
+            if entry.release is None:
+                continue
+            try:
+                entry.release(entry.handle)
+            except Exception as e:  # noqa: BLE001
+                logger.warning("llm_prefix_release_failed", error=str(e))
+
+    def stats(self) -> PrefixCacheStats:
+        with self._lock:
+            dropped: List[_Entry] = []
+            self._expire(dropped)
+            entries, failed = len(self._entries), len(self._failed)
+        self._release(dropped)
+        return PrefixCacheStats(
+            entries=entries, hits=self.hits, misses=self.misses, evictions=self.evictions, failed=failed
+        )
+
+
+@lru_cache()
+def get_prefix_cache() -> PrefixCache:
+    """Get the process-wide prompt prefix cache"""
+    return PrefixCache(ttl_seconds=get_settings().llm_prefix_cache_ttl_seconds)
+
+
+__all__ = ["PrefixCache", "PrefixCacheError", "prefix_key", "get_prefix_cache"]
@@ -0,0 +1,147 @@
+"""Retry pacing for rate-limited LLM calls.
+
+Three parts keep 429 bursts from turning into retry storms:
+
+- `decorrelated_jitter()` spreads retries out instead of sending every
+  waiting request back at the same instant (sleep = random between the base
+  and three times the previous sleep, capped).
+- `retry_after_seconds()` reads the wait the server asked for (gRPC
+  `RetryInfo`, "retry in 12s" messages, an HTTP `Retry-After` header); it
+  replaces the computed backoff.
+- `RetryBudget` caps retries at a fraction of requests for the whole
+  process: every request earns `ratio` tokens (up to a small bank), every
+  retry spends one, and a trickle of `min_per_second` tokens keeps retries
+  possible when traffic is low. Without a token the error is returned as is.
+"""
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+import structlog
+
+from app.core.config import get_settings
+from app.models.llm import RetryStats
+
+logger = structlog.get_logger()
+
+_RETRY_IN = re.compile(r"retry (?:in|after) ([\d.]+)\s*(ms|s)", re.IGNORECASE)
+_RETRY_DELAY = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)(?:\s*nanos:\s*(\d+))?", re.IGNORECASE)
+
+
+def decorrelated_jitter(
+    previous_s: float, base_s: float, cap_s: float, rng: Callable[[float, float], float] = random.uniform
+) -> float:
+    """Next backoff: uniform between `base_s` and three times the previous one, at most `cap_s`."""
+    return min(cap_s, rng(base_s, max(base_s, previous_s * 3)))
+
+
+def _duration_seconds(duration: Any) -> Optional[float]:
+    seconds = getattr(duration, "seconds", None)
+    if seconds is None:
+        return None
+    return float(seconds) + float(getattr(duration, "nanos", 0) or 0) / 1e9
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait before retrying, if it said."""
+    hinted = getattr(error, "retry_after", None)  # e.g. GeminiAPIError of the REST transport
+    if isinstance(hinted, (int, float)):
+        return float(hinted)
+    # google.api_core errors carry the RPC status details (google.rpc.RetryInfo)
+    for detail in getattr(error, "details", None) or []:
+        seconds = _duration_seconds(getattr(detail, "retry_delay", None))
+        if seconds is not None:
+            return seconds
+    # HTTP responses (httpx.HTTPStatusError and similar)
+    response = getattr(error, "response", None)
+    header = getattr(getattr(response, "headers", None), "get", lambda _k: None)("retry-after")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    text = str(error)
+    m = _RETRY_DELAY.search(text)
+    if m:
+        return float(m.group(1)) + float(m.group(2) or 0) / 1e9
+    m = _RETRY_IN.search(text)
+    if m:
+        value = float(m.group(1))
+        return value / 1000 if m.group(2).lower() == "ms" else value
+    return None
+
+
+class RetryBudget:
+    """Process-wide cap on retries as a fraction of requests."""
+
+    def __init__(
+        self,
+        ratio: float,
+        min_per_second: float = 0.0,
+        max_tokens: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = max(0.0, float(ratio))
+        self.min_per_second = max(0.0, float(min_per_second))
+        self.max_tokens = max(1.0, float(max_tokens))
+        self._clock = clock
+        self._tokens = self.max_tokens
+        self._refilled_at = clock()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self, tokens: float) -> None:
+        now = self._clock()
+        tokens += (now - self._refilled_at) * self.min_per_second
+        self._refilled_at = now
+        self._tokens = min(self.max_tokens, self._tokens + tokens)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._refill(self.ratio)
+
+    def try_retry(self) -> bool:
+        """Spend a token for one retry; False when the budget is used up."""
+        with self._lock:
+            self._refill(0.0)
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.retries += 1
+                return True
+            self.exhausted += 1
+            return False
+
+    def stats(self) -> RetryStats:
+        with self._lock:
+            return RetryStats(
+                requests=self.requests,
+                retries=self.retries,
+                exhausted=self.exhausted,
+                retry_rate=round(self.retries / self.requests, 4) if self.requests else 0.0,
+                ratio=self.ratio,
+            )
+
+
+@lru_cache()
+def get_retry_budget() -> RetryBudget:
+    """Get the process-wide LLM retry budget"""
+    settings = get_settings()
+    return RetryBudget(
+        ratio=settings.llm_retry_budget_ratio,
+        min_per_second=settings.llm_retry_budget_min_per_second,
+    )
+
+
+__all__ = ["decorrelated_jitter", "retry_after_seconds", "RetryBudget", "get_retry_budget"]
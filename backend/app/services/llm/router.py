@@ -0,0 +1,237 @@
+"""Provider-agnostic routing over several LLM backends.
+
+`RoutingLLMProvider` implements `LLMProvider` by picking a backend per call:
+
+1. Preference: the task's route (`LLM_ROUTES="classification=local:gemini"`,
+   task from `llm_task()`), then the remaining backends as failover.
+2. Eligibility: configured, not tripped (`is_available`, e.g. an open circuit
+   breaker) and able to take the prompt (`max_prompt_chars`).
+3. Strategy (`LLM_ROUTING_STRATEGY`): keep that order, or prefer the lowest
+   recent latency or the lowest configured cost.
+
+A backend that returns a failure message (see `capture_llm_failure()`) is
+failed over to the next candidate. Latency is tracked process-wide
+(`get_llm_latency_tracker()`) and the provider itself is built once per
+process (`get_llm_provider()`), so the statistics outlive a request.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import structlog
+
+from app.core.config import Settings, get_settings
+from app.services.llm.base import FunctionCallingLLMProvider, LLMProvider, PrefixCachingLLMProvider
+from app.services.llm.context import capture_llm_failure, current_llm_task, report_llm_failure
+from app.services.llm.types import FunctionCallingResponse
+from app.services.tools.types import ToolDefinition
+
+logger = structlog.get_logger()
+
+_LATENCY_ALPHA = 0.2  # weight of the newest sample in the moving average
+_STRATEGIES = ("order", "latency", "cost")
+
+
+class LatencyTracker:
+    """Requests and moving-average latency per backend name."""
+
+    def __init__(self, alpha: float = _LATENCY_ALPHA):
+        self._alpha = alpha
+        self._latency: Dict[str, float] = {}  # seconds
+        self._requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: Optional[float]) -> None:
+        """Count a request; `seconds` is None for a failed one (not a latency sample)."""
+        with self._lock:
+            self._requests[name] = self._requests.get(name, 0) + 1
+            if seconds is None:
+                return
+            previous = self._latency.get(name)
+            self._latency[name] = seconds if previous is None else (
+                self._alpha * seconds + (1 - self._alpha) * previous
+            )
+
+    def latency(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._latency)
+
+    def requests(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._requests)
+
+
+@lru_cache()
+def get_llm_latency_tracker() -> LatencyTracker:
+    """Get the process-wide backend latency tracker"""
+    return LatencyTracker()
+
+
+class RoutingLLMProvider(FunctionCallingLLMProvider, PrefixCachingLLMProvider):
+    """Chooses a backend per request by task, prompt size, latency or cost."""
+
+    def __init__(
+        self,
+        backends: Dict[str, LLMProvider],
+        routes: Optional[Dict[str, List[str]]] = None,
+        strategy: str = "order",
+        costs: Optional[Dict[str, float]] = None,
+        latency: Optional[LatencyTracker] = None,
+    ):
+        if not backends:
+            raise ValueError("at least one LLM backend is required")
+        if strategy not in _STRATEGIES:
+            raise ValueError(f"unknown routing strategy: {strategy}")
+        self._backends = dict(backends)  # insertion order is the default preference
+        self._routes = {task: list(names) for task, names in (routes or {}).items()}
+        self.strategy = strategy
+        self._costs = dict(costs or {})
+        self._latency = latency or get_llm_latency_tracker()
+
+    @property
+    def is_configured(self) -> bool:
+        return any(getattr(b, "is_configured", False) for b in self._backends.values())
+
+    @property
+    def backends(self) -> Dict[str, LLMProvider]:
+        return dict(self._backends)
+
+    @property
+    def requests(self) -> Dict[str, int]:
+        """Calls made to each backend (failed-over attempts included)."""
+        counts = self._latency.requests()
+        return {name: counts.get(name, 0) for name in self._backends}
+
+    def candidates(self, prompt: str, task: Optional[str] = None, function_calling: bool = False) -> List[str]:
+        """Eligible backend names for this call, best first."""
+        task = task or current_llm_task()
+        preferred = [n for n in self._routes.get(task or "", []) if n in self._backends]
+        order = preferred + [n for n in self._backends if n not in preferred]
+        eligible = []
+        for name in order:
+            backend = self._backends[name]
+            if not getattr(backend, "is_configured", False) or not getattr(backend, "is_available", True):
+                continue
+            max_chars = getattr(backend, "max_prompt_chars", None)
+            if max_chars and len(prompt) > max_chars:
+                continue
+            if function_calling and not isinstance(backend, FunctionCallingLLMProvider):
+                continue
+            eligible.append(name)
+        if self.strategy == "latency":
+            latency = self._latency.latency()
+            # Unmeasured backends sort first so they get measured
+            eligible.sort(key=lambda n: latency.get(n, 0.0))
+        elif self.strategy == "cost":
+            eligible.sort(key=lambda n: self._costs.get(n, 0.0))
+        return eligible
+
+    def latency_ms(self) -> Dict[str, float]:
+        latency = self._latency.latency()
+        return {name: round(latency[name] * 1000, 1) for name in self._backends if name in latency}
+
+    async def generate(self, prompt: str) -> str:
+        return await self._generate(prompt)
+
+    async def generate_with_prefix(self, prefix: str, prompt: str) -> str:
+        """Route on the full prompt; backends without prefix caching get it inline."""
+        return await self._generate(f"{prefix}\n\n{prompt}", prefix=prefix, suffix=prompt)
+
+    async def _generate(self, prompt: str, prefix: Optional[str] = None, suffix: str = "") -> str:
+        names = self.candidates(prompt)
+        if not names:
+            # Nothing eligible: let the first configured backend produce its own message
+            names = [n for n, b in self._backends.items() if getattr(b, "is_configured", False)]
+            if not names:
+                return "申し訳ございません。現在LLMが設定されていないため、回答を提供できません。API設定を確認してください。"
+            logger.warning("llm_route_unavailable", task=current_llm_task(), backend=names[0])
+        text = ""
+        for i, name in enumerate(names):
+            logger.debug("llm_routed", task=current_llm_task(), backend=name, prompt_chars=len(prompt))
+            backend = self._backends[name]
+            started = time.perf_counter()
+            with capture_llm_failure() as failure:
+                if prefix is not None and isinstance(backend, PrefixCachingLLMProvider):
+                    text = await backend.generate_with_prefix(prefix, suffix)
+                else:
+                    text = await backend.generate(prompt)
+            if not failure.failed:
+                self._latency.record(name, time.perf_counter() - started)
+                return text
+            self._latency.record(name, None)
+            if i + 1 < len(names):
+                logger.warning(
+                    "llm_failover", task=current_llm_task(), backend=name, reason=failure.reason, next=names[i + 1]
+                )
+            else:
+                report_llm_failure(failure.reason or "error")
+        return text
+
+    async def generate_with_tools(
+        self, prompt: str, tools: List[ToolDefinition]
+    ) -> FunctionCallingResponse:
+        response = FunctionCallingResponse(error="function_calling_unavailable")
+        names = self.candidates(prompt, function_calling=True)
+        for i, name in enumerate(names):
+            backend = self._backends[name]
+            assert isinstance(backend, FunctionCallingLLMProvider)
+            started = time.perf_counter()
+            response = await backend.generate_with_tools(prompt, tools)
+            if not response.error:
+                self._latency.record(name, time.perf_counter() - started)
+                return response
+            self._latency.record(name, None)
+            if i + 1 < len(names):
+                logger.warning(
+                    "llm_failover", task=current_llm_task(), backend=name, reason=response.error, next=names[i + 1]
+                )
+        return response
+
+
+def build_llm_provider(settings: Settings) -> LLMProvider:
+    """The configured provider: Gemini alone (default) or a router over `LLM_BACKENDS`."""
+    from app.services.llm.fake import FakeLLMProvider
+    from app.services.llm.gemini import GeminiProvider
+    from app.services.llm.openai_compat import OpenAICompatibleProvider
+
+    names = settings.get_llm_backends() or ["gemini"]
+    routes = settings.get_llm_routes()
+    backends: Dict[str, LLMProvider] = {}
+    for name in names:
+        if name == "gemini":
+            backends[name] = GeminiProvider(settings)
+        elif name == "local":
+            backends[name] = OpenAICompatibleProvider(settings)
+        elif name == "fake":
+            backends[name] = FakeLLMProvider(latency_s=settings.fake_llm_latency_ms / 1000)
+        else:
+            logger.warning("llm_backend_unknown", backend=name)
+    if not backends:
+        backends["gemini"] = GeminiProvider(settings)
+    if len(backends) == 1 and not routes:
+        return next(iter(backends.values()))
+    logger.info("llm_router_enabled", backends=list(backends), routes=routes, strategy=settings.llm_routing_strategy)
+    return RoutingLLMProvider(
+        backends,
+        routes=routes,
+        strategy=settings.llm_routing_strategy,
+        costs=settings.get_llm_backend_costs(),
+    )
+
+
+@lru_cache()
+def get_llm_provider() -> LLMProvider:
+    """Get the process-wide provider built from the settings"""
+    return build_llm_provider(get_settings())
+
+
+__all__ = [
+    "LatencyTracker",
+    "RoutingLLMProvider",
+    "build_llm_provider",
+    "get_llm_latency_tracker",
+    "get_llm_provider",
+]
@@ -0,0 +1,125 @@
+"""Bookkeeping for speculative classify-and-answer.
+
+With `LLM_SPECULATION`, the workflow starts the answer of the agent the
+local keyword heuristic predicts while the LLM classification is still
+running. A hit saves the shorter of the two calls; a miss costs one
+cancelled generation. `SpeculationTracker` counts both and acts as the cost
+cap: once the hit rate over the last `window` speculations drops below
+`min_hit_rate`, speculation is switched off for `cooldown_s` and then
+retried with a fresh window.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Deque, Optional
+
+import structlog
+
+from app.core.config import get_settings
+from app.models.llm import SpeculationStats
+
+logger = structlog.get_logger()
+
+_CATEGORY_KEYWORDS = (
+    ("manufacturing", ("改善", "品質", "製造", "効率", "生産")),
+    ("python", ("python", "プログラム", "コード", "スクリプト")),
+)
+
+
+def predict_category(query: str) -> str:
+    """Local keyword guess of the query category (no LLM call)."""
+    query = (query or "").lower()
+    for category, words in _CATEGORY_KEYWORDS:
+        if any(word in query for word in words):
+            return category
+    return "general"
+
+
+class SpeculationTracker:
+    """Hit rate and latency saved by speculation, with a hit-rate floor."""
+
+    def __init__(
+        self,
+        enabled: bool,
+        min_hit_rate: float = 0.6,
+        window: int = 50,
+        min_samples: int = 20,
+        cooldown_s: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.enabled = enabled
+        self.min_hit_rate = min(1.0, max(0.0, float(min_hit_rate)))
+        self.min_samples = max(1, int(min_samples))
+        self.cooldown_s = max(0.0, float(cooldown_s))
+        self._clock = clock
+        self._recent: Deque[bool] = deque(maxlen=max(self.min_samples, int(window)))
+        self._paused_until: Optional[float] = None
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.saved_ms = 0.0
+
+    def allow(self) -> bool:
+        """Whether to speculate on this request (False while paused by the cap)."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._paused_until is not None:
+                if self._clock() < self._paused_until:
+                    self.skipped += 1
+                    return False
+                self._paused_until = None
+                self._recent.clear()
+                logger.info("llm_speculation_resumed")
+            self.started += 1
+            return True
+
+    def record(self, hit: bool, saved_s: float = 0.0) -> None:
+        with self._lock:
+            self._recent.append(hit)
+            if hit:
+                self.hits += 1
+                self.saved_ms += max(0.0, saved_s) * 1000
+            else:
+                self.misses += 1
+            rate = sum(self._recent) / len(self._recent)
+            if len(self._recent) >= self.min_samples and rate < self.min_hit_rate:
+                self._paused_until = self._clock() + self.cooldown_s
+                logger.warning("llm_speculation_paused", hit_rate=round(rate, 3), cooldown_s=self.cooldown_s)
+
+    def stats(self) -> SpeculationStats:
+        with self._lock:
+            settled = self.hits + self.misses
+            return SpeculationStats(
+                enabled=self.enabled,
+                paused=self._paused_until is not None and self._clock() < self._paused_until,
+                started=self.started,
+                hits=self.hits,
+                misses=self.misses,
+                skipped=self.skipped,
+                hit_rate=round(self.hits / settled, 4) if settled else 0.0,
+                recent_hit_rate=round(sum(self._recent) / len(self._recent), 4) if self._recent else None,
+                saved_ms_total=round(self.saved_ms, 1),
+                saved_ms_avg=round(self.saved_ms / self.hits, 1) if self.hits else 0.0,
+            )
+
+
+@lru_cache()
+def get_speculation_tracker() -> SpeculationTracker:
+    """Get the process-wide speculation tracker"""
+    settings = get_settings()
+    return SpeculationTracker(
+        enabled=settings.llm_speculation,
+        min_hit_rate=settings.llm_speculation_min_hit_rate,
+        window=settings.llm_speculation_window,
+        min_samples=settings.llm_speculation_min_samples,
+        cooldown_s=settings.llm_speculation_cooldown_seconds,
+    )
+
+
+__all__ = ["SpeculationTracker", "get_speculation_tracker", "predict_category"]
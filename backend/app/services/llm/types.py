@@ -0,0 +1,31 @@
+"""LLM provider result models."""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class FunctionCall(BaseModel):
+    name: str = Field(..., description="Tool name chosen by the model")
+    arguments: Dict[str, Any] = Field(default_factory=dict, description="Arguments matching the tool's JSON schema")
+
+
+class FunctionCallingResponse(BaseModel):
+    text: str = Field("", description="Plain text answer when no tool was called")
+    calls: List[FunctionCall] = Field(default_factory=list, description="Requested tool calls, in order")
+    error: Optional[str] = Field(None, description="Error message if the call failed")
+
+
+class LLMUsage(BaseModel):
+    provider: str = Field(..., description="Backend that served the call (gemini, local, fake)")
+    model: str = Field("", description="Model name")
+    task: Optional[str] = Field(None, description="Task label from llm_task() (classification, agent type)")
+    session_id: Optional[str] = Field(None, description="Chat session the call belongs to")
+    prompt_tokens: int = Field(0, description="Prompt tokens (reported by the model, else estimated)")
+    output_tokens: int = Field(0, description="Output tokens (reported by the model, else estimated)")
+    cached_tokens: int = Field(0, description="Prompt tokens served from a cached prefix")
+    latency_ms: float = Field(0.0, description="Wall time of the call")
+    estimated: bool = Field(False, description="True when token counts come from the local estimator")
+
+
+__all__ = ["FunctionCall", "FunctionCallingResponse", "LLMUsage"]
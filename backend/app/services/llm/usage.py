@@ -0,0 +1,191 @@
+"""Token accounting and prompt-size budgeting.
+
+Providers report every successful call with `record_usage()`: prompt and
+output tokens (as returned by the model, else estimated locally) and
+latency, labelled with the task and session from `llm_task()`. Totals per
+agent and per session are kept in `UsageTracker` and exported as metrics;
+`collect_usage()` lets a caller see the usage of the calls it made, since
+`generate()` itself returns only text.
+
+`estimate_tokens()` is a cheap local estimate (about one token per non-ASCII
+character, four ASCII characters per token) used to trim prompts to a
+budget before sending.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Literal, Optional
+
+import structlog
+
+from app.models.llm import UsageStats, UsageTotals
+from app.services.llm.context import current_llm_session, current_llm_task
+from app.services.llm.types import LLMUsage
+
+logger = structlog.get_logger()
+
+_ASCII_CHARS_PER_TOKEN = 4
+_TRIM_MARKER = "…（省略）"
+_MAX_SESSIONS = 1000
+
+_COLLECTOR: ContextVar[Optional[List[LLMUsage]]] = ContextVar("llm_usage_collector", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text` without a tokenizer."""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (len(text) - ascii_chars) + math.ceil(ascii_chars / _ASCII_CHARS_PER_TOKEN)
+
+
+def trim_to_tokens(text: str, max_tokens: int, keep: Literal["head", "tail"] = "head") -> str:
+    """Cut `text` to about `max_tokens`, keeping its start ("head") or end ("tail")."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= estimate_tokens(_TRIM_MARKER):
+        return ""
+    budget = max_tokens - estimate_tokens(_TRIM_MARKER)
+    chars = len(text) * budget // max(1, estimate_tokens(text))
+    while chars > 0:
+        part = text[:chars] if keep == "head" else text[len(text) - chars:]
+        if estimate_tokens(part) <= budget:
+            return part + _TRIM_MARKER if keep == "head" else _TRIM_MARKER + part
+        chars = chars * 9 // 10
+    return ""
+
+
+@dataclass
+class _Totals:
+    requests: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    latency_ms: float = 0.0
+
+    def add(self, usage: LLMUsage) -> None:
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.output_tokens += usage.output_tokens
+        self.latency_ms += usage.latency_ms
+
+    def export(self, key: str) -> UsageTotals:
+        n = max(1, self.requests)
+        return UsageTotals(
+            key=key,
+            requests=self.requests,
+            prompt_tokens=self.prompt_tokens,
+            output_tokens=self.output_tokens,
+            prompt_tokens_avg=round(self.prompt_tokens / n, 1),
+            latency_ms_avg=round(self.latency_ms / n, 1),
+        )
+
+
+class UsageTracker:
+    """Token totals per agent (task) and per session (most recent sessions only)."""
+
+    def __init__(self, max_sessions: int = _MAX_SESSIONS):
+        self.max_sessions = max(1, int(max_sessions))
+        self._agents: Dict[str, _Totals] = {}
+        self._sessions: "OrderedDict[str, _Totals]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, usage: LLMUsage) -> None:
+        with self._lock:
+            self._agents.setdefault(usage.task or "other", _Totals()).add(usage)
+            if usage.session_id:
+                totals = self._sessions.pop(usage.session_id, None) or _Totals()
+                totals.add(usage)
+                self._sessions[usage.session_id] = totals
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+    def session(self, session_id: str) -> Optional[UsageTotals]:
+        with self._lock:
+            totals = self._sessions.get(session_id)
+            return totals.export(session_id) if totals else None
+
+    def stats(self, sessions: int = 50) -> UsageStats:
+        with self._lock:
+            agents = [t.export(k) for k, t in sorted(self._agents.items())]
+            recent = list(self._sessions.items())[-sessions:] if sessions > 0 else []
+            return UsageStats(agents=agents, sessions=[t.export(k) for k, t in reversed(recent)])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._agents.clear()
+            self._sessions.clear()
+
+
+@lru_cache()
+def get_usage_tracker() -> UsageTracker:
+    """Get the process-wide LLM usage tracker"""
+    return UsageTracker()
+
+
+@contextmanager
+def collect_usage() -> Iterator[List[LLMUsage]]:
+    """Collect the usage of LLM calls made inside the block (including child tasks)."""
+    usages: List[LLMUsage] = []
+    token = _COLLECTOR.set(usages)
+    try:
+        yield usages
+    finally:
+        _COLLECTOR.reset(token)
+
+
+def record_usage(
+    provider: str,
+    model: str,
+    prompt: str,
+    output: str,
+    latency_s: float,
+    prompt_tokens: Optional[int] = None,
+    output_tokens: Optional[int] = None,
+    cached_tokens: int = 0,
+) -> LLMUsage:
+    """Account one successful call; missing token counts are estimated."""
+    estimated = prompt_tokens is None or output_tokens is None
+    usage = LLMUsage(
+        provider=provider,
+        model=model,
+        task=current_llm_task(),
+        session_id=current_llm_session(),
+        prompt_tokens=prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+        output_tokens=output_tokens if output_tokens is not None else estimate_tokens(output),
+        cached_tokens=cached_tokens,
+        latency_ms=round(latency_s * 1000, 1),
+        estimated=estimated,
+    )
+    get_usage_tracker().record(usage)
+    collector = _COLLECTOR.get()
+    if collector is not None:
+        collector.append(usage)
+    logger.info(
+        "llm_usage",
+        provider=provider,
+        model=model,
+        task=usage.task,
+        session_id=usage.session_id,
+        prompt_tokens=usage.prompt_tokens,
+        output_tokens=usage.output_tokens,
+        cached_tokens=usage.cached_tokens,
+        latency_ms=usage.latency_ms,
+        estimated=estimated,
+    )
+    return usage
+
+
+__all__ = [
+    "estimate_tokens",
+    "trim_to_tokens",
+    "UsageTracker",
+    "get_usage_tracker",
+    "collect_usage",
+    "record_usage",
+]
@@ -0,0 +1,10 @@
+"""Local document search (on-disk inverted index with BM25 ranking).
+
+Used by the `web:`/`search:` tool on air-gapped deployments. Build or update
+the index with `python -m app.services.search build <corpus_dir>`.
+"""
+from __future__ import annotations
+
+from .index import SearchHit, SearchIndex, get_search_index
+
+__all__ = ["SearchHit", "SearchIndex", "get_search_index"]
@@ -0,0 +1,144 @@
+"""Search index CLI.
+
+Usage (from backend/):
+  python -m app.services.search build <corpus_dir> [--index PATH]
+  python -m app.services.search query "<terms>" [--index PATH] [-k 5]
+  python -m app.services.search bench [--index PATH] [--synthetic N] [--repeat 20] [queries ...]
+
+`build` is incremental: re-running it only re-indexes changed files and
+drops deleted ones. `bench --synthetic N` builds a throwaway index of N
+generated documents first, to check latency at a given corpus size.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from app.core.config import get_settings
+
+from .index import SearchIndex
+
+_DEFAULT_QUERIES = ["段取り替え", "設備 点検", "品質異常 対策", "チョコ停", "torque 設定"]
+
+_DOMAIN_TERMS = (
+    "段取り替え 設備 点検 品質 異常 対策 チョコ停 稼働率 作業 手順 安全 保全 予防 "
+    "不良 工程 検査 治具 金型 温度 圧力 トルク 締付 記録 報告 改善 標準 教育 "
+    "torque sensor spindle alarm reset calibration inspection maintenance"
+).split()
+_KANJI = "機械加工部品組立製造管理運転停止確認調整交換清掃注油電源制御装置表示警報"
+
+
+def _synthetic_vocabulary(rng: random.Random, size: int = 20_000) -> List[str]:
+    """Zipf-ranked vocabulary with the domain terms spread over common..rare ranks."""
+    vocab = ["".join(rng.choices(_KANJI, k=rng.randint(2, 4))) for _ in range(size)]
+    for i, term in enumerate(_DOMAIN_TERMS):
+        vocab.insert(20 + i * 40, term)
+    return vocab
+
+
+def _index_path(arg: Optional[str]) -> str:
+    path = arg or get_settings().search_index_path
+    if not path:
+        sys.exit("index path is not set: use --index or SEARCH_INDEX_PATH")
+    return path
+
+
+def _cmd_build(args: argparse.Namespace) -> int:
+    index = SearchIndex(_index_path(args.index))
+    stats = index.update_from_directory(args.corpus)
+    print(
+        f"added={stats.added} updated={stats.updated} removed={stats.removed} "
+        f"unchanged={stats.unchanged} failed={len(stats.failed)} "
+        f"docs={index.count()} took={stats.took_ms}ms"
+    )
+    return 0
+
+
+def _cmd_query(args: argparse.Namespace) -> int:
+    index = SearchIndex(_index_path(args.index), read_only=True)
+    start = time.perf_counter()
+    hits = index.search(args.query, top_k=args.k)
+    took = (time.perf_counter() - start) * 1000
+    for i, hit in enumerate(hits, 1):
+        print(f"{i}. [{hit.score:.3f}] {hit.title} — {hit.path}\n   {hit.snippet}")
+    print(f"{len(hits)} hits in {took:.1f}ms")
+    return 0
+
+
+def _synthetic_index(n_docs: int, directory: str) -> SearchIndex:
+    rng = random.Random(42)
+    vocab = _synthetic_vocabulary(rng)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) ** 1.1 for rank in range(len(vocab))))
+    index = SearchIndex(os.path.join(directory, "bench.sqlite"))
+    for i in range(n_docs):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(40, 200))
+        index.add_document(f"/synthetic/doc-{i}.txt", f"文書{i}\n" + "、".join(words))
+        if i % 5000 == 4999:
+            index.commit()
+    index.commit()
+    return index
+
+
+def _cmd_bench(args: argparse.Namespace) -> int:
+    queries: List[str] = args.queries or _DEFAULT_QUERIES
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic:
+            start = time.perf_counter()
+            index = _synthetic_index(args.synthetic, tmp)
+            print(f"built synthetic index: {args.synthetic} docs in {time.perf_counter() - start:.1f}s")
+        else:
+            index = SearchIndex(_index_path(args.index), read_only=True)
+        print(f"documents: {index.count()}")
+        for q in queries:
+            index.search(q, top_k=args.k)  # warm up
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                hits = index.search(q, top_k=args.k)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            print(
+                f"{q!r:>16}: hits={len(hits)} p50={statistics.median(samples):.1f}ms "
+                f"p95={p95:.1f}ms max={samples[-1]:.1f}ms"
+            )
+        index.close()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.services.search")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="index or incrementally update a corpus directory")
+    build.add_argument("corpus")
+    build.add_argument("--index")
+    build.set_defaults(func=_cmd_build)
+
+    query = sub.add_parser("query", help="run a single query")
+    query.add_argument("query")
+    query.add_argument("--index")
+    query.add_argument("-k", type=int, default=5)
+    query.set_defaults(func=_cmd_query)
+
+    bench = sub.add_parser("bench", help="measure query latency")
+    bench.add_argument("queries", nargs="*")
+    bench.add_argument("--index")
+    bench.add_argument("--synthetic", type=int, default=0, help="generate N documents instead of --index")
+    bench.add_argument("--repeat", type=int, default=20)
+    bench.add_argument("-k", type=int, default=5)
+    bench.set_defaults(func=_cmd_bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
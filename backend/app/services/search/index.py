@@ -0,0 +1,349 @@
+"""On-disk inverted index for the local document search tool.
+
+Backed by SQLite FTS5: documents are pre-tokenized with `tokenizer.tokenize`
+(word tokens + CJK bigrams) and stored space-separated, so FTS5 keeps the
+postings on disk and ranks with BM25. The normalized source text is stored
+alongside for snippet extraction. Updates are incremental: files are
+re-indexed only when their mtime or size changes.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import structlog
+
+from app.core.config import get_settings
+
+from .tokenizer import query_terms, tokenize
+
+logger = structlog.get_logger()
+
+# Formats that make sense as searchable documents (spreadsheets are summarized, not indexed)
+INDEXABLE_EXTENSIONS = (".txt", ".md", ".markdown", ".log", ".html", ".htm", ".json", ".pdf", ".docx")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    title, body, tokenize = 'unicode61 remove_diacritics 0'
+);
+"""
+# BM25 column weights: title, body
+_BM25_WEIGHTS = (3.0, 1.0)
+_COMMIT_EVERY = 500
+_MAX_TITLE_CHARS = 100
+
+
+@dataclass
+class SearchHit:
+    path: str
+    title: str
+    score: float
+    snippet: str
+
+
+@dataclass
+class IndexUpdateStats:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    failed: List[str] = field(default_factory=list)
+    took_ms: int = 0
+
+
+def _fts_phrase(tokens: Iterable[str]) -> str:
+    return '"' + " ".join(t.replace('"', '""') for t in tokens) + '"'
+
+
+def build_match_expression(query: str, require_all: bool = True) -> Optional[str]:
+    """FTS5 MATCH expression for a query.
+
+    With `require_all`, every query segment must appear (CJK segments as a
+    phrase of contiguous bigrams); otherwise any token may match.
+    """
+    if require_all:
+        phrases = [_fts_phrase(tokenize(term)) for term in query_terms(query)]
+        return " AND ".join(p for p in phrases if p != '""') or None
+    tokens = sorted(set(tokenize(query)))
+    return " OR ".join(_fts_phrase([t]) for t in tokens) or None
+
+
+def _term_positions(text: str, terms: List[str], per_term: int = 50) -> List[Tuple[int, str]]:
+    positions: List[Tuple[int, str]] = []
+    for term in {t for t in terms if t}:
+        start = text.find(term)
+        while start != -1 and len(positions) < per_term * len(terms):
+            positions.append((start, term))
+            start = text.find(term, start + 1)
+    return positions
+
+
+def make_snippet(body: str, terms: List[str], width: int = 120) -> str:
+    """Pick the window of `body` covering the most distinct query terms."""
+    if not body:
+        return ""
+    lowered = body.lower()
+    if len(lowered) != len(body):
+        lowered = body
+    positions = _term_positions(lowered, terms)
+    if not positions:
+        # Terms matched only as scattered bigrams: locate those instead
+        terms = [bg for t in terms for bg in tokenize(t)]
+        positions = _term_positions(lowered, terms)
+    if not positions:
+        window_start = 0
+    else:
+        positions.sort()
+        best, window_start = -1, 0
+        for pos, _ in positions:
+            candidate = max(0, pos - width // 4)
+            covered = {t for p, t in positions if candidate <= p < candidate + width}
+            if len(covered) > best:
+                best, window_start = len(covered), candidate
+    window = body[window_start:window_start + width]
+    text = " ".join(window.split())
+    if terms:
+        pattern = re.compile(
+            "|".join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True) if t),
+            re.I,
+        )
+        text = pattern.sub(lambda m: f"**{m.group(0)}**", text)
+    prefix = "…" if window_start > 0 else ""
+    suffix = "…" if window_start + width < len(body) else ""
+    return f"{prefix}{text}{suffix}"
+
+
+def _title_for(path: str, text: str) -> str:
+    for line in text.splitlines():
+        line = line.strip().lstrip("#").strip()
+        if line:
+            return line[:_MAX_TITLE_CHARS]
+    return os.path.basename(path)
+
+
+def extract_document(path: str) -> str:
+    """Extract text with the upload extractors (format sniffed from content)."""
+    from app.services.extractors.registry import resolve_extractor
+    from app.services.extractors.types import ExtractionContext
+
+    ext = os.path.splitext(path)[1].lower()
+    extractor = resolve_extractor(path, ext)
+    return extractor.func(path, ExtractionContext(file_type=ext)).text
+
+
+class SearchIndex:
+    """FTS5-backed document index stored in a single SQLite file."""
+
+    def __init__(self, path: str, read_only: bool = False):
+        """Open (and with `read_only=False` create or migrate) the index at `path`.
+
+        Read-only instances never write: the schema and the persisted BM25
+        rank config are left to the builder.
+        """
+        self.path = path
+        self.read_only = read_only
+        self._local = threading.local()
+        if read_only:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+            conn.execute(
+                "INSERT INTO docs_fts (docs_fts, rank) VALUES ('rank', ?)",
+                ("bm25({}, {})".format(*_BM25_WEIGHTS),),
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.read_only:
+                conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True)
+            else:
+                conn = sqlite3.connect(self.path)
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Writes ---
+    def add_document(self, path: str, text: str, mtime_ns: int = 0, size: int = 0,
+                     title: Optional[str] = None) -> None:
+        """Insert or replace a document (caller commits)."""
+        conn = self._connection()
+        body = unicodedata.normalize("NFKC", text or "")
+        title = title or _title_for(path, body)
+        row = conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        if row:
+            doc_id = row[0]
+            conn.execute(
+                "UPDATE docs SET title = ?, mtime_ns = ?, size = ?, body = ? WHERE id = ?",
+                (title, mtime_ns, size, body, doc_id),
+            )
+            conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+        else:
+            doc_id = conn.execute(
+                "INSERT INTO docs (path, title, mtime_ns, size, body) VALUES (?, ?, ?, ?, ?)",
+                (path, title, mtime_ns, size, body),
+            ).lastrowid
+        conn.execute(
+            "INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)",
+            (doc_id, " ".join(tokenize(title)), " ".join(tokenize(body))),
+        )
+
+    def remove_document(self, path: str) -> bool:
+        conn = self._connection()
+        row = conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        if not row:
+            return False
+        conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+        conn.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+        return True
+
+    def commit(self) -> None:
+        self._connection().commit()
+
+    def update_from_directory(self, root: str) -> IndexUpdateStats:
+        """Index new/changed files under `root` and drop files that disappeared."""
+        start = time.perf_counter()
+        stats = IndexUpdateStats()
+        root = os.path.abspath(root)
+        conn = self._connection()
+        known = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in conn.execute(
+                "SELECT path, mtime_ns, size FROM docs WHERE path >= ? AND path < ?",
+                (root + os.sep, root + chr(ord(os.sep) + 1)),
+            )
+        }
+        seen = set()
+        pending = 0
+        for dirpath, _dirs, files in os.walk(root):
+            for name in sorted(files):
+                if not name.lower().endswith(INDEXABLE_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, name)
+                seen.add(path)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if known.get(path) == (st.st_mtime_ns, st.st_size):
+                    stats.unchanged += 1
+                    continue
+                try:
+                    text = extract_document(path)
+                except Exception as e:  # noqa: BLE001
+                    logger.warning("search_index_extract_failed", path=path, error=str(e))
+                    stats.failed.append(path)
+                    continue
+                self.add_document(path, text, st.st_mtime_ns, st.st_size)
+                if path in known:
+                    stats.updated += 1
+                else:
+                    stats.added += 1
+                pending += 1
+                if pending >= _COMMIT_EVERY:
+                    self.commit()
+                    pending = 0
+        for path in set(known) - seen:
+            self.remove_document(path)
+            stats.removed += 1
+        self.commit()
+        stats.took_ms = int((time.perf_counter() - start) * 1000)
+        logger.info(
+            "search_index_updated",
+            root=root,
+            added=stats.added,
+            updated=stats.updated,
+            removed=stats.removed,
+            unchanged=stats.unchanged,
+            failed=len(stats.failed),
+            took_ms=stats.took_ms,
+        )
+        return stats
+
+    # --- Reads ---
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def search(self, query: str, top_k: int = 5, snippet_chars: int = 120) -> List[SearchHit]:
+        """BM25-ranked search; falls back to OR matching when AND finds nothing."""
+        conn = self._connection()
+        rows: list = []
+        for require_all in (True, False):
+            expr = build_match_expression(query, require_all=require_all)
+            if not expr:
+                return []
+            # Rank inside FTS5 first; only the top-k rows touch the docs table
+            rows = conn.execute(
+                "SELECT d.path, d.title, d.body, hits.rank FROM ("
+                "  SELECT rowid, rank FROM docs_fts WHERE docs_fts MATCH ? ORDER BY rank LIMIT ?"
+                ") AS hits JOIN docs d ON d.id = hits.rowid ORDER BY hits.rank",
+                (expr, max(1, top_k)),
+            ).fetchall()
+            if rows:
+                break
+        terms = query_terms(query)
+        return [
+            # FTS5 bm25() is "lower is better"; expose a positive relevance score
+            SearchHit(path=path, title=title, score=round(-score, 4),
+                      snippet=make_snippet(body, terms, snippet_chars))
+            for path, title, body, score in rows
+        ]
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[SearchIndex]:
+    """Get the configured search index (read-only), or None when not configured/built.
+
+    Only an opened index is kept; while the file does not exist each call
+    checks again, so an index built after startup is used without a restart.
+    """
+    global _index
+    if _index is not None:
+        return _index
+    path = get_settings().search_index_path
+    if not path or not os.path.exists(path):
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex(path, read_only=True)
+            logger.info("search_index_opened", path=path)
+        return _index
+
+
+__all__ = [
+    "INDEXABLE_EXTENSIONS",
+    "SearchHit",
+    "IndexUpdateStats",
+    "SearchIndex",
+    "build_match_expression",
+    "make_snippet",
+    "extract_document",
+    "get_search_index",
+]
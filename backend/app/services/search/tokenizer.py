@@ -0,0 +1,45 @@
+"""Japanese-aware tokenization for the local search index.
+
+Text is NFKC-normalized and lowercased. Runs of Latin letters/digits become
+word tokens; runs of kana/kanji become overlapping character bigrams (a
+single character stays a unigram), so no dictionary is required.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import List
+
+_WORD = re.compile(r"[0-9a-z]+")
+_CJK = re.compile(r"[ぁ-ゖァ-ヺー々㐀-䶿一-鿿豈-﫿]+")
+_SEGMENT = re.compile(_WORD.pattern + "|" + _CJK.pattern)
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index tokens (word tokens and CJK bigrams)."""
+    tokens: List[str] = []
+    for m in _SEGMENT.finditer(normalize(text)):
+        segment = m.group(0)
+        if _CJK.fullmatch(segment):
+            tokens.extend(_bigrams(segment))
+        else:
+            tokens.append(segment)
+    return tokens
+
+
+def query_terms(text: str) -> List[str]:
+    """Surface terms of a query (normalized segments), used for snippets."""
+    return [m.group(0) for m in _SEGMENT.finditer(normalize(text))]
+
+
+__all__ = ["normalize", "tokenize", "query_terms"]
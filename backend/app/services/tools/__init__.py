@@ -6,11 +6,27 @@ continue to work.
 """
 from __future__ import annotations
 
-from .detect import detect_tool_request
-from .registry import execute_tool, async_execute_tool
+from .detect import detect_tool_request, detect_tool_plan, detect_tool_route
+from .registry import (
+    execute_tool,
+    async_execute_tool,
+    async_execute_plan,
+    get_tool_definitions,
+    tool_call_from_arguments,
+)
+from .types import ToolCall, ToolDefinition, ToolResult, ToolRoute
 
 __all__ = [
     "detect_tool_request",
+    "detect_tool_plan",
+    "detect_tool_route",
     "execute_tool",
     "async_execute_tool",
+    "async_execute_plan",
+    "get_tool_definitions",
+    "tool_call_from_arguments",
+    "ToolCall",
+    "ToolDefinition",
+    "ToolResult",
+    "ToolRoute",
 ]
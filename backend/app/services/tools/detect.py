@@ -1,18 +1,54 @@
 """Tool detection utilities.
 
-Parses explicit user prefixes to route to tools safely.
+Parses explicit user prefixes to route to tools safely. A single compiled
+pattern captures the prefix token of a line ("sql:", "tool:sql:", ...) and a
+dict lookup resolves it against the alias table built from the registered
+tools, so detection cost does not grow with the number of tools.
 """
 from __future__ import annotations
 
-from typing import Optional, Tuple
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
 
-# Supported tool prefixes -> canonical tool name
-_PREFIX_MAP = {
-    "sql": "sql",
-    "web": "web",
-    "search": "web",  # alias for web search
-    "tool": None,  # generic prefix; requires explicit tool name after it
-}
+from .types import ToolCall, ToolRoute
+
+# Optional generic "tool:" marker, then a tool name token, then ":"
+_PREFIX = re.compile(r"\s*(?:(?P<generic>tool)\s*:\s*)?(?P<name>[a-z][\w.-]*)\s*:", re.IGNORECASE)
+_GENERIC = re.compile(r"\s*tool\s*:", re.IGNORECASE)
+
+_alias_lock = threading.Lock()
+_alias_cache: Tuple[Optional[Tuple[int, int]], Dict[str, str]] = (None, {})
+
+
+def _alias_table() -> Dict[str, str]:
+    """Prefix -> canonical tool name, rebuilt only when the registry changes."""
+    global _alias_cache
+    from .registry import TOOL_RUNNERS
+
+    names = list(TOOL_RUNNERS)  # discovers plugins without importing them
+    key = (id(TOOL_RUNNERS), TOOL_RUNNERS.version)
+    if _alias_cache[0] == key:
+        return _alias_cache[1]
+    with _alias_lock:
+        table: Dict[str, str] = {}
+        for name in names:
+            table[name.lower()] = name
+            spec = TOOL_RUNNERS.spec(name)
+            for alias in (spec.aliases if spec else ()):
+                table.setdefault(alias.lower(), name)
+        table.pop("tool", None)  # reserved for the generic form
+        _alias_cache = (key, table)
+    return table
+
+
+def _match_line(line: str, table: Dict[str, str]) -> Tuple[Optional[str], str]:
+    m = _PREFIX.match(line)
+    if m:
+        tool = table.get(m.group("name").lower())
+        if tool:
+            return tool, line[m.end():]
+    return None, line
 
 
 def detect_tool_request(text: str) -> Tuple[Optional[str], Optional[str]]:
@@ -28,26 +64,52 @@ def detect_tool_request(text: str) -> Tuple[Optional[str], Optional[str]]:
     """
     if not text:
         return (None, None)
-
-    raw = text.strip()
-
-    # Generic form: tool:<name>:<arg>
-    if raw.lower().startswith("tool:"):
-        rest = raw[5:].strip()
-        # Expect something like "sql: ..." or "web: ..."
-        for prefix in ("sql:", "web:", "search:"):
-            if rest.lower().startswith(prefix):
-                tool = _PREFIX_MAP[prefix[:-1]]  # remove trailing ':'
-                arg = rest[len(prefix):].strip()
-                return (tool, arg)
-        # If just "tool:" with no known subtool, treat as unknown
+    tool, rest = _match_line(text.strip(), _alias_table())
+    if not tool:
         return (None, None)
+    return (tool, rest.strip())
 
-    # Direct prefixes
-    for p in ("sql:", "web:", "search:"):
-        if raw.lower().startswith(p):
-            tool = _PREFIX_MAP[p[:-1]]
-            arg = raw[len(p):].strip()
-            return (tool, arg)
 
-    return (None, None)
+def detect_tool_plan(text: str) -> List[ToolCall]:
+    """Detect one or more explicit tool calls, one per line.
+
+    Each line starting with a tool prefix begins a new call; other lines
+    continue the previous call (e.g. multi-line SQL). Returns [] unless the
+    text starts with a tool prefix.
+
+        sql: SELECT line, SUM(minutes) FROM downtime GROUP BY line
+        search: チョコ停 対策
+    """
+    table = _alias_table()
+    calls: List[ToolCall] = []
+    current: Optional[List[str]] = None  # [tool, arg lines...]
+    for line in (text or "").strip().splitlines():
+        tool, rest = _match_line(line, table)
+        if tool:
+            if current:
+                calls.append(ToolCall(tool=current[0], input="\n".join(current[1:]).strip()))
+            current = [tool, rest.strip()]
+        elif current is None:
+            return []
+        else:
+            current.append(line)
+    if current:
+        calls.append(ToolCall(tool=current[0], input="\n".join(current[1:]).strip()))
+    return calls
+
+
+def detect_tool_route(text: str) -> ToolRoute:
+    """Routing decision for a message, computed once per turn.
+
+    - kind="tool": one or more recognized tool calls (`calls`)
+    - kind="generic": "tool:" prefix without a recognized tool name
+    - kind="none": no explicit tool request
+    """
+    raw = (text or "").strip()
+    calls = detect_tool_plan(raw)
+    if calls:
+        return ToolRoute(kind="tool", tool=calls[0].tool, input=calls[0].input, calls=calls, source="prefix")
+    m = _GENERIC.match(raw)
+    if m:
+        return ToolRoute(kind="generic", input=raw[m.end():].strip(), source="prefix")
+    return ToolRoute(kind="none")
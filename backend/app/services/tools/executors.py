@@ -0,0 +1,194 @@
+"""Dedicated, bounded executors for sync tool runners.
+
+Each tool gets its own pool (`TOOL_POOLS="sql=4:8,web=2:8"`, workers:queue)
+instead of sharing the event loop's default executor, so a slow or
+saturated tool cannot starve file I/O or other tools. A pool admits at most
+workers + queue calls at once (timed-out calls still running count too) and
+rejects the rest with `ToolSaturatedError`. Tools listed in
+`TOOL_PROCESS_POOL_TOOLS` (or whose plugin spec says `executor="process"`)
+run on a process pool instead; their runners must be picklable module-level
+functions and cannot be cancelled mid-run. Unconfigured tools are sized by
+their plugin's `max_concurrency`, then by the defaults.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import get_settings
+from app.core.plugins import PluginSpec
+from app.models.tools import ToolPoolStats
+
+logger = structlog.get_logger()
+
+_WAIT_SAMPLES = 256
+
+
+class ToolSaturatedError(RuntimeError):
+    """Raised when a tool pool has no free worker or queue slot."""
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[float, Any]:
+    # Runs in the worker (thread or process); wall clock so it compares across processes
+    started = time.time()
+    return started, fn(*args, **kwargs)
+
+
+class ToolExecutor:
+    """Bounded worker pool for one tool, with occupancy and queue-wait stats."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.processes = processes
+        self._pool: Executor
+        if processes:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"tool-{name}")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waits_ms: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn` on this pool; raises ToolSaturatedError when full."""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ToolSaturatedError(
+                    f"tool pool '{self.name}' is saturated "
+                    f"({self.max_workers} workers, {self.max_queue} queued)"
+                )
+            self._in_flight += 1
+        submitted = time.time()
+        try:
+            future = self._pool.submit(_timed_call, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(lambda f: self._on_done(f, submitted))
+        # Cancelling the awaiting task (e.g. wait_for timeout) drops a call that has
+        # not started yet; a running call keeps its slot until it returns
+        _started, result = await asyncio.wrap_future(future)
+        return result
+
+    def _on_done(self, future: Future, submitted: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                return
+            self.completed += 1
+            if future.exception() is None:
+                started, _ = future.result()
+                self._waits_ms.append(max(0.0, (started - submitted) * 1000))
+
+    def stats(self) -> ToolPoolStats:
+        with self._lock:
+            in_flight = self._in_flight
+            waits = sorted(self._waits_ms)
+            completed, rejected = self.completed, self.rejected
+        active = min(in_flight, self.max_workers)
+        return ToolPoolStats(
+            tool=self.name,
+            kind="process" if self.processes else "thread",
+            max_workers=self.max_workers,
+            max_queue=self.max_queue,
+            active=active,
+            queued=in_flight - active,
+            completed=completed,
+            rejected=rejected,
+            queue_wait_ms_avg=round(sum(waits) / len(waits), 2) if waits else 0.0,
+            queue_wait_ms_p95=round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+        )
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ToolExecutorRegistry:
+    """Per-tool executors, created on first use from the configured sizes."""
+
+    def __init__(
+        self,
+        pools: Dict[str, Tuple[int, int]],
+        default_workers: int,
+        default_queue: int,
+        process_tools: Optional[List[str]] = None,
+    ):
+        self._pools = dict(pools)
+        self._default = (default_workers, default_queue)
+        self._process_tools = set(process_tools or [])
+        self._executors: Dict[str, ToolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tool: str, spec: Optional[PluginSpec] = None) -> ToolExecutor:
+        """Executor for `tool`; configured sizes win over the plugin's metadata."""
+        with self._lock:
+            executor = self._executors.get(tool)
+            if executor is None:
+                default_workers, default_queue = self._default
+                if spec is not None and spec.max_concurrency:
+                    default_workers = spec.max_concurrency
+                workers, queue = self._pools.get(tool, (default_workers, default_queue))
+                processes = tool in self._process_tools or (spec is not None and spec.executor == "process")
+                executor = ToolExecutor(tool, workers, queue, processes=processes)
+                self._executors[tool] = executor
+                logger.info(
+                    "tool_executor_created",
+                    tool=tool,
+                    workers=executor.max_workers,
+                    queue=executor.max_queue,
+                    kind="process" if executor.processes else "thread",
+                )
+            return executor
+
+    def stats(self) -> List[ToolPoolStats]:
+        with self._lock:
+            executors = list(self._executors.values())
+        return [e.stats() for e in executors]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown()
+
+
+@lru_cache()
+def get_tool_executors() -> ToolExecutorRegistry:
+    """Get the process-wide tool executor registry"""
+    settings = get_settings()
+    return ToolExecutorRegistry(
+        settings.get_tool_pools(),
+        default_workers=settings.tool_pool_default_workers,
+        default_queue=settings.tool_pool_default_queue,
+        process_tools=settings.get_tool_process_pool_tools(),
+    )
+
+
+def shutdown_tool_executors() -> None:
+    """Stop the tool pools if they were ever created."""
+    if get_tool_executors.cache_info().currsize:
+        get_tool_executors().shutdown()
+        get_tool_executors.cache_clear()
+
+
+__all__ = [
+    "ToolSaturatedError",
+    "ToolExecutor",
+    "ToolExecutorRegistry",
+    "get_tool_executors",
+    "shutdown_tool_executors",
+]
@@ -0,0 +1,195 @@
+"""Per-session memo of recent tool results.
+
+Keeps the last few successful `ToolResult`s of each chat session, including
+their structured `data` (SQL rows, search hits), so follow-up turns can refer
+to them (`#1`, `#2`, ...) and agents can see compact summaries without
+re-running the tool. Bounded by a result count per session and a byte budget
+across sessions (least recently used sessions are dropped first); sessions
+idle for `session_timeout` expire.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+
+from .types import ToolResult
+
+_SUMMARY_ROWS = 3
+_MAX_INPUT_CHARS = 80
+_OVERSIZED_OUTPUT_CHARS = 2000
+_REFERENCE = re.compile(r"#(\d{1,4})(?!\d)")
+
+
+def references(text: str) -> List[int]:
+    """Result numbers referenced in a message ("#2 の結果を…")."""
+    return [int(m) for m in _REFERENCE.findall(text or "")]
+
+
+@dataclass
+class MemoEntry:
+    ref: int
+    result: ToolResult
+    size: int
+    stored_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class _Session:
+    entries: List[MemoEntry] = field(default_factory=list)
+    next_ref: int = 1
+    touched: float = field(default_factory=time.monotonic)
+
+    @property
+    def size(self) -> int:
+        return sum(e.size for e in self.entries)
+
+
+def _short(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def summarize(entry: MemoEntry) -> str:
+    """One compact, prompt-friendly summary of a stored result."""
+    tr = entry.result
+    head = f"[#{entry.ref}] {tr.tool}: {_short(tr.input, _MAX_INPUT_CHARS)}"
+    data: Dict[str, Any] = tr.data or {}
+    if "columns" in data:
+        rows = data.get("rows") or []
+        more = "以上" if data.get("has_more") or data.get("truncated") else ""
+        lines = [f"{head} → {data.get('database', '')} {len(rows)}行{more}（列: {', '.join(data['columns'])}）"]
+        for row in rows[:_SUMMARY_ROWS]:
+            lines.append("   | " + " | ".join(_short(str(v), 30) for v in row) + " |")
+        return "\n".join(lines)
+    if "hits" in data:
+        hits = data.get("hits") or []
+        titles = ", ".join(f"{h.get('title')} ({h.get('path')})" for h in hits[:_SUMMARY_ROWS])
+        return f"{head} → {len(hits)}件: {titles}"
+    return f"{head} → {_short(tr.output, 200)}"
+
+
+class ToolResultMemo:
+    """Recent tool results per session, under a global byte budget."""
+
+    def __init__(self, max_bytes: int, per_session: int, ttl_seconds: float):
+        self.max_bytes = max(0, int(max_bytes))
+        self.per_session = max(1, int(per_session))
+        self.ttl_seconds = float(ttl_seconds)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, session_id: str, result: ToolResult) -> Optional[MemoEntry]:
+        """Remember a successful result; returns its entry (None if not stored)."""
+        if not session_id or result.error or self.max_bytes == 0:
+            return None
+        size = len(result.model_dump_json())
+        if size > self.max_bytes // 4:
+            # Keep a reference to oversized results, without their payload
+            result = result.model_copy(update={
+                "data": None,
+                "output": _short(result.output, _OVERSIZED_OUTPUT_CHARS),
+            })
+            size = len(result.model_dump_json())
+        with self._lock:
+            self._sweep()
+            session = self._sessions.pop(session_id, None) or _Session()
+            self._sessions[session_id] = session
+            session.touched = time.monotonic()
+            entry = MemoEntry(ref=session.next_ref, result=result, size=size)
+            session.next_ref += 1
+            session.entries.append(entry)
+            self._bytes += size
+            while len(session.entries) > self.per_session:
+                self._bytes -= session.entries.pop(0).size
+            # Over budget: drop whole least-recently-used sessions, then our own oldest
+            while self._bytes > self.max_bytes and len(self._sessions) > 1:
+                _, old = self._sessions.popitem(last=False)
+                self._bytes -= old.size
+            while self._bytes > self.max_bytes and len(session.entries) > 1:
+                self._bytes -= session.entries.pop(0).size
+            return entry
+
+    def recent(self, session_id: Optional[str]) -> List[MemoEntry]:
+        """Stored entries for a session, oldest first."""
+        if not session_id:
+            return []
+        with self._lock:
+            self._sweep()
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            session.touched = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return list(session.entries)
+
+    def get(self, session_id: Optional[str], ref: int) -> Optional[MemoEntry]:
+        return next((e for e in self.recent(session_id) if e.ref == ref), None)
+
+    def context(self, session_id: Optional[str], max_chars: int, expand: Iterable[int] = ()) -> str:
+        """Summaries of the session's results, newest first, within `max_chars`.
+
+        Entries listed in `expand` (referenced by the user) come first and
+        carry their full rendered output instead of a summary.
+        """
+        expand = set(expand)
+        newest_first = list(reversed(self.recent(session_id)))
+        ordered = [e for e in newest_first if e.ref in expand] + [e for e in newest_first if e.ref not in expand]
+        parts: List[str] = []
+        used = 0
+        for entry in ordered:
+            summary = summarize(entry)
+            if entry.ref in expand:
+                head = summary.splitlines()[0]
+                summary = f"{head}\n{entry.result.output[: max(0, max_chars - used - len(head) - 1)]}"
+            if used + len(summary) > max_chars:
+                break
+            parts.append(summary)
+            used += len(summary) + 1
+        return "\n".join(parts)
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+                self._bytes = 0
+                return
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.size
+
+    def _sweep(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.touched >= cutoff:
+                break
+            del self._sessions[session_id]
+            self._bytes -= session.size
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+@lru_cache()
+def get_tool_memo() -> ToolResultMemo:
+    """Get the process-wide tool result memo"""
+    settings = get_settings()
+    return ToolResultMemo(
+        max_bytes=settings.tool_memo_max_bytes,
+        per_session=settings.tool_memo_results_per_session,
+        ttl_seconds=settings.session_timeout,
+    )
+
+
+__all__ = ["MemoEntry", "ToolResultMemo", "summarize", "references", "get_tool_memo"]
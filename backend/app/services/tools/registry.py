@@ -4,44 +4,110 @@ Provides a single `execute_tool(tool, arg)` entry point.
 """
 from __future__ import annotations
 
-from typing import Callable, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence
 import asyncio
 import inspect
+import json
+import threading
 import time
 
-from .types import ToolResult
+import structlog
+
+from app.core.deadline import DeadlineExceeded, clamp_timeout
+from app.core.plugins import TOOL_PLUGIN_GROUP, LazyPluginRegistry, PluginSpec, load_target
+
+from .executors import ToolSaturatedError, get_tool_executors
+from .types import ToolCall, ToolDefinition, ToolResult
+
+# Built-in tools. Modules are imported on first use, so workers that never
+# run a tool never pay for its imports (DB drivers, search index, ...).
+# More tools are discovered from the "aiconsal.tools" entry point group.
+_BUILTIN_TOOLS = {
+    "sql": PluginSpec(
+        name="sql",
+        target="app.services.tools.sql:run",
+        definition="app.services.tools.sql:definition",
+        max_concurrency=4,
+    ),
+    "web": PluginSpec(
+        name="web",
+        target="app.services.tools.web:run",
+        definition="app.services.tools.web:definition",
+        max_concurrency=2,
+        aliases=("search",),
+    ),
+}
 
-from . import sql, web
+# Map canonical tool names to their handlers. A handler returns the rendered
+# output, or a ToolResult when it has more to report (e.g. a cache hit).
+TOOL_RUNNERS: LazyPluginRegistry = LazyPluginRegistry(TOOL_PLUGIN_GROUP, _BUILTIN_TOOLS)
 
-# Map canonical tool names to their handlers
-TOOL_RUNNERS: dict[str, Callable[[str], str]] = {
-    "sql": sql.run,
-    "web": web.run,
-}
+logger = structlog.get_logger()
+
+
+def get_tool_definitions() -> List[ToolDefinition]:
+    """Definitions of the tools currently available to the model."""
+    definitions: List[ToolDefinition] = []
+    for name in TOOL_RUNNERS:
+        spec = TOOL_RUNNERS.spec(name)
+        if spec is None or not spec.definition:
+            continue
+        try:
+            # A factory returns None while its tool is unusable (e.g. no database configured)
+            definition = load_target(spec.definition)()
+        except Exception as e:  # noqa: BLE001
+            logger.warning("tool_definition_failed", tool=name, error=str(e))
+            continue
+        if definition is not None:
+            definitions.append(definition)
+    return definitions
+
+
+def tool_call_from_arguments(tool: str, arguments: Dict[str, Any]) -> ToolCall:
+    """Turn model-supplied arguments into the runner's string argument.
+
+    A lone `query` is passed as-is; anything richer goes as JSON (which the
+    SQL tool accepts as {"query", "params", "db"}).
+    """
+    args = {k: v for k, v in (arguments or {}).items() if v not in (None, "", [])}
+    if set(args) <= {"query"}:
+        return ToolCall(tool=tool.lower(), input=str(args.get("query", "")))
+    return ToolCall(tool=tool.lower(), input=json.dumps(args, ensure_ascii=False))
 
 
 def execute_tool(tool: Optional[str], arg: str) -> str:
-    """Execute the specified tool in a safe, placeholder manner.
+    """Execute the specified tool synchronously and return its text output.
 
-    This is a stub that does NOT hit databases or the network.
-    It returns an instructional message suitable for early scaffolding.
+    Dispatches to the registered runner (e.g. the read-only SQL tool or web
+    search), which may query configured databases or the network. Unknown
+    tools get an instructional message.
     """
     if not tool:
         return "不明なツールが指定されました。サポートされている例: sql:, web: / search:"
 
     runner = TOOL_RUNNERS.get(tool.lower())
     if runner:
-        return runner(arg)
+        output = runner(arg)
+        return output.output if isinstance(output, ToolResult) else output
 
     return f"[Tool:{tool}] まだ有効化されていません。入力: {arg}"
 
 
-async def async_execute_tool(tool: Optional[str], arg: str, timeout_s: float = 5.0) -> ToolResult:
+async def async_execute_tool(
+    tool: Optional[str], arg: str, timeout_s: float = 5.0, session_id: Optional[str] = None
+) -> ToolResult:
     """Async tool execution with timeout and structured result.
 
     - Preserves behavior of `execute_tool` but returns `ToolResult`.
-    - Wraps sync runners using `asyncio.to_thread`.
-    - Enforces `timeout_s` via `asyncio.wait_for`.
+    - Runs sync runners on the tool's own bounded pool (`executors`), not the
+      loop's default executor; a saturated pool rejects with `tool_busy`.
+    - Enforces `timeout_s` via `asyncio.wait_for`, cut to the request deadline
+      (`app.core.deadline`); once it has passed the tool is not started.
+    - Runners that accept a `cancel` keyword get a `threading.Event` that is set
+      once the call times out or is cancelled, so the worker thread can stop
+      its work instead of running on in the background.
+    - Runners that accept a `session_id` keyword get the chat session, for
+      state they keep per session (e.g. SQL result handles).
     """
     start = time.perf_counter()
     name = (tool or "").lower()
@@ -57,18 +123,72 @@ async def async_execute_tool(tool: Optional[str], arg: str, timeout_s: float = 5
         took = int((time.perf_counter() - start) * 1000)
         return ToolResult(tool=name, input=arg, output=msg, error="unsupported_tool", took_ms=took)
 
+    spec = TOOL_RUNNERS.spec(name)
+    if spec is not None and spec.timeout_s:
+        timeout_s = min(timeout_s, spec.timeout_s)
     try:
+        timeout_s = clamp_timeout(timeout_s)
+    except DeadlineExceeded:
+        return ToolResult(tool=name, input=arg, output="", error="deadline_exceeded", took_ms=0)
+    cancel = threading.Event()
+    try:
+        kwargs: Dict[str, Any] = {}
+        if session_id is not None and _accepts(runner, "session_id"):
+            kwargs["session_id"] = session_id
         if inspect.iscoroutinefunction(runner):
-            coro = runner(arg)  # type: ignore[arg-type]
+            coro = runner(arg, **kwargs)  # type: ignore[arg-type]
         else:
-            coro = asyncio.to_thread(runner, arg)
+            executor = get_tool_executors().get(name, spec)
+            if _accepts(runner, "cancel") and not executor.processes:
+                kwargs["cancel"] = cancel
+            coro = executor.run(runner, arg, **kwargs)
 
-        output: str = await asyncio.wait_for(coro, timeout=timeout_s)
+        output = await asyncio.wait_for(coro, timeout=timeout_s)
         took = int((time.perf_counter() - start) * 1000)
+        if isinstance(output, ToolResult):
+            return output.model_copy(update={"tool": name, "input": arg, "took_ms": took})
         return ToolResult(tool=name, input=arg, output=output, took_ms=took)
+    except ToolSaturatedError:
+        msg = f"[Tool:{name}] 混雑しています。しばらくしてから再度お試しください。"
+        took = int((time.perf_counter() - start) * 1000)
+        return ToolResult(tool=name, input=arg, output=msg, error="tool_busy", took_ms=took)
     except asyncio.TimeoutError:
         took = int((time.perf_counter() - start) * 1000)
         return ToolResult(tool=name, input=arg, output="", error=f"timeout after {timeout_s}s", took_ms=took)
     except Exception as e:  # noqa: BLE001
         took = int((time.perf_counter() - start) * 1000)
         return ToolResult(tool=name, input=arg, output="", error=str(e), took_ms=took)
+    finally:
+        # Stops a runner still executing after a timeout/cancellation; no-op otherwise
+        cancel.set()
+
+
+def _accepts(runner: Callable, keyword: str) -> bool:
+    try:
+        return keyword in inspect.signature(runner).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+async def async_execute_plan(
+    calls: Sequence[ToolCall],
+    deadline_s: float,
+    timeout_s: Optional[float] = None,
+    session_id: Optional[str] = None,
+) -> List[ToolResult]:
+    """Run independent tool calls concurrently under one shared deadline.
+
+    Each call's timeout is the time left until the deadline (capped at
+    `timeout_s` when given), so the plan as a whole never exceeds
+    `deadline_s`. Results keep the order of `calls`, each with its own
+    `took_ms`.
+    """
+    deadline = time.monotonic() + deadline_s
+
+    async def _one(call: ToolCall) -> ToolResult:
+        remaining = max(0.0, deadline - time.monotonic())
+        if timeout_s is not None:
+            remaining = min(remaining, timeout_s)
+        return await async_execute_tool(call.tool, call.input, timeout_s=remaining, session_id=session_id)
+
+    return list(await asyncio.gather(*(_one(c) for c in calls)))
@@ -1,13 +1,393 @@
-"""SQL tool placeholder implementation.
+"""Read-only SQL tool over configured local SQLite/DuckDB databases.
 
-Provides `run(arg)` which returns a non-network, non-DB placeholder message.
+`run(arg)` accepts either a plain statement (`SELECT ...`) or a JSON object
+`{"query": "...", "params": [...] | {...}, "db": "name"}` for parameterized
+queries. Only a single SELECT/WITH statement is accepted; the row limit and
+timeout are enforced inside the engine (SQLite progress handler, DuckDB
+`interrupt`) so a timed-out or cancelled query stops running.
+
+Results are paged: the first page is rendered right away and the open
+cursor is kept behind a result handle, so `next <handle>` continues reading
+without re-running the query. Handles are bound to the chat session that
+opened them.
 """
 from __future__ import annotations
 
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple, Union
+
+import structlog
+
+from app.core.config import get_settings
+
+from .sql_cache import data_version, get_sql_result_cache
+from .sql_pool import SQLPoolError, get_sql_pool_manager
+from .sql_results import SQLResultHandle, engine_guard, get_sql_result_registry
+from .types import SQLQueryResult, ToolDefinition, ToolResult
+
+logger = structlog.get_logger()
+
+Params = Union[Sequence[Any], Dict[str, Any], None]
+
+# Only the leading keyword is checked here; writes nested in a WITH are
+# refused by the engine (read-only connections, `query_only`, authorizer).
+_ALLOWED_LEADING = {"select", "with"}
+
+_LITERAL_OR_COMMENT = re.compile(
+    r"'(?:[^']|'')*'"  # string literal
+    r'|"(?:[^"]|"")*"'  # quoted identifier
+    r"|--[^\n]*"  # line comment
+    r"|/\*.*?\*/",  # block comment
+    re.S,
+)
+_WORD = re.compile(r"[A-Za-z_]+")
+# Follow-up page request: "next <handle>"
+_NEXT_PAGE = re.compile(r"^\s*(?:next|more)\s+([0-9a-f]{6,32})\s*$", re.I)
+
+_MAX_CELL_CHARS = 200
+
+
+class SQLToolError(ValueError):
+    """Invalid statement or failed execution (message is user-facing)."""
+
+
+def validate_statement(query: str) -> str:
+    """Return the normalized statement or raise SQLToolError.
+
+    Only the leading keyword is checked (literals and comments masked), so
+    identifiers such as a `load` column are accepted; writes are refused by
+    the read-only connections themselves.
+    """
+    statement = (query or "").strip()
+    masked = _LITERAL_OR_COMMENT.sub(" ", statement).strip()
+    while masked.endswith(";"):
+        masked = masked[:-1].rstrip()
+        statement = statement.rstrip().rstrip(";").rstrip()
+    if not masked:
+        raise SQLToolError("SQL文が空です")
+    if ";" in masked:
+        raise SQLToolError("複数のSQL文は実行できません")
+    words = [w.lower() for w in _WORD.findall(masked)]
+    if not words or words[0] not in _ALLOWED_LEADING:
+        raise SQLToolError("読み取り専用です: SELECT または WITH で始まる文のみ実行できます")
+    return statement
+
+
+def parse_arg(arg: str) -> Tuple[str, Params, Optional[str]]:
+    """Split the tool argument into (query, params, database)."""
+    raw = (arg or "").strip()
+    if raw.startswith("{"):
+        try:
+            payload = json.loads(raw)
+        except ValueError as e:
+            raise SQLToolError(f"JSON形式の引数を解釈できません: {e}")
+        if not isinstance(payload, dict) or not isinstance(payload.get("query"), str):
+            raise SQLToolError('JSON形式では {"query": "...", "params": [...]} を指定してください')
+        params = payload.get("params")
+        if params is not None and not isinstance(params, (list, dict)):
+            raise SQLToolError("params は配列またはオブジェクトで指定してください")
+        return payload["query"], params, payload.get("db")
+    return raw, None, None
+
+
+def _limited(statement: str, params: Params, limit: int, named_marker: str):
+    """Wrap the statement so the engine itself stops after `limit` rows."""
+    if isinstance(params, dict):
+        return f"SELECT * FROM ({statement}) LIMIT {named_marker}_row_limit", {**params, "_row_limit": limit}
+    return f"SELECT * FROM ({statement}) LIMIT ?", [*(params or []), limit]
+
+
+def open_result(
+    query: str,
+    params: Params = None,
+    database: Optional[str] = None,
+    page_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+    timeout_s: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+    use_cache: bool = True,
+    owner: Optional[str] = None,
+) -> SQLQueryResult:
+    """Execute a validated read-only query and return its first page.
+
+    When more rows remain, the cursor stays open behind `result.handle` and
+    further pages are read with `fetch_next` by the same `owner`. On SQLite
+    rollback-journal databases the rest of the rows are buffered (up to
+    `sql_buffer_max_bytes`) and the connection released right away, so the
+    handle never holds a lock that blocks writers. Results that fit in one
+    page are cached until the database file changes.
+    """
+    settings = get_settings()
+    statement = validate_statement(query)
+    max_rows = max(1, int(max_rows or settings.sql_max_rows))
+    page_size = max(1, int(page_size or settings.sql_page_rows))
+    timeout_s = float(timeout_s or settings.sql_timeout_seconds)
+    cancel = cancel or threading.Event()
+
+    pool = get_sql_pool_manager().get(database)
+    if pool is None:
+        raise SQLToolError(f"データベース '{database}' は設定されていません")
+
+    cache = get_sql_result_cache() if use_cache else None
+    if cache is not None and cache.max_bytes:
+        cache_key = cache.make_key(pool.path, statement, params, max_rows, page_size)
+        version = data_version(pool.path)
+        cached = cache.get(cache_key, version)
+        if cached is not None:
+            logger.info("sql_cache_hit", database=pool.name, rows=len(cached.rows))
+            return cached.model_copy(update={"cached": True})
+    else:
+        cache = None
+
+    registry = get_sql_result_registry()
+    registry.make_room(pool)
+    deadline = time.monotonic() + timeout_s
+    try:
+        conn = pool.acquire(timeout=timeout_s)
+    except SQLPoolError as e:
+        raise SQLToolError(f"接続を確保できませんでした: {e}")
+
+    handle = None
+    try:
+        cursor = conn.cursor()
+        sql, bound = _limited(statement, params, max_rows + 1, "$" if pool.engine == "duckdb" else ":")
+        with engine_guard(conn, cursor, pool.engine, deadline, cancel):
+            cursor.execute(sql, bound)
+        handle = SQLResultHandle(
+            pool,
+            conn,
+            cursor,
+            columns=[d[0] for d in cursor.description or []],
+            page_size=page_size,
+            max_page_bytes=settings.sql_page_max_bytes,
+            ttl_s=settings.sql_result_ttl_seconds,
+            max_rows=max_rows,
+            owner=owner,
+        )
+        page = handle.fetch_page(deadline, cancel)
+        if page.has_more and pool.readers_block_writers:
+            handle.detach(settings.sql_buffer_max_bytes, deadline, cancel)
+    except Exception as e:  # noqa: BLE001
+        if handle is not None:
+            handle.close()
+        else:
+            pool.release(conn)
+        raise _execution_error(e, pool.name, timeout_s, deadline, cancel)
+
+    if page.has_more:
+        registry.register(handle)
+    elif cache is not None:
+        # Only complete results are cached; paged ones depend on an open cursor
+        cache.put(cache_key, version, page)
+    logger.info(
+        "sql_query_executed",
+        database=pool.name,
+        rows=len(page.rows),
+        has_more=page.has_more,
+        truncated=page.truncated,
+        took_ms=page.took_ms,
+    )
+    return page
+
+
+def fetch_next(
+    handle_id: str,
+    timeout_s: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+    owner: Optional[str] = None,
+) -> SQLQueryResult:
+    """Read the next page of a result handle opened by `owner`."""
+    registry = get_sql_result_registry()
+    handle = registry.get(handle_id, owner)
+    if handle is None or handle.closed:
+        raise SQLToolError(f"結果ハンドル {handle_id} は期限切れか存在しません。クエリを再実行してください")
+    timeout_s = float(timeout_s or get_settings().sql_timeout_seconds)
+    cancel = cancel or threading.Event()
+    deadline = time.monotonic() + timeout_s
+    try:
+        page = handle.fetch_page(deadline, cancel)
+    except Exception as e:  # noqa: BLE001
+        registry.close(handle_id)
+        raise _execution_error(e, handle.pool.name, timeout_s, deadline, cancel)
+    if not page.has_more:
+        registry.close(handle_id)
+    return page
+
+
+def execute_query(
+    query: str,
+    params: Params = None,
+    database: Optional[str] = None,
+    max_rows: Optional[int] = None,
+    timeout_s: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> SQLQueryResult:
+    """Execute a query and return up to `max_rows` rows in a single result."""
+    max_rows = max(1, int(max_rows or get_settings().sql_max_rows))
+    page = open_result(query, params, database, page_size=max_rows, max_rows=max_rows,
+                       timeout_s=timeout_s, cancel=cancel)
+    if page.handle:
+        get_sql_result_registry().close(page.handle)
+    return page
+
+
+async def iter_query_pages(
+    query: str,
+    params: Params = None,
+    database: Optional[str] = None,
+    page_size: Optional[int] = None,
+) -> AsyncIterator[SQLQueryResult]:
+    """Yield result pages as they are read from the cursor."""
+    page = await asyncio.to_thread(open_result, query, params, database, page_size)
+    try:
+        yield page
+        while page.has_more and page.handle:
+            page = await asyncio.to_thread(fetch_next, page.handle)
+            yield page
+    finally:
+        if page.handle:
+            get_sql_result_registry().close(page.handle)
+
+
+def _execution_error(
+    e: Exception, database: str, timeout_s: float, deadline: float, cancel: threading.Event
+) -> SQLToolError:
+    if isinstance(e, SQLToolError):
+        return e
+    if cancel.is_set() or time.monotonic() > deadline:
+        logger.warning("sql_query_interrupted", database=database, timeout_s=timeout_s)
+        return SQLToolError(f"クエリを中断しました（タイムアウト {timeout_s}s またはキャンセル）")
+    return SQLToolError(f"クエリ実行エラー: {e}")
+
+
+def _fmt_cell(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    text = str(value).replace("|", "\\|").replace("\n", " ")
+    return text if len(text) <= _MAX_CELL_CHARS else text[: _MAX_CELL_CHARS - 1] + "…"
+
+
+def render_result(result: SQLQueryResult) -> str:
+    """Render a result page as a compact Markdown table."""
+    if result.rows:
+        span = f"{result.offset + 1}–{result.offset + len(result.rows)}行目"
+    else:
+        span = "0行"
+    source = "キャッシュ" if result.cached else f"{result.took_ms}ms"
+    lines = [f"[SQL Tool] {result.database}: {span} ({source})"]
+    if not result.columns:
+        return lines[0]
+    lines.append("| " + " | ".join(_fmt_cell(c) for c in result.columns) + " |")
+    lines.append("| " + " | ".join("---" for _ in result.columns) + " |")
+    for row in result.rows:
+        lines.append("| " + " | ".join(_fmt_cell(v) for v in row) + " |")
+    if result.has_more and result.handle:
+        ttl = int(get_settings().sql_result_ttl_seconds)
+        lines.append(f"※ 続きは `sql: next {result.handle}` で取得できます（{ttl}秒間有効）")
+    elif result.truncated:
+        lines.append(
+            f"※ 上限 {result.offset + len(result.rows)} 行で打ち切りました。条件を絞り込んでください。"
+        )
+    return "\n".join(lines)
+
+
+_MAX_SCHEMA_TABLES = 30
+_schema_cache: Dict[str, Tuple[Tuple[int, ...], str]] = {}
+_schema_lock = threading.Lock()
+
+
+def _schema_summary(pool) -> str:
+    """Compact "table(col, ...)" listing of a database, cached per data version.
+
+    When the database changed but every connection is busy with queries, the
+    previous listing is returned instead of waiting for the pool.
+    """
+    version = data_version(pool.path)
+    with _schema_lock:
+        cached = _schema_cache.get(pool.path)
+    if cached and cached[0] == version:
+        return cached[1]
+    if pool.engine == "duckdb":
+        listing = "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main' ORDER BY 1"
+    else:
+        listing = (
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+            "AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+    tables = []
+    try:
+        with pool.connection(timeout=0.0 if cached else 1.0) as conn:
+            names = [row[0] for row in conn.execute(listing).fetchall()]
+            for name in names[:_MAX_SCHEMA_TABLES]:
+                cursor = conn.execute('SELECT * FROM "{}" LIMIT 0'.format(name.replace('"', '""')))
+                tables.append(f"{name}({', '.join(d[0] for d in cursor.description)})")
+    except SQLPoolError:
+        if cached:
+            return cached[1]
+        raise
+    summary = "; ".join(tables)
+    with _schema_lock:
+        _schema_cache[pool.path] = (version, summary)
+    return summary
+
+
+def definition() -> Optional[ToolDefinition]:
+    """Function-calling definition, or None when no database is configured."""
+    manager = get_sql_pool_manager()
+    names = manager.names()
+    if not names:
+        return None
+    schemas = []
+    for name in names:
+        try:
+            schemas.append(f"[{name}] {_schema_summary(manager.get(name))}")
+        except Exception as e:  # noqa: BLE001
+            logger.warning("sql_schema_summary_failed", database=name, error=str(e))
+    return ToolDefinition(
+        name="sql",
+        description=(
+            "工場の稼働・品質データベース（読み取り専用）に SELECT 文を実行し、集計や一覧を取得します。"
+            "テーブル: " + " / ".join(schemas)
+        ),
+        parameters={
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "単一の SELECT または WITH 文"},
+                "params": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "query 内の ? プレースホルダに順に渡す値",
+                },
+                "db": {"type": "string", "enum": names, "description": f"対象データベース（既定: {names[0]}）"},
+            },
+            "required": ["query"],
+        },
+    )
+
 
-def run(arg: str) -> str:
-    return (
-        "[SQL Tool] まだ有効化されていません。\n"
-        "将来的には安全な読み取り専用クエリ実行（パラメータ化・監査ログ・タイムアウト）を提供予定です。\n"
-        f"受領クエリ候補: {arg}"
+def run(
+    arg: str, cancel: Optional[threading.Event] = None, session_id: Optional[str] = None
+) -> Union[str, ToolResult]:
+    if not get_sql_pool_manager().names():
+        return (
+            "[SQL Tool] 参照可能なデータベースが設定されていません（SQL_DATABASES）。\n"
+            "読み取り専用クエリ（SELECT/WITH）を実行するには設定後に再起動してください。\n"
+            f"受領クエリ候補: {arg}"
+        )
+    follow_up = _NEXT_PAGE.match(arg or "")
+    if follow_up:
+        result = fetch_next(follow_up.group(1), cancel=cancel, owner=session_id)
+    else:
+        query, params, database = parse_arg(arg)
+        result = open_result(query, params, database, cancel=cancel, owner=session_id)
+    return ToolResult(
+        tool="sql",
+        input=arg,
+        output=render_result(result),
+        cached=result.cached,
+        data=result.model_dump(include={"database", "columns", "rows", "offset", "has_more", "truncated"}),
     )
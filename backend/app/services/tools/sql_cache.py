@@ -0,0 +1,138 @@
+"""Result cache for the SQL tool.
+
+Entries are keyed by database file, normalized query text and parameters, and
+carry the database's data-version token at the time they were stored. A
+lookup whose current token differs is a miss (and drops the entry), so
+results never outlive a change to the underlying file. Size is bounded by an
+LRU over the approximate serialized size of the cached results.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional, Tuple
+
+from app.core.config import get_settings
+
+from .types import SQLQueryResult
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Drop comments and collapse whitespace outside of literals."""
+    text = query or ""
+    parts = []
+    pos = 0
+    for m in _LITERAL.finditer(text):
+        parts.append(_COMMENT.sub(" ", text[pos:m.start()]))
+        parts.append(m.group(0))
+        pos = m.end()
+    parts.append(_COMMENT.sub(" ", text[pos:]))
+    # Even indexes are code between literals
+    out = [part if i % 2 else _WHITESPACE.sub(" ", part) for i, part in enumerate(parts)]
+    return "".join(out).strip().rstrip(";").strip()
+
+
+def data_version(path: str) -> Tuple[int, ...]:
+    """Version token for a database file.
+
+    Built from the mtime/size of the file and its WAL/journal, which change on
+    every committed write. (SQLite's `PRAGMA data_version` is only meaningful
+    per connection, so it cannot be compared across pooled connections.)
+    """
+    token = []
+    for suffix in ("", "-wal", ".wal", "-journal"):
+        try:
+            st = os.stat(path + suffix)
+        except FileNotFoundError:
+            token.extend((0, 0))
+            continue
+        token.extend((st.st_mtime_ns, st.st_size))
+    return tuple(token)
+
+
+class _Entry(NamedTuple):
+    version: Tuple[int, ...]
+    result: SQLQueryResult
+    size: int
+
+
+class SQLResultCache:
+    """Byte-bounded LRU of complete query results."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: "OrderedDict[Tuple[Any, ...], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(database_path: str, query: str, params: Any, *limits: int) -> Tuple[Any, ...]:
+        return (
+            database_path,
+            normalize_query(query),
+            json.dumps(params, sort_keys=True, ensure_ascii=False, default=str),
+            *limits,
+        )
+
+    def get(self, key: Tuple[Any, ...], version: Tuple[int, ...]) -> Optional[SQLQueryResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.version != version:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+    def put(self, key: Tuple[Any, ...], version: Tuple[int, ...], result: SQLQueryResult) -> bool:
+        size = len(result.model_dump_json())
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(version, result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def _drop(self, key: Tuple[Any, ...]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache()
+def get_sql_result_cache() -> SQLResultCache:
+    """Get the process-wide SQL result cache"""
+    return SQLResultCache(get_settings().sql_cache_max_bytes)
+
+
+__all__ = ["normalize_query", "data_version", "SQLResultCache", "get_sql_result_cache"]
@@ -0,0 +1,170 @@
+"""Read-only connection pools for the SQL tool.
+
+One pool per configured database (`SQL_DATABASES`). Connections are opened
+at startup in read-only mode: SQLite via a `mode=ro` URI plus
+`PRAGMA query_only` and an authorizer that only permits reads, DuckDB via
+`read_only=True`.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+import structlog
+
+from app.core.config import get_settings
+
+logger = structlog.get_logger()
+
+_DUCKDB_SUFFIXES = (".duckdb", ".ddb")
+
+# Authorizer actions a SELECT/WITH statement needs; everything else is denied
+_SQLITE_READ_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+class SQLPoolError(RuntimeError):
+    """Raised when a connection cannot be provided."""
+
+
+def _sqlite_authorizer(action, arg1, arg2, db_name, trigger):
+    return sqlite3.SQLITE_OK if action in _SQLITE_READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class SQLConnectionPool:
+    """Fixed-size pool of read-only connections to one database file."""
+
+    def __init__(self, name: str, path: str, size: int = 4):
+        self.name = name
+        self.path = path
+        self.engine = "duckdb" if path.lower().endswith(_DUCKDB_SUFFIXES) else "sqlite"
+        if not os.path.exists(path):
+            raise SQLPoolError(f"database file not found: {path}")
+        self._size = max(1, int(size))
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._all: List[Any] = []
+        # An open SQLite read cursor blocks writers unless the database uses WAL
+        self.readers_block_writers = self.engine == "sqlite" and self._journal_mode() != "wal"
+        for _ in range(self._size):
+            conn = self._connect()
+            self._all.append(conn)
+            self._idle.put(conn)
+
+    def _connect(self):
+        if self.engine == "duckdb":
+            import duckdb  # optional dependency
+
+            return duckdb.connect(self.path, read_only=True)
+        conn = sqlite3.connect(
+            f"file:{quote(os.path.abspath(self.path))}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA query_only = ON")
+        conn.set_authorizer(_sqlite_authorizer)
+        return conn
+
+    def _journal_mode(self) -> str:
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True)
+        try:
+            return str(conn.execute("PRAGMA journal_mode").fetchone()[0]).lower()
+        except sqlite3.Error:
+            return "unknown"
+        finally:
+            conn.close()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def available(self) -> int:
+        return self._idle.qsize()
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Take a connection, waiting up to `timeout` seconds; pair with `release`."""
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SQLPoolError(f"no idle connection for '{self.name}' within {timeout}s")
+
+    def release(self, conn: Any) -> None:
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Borrow a connection, waiting up to `timeout` seconds for one."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        for conn in self._all:
+            try:
+                conn.close()
+            except Exception as e:  # noqa: BLE001
+                logger.warning("sql_connection_close_failed", database=self.name, error=str(e))
+        self._all.clear()
+
+
+class SQLPoolManager:
+    """Holds the pools for every configured database."""
+
+    def __init__(self, databases: Dict[str, str], pool_size: int = 4):
+        self._pools: Dict[str, SQLConnectionPool] = {}
+        self._lock = threading.Lock()
+        for name, path in databases.items():
+            try:
+                self._pools[name] = SQLConnectionPool(name, path, pool_size)
+                logger.info("sql_pool_opened", database=name, path=path, size=pool_size)
+            except Exception as e:  # noqa: BLE001
+                # One broken database should not disable the others
+                logger.error("sql_pool_open_failed", database=name, path=path, error=str(e))
+
+    def names(self) -> List[str]:
+        return list(self._pools)
+
+    def get(self, name: Optional[str] = None) -> Optional[SQLConnectionPool]:
+        if name:
+            return self._pools.get(name)
+        return next(iter(self._pools.values()), None)
+
+    def close(self) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+@lru_cache()
+def get_sql_pool_manager() -> SQLPoolManager:
+    """Get the process-wide SQL pools (opened on first call, normally at startup)"""
+    settings = get_settings()
+    return SQLPoolManager(settings.get_sql_databases(), pool_size=settings.sql_pool_size)
+
+
+def shutdown_sql_pools() -> None:
+    """Close all pooled connections if the pools were ever opened."""
+    if get_sql_pool_manager.cache_info().currsize:
+        get_sql_pool_manager().close()
+        get_sql_pool_manager.cache_clear()
+
+
+__all__ = [
+    "SQLPoolError",
+    "SQLConnectionPool",
+    "SQLPoolManager",
+    "get_sql_pool_manager",
+    "shutdown_sql_pools",
+]
@@ -0,0 +1,318 @@
+"""Server-side SQL result handles.
+
+A handle keeps an open cursor (and the pooled connection it runs on) so
+follow-up pages are fetched from the same cursor instead of re-running the
+query. Handles expire after a TTL; the number of open handles per database is
+bounded so they never starve the pool for new queries.
+
+On SQLite databases in rollback-journal mode an open read cursor holds a
+SHARED lock that blocks writers, so those handles buffer the remaining rows
+(`detach`) and give the connection back right after the first page. Each
+handle belongs to the session that opened it; other sessions cannot page it.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+import structlog
+
+from .sql_pool import SQLConnectionPool
+from .types import SQLQueryResult
+
+logger = structlog.get_logger()
+
+# SQLite VM instructions between progress-handler checks
+_PROGRESS_STEPS = 1000
+# Buffered (detached) handles kept per database
+_MAX_DETACHED_PER_DB = 16
+
+
+@contextmanager
+def engine_guard(conn, cursor, engine: str, deadline: float, cancel: threading.Event) -> Iterator[None]:
+    """Abort engine work once `deadline` passes or `cancel` is set.
+
+    SQLite uses a progress handler on the connection; DuckDB cursors are
+    interrupted from a watchdog thread.
+    """
+    def _should_abort() -> bool:
+        return cancel.is_set() or time.monotonic() > deadline
+
+    if engine == "duckdb":
+        done = threading.Event()
+
+        def _watchdog() -> None:
+            while not done.wait(0.05):
+                if _should_abort():
+                    cursor.interrupt()
+                    return
+
+        threading.Thread(target=_watchdog, name="sql-watchdog", daemon=True).start()
+        try:
+            yield
+        finally:
+            done.set()
+        return
+
+    conn.set_progress_handler(lambda: 1 if _should_abort() else 0, _PROGRESS_STEPS)
+    try:
+        yield
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def _row_bytes(row) -> int:
+    return sum(len(str(v)) for v in row) + 8 * len(row)
+
+
+class SQLResultHandle:
+    """Open cursor over a query result, read page by page."""
+
+    def __init__(
+        self,
+        pool: SQLConnectionPool,
+        conn: Any,
+        cursor: Any,
+        columns: List[str],
+        page_size: int,
+        max_page_bytes: int,
+        ttl_s: float,
+        max_rows: int,
+        owner: Optional[str] = None,
+    ):
+        self.id = uuid4().hex[:12]
+        self.pool = pool
+        # Session (thread_id) allowed to read further pages; None = any caller
+        self.owner = owner
+        self.columns = columns
+        self.page_size = max(1, page_size)
+        self.max_page_bytes = max(1, max_page_bytes)
+        self.ttl_s = ttl_s
+        self.expires_at = time.monotonic() + ttl_s
+        self.max_rows = max(1, max_rows)
+        self.offset = 0
+        self.truncated = False
+        self._conn = conn
+        self._cursor = cursor
+        self._lookahead: Optional[tuple] = None
+        # Remaining rows once detached from the cursor
+        self._buffer: Optional[Deque[tuple]] = None
+        self._buffer_truncated = False
+        self._exhausted = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def detached(self) -> bool:
+        return self._buffer is not None
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (now or time.monotonic()) > self.expires_at
+
+    def _next_row(self) -> Optional[tuple]:
+        if self._lookahead is not None:
+            row, self._lookahead = self._lookahead, None
+            return row
+        if self._exhausted:
+            return None
+        if self._buffer is not None:
+            if self._buffer:
+                return self._buffer.popleft()
+            self._exhausted = True
+            self.truncated = self.truncated or self._buffer_truncated
+            return None
+        row = self._cursor.fetchone()
+        if row is None:
+            self._exhausted = True
+        return row
+
+    def _guard(self, deadline: float, cancel: threading.Event):
+        if self._buffer is not None:
+            return nullcontext()
+        return engine_guard(self._conn, self._cursor, self.pool.engine, deadline, cancel)
+
+    def detach(self, max_bytes: int, deadline: float, cancel: threading.Event) -> None:
+        """Buffer the remaining rows (at most `max_bytes`) and release the cursor.
+
+        Rows past the byte cap are dropped and the result is reported as
+        truncated once the buffer is read to the end.
+        """
+        with self._lock:
+            if self._closed or self._buffer is not None:
+                return
+            buffer: Deque[tuple] = deque()
+            size = 0
+            with self._guard(deadline, cancel):
+                while True:
+                    row = self._next_row()
+                    if row is None:
+                        break
+                    size += _row_bytes(row)
+                    if buffer and size > max(1, max_bytes):
+                        self._buffer_truncated = True
+                        break
+                    buffer.append(row)
+            self._exhausted = False
+            self._buffer = buffer
+            self._release_cursor()
+        logger.info("sql_result_handle_detached", handle=self.id, database=self.pool.name, rows=len(buffer))
+
+    def fetch_page(self, deadline: float, cancel: threading.Event) -> SQLQueryResult:
+        """Read the next page: up to `page_size` rows or `max_page_bytes`."""
+        with self._lock:
+            if self._closed:
+                raise LookupError("result handle is closed")
+            start = time.perf_counter()
+            rows: List[list] = []
+            size = 0
+            with self._guard(deadline, cancel):
+                while len(rows) < self.page_size and self.offset + len(rows) < self.max_rows:
+                    row = self._next_row()
+                    if row is None:
+                        break
+                    size += _row_bytes(row)
+                    if rows and size > self.max_page_bytes:
+                        self._lookahead = row
+                        break
+                    rows.append(list(row))
+                # One-row lookahead tells whether another page exists
+                if self._lookahead is None and not self._exhausted:
+                    self._lookahead = self._next_row()
+            if self._lookahead is not None and self.offset + len(rows) >= self.max_rows:
+                # Row cap reached: report truncation instead of another page
+                self.truncated = True
+                self._lookahead = None
+                self._exhausted = True
+            page = SQLQueryResult(
+                database=self.pool.name,
+                columns=self.columns,
+                rows=rows,
+                offset=self.offset,
+                has_more=self._lookahead is not None,
+                handle=self.id if self._lookahead is not None else None,
+                truncated=self.truncated,
+                took_ms=int((time.perf_counter() - start) * 1000),
+            )
+            self.offset += len(rows)
+            self.expires_at = time.monotonic() + self.ttl_s
+        if not page.has_more:
+            self.close()
+        return page
+
+    def _release_cursor(self) -> None:
+        if self._cursor is None:
+            return
+        try:
+            self._cursor.close()
+        except Exception:  # noqa: BLE001
+            pass
+        self.pool.release(self._conn)
+        self._cursor = self._conn = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._buffer = None
+            self._release_cursor()
+
+
+class SQLResultRegistry:
+    """Tracks open handles; enforces TTL and a per-database open-handle cap."""
+
+    def __init__(self) -> None:
+        self._handles: Dict[str, SQLResultHandle] = {}
+        self._lock = threading.Lock()
+
+    def _max_open(self, pool: SQLConnectionPool) -> int:
+        # Always leave one connection for new queries
+        return max(1, pool.size - 1)
+
+    def sweep(self) -> int:
+        """Close expired or already-closed handles; returns how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [h for h in self._handles.values() if h.closed or h.expired(now)]
+            for h in stale:
+                self._handles.pop(h.id, None)
+        for h in stale:
+            if not h.closed:
+                logger.info("sql_result_handle_expired", handle=h.id, database=h.pool.name)
+            h.close()
+        return len(stale)
+
+    def make_room(self, pool: SQLConnectionPool) -> None:
+        """Evict the least recently used handles of `pool` until one more fits."""
+        self.sweep()
+        with self._lock:
+            mine = sorted(
+                (h for h in self._handles.values() if h.pool is pool),
+                key=lambda h: h.expires_at,
+            )
+            # Detached handles hold no connection, only their buffered rows
+            holding = [h for h in mine if not h.detached]
+            buffered = [h for h in mine if h.detached]
+            evict = (
+                holding[: max(0, len(holding) - self._max_open(pool) + 1)]
+                + buffered[: max(0, len(buffered) - _MAX_DETACHED_PER_DB + 1)]
+            )
+            for h in evict:
+                self._handles.pop(h.id, None)
+        for h in evict:
+            logger.info("sql_result_handle_evicted", handle=h.id, database=pool.name)
+            h.close()
+
+    def register(self, handle: SQLResultHandle) -> None:
+        with self._lock:
+            self._handles[handle.id] = handle
+
+    def get(self, handle_id: str, owner: Optional[str] = None) -> Optional[SQLResultHandle]:
+        """Look up a handle; another session's handle is reported as missing."""
+        self.sweep()
+        with self._lock:
+            handle = self._handles.get(handle_id)
+        if handle is not None and handle.owner is not None and handle.owner != owner:
+            logger.warning("sql_result_handle_owner_mismatch", handle=handle_id, database=handle.pool.name)
+            return None
+        return handle
+
+    def close(self, handle_id: str) -> None:
+        with self._lock:
+            handle = self._handles.pop(handle_id, None)
+        if handle is not None:
+            handle.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for h in handles:
+            h.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._handles)
+
+
+@lru_cache()
+def get_sql_result_registry() -> SQLResultRegistry:
+    """Get the process-wide result handle registry"""
+    return SQLResultRegistry()
+
+
+__all__ = [
+    "engine_guard",
+    "SQLResultHandle",
+    "SQLResultRegistry",
+    "get_sql_result_registry",
+]
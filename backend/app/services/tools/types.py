@@ -1,7 +1,7 @@
 """Tool types and result models."""
 from __future__ import annotations
 
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -11,6 +11,39 @@ class ToolResult(BaseModel):
     output: str = Field(..., description="Rendered tool output (human-readable)")
     took_ms: Optional[int] = Field(None, description="Elapsed time in milliseconds")
     error: Optional[str] = Field(None, description="Error message if failed")
+    cached: bool = Field(False, description="True if served from a result cache")
+    data: Optional[Dict[str, Any]] = Field(None, description="Structured result (SQL rows, search hits) for follow-ups")
 
 
-__all__ = ["ToolResult"]
+class ToolCall(BaseModel):
+    tool: str = Field(..., description="Canonical tool name")
+    input: str = Field("", description="Tool argument")
+
+
+class ToolRoute(BaseModel):
+    kind: Literal["tool", "generic", "none"] = Field("none", description="Routing decision")
+    tool: Optional[str] = Field(None, description="First (or only) tool to run")
+    input: str = Field("", description="Argument of the first call")
+    calls: List[ToolCall] = Field(default_factory=list, description="All tool calls, in order")
+    source: Optional[Literal["prefix", "function_calling"]] = Field(None, description="How the route was decided")
+
+
+class ToolDefinition(BaseModel):
+    name: str = Field(..., description="Canonical tool name")
+    description: str = Field(..., description="What the tool does, for the model")
+    parameters: Dict[str, Any] = Field(..., description="JSON schema (object) of the tool arguments")
+
+
+class SQLQueryResult(BaseModel):
+    database: str = Field(..., description="Database name the query ran against")
+    columns: List[str] = Field(default_factory=list, description="Column names")
+    rows: List[List[Any]] = Field(default_factory=list, description="Result rows of this page")
+    offset: int = Field(0, description="Row offset of the first row in this page")
+    has_more: bool = Field(False, description="True if further pages can be fetched via handle")
+    handle: Optional[str] = Field(None, description="Server-side result handle for follow-up pages")
+    truncated: bool = Field(False, description="True if more rows than max_rows matched")
+    cached: bool = Field(False, description="True if served from the result cache")
+    took_ms: Optional[int] = Field(None, description="Elapsed time in milliseconds")
+
+
+__all__ = ["ToolResult", "ToolCall", "ToolRoute", "ToolDefinition", "SQLQueryResult"]
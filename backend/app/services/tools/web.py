@@ -1,13 +1,58 @@
-"""Web search tool placeholder implementation.
+"""Search tool over the local document index.
 
-Provides `run(arg)` which returns a placeholder message without network calls.
+The plant network is air-gapped, so `web:`/`search:` queries run against an
+on-disk index of internal documents (see `app.services.search`). Without a
+built index, `run(arg)` returns a placeholder message.
 """
 from __future__ import annotations
 
+import time
+from dataclasses import asdict
+from typing import Optional, Union
 
-def run(arg: str) -> str:
-    return (
-        "[Web Search Tool] まだ有効化されていません。\n"
-        "将来的には検索プロバイダ統合＋要約（ソース出典付き）・レート制御・キャッシュを提供予定です。\n"
-        f"受領検索語: {arg}"
+from app.core.config import get_settings
+from app.services.search import get_search_index
+
+from .types import ToolDefinition, ToolResult
+
+
+def definition() -> Optional[ToolDefinition]:
+    """Function-calling definition, or None when the index is not built."""
+    if get_search_index() is None:
+        return None
+    return ToolDefinition(
+        name="web",
+        description="社内文書（作業手順書・保全記録・報告書など）を全文検索し、関連箇所を返します。",
+        parameters={
+            "type": "object",
+            "properties": {"query": {"type": "string", "description": "検索語（空白区切りで複数可）"}},
+            "required": ["query"],
+        },
+    )
+
+
+def run(arg: str) -> Union[str, ToolResult]:
+    index = get_search_index()
+    if index is None:
+        return (
+            "[Web Search Tool] 検索索引が構築されていません（SEARCH_INDEX_PATH）。\n"
+            "`python -m app.services.search build <文書フォルダ>` で社内文書の索引を作成してください。\n"
+            f"受領検索語: {arg}"
+        )
+    settings = get_settings()
+    start = time.perf_counter()
+    hits = index.search(arg, top_k=settings.search_top_k, snippet_chars=settings.search_snippet_chars)
+    took = int((time.perf_counter() - start) * 1000)
+    if not hits:
+        return f"[Web Search Tool] 社内文書に「{arg}」は見つかりませんでした ({took}ms)"
+    lines = [f"[Web Search Tool] 社内文書 {len(hits)}件 ({took}ms)"]
+    for i, hit in enumerate(hits, 1):
+        lines.append(f"{i}. {hit.title} — {hit.path}")
+        if hit.snippet:
+            lines.append(f"   {hit.snippet}")
+    return ToolResult(
+        tool="web",
+        input=arg,
+        output="\n".join(lines),
+        data={"query": arg, "hits": [asdict(hit) for hit in hits]},
     )
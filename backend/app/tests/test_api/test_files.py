@@ -30,8 +30,9 @@ class TestFileAPI:
         file_info = data["file"]
         assert file_info["original_filename"] == "test.txt"
         assert file_info["file_type"] == ".txt"
-        assert "content" in file_info
-        assert len(file_info["content"]) > 0
+        assert file_info["status"] == "completed"
+        assert len(file_info["content_preview"]) > 0
+        assert file_info["content_length"] > 0
     
     @pytest.mark.unit
     def test_upload_file_without_session_id(self, client: TestClient):
@@ -95,7 +96,7 @@ class TestFileAPI:
         data = response.json()
         assert data["id"] == file_id
         assert data["original_filename"] == "test.txt"
-        assert "content" in data
+        assert "content_preview" in data
     
     @pytest.mark.unit
     def test_get_file_info_nonexistent_file(self, client: TestClient):
@@ -195,7 +196,7 @@ class TestFileAPI:
         data = response.json()
         file_info = data["file"]
         assert file_info["file_type"] == ".csv"
-        assert "田中" in file_info["content"]
+        assert "田中" in file_info["content_preview"]
     
     @pytest.mark.unit
     def test_file_upload_response_structure(self, client: TestClient):
@@ -218,6 +219,7 @@ class TestFileAPI:
         
         file_info = data["file"]
         required_fields = ["id", "filename", "original_filename", "file_type", 
-                          "file_size", "content", "upload_time", "session_id"]
+                          "file_size", "content_preview", "content_length", "upload_time",
+                          "session_id", "status"]
         for field in required_fields:
             assert field in file_info
@@ -128,11 +128,14 @@ class TestChatService:
         # Arrange
         file_ids = ["file-123", "file-456"]
         
-        mock_file1 = Mock(original_filename="doc1.txt", content="ファイル1の内容")
-        mock_file2 = Mock(original_filename="doc2.txt", content="ファイル2の内容")
+        mock_file1 = Mock(id="file-123", original_filename="doc1.txt", status="completed")
+        mock_file2 = Mock(id="file-456", original_filename="doc2.txt", status="completed")
+        contents = {"file-123": "ファイル1の内容", "file-456": "ファイル2の内容"}
         
         with patch.object(chat_service._file_service, 'get_file_info', 
-                         side_effect=[mock_file1, mock_file2]) as mock_get_file:
+                         side_effect=[mock_file1, mock_file2]) as mock_get_file, \
+             patch.object(chat_service._file_service, 'read_content',
+                          side_effect=lambda file_id: contents[file_id]):
             
             # Act
             context = await chat_service._get_file_context(file_ids)
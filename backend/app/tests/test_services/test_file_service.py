@@ -42,7 +42,7 @@ class TestFileService:
     async def test_extract_from_txt_file(self, file_service: FileService, sample_text_file):
         """Test text extraction from TXT file"""
         # Act
-        result = await file_service._extract_from_txt(sample_text_file)
+        result = await file_service._extract_text_from_file(sample_text_file, ".txt")
         
         # Assert
         assert "テスト用のサンプルテキスト" in result
@@ -228,7 +228,7 @@ class TestFileService:
         
         try:
             # Act
-            result = await file_service._extract_from_spreadsheet(temp_path, ".csv")
+            result = await file_service._extract_text_from_file(temp_path, ".csv")
             
             # Assert
             assert "田中" in result
@@ -13,6 +13,7 @@ from unittest.mock import Mock
 
 from app.main import app
 from app.core.config import Settings, get_settings
+from app.services.llm.gemini import GeminiProvider
 
 
 def pytest_configure(config):
@@ -90,6 +91,30 @@ def mock_gemini_service():
     return mock
 
 
+@pytest.fixture
+def gemini_provider():
+    """差し替えモデルで動く GeminiProvider のファクトリ（APIキー・ブレーカー・ヘッジは既定で無し）"""
+    def _make(model, fallback=None, hedger=None, breaker=None, retry_budget=None, **settings):
+        options = {
+            "gemini_api_key": "",
+            "gemini_model": "gemini-test",
+            "gemini_fallback_model": None,
+            "llm_circuit_breaker": False,
+            "llm_hedging": False,
+        }
+        options.update(settings)
+        return GeminiProvider(
+            Settings(**options),
+            model=model,
+            fallback_model=fallback,
+            hedger=hedger,
+            breaker=breaker,
+            retry_budget=retry_budget,
+        )
+
+    return _make
+
+
 @pytest.fixture
 def mock_langgraph_service():
     """LangGraph サービスモック"""
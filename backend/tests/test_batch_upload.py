@@ -0,0 +1,114 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.file_service as file_service_module
+from app.core.config import Settings
+from app.main import app
+from app.services.file_service import FileService
+from app.services.ingestion import IngestionQueue
+
+
+def test_batch_upload_reports_partial_failures(client: TestClient, tmp_path):
+    svc = FileService()
+    svc._settings = Settings(upload_dir=str(tmp_path))
+    app.dependency_overrides[FileService] = lambda: svc
+    try:
+        files = [
+            ("files", ("a.txt", "品質記録A".encode("utf-8"), "text/plain")),
+            ("files", ("bad.bin", b"\x00\x01", "application/octet-stream")),
+            ("files", ("b.txt", "品質記録B".encode("utf-8"), "text/plain")),
+        ]
+        resp = client.post("/api/v1/files/upload/batch", files=files, data={"session_id": "sess-batch"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        names = [r["filename"] for r in data["results"]]
+        assert names == ["a.txt", "bad.bin", "b.txt"]
+        assert data["results"][1]["status_code"] == 400
+        assert data["results"][0]["file"]["content_preview"] == "品質記録A"
+
+        listing = client.get("/api/v1/files/session/sess-batch").json()
+        assert {f["original_filename"] for f in listing} == {"a.txt", "b.txt"}
+    finally:
+        app.dependency_overrides.pop(FileService, None)
+
+
+def test_batch_upload_rejects_too_many_files(client: TestClient, monkeypatch):
+    monkeypatch.setattr(
+        "app.api.v1.files.get_settings", lambda: Settings(batch_upload_max_files=1)
+    )
+    files = [
+        ("files", ("a.txt", b"a", "text/plain")),
+        ("files", ("b.txt", b"b", "text/plain")),
+    ]
+    resp = client.post("/api/v1/files/upload/batch", files=files)
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_process_uploaded_files_runs_concurrently_with_cap(monkeypatch, tmp_path):
+    queue = IngestionQueue(max_workers=8)
+    monkeypatch.setattr(file_service_module, "get_ingestion_queue", lambda: queue)
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow_extract(self, file_id, temp_file_path, file_extension):
+        nonlocal active, peak, spooled
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.2)
+        with lock:
+            active -= 1
+            spooled -= 1
+        return f"text-{file_id}"
+
+    monkeypatch.setattr(FileService, "_extract_blocking", slow_extract)
+
+    # Uploads copied to disk but not yet extracted
+    spooled = 0
+    peak_spooled = 0
+    spool = FileService._spool_upload
+
+    def tracking_spool(source, suffix):
+        nonlocal spooled, peak_spooled
+        with lock:
+            spooled += 1
+            peak_spooled = max(peak_spooled, spooled)
+        path, size = spool(source, suffix)
+        os.unlink(path)
+        return path, size
+
+    monkeypatch.setattr(FileService, "_spool_upload", staticmethod(tracking_spool))
+
+    class _Upload:
+        def __init__(self, name: str):
+            self.filename = name
+            self.file = io.BytesIO(b"x" * 1000)
+
+    svc = FileService()
+    svc._settings = Settings(upload_dir=str(tmp_path))
+    try:
+        start = time.perf_counter()
+        results = await svc.process_uploaded_files(
+            [_Upload(f"f{i}.txt") for i in range(6)], session_id="s-par", concurrency=3
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        queue.shutdown()
+
+    assert all(not isinstance(r, Exception) for r in results)
+    assert {r.file_size for r in results} == {1000}
+    assert peak == 3
+    # Later uploads are only read once a slot frees up
+    assert peak_spooled == 3
+    # Two waves of 0.2s instead of six sequential extractions
+    assert elapsed < 0.8
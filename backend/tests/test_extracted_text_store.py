@@ -0,0 +1,72 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import Settings
+from app.main import app
+from app.repositories.extracted_text import ExtractedTextStore
+from app.services.file_service import FileService
+
+
+def test_read_range_aligns_to_utf8_boundaries(tmp_path):
+    store = ExtractedTextStore(str(tmp_path))
+    total = store.write("f1", "品質abc")  # 3 bytes per kanji
+    assert total == 9
+
+    # Offset inside the first character moves forward to the next boundary
+    s = store.read_range("f1", offset=1, length=4)
+    assert s.start == 3
+    assert s.text == "質a"
+    assert s.end == 7
+
+    # A window smaller than one character still returns that character
+    s2 = store.read_range("f1", offset=0, length=1)
+    assert s2.text == "品"
+    assert s2.end == 3
+
+    # Past the end -> empty
+    s3 = store.read_range("f1", offset=100, length=10)
+    assert s3.text == "" and s3.start == 9
+
+    assert store.read_all("f1") == "品質abc"
+    store.delete("f1")
+    assert store.read_range("f1", 0, 10) is None
+
+
+def test_upload_keeps_preview_and_serves_ranged_content(client: TestClient, tmp_path):
+    svc = FileService()
+    svc._settings = Settings(upload_dir=str(tmp_path), file_preview_chars=4)
+    app.dependency_overrides[FileService] = lambda: svc
+    try:
+        text = "段取り替え時間の短縮手順\n" * 20
+        resp = client.post(
+            "/api/v1/files/upload",
+            files={"file": ("sop.txt", text.encode("utf-8"), "text/plain")},
+            data={"session_id": "sess-range"},
+        )
+        assert resp.status_code == 200
+        body = resp.json()["file"]
+        assert "content" not in body
+        assert body["content_preview"] == "段取り替..."
+        assert body["content_length"] == len(text.encode("utf-8"))
+
+        # Page through the text with next_offset until exhausted
+        chunks, offset = [], 0
+        while offset < body["content_length"]:
+            page = client.get(
+                f"/api/v1/files/{body['id']}/content", params={"offset": offset, "length": 100}
+            ).json()
+            chunks.append(page["content"])
+            offset = page["next_offset"]
+        assert "".join(chunks) == text
+
+        listing = client.get("/api/v1/files/session/sess-range").json()
+        assert listing[0]["content_preview"] == "段取り替..."
+
+        client.delete(f"/api/v1/files/{body['id']}")
+        assert not list((tmp_path / "text").iterdir())
+    finally:
+        app.dependency_overrides.pop(FileService, None)
+
+
+def test_content_endpoint_404_for_unknown_file(client: TestClient):
+    assert client.get("/api/v1/files/missing/content").status_code == 404
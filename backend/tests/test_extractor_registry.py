@@ -0,0 +1,90 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from app.services.extractors.registry import EXTRACTORS, choose_placement, sniff_format
+from app.services.extractors.text import detect_encoding
+from app.services.file_service import FileService
+
+
+def _zip_bytes(names):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name in names:
+            zf.writestr(name, "<xml/>")
+    return buf.getvalue()
+
+
+def test_sniff_prefers_magic_bytes_over_extension(tmp_path):
+    pdf_as_txt = tmp_path / "report.txt"
+    pdf_as_txt.write_bytes(b"%PDF-1.7\n...")
+    assert sniff_format(str(pdf_as_txt), ".txt") == "pdf"
+
+    xlsx_as_docx = tmp_path / "sheet.docx"
+    xlsx_as_docx.write_bytes(_zip_bytes(["[Content_Types].xml", "xl/workbook.xml"]))
+    assert sniff_format(str(xlsx_as_docx), ".docx") == "xlsx"
+
+
+def test_sniff_rejects_unknown_and_legacy_office(tmp_path):
+    doc = tmp_path / "old.docx"
+    doc.write_bytes(b"\xd0\xcf\x11\xe0" + b"\x00" * 16)
+    with pytest.raises(ValueError):
+        sniff_format(str(doc), ".docx")
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        sniff_format(str(doc), ".exe")
+
+
+def test_detect_encoding_handles_shift_jis():
+    assert detect_encoding("設備点検記録".encode("cp932")) == "cp932"
+    assert detect_encoding("設備点検記録".encode("utf-8")) == "utf-8"
+
+
+@pytest.mark.asyncio
+async def test_new_text_formats_are_extracted(tmp_path):
+    svc = FileService()
+
+    log = tmp_path / "line.log"
+    log.write_bytes("E102 主軸過負荷\n".encode("cp932"))
+    assert "主軸過負荷" in await svc._extract_text_from_file(str(log), ".log")
+
+    md = tmp_path / "notes.md"
+    md.write_text("# 5S\n- 整理", encoding="utf-8")
+    assert "# 5S" in await svc._extract_text_from_file(str(md), ".md")
+
+    data = tmp_path / "spec.json"
+    data.write_text(json.dumps({"工程": "溶接"}), encoding="utf-8")
+    assert '"工程": "溶接"' in await svc._extract_text_from_file(str(data), ".json")
+
+    page = tmp_path / "page.html"
+    page.write_text(
+        "<html><head><title>手順書</title><script>var x=1;</script></head>"
+        "<body><p>治具を固定する</p></body></html>",
+        encoding="utf-8",
+    )
+    html_text = await svc._extract_text_from_file(str(page), ".html")
+    assert "手順書" in html_text and "治具を固定する" in html_text
+    assert "var x" not in html_text
+
+
+def test_choose_placement_by_estimated_cost():
+    one_mb = 1024 * 1024
+    assert choose_placement(EXTRACTORS["txt"], one_mb, 0.05, 2.0) == "inline"
+    assert choose_placement(EXTRACTORS["csv"], one_mb, 0.05, 2.0) == "thread"
+    assert choose_placement(EXTRACTORS["pdf"], 10 * one_mb, 0.05, 2.0) == "process"
+    # Small PDFs are not worth the process hop
+    assert choose_placement(EXTRACTORS["pdf"], one_mb // 2, 0.05, 2.0) == "thread"
+    # Streaming extractors stay off the event loop even when cheap
+    assert choose_placement(EXTRACTORS["csv"], 1024, 0.05, 2.0) == "thread"
+    assert choose_placement(EXTRACTORS["txt"], 1024, 0.05, 2.0) == "inline"
+
+
+def test_upload_allow_list_comes_from_the_registry(client):
+    files = {"file": ("5s.markdown", "# 5S\n整理・整頓".encode("utf-8"), "text/markdown")}
+    resp = client.post("/api/v1/files/upload", files=files, data={"session_id": "sess-md"})
+    assert resp.status_code == 200
+    assert "整理・整頓" in resp.json()["file"]["content_preview"]
+
+    bad = client.post("/api/v1/files/upload", files={"file": ("tool.exe", b"MZ", "application/octet-stream")})
+    assert bad.status_code == 400 and ".markdown" in bad.json()["detail"]
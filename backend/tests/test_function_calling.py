@@ -0,0 +1,158 @@
+import asyncio
+import json
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.langgraph_service as lgs
+import app.services.tools.sql as sql_tool
+from app.services.llm.batching import batch_questions
+from app.services.llm.types import FunctionCall, FunctionCallingResponse
+from app.services.tools.registry import TOOL_RUNNERS, get_tool_definitions, tool_call_from_arguments
+from app.services.tools.sql_pool import SQLPoolManager
+from app.services.tools.types import ToolDefinition
+
+_WEB = ToolDefinition(
+    name="web",
+    description="社内文書検索",
+    parameters={"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]},
+)
+
+
+class StubFunctionCallingLLM:
+    def __init__(self, response: FunctionCallingResponse, outputs=None):
+        self.response = response
+        self.outputs = list(outputs or [])
+        self.round_trips = 0
+
+    @property
+    def is_configured(self) -> bool:
+        return True
+
+    async def generate(self, prompt: str) -> str:
+        self.round_trips += 1
+        return self.outputs.pop(0) if self.outputs else "general"
+
+    async def generate_with_tools(self, prompt, tools):
+        self.round_trips += 1
+        return self.response
+
+
+def test_sql_definition_lists_tables_and_databases(tmp_path, monkeypatch):
+    db_path = tmp_path / "plant.sqlite"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE downtime (line TEXT, minutes INTEGER, cause TEXT)")
+    conn.close()
+    manager = SQLPoolManager({"plant": str(db_path)}, pool_size=1)
+    monkeypatch.setattr(sql_tool, "get_sql_pool_manager", lambda: manager)
+    try:
+        definitions = {d.name: d for d in get_tool_definitions()}
+        sql_def = definitions["sql"]
+        assert "downtime(line, minutes, cause)" in sql_def.description
+        assert sql_def.parameters["properties"]["db"]["enum"] == ["plant"]
+        assert sql_def.parameters["required"] == ["query"]
+    finally:
+        manager.close()
+
+
+def test_schema_summary_serves_previous_listing_while_pool_is_busy(tmp_path, monkeypatch):
+    db_path = tmp_path / "plant.sqlite"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE downtime (line TEXT)")
+    conn.close()
+    manager = SQLPoolManager({"plant": str(db_path)}, pool_size=1)
+    pool = manager.get()
+    monkeypatch.setattr(sql_tool, "_schema_cache", {})
+    try:
+        assert sql_tool._schema_summary(pool) == "downtime(line)"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE scrap (line TEXT, qty INTEGER)")
+        conn.commit()
+        conn.close()
+
+        with pool.connection():  # every connection busy
+            assert sql_tool._schema_summary(pool) == "downtime(line)"
+        assert sql_tool._schema_summary(pool) == "downtime(line); scrap(line, qty)"
+    finally:
+        manager.close()
+
+
+def test_tool_call_from_arguments_matches_runner_input():
+    assert tool_call_from_arguments("web", {"query": "チョコ停"}).input == "チョコ停"
+    call = tool_call_from_arguments("sql", {"query": "SELECT * FROM t WHERE a = ?", "params": ["x"], "db": None})
+    assert sql_tool.parse_arg(call.input) == ("SELECT * FROM t WHERE a = ?", ["x"], None)
+    assert json.loads(call.input) == {"query": "SELECT * FROM t WHERE a = ?", "params": ["x"]}
+
+
+@pytest.mark.asyncio
+async def test_tool_labelled_queries_are_routed_with_function_calling(monkeypatch):
+    monkeypatch.setattr(lgs, "get_tool_definitions", lambda: [_WEB])
+    llm = StubFunctionCallingLLM(FunctionCallingResponse(calls=[
+        FunctionCall(name="web", arguments={"query": "金型 交換手順"}),
+        FunctionCall(name="unknown", arguments={}),
+    ]), outputs=["tool"])
+    svc = lgs.LangGraphService(llm_provider=llm)
+    result = await svc.process_query("金型交換の手順書はどこ？", debug=True)
+
+    assert "[tool:web]" in result
+    assert "金型 交換手順" in result
+    assert llm.round_trips == 2  # classification, then the tool choice
+    trace = svc.get_last_debug_info()["decision_trace"]
+    detected = [e for e in trace if e["type"] == "tool_detected"][0]
+    assert detected["reason"] == "LLMによるツール選択"
+
+
+@pytest.mark.asyncio
+async def test_text_answer_is_used_as_category_and_errors_fall_back(monkeypatch):
+    monkeypatch.setattr(lgs, "get_tool_definitions", lambda: [_WEB])
+    llm = StubFunctionCallingLLM(FunctionCallingResponse(text="python"), outputs=["tool"])
+    svc = lgs.LangGraphService(llm_provider=llm)
+    state = await svc._analyze_query({"user_query": "pandasの使い方", "debug": False})
+    assert state["query_type"] == "python"
+    assert llm.round_trips == 2
+
+    llm = StubFunctionCallingLLM(FunctionCallingResponse(error="boom"), outputs=["tool"])
+    svc = lgs.LangGraphService(llm_provider=llm)
+    state = await svc._analyze_query({"user_query": "品質改善の進め方は？", "debug": False})
+    assert state["query_type"] == "manufacturing"  # keyword detection
+    assert llm.round_trips == 2
+
+
+@pytest.mark.asyncio
+async def test_classification_is_batched_with_the_default_tool_registry():
+    class BatchingStub(StubFunctionCallingLLM):
+        async def generate(self, prompt: str) -> str:
+            self.round_trips += 1
+            return json.dumps(["manufacturing", "python", "general"][: len(batch_questions(prompt))])
+
+    assert {"sql", "web"} <= set(TOOL_RUNNERS)
+    llm = BatchingStub(FunctionCallingResponse(text="general"))
+    svc = lgs.LangGraphService(llm_provider=llm)
+    assert "tool" in svc._classifier.categories
+    queries = ["品質改善の進め方は？", "Pythonでコードを書きたい", "おすすめの本は？"]
+    states = await asyncio.gather(*(
+        svc._analyze_query({"user_query": q, "debug": False, "decision_trace": []}) for q in queries
+    ))
+
+    assert [s["query_type"] for s in states] == ["manufacturing", "python", "general"]
+    assert llm.round_trips == 1  # one combined prompt, no function-calling requests
+    assert svc._classifier.batched >= 3
+
+
+@pytest.mark.asyncio
+async def test_gemini_parses_function_call_parts(gemini_provider):
+    from google.generativeai import protos
+
+    seen = {}
+
+    async def fake_generate(prompt, tools=None):
+        seen["tools"] = tools
+        call = protos.FunctionCall(name="sql", args={"query": "SELECT 1", "params": ["A"]})
+        parts = [SimpleNamespace(function_call=call, text="")]
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))])
+
+    provider = gemini_provider(SimpleNamespace(generate_content_async=fake_generate))
+    result = await provider.generate_with_tools("q", [_WEB])
+    assert result.calls == [FunctionCall(name="sql", arguments={"query": "SELECT 1", "params": ["A"]})]
+    assert seen["tools"][0]["function_declarations"][0]["name"] == "web"
@@ -0,0 +1,92 @@
+import json
+
+import httpx
+import pytest
+
+from app.core.config import Settings
+from app.services.llm import GeminiProvider
+from app.services.llm.gemini_rest import GeminiAPIError, GeminiRESTModel
+from app.services.llm.http import close_llm_http_client, get_llm_http_client, open_llm_http_client
+from app.services.llm.retry import RetryBudget
+from app.services.llm.usage import collect_usage
+from app.services.tools.types import ToolDefinition
+
+
+def _mock_client(responses):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        status, body = responses.pop(0)
+        return httpx.Response(status, json=body)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), seen
+
+
+def _answer(parts, prompt_tokens=20):
+    return 200, {
+        "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": 4},
+    }
+
+
+def _rest_model(client):
+    return GeminiRESTModel("gemini-test", "k", "http://mock/v1beta", client=lambda: client)
+
+
+@pytest.mark.asyncio
+async def test_rest_transport_generates_content_and_reports_usage(gemini_provider):
+    client, seen = _mock_client([_answer([{"text": "回答です"}])])
+    provider = gemini_provider(_rest_model(client), gemini_transport="rest")
+    with collect_usage() as usages:
+        assert await provider.generate("品質改善の方法は？") == "回答です"
+
+    request = seen[0]
+    assert str(request.url) == "http://mock/v1beta/models/gemini-test:generateContent"
+    assert request.headers["x-goog-api-key"] == "k"
+    assert json.loads(request.content)["contents"][0]["parts"][0]["text"] == "品質改善の方法は？"
+    assert (usages[0].prompt_tokens, usages[0].output_tokens) == (20, 4)
+    # Built from the settings, the provider uses the REST model too
+    assert isinstance(GeminiProvider(Settings(gemini_api_key="k", gemini_transport="rest"))._model, GeminiRESTModel)
+
+
+@pytest.mark.asyncio
+async def test_rest_transport_rate_limit_carries_retry_hint(gemini_provider):
+    rate_limited = (429, {"error": {
+        "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Resource has been exhausted",
+        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "0.01s"}],
+    }})
+    client, seen = _mock_client([rate_limited, _answer([{"text": "再試行後の回答"}])])
+    budget = RetryBudget(ratio=1.0)
+    provider = gemini_provider(
+        _rest_model(client), retry_budget=budget, gemini_transport="rest", gemini_retry_backoff_seconds=0.001
+    )
+    assert await provider.generate("質問") == "再試行後の回答"
+    assert len(seen) == 2 and budget.retries == 1
+
+    client, _ = _mock_client([rate_limited])
+    model = _rest_model(client)
+    with pytest.raises(GeminiAPIError) as exc:
+        await model.generate_content_async("質問")
+    assert exc.value.status_code == 429 and exc.value.retry_after == 0.01
+
+
+@pytest.mark.asyncio
+async def test_rest_transport_function_calling(gemini_provider):
+    client, seen = _mock_client([_answer([{"functionCall": {"name": "sql", "args": {"query": "SELECT 1"}}}])])
+    provider = gemini_provider(_rest_model(client), gemini_transport="rest")
+    tool = ToolDefinition(name="sql", description="SQL", parameters={"type": "object", "properties": {}})
+    response = await provider.generate_with_tools("sql: SELECT 1", [tool])
+    assert [(c.name, c.arguments) for c in response.calls] == [("sql", {"query": "SELECT 1"})]
+    assert json.loads(seen[0].content)["tools"][0]["functionDeclarations"][0]["name"] == "sql"
+
+
+@pytest.mark.asyncio
+async def test_shared_client_lifecycle():
+    client = open_llm_http_client(Settings(llm_http_max_connections=8, llm_http_max_keepalive_connections=4))
+    assert get_llm_http_client() is client
+    await close_llm_http_client()
+    assert client.is_closed
+    reopened = get_llm_http_client()
+    assert reopened is not client and not reopened.is_closed
+    await close_llm_http_client()
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import get_settings
+from app.main import app
+from app.models.files import UploadedFile
+from app.repositories.chat_history import InMemoryChatHistoryRepository
+from app.services.chat_service import ChatService
+from app.services.file_service import FileService
+from app.services.ingestion import IngestionQueue
+import app.services.chat_service as chat_service_module
+
+
+def _poll_status(client: TestClient, file_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        data = client.get(f"/api/v1/files/{file_id}/status").json()
+        if data["status"] != "processing":
+            return data
+        time.sleep(0.02)
+    raise AssertionError("ingestion did not finish in time")
+
+
+def test_background_upload_returns_processing_then_completes(client: TestClient):
+    files = {"file": ("manual.txt", "段取り替え手順".encode("utf-8"), "text/plain")}
+    resp = client.post(
+        "/api/v1/files/upload",
+        files=files,
+        data={"session_id": "sess-bg", "background": "true"},
+    )
+    assert resp.status_code == 200
+    body = resp.json()["file"]
+    assert body["status"] == "processing"
+    assert body["content_preview"] is None
+
+    status = _poll_status(client, body["id"])
+    assert status["status"] == "completed"
+    assert status["progress"] == 1.0
+
+    info = client.get(f"/api/v1/files/{body['id']}").json()
+    assert info["status"] == "completed"
+    assert "段取り替え手順" in info["content_preview"]
+
+
+def test_background_upload_reports_extraction_errors_as_failed(client: TestClient, monkeypatch):
+    def broken(self, file_path, file_type, file_id=None):
+        raise ValueError("broken file")
+
+    monkeypatch.setattr(FileService, "_plan_extraction", broken)
+    files = {"file": ("manual.txt", "段取り替え手順".encode("utf-8"), "text/plain")}
+    resp = client.post(
+        "/api/v1/files/upload",
+        files=files,
+        data={"session_id": "sess-bg-fail", "background": "true"},
+    )
+    file_id = resp.json()["file"]["id"]
+
+    status = _poll_status(client, file_id)
+    assert status["status"] == "failed"
+    assert status["error"] == "broken file"
+    info = client.get(f"/api/v1/files/{file_id}").json()
+    assert info["status"] == "failed" and info["content_preview"] is None
+
+
+def test_status_unknown_file_returns_404(client: TestClient):
+    assert client.get("/api/v1/files/nope/status").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_queue_marks_failed_jobs_and_notifies_subscribers():
+    queue = IngestionQueue(max_workers=1)
+    try:
+        updates = queue.subscribe("s-1")
+
+        def boom():
+            raise RuntimeError("broken file")
+
+        queue.submit("f-1", "s-1", boom)
+        assert await queue.wait(["f-1"], timeout=2.0) == []
+        assert queue.get_status("f-1").status == "failed"
+        assert queue.get_status("f-1").error == "broken file"
+
+        seen = []
+        while not updates.empty() or not seen or seen[-1].status == "processing":
+            seen.append(await asyncio.wait_for(updates.get(), timeout=2.0))
+        assert seen[-1].status == "failed"
+    finally:
+        queue.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_are_pruned_after_retention():
+    now = [0.0]
+    queue = IngestionQueue(max_workers=1, retention_s=60, clock=lambda: now[0])
+    try:
+        queue.submit("f-old", "s-1", lambda: None)
+        assert await queue.wait(["f-old"], timeout=2.0) == []
+        queue.submit("f-new", "s-1", lambda: None)
+        assert queue.get_status("f-old").status == "completed"  # still within retention
+        assert await queue.wait(["f-new"], timeout=2.0) == []
+
+        now[0] = 61.0
+        queue.submit("f-next", "s-1", lambda: None)
+        assert queue.get_status("f-old") is None and queue.get_status("f-new") is None
+        assert set(queue._jobs) == set(queue._futures) == {"f-next"}
+    finally:
+        queue.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_chat_context_skips_files_still_processing(monkeypatch, tmp_path):
+    queue = IngestionQueue(max_workers=1)
+    monkeypatch.setattr(chat_service_module, "get_ingestion_queue", lambda: queue)
+    release = threading.Event()
+
+    settings = get_settings().model_copy(
+        update={"ingest_chat_wait_seconds": 0.05, "upload_dir": str(tmp_path)}
+    )
+    monkeypatch.setattr(chat_service_module, "get_settings", lambda: settings)
+    svc = FileService()
+    svc._settings = settings
+    done = UploadedFile(
+        id="done-1", filename="done-1.txt", original_filename="done.txt",
+        file_type=".txt", file_size=3, session_id="s-ctx",
+    )
+    pending = UploadedFile(
+        id="pend-1", filename="pend-1.txt", original_filename="pend.txt",
+        file_type=".txt", file_size=3, session_id="s-ctx", status="processing",
+    )
+    svc._files[done.id] = done
+    svc._text_store.write(done.id, "ready")
+    svc._files[pending.id] = pending
+    try:
+        queue.submit(pending.id, "s-ctx", lambda: release.wait(2.0))
+        chat = ChatService(repository=InMemoryChatHistoryRepository(), file_service=svc)
+
+        context = await chat._get_file_context([done.id, pending.id])
+        assert "ready" in context
+        assert "pend.txt" not in context
+    finally:
+        release.set()
+        queue.shutdown()
+        svc._files.pop(done.id, None)
+        svc._files.pop(pending.id, None)
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.services.langgraph_service import QUERY_CATEGORIES, LangGraphService
+from app.services.llm import FakeLLMProvider
+from app.services.llm.batching import ClassificationBatcher, batch_questions, parse_labels
+from app.services.llm.context import capture_llm_failure, report_llm_failure
+
+
+class CountingLLM:
+    def __init__(self, answer=None, failure=None):
+        self.answer = answer
+        self.failure = failure
+        self.prompts = []
+
+    @property
+    def is_configured(self):
+        return True
+
+    async def generate(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        if self.failure:
+            report_llm_failure(self.failure)
+            return "現在リクエストが集中しているため回答できません。"
+        if self.answer is not None and batch_questions(prompt):
+            return self.answer
+        return "python" if "コード" in prompt else "general"
+
+
+def test_parse_labels_accepts_fenced_json_and_rejects_mismatches():
+    assert parse_labels('```json\n["Python", "general"]\n```', 2) == ["python", "general"]
+    assert parse_labels('["python"]', 2) is None
+    assert parse_labels("manufacturing", 1) is None
+    assert parse_labels('[1, 2]', 2) is None
+
+
+@pytest.mark.asyncio
+async def test_burst_is_classified_in_one_request():
+    llm = FakeLLMProvider()
+    batcher = ClassificationBatcher(llm, QUERY_CATEGORIES, max_batch=8, max_wait_s=0.01)
+    questions = ["品質の改善", "Pythonのコード", "今日の天気", "生産計画", "スクリプトの書き方"]
+    labels = await asyncio.gather(*(batcher.classify(q, f"質問: {q}") for q in questions))
+    assert labels == ["manufacturing", "python", "general", "manufacturing", "python"]
+    assert llm.calls == 1
+    assert (batcher.batches, batcher.batched, batcher.fallbacks) == (1, 5, 0)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_and_unparsable_answer_falls_back():
+    llm = CountingLLM(answer="わかりません")
+    batcher = ClassificationBatcher(llm, QUERY_CATEGORIES, max_batch=3, max_wait_s=10)
+    labels = await asyncio.wait_for(
+        asyncio.gather(*(batcher.classify(q, f"single:{q}") for q in ["a", "コード", "c"])), timeout=1
+    )
+    assert labels == ["general", "python", "general"]
+    # One combined attempt, then the individual prompts
+    assert len(llm.prompts) == 4
+    assert sorted(llm.prompts[1:]) == ["single:a", "single:c", "single:コード"]
+    assert batcher.fallbacks == 1
+
+    # Long questions and single requests use their own prompt directly
+    llm.prompts.clear()
+    batcher.max_question_chars = 5
+    assert await batcher.classify("長い質問" * 10, "single:long") == "general"
+    assert llm.prompts == ["single:long"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_classification_call():
+    llm = FakeLLMProvider()
+    svc = LangGraphService(llm_provider=llm)
+    queries = ["品質改善の進め方は？", "Pythonでコードを書きたい", "おすすめの本は？"]
+    states = await asyncio.gather(*(
+        svc._analyze_query({"user_query": q, "debug": False, "decision_trace": []}) for q in queries
+    ))
+    assert [s["query_type"] for s in states] == ["manufacturing", "python", "general"]
+    assert llm.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_provider_failure_is_not_fanned_out_to_individual_prompts():
+    llm = CountingLLM(failure="rate_limited")
+    batcher = ClassificationBatcher(llm, QUERY_CATEGORIES, max_batch=3, max_wait_s=10)
+
+    async def classify(q):
+        with capture_llm_failure() as failure:
+            text = await batcher.classify(q, f"single:{q}")
+        return text, failure.reason
+
+    results = await asyncio.wait_for(asyncio.gather(*(classify(q) for q in ["a", "b", "c"])), timeout=1)
+    assert len(llm.prompts) == 1  # the combined prompt only
+    assert all(reason == "rate_limited" and "集中" in text for text, reason in results)
+    assert batcher.fallbacks == 0
+
+
+@pytest.mark.asyncio
+async def test_separate_service_instances_share_one_batch():
+    llm = FakeLLMProvider()
+    services = [LangGraphService(llm_provider=llm) for _ in range(3)]
+    queries = ["品質改善の進め方は？", "Pythonでコードを書きたい", "おすすめの本は？"]
+    states = await asyncio.gather(*(
+        svc._analyze_query({"user_query": q, "debug": False, "decision_trace": []}) for svc, q in zip(services, queries)
+    ))
+    assert [s["query_type"] for s in states] == ["manufacturing", "python", "general"]
+    assert llm.calls == 1
@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.llm.breaker import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class OutageModel:
+    """Fake genai model that fails while `down` is set."""
+
+    def __init__(self, name, down=False):
+        self.name = name
+        self.down = down
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.down:
+            raise RuntimeError("503 service unavailable")
+        return SimpleNamespace(text=f"{self.name}: {prompt}")
+
+
+@pytest.mark.asyncio
+async def test_simulated_outage_opens_then_probes_and_recovers(gemini_provider):
+    clock = Clock()
+    breaker = CircuitBreaker(
+        "primary", window_seconds=60, min_calls=4, failure_rate=0.5,
+        open_seconds=30, probe_interval_seconds=5, clock=clock,
+    )
+    primary, fallback = OutageModel("primary", down=True), OutageModel("fallback")
+    provider = gemini_provider(primary, fallback, breaker=breaker, gemini_max_retries=3)
+
+    for i in range(4):
+        assert await provider.generate(str(i)) == f"fallback: {i}"
+    assert breaker.state == "open"
+    assert primary.calls == 4
+
+    # While open, the primary is not called at all
+    for i in range(5):
+        assert await provider.generate("x") == "fallback: x"
+    assert primary.calls == 4
+    stats = breaker.stats()
+    assert (stats.state, stats.opened, stats.rejected) == ("open", 1, 5)
+
+    # Half-open: one probe; it fails and the breaker opens again
+    clock.now += 30
+    assert breaker.state == "half_open"
+    await provider.generate("probe")
+    assert primary.calls == 5
+    assert breaker.state == "open"
+
+    # Next probe after recovery closes the breaker
+    primary.down = False
+    clock.now += 30
+    assert await provider.generate("probe") == "primary: probe"
+    assert breaker.state == "closed"
+    assert await provider.generate("ok") == "primary: ok"
+    assert breaker.stats().opened == 2
+
+
+def test_half_open_probes_are_rate_limited():
+    clock = Clock()
+    breaker = CircuitBreaker("m", min_calls=2, failure_rate=0.5, open_seconds=10, probe_interval_seconds=5, clock=clock)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # one probe in flight at a time
+    breaker.release()  # probe cancelled without an outcome
+    assert not breaker.allow()  # still within the probe interval
+    clock.now += 5
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_slow_calls_and_window_drive_the_failure_rate():
+    clock = Clock()
+    breaker = CircuitBreaker("m", window_seconds=60, min_calls=3, failure_rate=0.6, slow_call_seconds=2.0, clock=clock)
+    breaker.record(True, 0.1)
+    breaker.record(False)
+    clock.now += 61  # both calls fall out of the window
+    breaker.record(True, 3.0)  # slow
+    breaker.record(True, 0.1)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.stats().failure_rate == 0.0  # window cleared on opening
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_function_calling(gemini_provider):
+    breaker = CircuitBreaker("primary", min_calls=1, failure_rate=0.5)
+    breaker.record(False)
+    primary = OutageModel("primary")
+    provider = gemini_provider(primary, OutageModel("fallback"), breaker=breaker, gemini_max_retries=3)
+    response = await provider.generate_with_tools("q", [])
+    assert response.error == "circuit_open"
+    assert primary.calls == 0
@@ -0,0 +1,114 @@
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.llm.hedging import Hedger
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; latency drawn from `latency()`."""
+
+    def __init__(self, name, latency, fail=False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency())
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return SimpleNamespace(text=f"{self.name}: {prompt}")
+
+
+def _hedger(**kwargs):
+    options = dict(initial_delay_s=0.05, min_delay_s=0.01, max_delay_s=1.0, max_rate=1.0)
+    options.update(kwargs)
+    return Hedger(**options)
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_loser_cancelled(gemini_provider):
+    primary = FakeModel("primary", lambda: 0.5)
+    fallback = FakeModel("fallback", lambda: 0.01)
+    hedger = _hedger()
+    provider = gemini_provider(primary, fallback, hedger=hedger, llm_generate_timeout_seconds=2.0)
+
+    start = time.perf_counter()
+    assert await provider.generate("q") == "fallback: q"
+    assert time.perf_counter() - start < 0.3
+    await asyncio.sleep(0.01)
+    assert primary.cancelled == 1
+    stats = hedger.stats()
+    assert (stats.requests, stats.hedged, stats.hedge_wins) == (1, 1, 1)
+
+    # A fast primary is never hedged
+    primary.latency = lambda: 0.001
+    assert await provider.generate("q") == "primary: q"
+    assert fallback.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_rate_is_capped_and_failures_fall_back(gemini_provider):
+    primary = FakeModel("primary", lambda: 0.1)
+    fallback = FakeModel("fallback", lambda: 0.001)
+    hedger = _hedger(initial_delay_s=0.01, max_rate=0.0)
+    provider = gemini_provider(primary, fallback, hedger=hedger, llm_generate_timeout_seconds=2.0)
+
+    # The bucket starts with one token; afterwards max_rate=0 forbids hedging
+    assert await provider.generate("a") == "fallback: a"
+    assert await provider.generate("b") == "primary: b"
+    assert hedger.stats().budget_skipped == 1
+
+    # An early primary failure goes to the fallback without spending the budget
+    primary.fail, primary.latency = True, lambda: 0.0
+    assert await provider.generate("c") == "fallback: c"
+    fallback.fail = True
+    assert "回答を生成できませんでした" in await provider.generate("d")
+    stats = hedger.stats()
+    assert (stats.hedged, stats.fallbacks) == (1, 2)
+
+
+def test_delay_tracks_primary_quantile_within_bounds():
+    hedger = _hedger(initial_delay_s=2.0, min_delay_s=0.1, max_delay_s=1.0)
+    assert hedger.delay() == 1.0  # initial delay, clamped
+    for i in range(100):
+        hedger.record_primary(0.2 if i < 90 else 0.6)
+    assert hedger.delay() == pytest.approx(0.6)
+    assert hedger.stats().primary_p95_ms == pytest.approx(600.0)
+    for _ in range(256):
+        hedger.record_primary(0.01)
+    assert hedger.delay() == 0.1
+
+
+@pytest.mark.asyncio
+async def test_heavy_tailed_primary_latency_distribution(gemini_provider):
+    rng = random.Random(7)
+    # 10% of primary calls stall; the fallback is a bit slower but steady
+    primary = FakeModel("primary", lambda: 0.8 if rng.random() < 0.1 else rng.uniform(0.005, 0.02))
+    fallback = FakeModel("fallback", lambda: rng.uniform(0.02, 0.04))
+    hedger = _hedger(initial_delay_s=0.05, max_rate=0.3)
+    provider = gemini_provider(primary, fallback, hedger=hedger, llm_generate_timeout_seconds=2.0)
+
+    async def timed(i):
+        start = time.perf_counter()
+        text = await provider.generate(str(i))
+        return text, time.perf_counter() - start
+
+    results = await asyncio.gather(*(timed(i) for i in range(60)))
+    assert all(text.endswith(f": {i}") for i, (text, _) in enumerate(results))
+    stats = hedger.stats()
+    assert stats.hedged <= 1 + 0.3 * stats.requests
+    assert stats.hedge_rate <= 0.3 + 1 / stats.requests
+    # Every stalled call that could be hedged finished early
+    slow = [took for _, took in results if took > 0.5]
+    assert len(slow) == stats.budget_skipped
@@ -0,0 +1,205 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.files import UploadedFile
+from app.services.agents import manufacturing_advisor
+from app.services.agents.types import AgentInput
+from app.services.file_service import FileService
+from app.services.llm import FakeLLMProvider, llm_task
+from app.services.langgraph_service import LangGraphService
+from app.services.llm.gemini import cache_min_tokens
+from app.services.llm.prefix_cache import PrefixCache, PrefixCacheError, get_prefix_cache
+from app.services.llm.usage import collect_usage
+
+
+@pytest.fixture(autouse=True)
+def _fresh_prefix_cache():
+    get_prefix_cache().clear()
+    yield
+    get_prefix_cache().clear()
+
+
+def _inp(query: str, files: str = "ファイル 'line.csv':\n" + "設備A,停止,12分\n" * 50) -> AgentInput:
+    return AgentInput(user_query=query, file_context=files, conversation_history="ユーザー: 前の質問")
+
+
+@pytest.mark.asyncio
+async def test_file_context_prefix_is_uploaded_once_per_session():
+    llm = FakeLLMProvider()
+    with collect_usage() as usages:
+        for query in ("停止時間の多い設備は？", "改善の優先順位は？", "来月の目標は？"):
+            with llm_task("manufacturing", "s-files"):
+                out = await manufacturing_advisor.run_v2(llm, _inp(query))
+            assert out.content.startswith("[fake:")
+    assert llm.prefix_uploads == 1
+    assert all(u.cached_tokens > 0 for u in usages)
+    stats = get_prefix_cache().stats()
+    assert (stats.entries, stats.hits, stats.misses) == (1, 2, 1)
+
+    # Without files the prompt is sent whole
+    with llm_task("manufacturing", "s-files"):
+        await manufacturing_advisor.run_v2(llm, AgentInput(user_query="一般的な質問"))
+    assert llm.prefix_uploads == 1
+
+
+@pytest.mark.asyncio
+async def test_new_file_set_or_deleted_file_drops_the_session_prefix():
+    llm = FakeLLMProvider()
+    with llm_task("manufacturing", "s-change"):
+        await manufacturing_advisor.run_v2(llm, _inp("質問1"))
+        await manufacturing_advisor.run_v2(llm, _inp("質問2", files="ファイル 'other.csv':\n別の内容"))
+    assert llm.prefix_uploads == 2
+    assert get_prefix_cache().stats().entries == 1  # the old file set was replaced
+
+    svc = FileService()
+    info = UploadedFile(filename="x.csv", original_filename="x.csv", file_type="csv", file_size=1, session_id="s-change")
+    svc._files[info.id] = info
+    assert await svc.delete_file(info.id)
+    assert get_prefix_cache().stats().entries == 0
+
+
+@pytest.mark.asyncio
+async def test_prefix_expires_after_ttl_and_creation_is_single_flight():
+    now = [0.0]
+    released = []
+    cache = PrefixCache(ttl_seconds=10, clock=lambda: now[0])
+    created = 0
+
+    async def create():
+        nonlocal created
+        created += 1
+        await asyncio.sleep(0.01)
+        return f"handle-{created}"
+
+    handles = await asyncio.gather(*(cache.get_or_create("k", "s", create, released.append) for _ in range(5)))
+    assert handles == ["handle-1"] * 5 and created == 1
+
+    now[0] = 11.0
+    assert await cache.get_or_create("k", "s", create, released.append) == "handle-2"
+    assert released == ["handle-1"]
+    assert cache.invalidate_session("s") == 1 and released == ["handle-1", "handle-2"]
+
+
+@pytest.mark.asyncio
+async def test_gemini_sends_small_prefixes_inline_and_large_ones_via_cached_content(monkeypatch, gemini_provider):
+    sent = []
+
+    class Model:
+        def __init__(self, name):
+            self.cached_content = name
+
+        async def generate_content_async(self, prompt, **kwargs):
+            sent.append((self.cached_content, prompt))
+            meta = SimpleNamespace(prompt_token_count=10, candidates_token_count=2, cached_content_token_count=5000)
+            return SimpleNamespace(text="回答", usage_metadata=meta)
+
+    uploads = []
+
+    def create_cached(**kwargs):
+        uploads.append(kwargs)
+        return SimpleNamespace(name=f"cachedContents/{len(uploads)}")
+
+    monkeypatch.setattr("app.services.llm.gemini.caching.CachedContent.create", create_cached)
+    monkeypatch.setattr("app.services.llm.gemini.genai.GenerativeModel.from_cached_content", lambda c: Model(c.name))
+
+    provider = gemini_provider(Model(None), llm_prefix_cache_min_tokens=100)
+
+    assert await provider.generate_with_prefix("短い指示", "質問") == "回答"
+    assert sent[-1] == (None, "短い指示\n\n質問") and not uploads
+
+    prefix = "指示\n" + "大きなファイル" * 100
+    with collect_usage() as usages, llm_task("manufacturing", "s-gemini-cache"):
+        await provider.generate_with_prefix(prefix, "質問1")
+        await provider.generate_with_prefix(prefix, "質問2")
+    assert len(uploads) == 1 and uploads[0]["contents"] == [prefix] and uploads[0]["model"] == "gemini-test"
+    assert sent[-2:] == [("cachedContents/1", "質問1"), ("cachedContents/1", "質問2")]
+    assert [u.cached_tokens for u in usages] == [5000, 5000]
+
+
+@pytest.mark.asyncio
+async def test_cached_generate_retries_rate_limits_and_drops_only_missing_caches(monkeypatch, gemini_provider):
+    sent = []
+    errors = []
+
+    class Model:
+        def __init__(self, name):
+            self.cached_content = name
+
+        async def generate_content_async(self, prompt, **kwargs):
+            sent.append((self.cached_content, prompt))
+            if self.cached_content and errors:
+                raise errors.pop(0)
+            return SimpleNamespace(text="回答")
+
+    uploads = []
+
+    def create_cached(**kwargs):
+        uploads.append(kwargs)
+        return SimpleNamespace(name=f"cachedContents/{len(uploads)}")
+
+    monkeypatch.setattr("app.services.llm.gemini.caching.CachedContent.create", create_cached)
+    monkeypatch.setattr("app.services.llm.gemini.genai.GenerativeModel.from_cached_content", lambda c: Model(c.name))
+    monkeypatch.setattr("app.services.llm.gemini._delete_cached_content", lambda model: None)
+    provider = gemini_provider(Model(None), llm_prefix_cache_min_tokens=100, gemini_retry_backoff_seconds=0.01)
+    prefix = "指示\n" + "大きなファイル" * 100
+
+    # 429: retried on the cached model; the cache is kept and the prefix is not resent
+    errors.append(RuntimeError("429 Quota exceeded. Please retry in 0.01s."))
+    with llm_task("manufacturing", "s-cache-errors"):
+        assert await provider.generate_with_prefix(prefix, "質問1") == "回答"
+    assert sent == [("cachedContents/1", "質問1"), ("cachedContents/1", "質問1")]
+    assert get_prefix_cache().stats().entries == 1
+
+    # The remote cache is gone: drop it and send the whole prompt
+    errors.append(RuntimeError("403 CachedContent not found (or permission denied)"))
+    with llm_task("manufacturing", "s-cache-errors"):
+        assert await provider.generate_with_prefix(prefix, "質問2") == "回答"
+    assert sent[-2:] == [("cachedContents/1", "質問2"), (None, f"{prefix}\n\n質問2")]
+    assert get_prefix_cache().stats().entries == 0 and len(uploads) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_creation_is_remembered_for_the_ttl():
+    now = [0.0]
+    cache = PrefixCache(ttl_seconds=10, clock=lambda: now[0])
+    attempts = 0
+
+    async def create():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ValueError("content too small")
+        return "handle"
+
+    with pytest.raises(ValueError):
+        await cache.get_or_create("k", "s", create)
+    with pytest.raises(PrefixCacheError):
+        await cache.get_or_create("k", "s", create)
+    assert attempts == 1 and cache.stats().failed == 1
+
+    now[0] = 11.0
+    assert await cache.get_or_create("k", "s", create) == "handle"
+    assert attempts == 2 and cache.stats().failed == 0
+
+
+def test_cache_minimum_follows_the_model():
+    assert cache_min_tokens("gemini-1.5-pro", 4096) == 32768
+    assert cache_min_tokens("models/gemini-1.5-flash-002", 4096) == 32768
+    assert cache_min_tokens("gemini-2.5-flash", 4096) == 4096
+    assert cache_min_tokens("gemini-1.5-pro", 50000) == 50000
+
+
+def test_budget_keeps_the_cached_file_context_intact():
+    svc = LangGraphService(llm_provider=FakeLLMProvider())
+    svc._settings = svc._settings.model_copy(update={"llm_prompt_token_budgets": "manufacturing=1000"})
+    files = "ファイル 'manual.txt':\n" + "保全手順。" * 400
+    history = "\n".join(f"ユーザー: 質問{i}" for i in range(300))
+    fitted = svc._fit_agent_input("manufacturing", AgentInput(user_query="q", file_context=files, conversation_history=history))
+    assert fitted.file_context == files  # same prefix (and cache key) every turn
+    assert len(fitted.conversation_history) < len(history)
+
+    svc._settings = svc._settings.model_copy(update={"llm_prefix_cache": False})
+    fitted = svc._fit_agent_input("manufacturing", AgentInput(user_query="q", file_context=files, conversation_history=history))
+    assert len(fitted.file_context) < len(files)
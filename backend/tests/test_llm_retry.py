@@ -0,0 +1,95 @@
+import heapq
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services.llm.retry import RetryBudget, decorrelated_jitter, retry_after_seconds
+
+
+def test_server_retry_hints_are_parsed():
+    grpc = RuntimeError("429 Resource has been exhausted")
+    grpc.details = [SimpleNamespace(reason="RATE_LIMIT_EXCEEDED"), SimpleNamespace(retry_delay=SimpleNamespace(seconds=7, nanos=500_000_000))]
+    assert retry_after_seconds(grpc) == 7.5
+    assert retry_after_seconds(RuntimeError("429 Quota exceeded. Please retry in 12.3s.")) == 12.3
+    assert retry_after_seconds(RuntimeError("429 ... retry_delay {\n  seconds: 21\n}")) == 21.0
+
+    request = httpx.Request("POST", "http://local/chat/completions")
+    response = httpx.Response(429, headers={"Retry-After": "3"}, request=request)
+    assert retry_after_seconds(httpx.HTTPStatusError("429", request=request, response=response)) == 3.0
+    assert retry_after_seconds(RuntimeError("429 quota exceeded")) is None
+
+
+def test_retry_budget_caps_retries_to_a_fraction_of_requests():
+    now = [0.0]
+    budget = RetryBudget(ratio=0.1, min_per_second=0.5, max_tokens=10, clock=lambda: now[0])
+    for _ in range(1000):  # every request fails and wants a retry
+        budget.record_request()
+        budget.try_retry()
+    assert budget.retries <= 0.1 * 1000 + 10
+    assert budget.exhausted >= 890
+
+    now[0] += 10  # the trickle still allows a few retries when traffic stops
+    assert sum(budget.try_retry() for _ in range(10)) == 5
+    assert budget.stats().ratio == 0.1
+
+
+def _simulate(backoff, clients=200, capacity=40, window_s=1.0, attempts=4, seed=0):
+    """Requests per window when `clients` hit a server serving `capacity` per window at t=0."""
+    rng = random.Random(seed)
+    arrivals = [(0.0, i, 0, 0.0) for i in range(clients)]
+    heapq.heapify(arrivals)
+    served, load = Counter(), Counter()
+    while arrivals:
+        t, client, attempt, previous = heapq.heappop(arrivals)
+        window = int(t // window_s)
+        load[window] += 1
+        if served[window] < capacity:
+            served[window] += 1
+        elif attempt + 1 < attempts:
+            sleep = backoff(attempt, previous, rng)
+            heapq.heappush(arrivals, (t + sleep, client, attempt + 1, sleep))
+    return load, sum(served.values())
+
+
+def test_jittered_backoff_smooths_retry_load_after_a_429_burst():
+    lockstep, lockstep_ok = _simulate(lambda attempt, _prev, _rng: 2.0 * 2 ** attempt)
+    jittered, jittered_ok = _simulate(
+        lambda _attempt, prev, rng: decorrelated_jitter(prev or 2.0, 2.0, 30.0, rng.uniform)
+    )
+    # Lockstep: every rejected client comes back in the same window
+    assert max(v for w, v in lockstep.items() if w > 0) == 200 - 40
+    # Jitter: retries spread over many windows, so more of them get served
+    assert max(v for w, v in jittered.items() if w > 0) < 60
+    assert jittered_ok > lockstep_ok
+
+
+class _RateLimitedModel:
+    def __init__(self, failures, message="429 Quota exceeded. Please retry in 0.01s."):
+        self.failures, self.message, self.calls = failures, message, 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError(self.message)
+        return SimpleNamespace(text="回答")
+
+
+@pytest.mark.asyncio
+async def test_gemini_honors_retry_hint_and_retry_budget(gemini_provider):
+    model = _RateLimitedModel(failures=1)
+    budget = RetryBudget(ratio=0.1, max_tokens=1)
+    assert await gemini_provider(model, retry_budget=budget, gemini_retry_backoff_seconds=0.001).generate("質問") == "回答"
+    assert model.calls == 2 and budget.retries == 1
+
+    # Budget spent: the next 429 is returned instead of retried
+    model = _RateLimitedModel(failures=5)
+    assert "リクエストが集中" in await gemini_provider(model, retry_budget=budget).generate("質問")
+    assert model.calls == 1 and budget.exhausted == 1
+
+    # Hints beyond the max backoff are not waited for
+    model = _RateLimitedModel(failures=5, message="429 Please retry in 120s.")
+    assert "リクエストが集中" in await gemini_provider(model, retry_budget=RetryBudget(ratio=1.0)).generate("質問")
+    assert model.calls == 1
@@ -0,0 +1,153 @@
+import json
+
+import httpx
+import pytest
+
+from app.core.config import Settings
+from app.services.langgraph_service import LangGraphService
+from app.services.llm import (
+    FakeLLMProvider,
+    GeminiProvider,
+    OpenAICompatibleProvider,
+    RoutingLLMProvider,
+    build_llm_provider,
+    llm_task,
+)
+from app.services.llm.context import capture_llm_failure, report_llm_failure
+from app.services.llm.router import LatencyTracker, get_llm_latency_tracker, get_llm_provider
+
+
+class StubBackend:
+    def __init__(self, name, available=True, max_prompt_chars=None, failure=None):
+        self.name = name
+        self.is_available = available
+        self.max_prompt_chars = max_prompt_chars
+        self.failure = failure
+        self.prompts = []
+
+    @property
+    def is_configured(self):
+        return True
+
+    async def generate(self, prompt):
+        self.prompts.append(prompt)
+        if self.failure:
+            report_llm_failure(self.failure)
+            return f"{self.name}: 申し訳ございません"
+        return self.name
+
+
+@pytest.mark.asyncio
+async def test_routes_by_task_prompt_size_and_availability():
+    cloud, local = StubBackend("cloud"), StubBackend("local", max_prompt_chars=100)
+    router = RoutingLLMProvider(
+        {"cloud": cloud, "local": local}, routes={"classification": ["local", "cloud"]}, latency=LatencyTracker()
+    )
+
+    with llm_task("classification"):
+        assert await router.generate("短い分類") == "local"
+        assert await router.generate("x" * 500) == "cloud"  # too long for the local model
+    with llm_task("manufacturing"):
+        assert await router.generate("相談") == "cloud"
+
+    # Outage of the preferred backend: served by the next one
+    cloud.is_available = False
+    with llm_task("manufacturing"):
+        assert await router.generate("相談") == "local"
+    assert router.requests == {"cloud": 2, "local": 2}
+
+
+@pytest.mark.asyncio
+async def test_latency_and_cost_strategies():
+    fast, slow = StubBackend("fast"), StubBackend("slow")
+    tracker = LatencyTracker()
+    tracker.record("slow", 2.0)
+    tracker.record("fast", 0.1)
+    router = RoutingLLMProvider({"slow": slow, "fast": fast}, strategy="latency", latency=tracker)
+    assert await router.generate("q") == "fast"
+    assert router.latency_ms()["slow"] == 2000.0
+
+    router = RoutingLLMProvider({"slow": slow, "fast": fast}, strategy="cost", costs={"slow": 1.0, "fast": 0.2})
+    assert router.candidates("q") == ["fast", "slow"]
+    with pytest.raises(ValueError):
+        RoutingLLMProvider({"a": fast}, strategy="random")
+
+
+@pytest.mark.asyncio
+async def test_failure_message_fails_over_to_the_next_backend():
+    limited, local = StubBackend("cloud", failure="rate_limited"), StubBackend("local")
+    router = RoutingLLMProvider({"cloud": limited, "local": local}, latency=LatencyTracker())
+    assert await router.generate("相談") == "local"
+    assert router.requests == {"cloud": 1, "local": 1}
+    assert list(router.latency_ms()) == ["local"]  # failures are not latency samples
+
+    # Every candidate failed: the last message is returned and the failure is passed on
+    local.failure = "timeout"
+    with capture_llm_failure() as failure:
+        assert await router.generate("相談") == "local: 申し訳ございません"
+    assert failure.reason == "timeout"
+
+
+def test_latency_is_shared_by_routers_across_requests():
+    first = RoutingLLMProvider({"fast": StubBackend("fast")}, strategy="latency")
+    second = RoutingLLMProvider({"fast": StubBackend("fast")}, strategy="latency")
+    get_llm_latency_tracker().record("fast", 0.05)
+    assert first.latency_ms()["fast"] == second.latency_ms()["fast"]
+
+    assert get_llm_provider() is get_llm_provider()
+    assert LangGraphService()._llm is LangGraphService()._llm
+
+
+@pytest.mark.asyncio
+async def test_openai_compatible_backend_talks_chat_completions():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["url"] = str(request.url)
+        seen["body"] = json.loads(request.content)
+        assert request.headers["authorization"] == "Bearer secret"
+        if seen["body"]["messages"][0]["content"] == "boom":
+            return httpx.Response(500, json={"error": "down"})
+        return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": " ローカル応答 "}}]})
+
+    settings = Settings(
+        local_llm_base_url="http://llm.local/v1/", local_llm_model="qwen2.5-7b", local_llm_api_key="secret",
+        llm_circuit_breaker=False,
+    )
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    provider = OpenAICompatibleProvider(settings, client=lambda: client)
+    try:
+        assert await provider.generate("こんにちは") == "ローカル応答"
+        assert seen["url"] == "http://llm.local/v1/chat/completions"
+        assert seen["body"]["model"] == "qwen2.5-7b"
+        with capture_llm_failure() as failure:
+            assert "回答を生成できませんでした" in await provider.generate("boom")
+        assert failure.reason == "error"
+    finally:
+        await client.aclose()
+    assert not OpenAICompatibleProvider(Settings(local_llm_base_url="", llm_circuit_breaker=False)).is_configured
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_is_deterministic_end_to_end():
+    fake = FakeLLMProvider()
+    assert await fake.generate("同じ") == await fake.generate("同じ")
+    assert await fake.generate("同じ") != await fake.generate("違う")
+
+    svc = LangGraphService(llm_provider=RoutingLLMProvider({"fake": fake}))
+    result = await svc.process_query("品質改善の進め方は？", debug=True)
+    assert "[fake:" in result
+    trace = svc.get_last_debug_info()["decision_trace"]
+    assert any(e.get("name") == "manufacturing_advisor" for e in trace)
+
+
+def test_build_llm_provider_from_settings():
+    assert isinstance(build_llm_provider(Settings(llm_backends="gemini", llm_routes="")), GeminiProvider)
+    assert isinstance(build_llm_provider(Settings(llm_backends="fake")), FakeLLMProvider)
+    router = build_llm_provider(Settings(
+        llm_backends="gemini,local,fake", llm_routes="classification=local:fake,general=fake",
+        local_llm_base_url="http://localhost:8080/v1",
+    ))
+    assert isinstance(router, RoutingLLMProvider)
+    assert list(router.backends) == ["gemini", "local", "fake"]
+    assert router.candidates("q", task="classification")[:2] == ["local", "fake"]
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.langgraph_service import LangGraphService
+from app.services.llm import FakeLLMProvider
+from app.services.llm.context import current_llm_task
+from app.services.llm.speculation import SpeculationTracker, predict_category
+from app.services.llm.usage import collect_usage
+
+
+def _service(llm, **tracker):
+    svc = LangGraphService(llm_provider=llm)
+    svc._speculation = SpeculationTracker(enabled=True, **tracker)
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_matching_speculation_reuses_the_answer_and_saves_a_round_trip():
+    query = "品質改善の進め方は？"
+    plain = LangGraphService(llm_provider=FakeLLMProvider(latency_s=0.1))
+    started = time.perf_counter()
+    expected = await plain.process_query(query)
+    sequential_s = time.perf_counter() - started
+
+    svc = _service(FakeLLMProvider(latency_s=0.1))
+    started = time.perf_counter()
+    with collect_usage() as usages:
+        assert await svc.process_query(query) == expected
+    speculative_s = time.perf_counter() - started
+
+    assert sorted(u.task for u in usages) == ["classification", "manufacturing"]  # no second agent call
+    assert speculative_s < sequential_s - 0.05
+    stats = svc._speculation.stats()
+    assert (stats.started, stats.hits, stats.misses) == (1, 1, 0)
+    assert stats.saved_ms_total >= 50
+
+
+@pytest.mark.asyncio
+async def test_mismatched_speculation_is_cancelled_and_the_right_agent_answers():
+    cancelled = []
+
+    class StubLLM:
+        is_configured = True
+
+        async def generate(self, prompt: str) -> str:
+            task = current_llm_task()
+            if task == "classification":
+                await asyncio.sleep(0.02)
+                return "python"
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                cancelled.append(task)
+                raise
+            return f"{task}の回答"
+
+    svc = _service(StubLLM())
+    assert predict_category("品質改善のスクリプト") == "manufacturing"
+    assert await svc.process_query("品質改善のスクリプト") == "pythonの回答"
+    assert cancelled == ["manufacturing"]
+    stats = svc._speculation.stats()
+    assert (stats.hits, stats.misses, stats.saved_ms_total) == (0, 1, 0.0)
+
+
+def test_low_hit_rate_pauses_speculation_until_cooldown():
+    now = [0.0]
+    tracker = SpeculationTracker(enabled=True, min_hit_rate=0.5, window=4, min_samples=4, cooldown_s=60, clock=lambda: now[0])
+    for hit in (True, False, False, False):
+        assert tracker.allow()
+        tracker.record(hit, 0.1)
+    assert not tracker.allow() and tracker.stats().paused
+    assert tracker.stats().skipped == 1
+
+    now[0] = 61.0
+    assert tracker.allow()  # resumes with a fresh window
+    stats = tracker.stats()
+    assert not stats.paused and stats.recent_hit_rate is None and stats.hit_rate == 0.25
+    assert not SpeculationTracker(enabled=False).allow()
+
+
+def test_speculation_metrics_exported(client):
+    body = client.get("/api/v1/llm/metrics").json()
+    assert {"enabled", "hits", "misses", "hit_rate", "saved_ms_total"} <= set(body["speculation"])
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import Settings
+from app.services.agents import manufacturing_advisor
+from app.services.agents.prompting import template_tokens
+from app.services.agents.types import AgentInput
+from app.services.langgraph_service import LangGraphService
+from app.services.llm import FakeLLMProvider, llm_task
+from app.services.llm.usage import collect_usage, estimate_tokens, get_usage_tracker, trim_to_tokens
+
+
+def test_estimate_and_trim_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("品質改善") == 4
+    assert estimate_tokens("OEE 85%の改善") == 2 + 3
+
+    text = "".join(f"行{i}の記録。" for i in range(200))
+    head = trim_to_tokens(text, 50)
+    tail = trim_to_tokens(text, 50, keep="tail")
+    assert estimate_tokens(head) <= 50 and head.startswith("行0の記録") and head.endswith("（省略）")
+    assert estimate_tokens(tail) <= 50 and tail.endswith("行199の記録。")
+    assert trim_to_tokens("短い", 50) == "短い"
+
+
+@pytest.mark.asyncio
+async def test_gemini_reported_token_counts_are_recorded(gemini_provider):
+    class Model:
+        async def generate_content_async(self, prompt, **kwargs):
+            meta = SimpleNamespace(prompt_token_count=12, candidates_token_count=3)
+            return SimpleNamespace(text="回答", usage_metadata=meta)
+
+    provider = gemini_provider(Model())
+    with collect_usage() as usages, llm_task("python", "s-gemini"):
+        assert await provider.generate("質問") == "回答"
+    assert [(u.provider, u.model, u.task, u.session_id) for u in usages] == [("gemini", "gemini-test", "python", "s-gemini")]
+    assert (usages[0].prompt_tokens, usages[0].output_tokens, usages[0].estimated) == (12, 3, False)
+    assert get_usage_tracker().session("s-gemini").prompt_tokens == 12
+
+
+@pytest.mark.asyncio
+async def test_agent_prompts_are_trimmed_to_budget_and_totals_exported(client):
+    svc = LangGraphService(llm_provider=FakeLLMProvider())
+    svc._settings = svc._settings.model_copy(update={"llm_prompt_token_budgets": "manufacturing=1000"})
+    history = "\n".join(f"ユーザー: 質問{i}\nアシスタント: 回答{i}" for i in range(500))
+
+    with collect_usage() as usages:
+        await svc.process_query("品質改善の進め方は？", context=history, thread_id="s-budget")
+    by_task = {u.task: u for u in usages}
+    assert set(by_task) == {"classification", "manufacturing"}
+    assert by_task["manufacturing"].session_id == "s-budget"
+    assert by_task["manufacturing"].prompt_tokens <= 1000
+    assert estimate_tokens(history) > 5000
+
+    # Newest history is kept
+    trimmed = svc._fit_agent_input("manufacturing", AgentInput(user_query="q", conversation_history=history))
+    assert trimmed.conversation_history.endswith("回答499")
+    # The fixed text is measured from the registered template, not a constant
+    role_and_guidelines = manufacturing_advisor._ROLE + manufacturing_advisor._GUIDELINES
+    assert template_tokens("manufacturing") > estimate_tokens(role_and_guidelines)
+
+    usage = client.get("/api/v1/llm/usage/s-budget").json()
+    assert usage["requests"] == 2
+    agents = {a["key"]: a for a in client.get("/api/v1/llm/metrics").json()["usage"]["agents"]}
+    assert agents["manufacturing"]["prompt_tokens_avg"] > 0
+    assert client.get("/api/v1/llm/usage/unknown").status_code == 404
+
+
+def test_prompt_budgets_are_opt_in():
+    settings = Settings()
+    assert settings.get_llm_prompt_token_budgets() == {} and settings.llm_prompt_token_budget_default == 0
+    svc = LangGraphService(llm_provider=FakeLLMProvider())
+    svc._settings = settings
+    manual = "設備保全マニュアル。" * 20000  # an attached manual far beyond any fixed budget
+    inp = AgentInput(user_query="q", file_context=manual)
+    assert svc._fit_agent_input("manufacturing", inp).file_context == manual
@@ -0,0 +1,115 @@
+import subprocess
+import sys
+import textwrap
+from importlib.metadata import EntryPoint
+
+import pytest
+
+import app.core.plugins as plugins
+import app.services.tools.registry as reg
+from app.core.plugins import LazyPluginRegistry, PluginSpec
+from app.services.tools.executors import ToolExecutorRegistry
+
+
+def test_importing_the_workflow_does_not_import_tool_or_agent_modules():
+    code = (
+        "import sys, app.services.langgraph_service\n"
+        "heavy = ['app.services.tools.sql', 'app.services.tools.web', 'app.services.search',\n"
+        "         'app.services.agents.general_responder']\n"
+        "print([m for m in heavy if m in sys.modules])\n"
+    )
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+@pytest.fixture
+def plugin_module(tmp_path, monkeypatch):
+    (tmp_path / "plant_plugin.py").write_text(textwrap.dedent("""
+        from app.core.plugins import PluginSpec
+
+        ECHO = PluginSpec(name="echo", target="plant_plugin_impl:run", timeout_s=0.1, max_concurrency=3)
+    """))
+    (tmp_path / "plant_plugin_impl.py").write_text(textwrap.dedent("""
+        import time
+
+        def run(arg: str) -> str:
+            if arg == "slow":
+                time.sleep(0.5)
+            return f"echo:{arg}"
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    eps = [EntryPoint(name="echo", value="plant_plugin:ECHO", group="aiconsal.tools")]
+    monkeypatch.setattr(plugins, "entry_points", lambda group: eps if group == "aiconsal.tools" else [])
+    yield
+    for name in ("plant_plugin", "plant_plugin_impl"):
+        sys.modules.pop(name, None)
+
+
+def test_entry_point_plugins_are_discovered_and_loaded_lazily(plugin_module):
+    registry = LazyPluginRegistry("aiconsal.tools", {})
+    assert "echo" in registry
+    assert "plant_plugin" not in sys.modules  # discovery does not import the entry point
+    assert registry.spec("echo").max_concurrency == 3
+    assert "plant_plugin" in sys.modules
+    assert "plant_plugin_impl" not in sys.modules
+
+    assert registry["echo"]("x") == "echo:x"
+    assert registry["echo"] is registry["echo"]  # cached
+    assert "plant_plugin_impl" in sys.modules
+
+
+@pytest.mark.asyncio
+async def test_plugin_metadata_bounds_timeout_and_sizes_pool(plugin_module, monkeypatch):
+    pools = ToolExecutorRegistry({}, default_workers=1, default_queue=2)
+    monkeypatch.setattr(reg, "get_tool_executors", lambda: pools)
+    monkeypatch.setattr(reg, "TOOL_RUNNERS", LazyPluginRegistry("aiconsal.tools", {}))
+    try:
+        ok = await reg.async_execute_tool("echo", "hi")
+        assert ok.output == "echo:hi"
+        assert pools.get("echo").max_workers == 3
+
+        slow = await reg.async_execute_tool("echo", "slow", timeout_s=5.0)
+        assert slow.error == "timeout after 0.1s"
+    finally:
+        pools.shutdown()
+
+
+def test_broken_plugin_is_reported_as_unsupported():
+    registry = LazyPluginRegistry("aiconsal.tools", {"gone": PluginSpec(name="gone", target="no_such_module:run")})
+    assert registry.get("gone") is None
+
+
+def test_broken_entry_point_fails_on_lookup_not_discovery(monkeypatch):
+    eps = [EntryPoint(name="gone", value="no_such_plugin_module:SPEC", group="aiconsal.tools")]
+    monkeypatch.setattr(plugins, "entry_points", lambda group: eps)
+    registry = LazyPluginRegistry("aiconsal.tools", {})
+    assert list(registry) == ["gone"]
+    assert registry.spec("gone") is None
+    assert registry.get("gone") is None
+
+
+@pytest.mark.asyncio
+async def test_agent_plugin_timeout_bounds_the_agent_call(monkeypatch):
+    import asyncio
+
+    import app.services.langgraph_service as lgs
+    from app.core.deadline import remaining_time
+    from app.services.agents.types import AgentOutput
+
+    specs = {"maintenance": PluginSpec(name="maintenance", target="x:y", timeout_s=0.1)}
+    monkeypatch.setattr(lgs, "get_agent_spec", specs.get)
+    seen = []
+
+    async def agent(llm, inp):
+        seen.append(remaining_time())
+        await asyncio.sleep(0.05 if inp.user_query == "fast" else 1.0)
+        return AgentOutput(content="ok")
+
+    svc = lgs.LangGraphService()
+    state = lgs.WorkflowState(user_query="fast", conversation_history="", file_context="", thread_id="t-1")
+    assert (await svc._invoke_agent("maintenance", state, agent)).content == "ok"
+    assert seen[0] is not None and seen[0] <= 0.1  # LLM calls inside clamp to the plugin bound
+
+    state["user_query"] = "slow"
+    with pytest.raises(asyncio.TimeoutError):
+        await svc._invoke_agent("maintenance", state, agent)
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.deadline import DeadlineExceeded, clamp_timeout, remaining_time, request_deadline
+from app.services.langgraph_service import LangGraphService
+from app.services.llm.prefix_cache import get_prefix_cache
+from app.services.tools.registry import TOOL_RUNNERS, async_execute_tool
+
+
+class _Model:
+    def __init__(self, error=None, latency_s=0.0):
+        self.error, self.latency_s, self.calls = error, latency_s, 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        if self.error:
+            raise self.error
+        return type("R", (), {"text": "回答"})()
+
+
+def test_nested_deadlines_only_shorten():
+    assert remaining_time() is None and clamp_timeout(30) == 30
+    with request_deadline(10):
+        with request_deadline(60):
+            assert remaining_time() <= 10
+        with request_deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                clamp_timeout(30)
+    assert remaining_time() is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_retry_is_not_started_when_backoff_outlives_the_deadline(gemini_provider):
+    model = _Model(error=RuntimeError("429 quota exceeded"))
+    provider = gemini_provider(model, gemini_max_retries=3, gemini_retry_backoff_seconds=1.0)
+    started = time.perf_counter()
+    with request_deadline(0.5):
+        text = await provider.generate("質問")
+    assert model.calls == 1
+    assert time.perf_counter() - started < 0.3
+    assert "リクエストが集中" in text
+
+
+@pytest.mark.asyncio
+async def test_attempt_timeout_is_clamped_and_fallback_skipped_after_deadline(gemini_provider):
+    primary, fallback = _Model(latency_s=5.0), _Model()
+    provider = gemini_provider(primary, fallback, llm_generate_timeout_seconds=30.0)
+    started = time.perf_counter()
+    with request_deadline(0.1):
+        text = await provider.generate("質問")
+    assert time.perf_counter() - started < 1.0
+    assert "時間がかかっています" in text
+    assert fallback.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_tool_is_not_started_after_the_deadline(monkeypatch):
+    calls = []
+    monkeypatch.setitem(TOOL_RUNNERS, "deadline_probe", lambda arg: calls.append(arg) or "ok")
+    with request_deadline(0):
+        result = await async_execute_tool("deadline_probe", "x")
+    assert result.error == "deadline_exceeded" and calls == []
+
+
+@pytest.mark.asyncio
+async def test_workflow_deadline_reaches_llm_calls():
+    seen = []
+
+    class StubLLM:
+        is_configured = True
+
+        async def generate(self, prompt: str) -> str:
+            seen.append(remaining_time())
+            return "general"
+
+    svc = LangGraphService(llm_provider=StubLLM())
+    svc._settings = svc._settings.model_copy(update={"workflow_invoke_timeout_seconds": 5.0})
+    await svc.process_query("こんにちは")
+    assert seen and all(r is not None and 0 < r <= 5.0 for r in seen)
+
+
+@pytest.mark.asyncio
+async def test_streamed_workflow_is_bounded_by_the_deadline():
+    seen = []
+
+    class SlowLLM:
+        is_configured = True
+
+        async def generate(self, prompt: str) -> str:
+            seen.append(remaining_time())
+            await asyncio.sleep(5)
+            return "general"
+
+    svc = LangGraphService(llm_provider=SlowLLM())
+    svc._settings = svc._settings.model_copy(update={"workflow_invoke_timeout_seconds": 0.3})
+    started = time.perf_counter()
+    events = [ev async for ev in svc.stream_events("こんにちは", thread_id="s-stream")]
+    assert time.perf_counter() - started < 1.5
+    assert events and seen and all(r is not None and 0 < r <= 0.3 for r in seen)
+    assert remaining_time() is None  # the deadline does not leak into the consumer
+
+
+@pytest.mark.asyncio
+async def test_cached_content_upload_is_clamped_to_the_deadline(monkeypatch, gemini_provider):
+    monkeypatch.setattr("app.services.llm.gemini.caching.CachedContent.create", lambda **kwargs: time.sleep(1.0))
+    provider = gemini_provider(_Model(), llm_prefix_cache_min_tokens=10)
+    get_prefix_cache().clear()
+    started = time.perf_counter()
+    with request_deadline(0.2):
+        text = await provider.generate_with_prefix("ファイル文脈" * 100, "質問")
+    assert time.perf_counter() - started < 0.6
+    assert "時間がかかっています" in text
+    assert get_prefix_cache().stats().failed == 0  # a slow upload is retried next turn
+    get_prefix_cache().clear()
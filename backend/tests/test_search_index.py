@@ -0,0 +1,93 @@
+import os
+import sqlite3
+
+import pytest
+
+import app.services.tools.web as web_tool
+from app.core.config import get_settings
+from app.services.search.index import SearchIndex, build_match_expression
+from app.services.search.tokenizer import tokenize
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_tokenize_uses_cjk_bigrams_and_words():
+    assert tokenize("段取り替え") == ["段取", "取り", "り替", "替え"]
+    assert tokenize("ＴＯＲＱＵＥ 設定値 5Nm") == ["torque", "設定", "定値", "5nm"]
+    assert build_match_expression("設備 点検") == '"設備" AND "点検"'
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "corpus"
+    _write(root / "sop" / "changeover.md", "# 段取り替え手順\n金型交換の前に治具を清掃し、段取り替え時間を記録する。")
+    _write(root / "sop" / "inspection.txt", "設備点検表\n毎朝、主軸の温度と潤滑油の量を確認する。")
+    _write(root / "wiki" / "stops.html",
+           "<html><head><title>チョコ停対策</title></head><body><p>センサー誤検知によるチョコ停の対策。</p></body></html>")
+    return root
+
+
+def test_search_ranks_and_snippets(corpus, tmp_path):
+    index = SearchIndex(str(tmp_path / "index.sqlite"))
+    stats = index.update_from_directory(str(corpus))
+    assert stats.added == 3 and not stats.failed
+
+    hits = index.search("段取り替え")
+    assert hits[0].path.endswith("changeover.md")
+    assert hits[0].title == "段取り替え手順"
+    assert "**段取り替え**" in hits[0].snippet
+
+    html_hits = index.search("チョコ停")
+    assert html_hits[0].path.endswith("stops.html")
+    assert index.search("存在しない語句ですね") == []
+
+
+def test_incremental_update(corpus, tmp_path):
+    index = SearchIndex(str(tmp_path / "index.sqlite"))
+    index.update_from_directory(str(corpus))
+
+    stats = index.update_from_directory(str(corpus))
+    assert (stats.added, stats.updated, stats.removed, stats.unchanged) == (0, 0, 0, 3)
+
+    changed = corpus / "sop" / "inspection.txt"
+    _write(changed, "設備点検表\n油圧ユニットの圧力を確認する。")
+    os.utime(changed, ns=(1, 1))
+    (corpus / "wiki" / "stops.html").unlink()
+    stats = index.update_from_directory(str(corpus))
+    assert (stats.updated, stats.removed) == (1, 1)
+    assert index.search("油圧")[0].path.endswith("inspection.txt")
+    assert index.search("チョコ停") == []
+    assert index.count() == 2
+
+
+def test_web_tool_uses_local_index(corpus, tmp_path, monkeypatch):
+    index = SearchIndex(str(tmp_path / "index.sqlite"))
+    index.update_from_directory(str(corpus))
+    monkeypatch.setattr(web_tool, "get_search_index", lambda: index)
+
+    result = web_tool.run("温度")
+    out = result.output
+    assert "社内文書 1件" in out
+    assert "inspection.txt" in out
+    assert result.data["hits"][0]["path"].endswith("inspection.txt")
+
+
+def test_index_built_after_startup_is_picked_up(corpus, tmp_path, monkeypatch):
+    import app.services.search.index as index_module
+
+    path = tmp_path / "later" / "index.sqlite"
+    settings = get_settings().model_copy(update={"search_index_path": str(path)})
+    monkeypatch.setattr(index_module, "get_settings", lambda: settings)
+    monkeypatch.setattr(index_module, "_index", None)
+
+    assert index_module.get_search_index() is None  # not built yet; not remembered
+    SearchIndex(str(path)).update_from_directory(str(corpus))
+
+    index = index_module.get_search_index()
+    assert index is not None and index.read_only and index is index_module.get_search_index()
+    assert index.search("温度")[0].path.endswith("inspection.txt")
+    with pytest.raises(sqlite3.OperationalError):
+        index.add_document("/x.txt", "書き込み不可")
@@ -0,0 +1,129 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import Settings
+from app.main import app
+from app.services.extractors.spreadsheet import (
+    ingest_spreadsheet,
+    read_table_rows,
+    render_table_summary,
+)
+from app.services.file_service import FileService
+
+
+def _write_csv(path, rows: int) -> None:
+    lines = ["line,temp,status"]
+    for i in range(rows):
+        temp = "" if i % 10 == 0 else str(20 + i % 5)
+        status = "NG" if i % 4 == 0 else "OK"
+        lines.append(f"L{i % 3},{temp},{status}")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def test_ingest_csv_streams_chunks_and_computes_stats(tmp_path):
+    csv_path = tmp_path / "log.csv"
+    _write_csv(csv_path, 250)
+
+    summary, cache_path = ingest_spreadsheet(
+        str(csv_path), ".csv", cache_base_path=str(tmp_path / "cache"), chunk_rows=40, top_k=2
+    )
+
+    assert summary.row_count == 250
+    assert summary.column_count == 3
+    cols = {c.name: c for c in summary.columns}
+    assert cols["temp"].dtype == "numeric"
+    assert cols["temp"].nulls == 25
+    assert cols["temp"].min == 20.0 and cols["temp"].max == 24.0
+    assert cols["temp"].top_values[0].value in {"20", "21", "22", "23", "24"}
+    assert cols["status"].dtype == "text"
+    assert cols["status"].top_values[0].value == "OK"
+    assert cols["status"].top_values[0].count == 187
+    assert len(summary.sample_rows) == 5
+    assert cache_path is not None
+
+    text = render_table_summary(summary)
+    assert "行数: 250" in text
+    assert "temp (numeric)" in text
+
+
+def test_read_table_rows_returns_exact_window_across_chunks(tmp_path):
+    csv_path = tmp_path / "log.csv"
+    _write_csv(csv_path, 250)
+    _, cache_path = ingest_spreadsheet(
+        str(csv_path), ".csv", cache_base_path=str(tmp_path / "cache"), chunk_rows=40
+    )
+
+    columns, rows, total = read_table_rows(cache_path, offset=38, limit=5)
+    assert columns == ["line", "temp", "status"]
+    assert total == 250
+    assert len(rows) == 5
+    assert rows[0][0] == "L2"  # row 38 -> 38 % 3 == 2
+    assert rows[2][1] is None  # row 40 has an empty temp
+
+
+def test_mixed_column_keeps_non_numeric_values(tmp_path):
+    csv_path = tmp_path / "mixed.csv"
+    csv_path.write_text("id,reading\n1,1\n2,2\n3,N/A", encoding="utf-8")
+
+    summary, cache_path = ingest_spreadsheet(str(csv_path), ".csv", cache_base_path=str(tmp_path / "cache"))
+
+    assert {c.name: c.dtype for c in summary.columns} == {"id": "numeric", "reading": "text"}
+    _, rows, _ = read_table_rows(cache_path, offset=0, limit=3)
+    assert [r[1] for r in rows] == ["1", "2", "N/A"]
+
+
+def test_numeric_column_falls_back_to_text_when_a_later_chunk_fails_to_parse(tmp_path):
+    csv_path = tmp_path / "late.csv"
+    csv_path.write_text("reading\n" + "\n".join(["10"] * 50 + ["N/A"]), encoding="utf-8")
+
+    summary, cache_path = ingest_spreadsheet(
+        str(csv_path), ".csv", cache_base_path=str(tmp_path / "cache"), chunk_rows=20
+    )
+
+    col = summary.columns[0]
+    assert col.dtype == "text" and col.nulls == 0 and col.non_null == 51
+    _, rows, total = read_table_rows(cache_path, offset=49, limit=5)
+    assert total == 51
+    assert rows == [["10"], ["N/A"]]
+
+
+def test_ingest_cp932_csv(tmp_path):
+    csv_path = tmp_path / "jp.csv"
+    csv_path.write_bytes("名前,部署\n田中,製造\n佐藤,品質".encode("cp932"))
+    summary, _ = ingest_spreadsheet(str(csv_path), ".csv")
+    assert summary.row_count == 2
+    assert "田中" in render_table_summary(summary)
+
+
+def test_upload_csv_exposes_summary_and_rows_endpoint(client: TestClient, tmp_path):
+    svc = FileService()
+    svc._settings = Settings(upload_dir=str(tmp_path))
+    app.dependency_overrides[FileService] = lambda: svc
+    try:
+        content = "名前,年齢\n田中,30\n佐藤,25\n鈴木,41".encode("utf-8")
+        resp = client.post(
+            "/api/v1/files/upload",
+            files={"file": ("staff.csv", content, "text/csv")},
+            data={"session_id": "sess-csv"},
+        )
+        assert resp.status_code == 200
+        body = resp.json()["file"]
+        assert body["table_summary"]["row_count"] == 3
+        assert "田中" in body["content_preview"]
+        file_id = body["id"]
+
+        rows = client.get(f"/api/v1/files/{file_id}/rows", params={"offset": 1, "limit": 2})
+        assert rows.status_code == 200
+        data = rows.json()
+        assert data["total_rows"] == 3
+        assert data["rows"] == [["佐藤", 25.0], ["鈴木", 41.0]]
+
+        assert client.delete(f"/api/v1/files/{file_id}").status_code == 200
+        assert not list((tmp_path / "tables").iterdir())
+    finally:
+        app.dependency_overrides.pop(FileService, None)
+
+
+def test_rows_endpoint_404_for_unknown_file(client: TestClient):
+    resp = client.get("/api/v1/files/missing/rows")
+    assert resp.status_code == 404
@@ -0,0 +1,256 @@
+import sqlite3
+import time
+
+import pytest
+
+import app.services.tools.registry as reg
+import app.services.tools.sql as sql_tool
+from app.services.tools.sql_pool import SQLPoolManager
+
+
+def _open_pools(tmp_path, monkeypatch, journal_mode: str) -> SQLPoolManager:
+    db_path = tmp_path / "plant.sqlite"
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    conn.execute("CREATE TABLE downtime (line TEXT, minutes INTEGER, cause TEXT)")
+    conn.executemany(
+        "INSERT INTO downtime VALUES (?, ?, ?)",
+        [("A", 30, "段取り替え"), ("A", 12, "チョコ停"), ("B", 45, "設備故障")]
+        + [("C", i, "その他") for i in range(300)],
+    )
+    conn.commit()
+    conn.close()
+
+    manager = SQLPoolManager({"plant": str(db_path)}, pool_size=2)
+    monkeypatch.setattr(sql_tool, "get_sql_pool_manager", lambda: manager)
+    return manager
+
+
+def _close_pools(manager: SQLPoolManager) -> None:
+    sql_tool.get_sql_result_registry().close_all()
+    sql_tool.get_sql_result_cache().clear()
+    manager.close()
+
+
+@pytest.fixture
+def sql_pools(tmp_path, monkeypatch):
+    # WAL: readers do not block writers, so paged results keep their cursor open
+    manager = _open_pools(tmp_path, monkeypatch, "wal")
+    yield manager
+    _close_pools(manager)
+
+
+@pytest.fixture
+def rollback_journal_pools(tmp_path, monkeypatch):
+    manager = _open_pools(tmp_path, monkeypatch, "delete")
+    yield manager
+    _close_pools(manager)
+
+
+def test_select_with_params_renders_table(sql_pools):
+    out = sql_tool.run(
+        '{"query": "SELECT line, SUM(minutes) AS total FROM downtime WHERE line = ? GROUP BY line",'
+        ' "params": ["A"]}'
+    ).output
+    assert "| line | total |" in out
+    assert "| A | 42 |" in out
+
+    named = sql_tool.execute_query(
+        "SELECT cause FROM downtime WHERE line = :line", params={"line": "B"}
+    )
+    assert named.rows == [["設備故障"]]
+
+
+def test_row_limit_is_applied(sql_pools):
+    result = sql_tool.execute_query("SELECT * FROM downtime", max_rows=10)
+    assert len(result.rows) == 10
+    assert result.truncated is True
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "DELETE FROM downtime",
+        "SELECT 1; DROP TABLE downtime",
+        "WITH x AS (SELECT 1) INSERT INTO downtime VALUES ('Z', 1, 'x')",
+        "PRAGMA table_info(downtime)",
+    ],
+)
+def test_non_select_statements_are_rejected(sql_pools, query):
+    with pytest.raises(sql_tool.SQLToolError):
+        sql_tool.execute_query(query)
+
+
+def test_keywords_inside_literals_are_allowed(sql_pools):
+    result = sql_tool.execute_query("SELECT 'delete; drop' AS note")
+    assert result.rows == [["delete; drop"]]
+
+
+def test_columns_named_like_keywords_are_allowed(sql_pools):
+    result = sql_tool.execute_query(
+        "WITH machines(name, load) AS (VALUES ('M1', 0.8), ('M2', 0.5)) SELECT load FROM machines ORDER BY load"
+    )
+    assert result.rows == [[0.5], [0.8]]
+
+
+def test_connections_are_read_only_at_engine_level(sql_pools):
+    pool = sql_pools.get()
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.DatabaseError):
+            conn.execute("DELETE FROM downtime")
+
+
+_ENDLESS = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+
+
+def test_engine_timeout_interrupts_query(sql_pools):
+    start = time.monotonic()
+    with pytest.raises(sql_tool.SQLToolError, match="中断"):
+        sql_tool.execute_query(_ENDLESS, timeout_s=0.2)
+    assert time.monotonic() - start < 2.0
+
+
+@pytest.mark.asyncio
+async def test_async_timeout_cancels_worker_and_releases_connection(sql_pools):
+    pool = sql_pools.get()
+    tr = await reg.async_execute_tool("sql", _ENDLESS, timeout_s=0.2)
+    assert tr.error and "timeout" in tr.error
+
+    # The worker stops promptly instead of running until the engine timeout
+    deadline = time.monotonic() + 1.0
+    while pool.available() < pool.size and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.available() == pool.size
+
+
+def test_pages_are_read_from_the_open_cursor(sql_pools):
+    pool = sql_pools.get()
+    first = sql_tool.open_result("SELECT line, minutes FROM downtime", page_size=100)
+    assert len(first.rows) == 100 and first.offset == 0
+    assert first.has_more and first.handle
+    # The cursor holds its connection until exhausted or expired
+    assert pool.available() == pool.size - 1
+
+    out = sql_tool.run(f"next {first.handle}").output
+    assert "101–200行目" in out
+    assert f"sql: next {first.handle}" in out
+
+    rest = sql_tool.fetch_next(first.handle)
+    assert rest.offset == 200 and len(rest.rows) == 100
+    last = sql_tool.fetch_next(first.handle)
+    assert len(last.rows) == 3 and not last.has_more and last.handle is None
+    assert pool.available() == pool.size
+
+    with pytest.raises(sql_tool.SQLToolError, match="期限切れ"):
+        sql_tool.fetch_next(first.handle)
+
+
+def test_rollback_journal_results_are_buffered_and_do_not_block_writers(rollback_journal_pools, tmp_path):
+    pool = rollback_journal_pools.get()
+    assert pool.readers_block_writers
+    first = sql_tool.open_result("SELECT line, minutes FROM downtime", page_size=100, owner="s-1")
+    assert first.has_more and first.handle
+    # The rest of the rows are buffered; the connection (and its SHARED lock) is back
+    assert pool.available() == pool.size
+
+    writer = sqlite3.connect(tmp_path / "plant.sqlite", timeout=0.1)
+    writer.execute("INSERT INTO downtime VALUES ('D', 5, '停電')")
+    writer.commit()
+    writer.close()
+
+    seen = len(first.rows)
+    page = first
+    while page.has_more:
+        page = sql_tool.fetch_next(page.handle, owner="s-1")
+        seen += len(page.rows)
+    assert seen == 303 and not page.truncated  # the snapshot taken before the insert
+
+
+def test_buffered_results_are_capped_by_bytes(rollback_journal_pools, monkeypatch):
+    settings = sql_tool.get_settings().model_copy(update={"sql_buffer_max_bytes": 500})
+    monkeypatch.setattr(sql_tool, "get_settings", lambda: settings)
+    page = sql_tool.open_result("SELECT line, minutes FROM downtime", page_size=10)
+    while page.has_more:
+        page = sql_tool.fetch_next(page.handle)
+    assert page.truncated and page.offset + len(page.rows) < 303
+
+
+def test_result_handles_belong_to_their_session(sql_pools):
+    first = sql_tool.open_result("SELECT line, minutes FROM downtime", page_size=100, owner="s-1")
+    with pytest.raises(sql_tool.SQLToolError, match="期限切れ"):
+        sql_tool.run(f"next {first.handle}", session_id="s-2")
+    with pytest.raises(sql_tool.SQLToolError):
+        sql_tool.fetch_next(first.handle)
+    assert "101–200行目" in sql_tool.run(f"next {first.handle}", session_id="s-1").output
+
+
+def test_page_byte_cap_and_handle_eviction(sql_pools, monkeypatch):
+    settings = sql_tool.get_settings().model_copy(update={"sql_page_max_bytes": 100})
+    monkeypatch.setattr(sql_tool, "get_settings", lambda: settings)
+    page = sql_tool.open_result("SELECT * FROM downtime", page_size=50)
+    assert 1 <= len(page.rows) < 50 and page.has_more
+
+    # Pool size 2 keeps at most one open handle; a new query evicts the old one
+    pool = sql_pools.get()
+    newer = sql_tool.open_result("SELECT * FROM downtime", page_size=10)
+    assert newer.has_more
+    assert pool.available() == 1
+    with pytest.raises(sql_tool.SQLToolError):
+        sql_tool.fetch_next(page.handle)
+    sql_tool.get_sql_result_registry().close(newer.handle)
+
+
+@pytest.mark.asyncio
+async def test_iter_query_pages_streams_all_rows(sql_pools):
+    seen = 0
+    async for page in sql_tool.iter_query_pages("SELECT * FROM downtime", page_size=120):
+        seen += len(page.rows)
+    assert seen == 303
+    assert sql_pools.get().available() == sql_pools.get().size
+
+
+def test_cache_hits_until_the_database_changes(sql_pools, tmp_path):
+    query = "SELECT line, SUM(minutes) AS total FROM downtime GROUP BY line ORDER BY line"
+    first = sql_tool.open_result(query)
+    assert not first.cached
+    # Whitespace/comment differences normalize to the same key
+    again = sql_tool.open_result("SELECT line, SUM(minutes) AS total  -- dashboard\n"
+                                 "FROM downtime GROUP BY line ORDER BY line;")
+    assert again.cached and again.rows == first.rows
+
+    conn = sqlite3.connect(tmp_path / "plant.sqlite")
+    conn.execute("INSERT INTO downtime VALUES ('D', 5, '停電')")
+    conn.commit()
+    conn.close()
+    fresh = sql_tool.open_result(query)
+    assert not fresh.cached
+    assert ["D", 5] in fresh.rows
+
+
+def test_cache_is_byte_bounded_lru():
+    from app.services.tools.sql_cache import SQLResultCache
+    from app.services.tools.types import SQLQueryResult
+
+    result = SQLQueryResult(database="db", columns=["x"], rows=[["y" * 100]])
+    size = len(result.model_dump_json())
+    cache = SQLResultCache(max_bytes=size * 2)
+    for name in ("a", "b"):
+        cache.put(("db", name), (1,), result)
+    cache.get(("db", "a"), (1,))  # refresh "a"
+    cache.put(("db", "c"), (1,), result)
+    assert cache.get(("db", "b"), (1,)) is None
+    assert cache.get(("db", "a"), (1,)) is not None
+    assert cache.size_bytes <= cache.max_bytes
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_is_reported_in_tool_trace(sql_pools):
+    from app.services.langgraph_service import LangGraphService
+
+    svc = LangGraphService()
+    state = {"user_query": "sql: SELECT COUNT(*) FROM downtime", "debug": True, "decision_trace": []}
+    await svc._process_tool_query(dict(state, decision_trace=[]))
+    second = await svc._process_tool_query(dict(state, decision_trace=[]))
+    invoked = [e for e in second["decision_trace"] if e["type"] == "tool_invoked"][-1]
+    assert invoked["cached"] is True
+    assert isinstance(invoked["took_ms"], int)
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import app.services.tools.registry as reg
+from app.services.tools.executors import ToolExecutor, ToolExecutorRegistry, ToolSaturatedError
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_when_workers_and_queue_are_full():
+    executor = ToolExecutor("slow", max_workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        running = asyncio.ensure_future(executor.run(release.wait, 2))
+        queued = asyncio.ensure_future(executor.run(release.wait, 2))
+        await asyncio.sleep(0.05)
+        stats = executor.stats()
+        assert (stats.active, stats.queued) == (1, 1)
+
+        with pytest.raises(ToolSaturatedError):
+            await executor.run(time.sleep, 0)
+        assert executor.stats().rejected == 1
+
+        release.set()
+        await asyncio.gather(running, queued)
+        stats = executor.stats()
+        assert (stats.active, stats.queued, stats.completed) == (0, 0, 2)
+        # The queued call waited for the running one
+        assert stats.queue_wait_ms_p95 >= 30
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_process_pool_executor_runs_picklable_runners():
+    executor = ToolExecutor("cpu", max_workers=1, max_queue=0, processes=True)
+    try:
+        assert await executor.run(pow, 2, 10) == 1024
+        assert executor.stats().kind == "process"
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_saturated_tool_does_not_block_other_tools(monkeypatch):
+    pools = ToolExecutorRegistry({"slow": (1, 0)}, default_workers=2, default_queue=2)
+    monkeypatch.setattr(reg, "get_tool_executors", lambda: pools)
+    release = threading.Event()
+    original = reg.TOOL_RUNNERS.copy()
+    try:
+        reg.TOOL_RUNNERS["slow"] = lambda arg: release.wait(2) and "slow"
+        reg.TOOL_RUNNERS["fast"] = lambda arg: f"fast:{arg}"
+
+        busy = asyncio.ensure_future(reg.async_execute_tool("slow", "1", timeout_s=3))
+        await asyncio.sleep(0.05)
+        rejected = await reg.async_execute_tool("slow", "2")
+        assert rejected.error == "tool_busy"
+        assert "混雑" in rejected.output
+
+        start = time.perf_counter()
+        fast = await reg.async_execute_tool("fast", "x")
+        assert fast.output == "fast:x"
+        assert time.perf_counter() - start < 0.5
+        # The loop's default executor is untouched as well
+        assert await asyncio.to_thread(lambda: "io") == "io"
+
+        release.set()
+        assert (await busy).output == "slow"
+        assert {s.tool for s in pools.stats()} == {"slow", "fast"}
+    finally:
+        release.set()
+        reg.TOOL_RUNNERS.clear()
+        reg.TOOL_RUNNERS.update(original)
+        pools.shutdown()
+
+
+def test_tool_pool_settings_and_metrics_endpoint(client):
+    from app.core.config import Settings
+
+    settings = Settings(tool_pools="sql=3:5, web=2", tool_pool_default_queue=7,
+                        tool_process_pool_tools="Render, ")
+    assert settings.get_tool_pools() == {"sql": (3, 5), "web": (2, 7)}
+    assert settings.get_tool_process_pool_tools() == ["render"]
+
+    resp = client.get("/api/v1/tools/metrics")
+    assert resp.status_code == 200
+    assert isinstance(resp.json()["pools"], list)
@@ -0,0 +1,83 @@
+import pytest
+
+import app.services.langgraph_service as lgs
+from app.services.tools.memo import ToolResultMemo, references, summarize
+from app.services.tools.types import ToolResult
+
+
+def _sql_result(n_rows: int = 3) -> ToolResult:
+    return ToolResult(
+        tool="sql",
+        input="SELECT line, minutes FROM downtime",
+        output="[SQL Tool] plant: ...",
+        data={"database": "plant", "columns": ["line", "minutes"],
+              "rows": [["A", i] for i in range(n_rows)], "has_more": False},
+    )
+
+
+def test_memo_keeps_recent_results_per_session_with_refs():
+    memo = ToolResultMemo(max_bytes=1_000_000, per_session=2, ttl_seconds=3600)
+    refs = [memo.put("s1", _sql_result()).ref for _ in range(3)]
+    assert refs == [1, 2, 3]
+    assert [e.ref for e in memo.recent("s1")] == [2, 3]
+    assert memo.recent("s2") == []
+    # Failed calls are not remembered
+    assert memo.put("s1", ToolResult(tool="sql", input="x", output="", error="boom")) is None
+
+    summary = summarize(memo.get("s1", 3))
+    assert summary.startswith("[#3] sql: SELECT line, minutes FROM downtime")
+    assert "plant 3行（列: line, minutes）" in summary
+    assert "| A | 0 |" in summary
+
+
+def test_memo_byte_budget_drops_least_recently_used_sessions():
+    size = len(_sql_result().model_dump_json())
+    memo = ToolResultMemo(max_bytes=size * 5, per_session=5, ttl_seconds=3600)
+    memo.put("old", _sql_result())
+    memo.put("new", _sql_result())
+    memo.recent("old")  # touch: "new" becomes least recently used
+    for _ in range(4):
+        memo.put("other", _sql_result())
+    assert memo.recent("new") == []
+    assert memo.recent("old")
+    assert memo.size_bytes <= memo.max_bytes
+
+    # Oversized results are kept without their structured payload
+    big = memo.put("old", _sql_result(n_rows=2000))
+    assert big.result.data is None and len(big.result.output) <= 2000
+
+
+def test_context_expands_referenced_results():
+    memo = ToolResultMemo(max_bytes=1_000_000, per_session=5, ttl_seconds=3600)
+    first = memo.put("s", _sql_result())
+    memo.put("s", ToolResult(tool="web", input="金型", output="[Web Search Tool] ...",
+                             data={"query": "金型", "hits": [{"title": "金型交換", "path": "/d/a.md"}]}))
+    assert references("#1 の結果と#12も比べて") == [1, 12]
+
+    context = memo.context("s", max_chars=2000)
+    assert context.index("[#2] web") < context.index("[#1] sql")
+    assert "1件: 金型交換 (/d/a.md)" in context
+    expanded = memo.context("s", max_chars=2000, expand=[first.ref])
+    assert expanded.startswith("[#1] sql")
+    assert first.result.output in expanded
+
+
+@pytest.mark.asyncio
+async def test_follow_up_turn_sees_previous_tool_result(monkeypatch):
+    memo = ToolResultMemo(max_bytes=1_000_000, per_session=5, ttl_seconds=3600)
+    monkeypatch.setattr(lgs, "get_tool_memo", lambda: memo)
+    prompts = []
+
+    class RecordingLLM:
+        is_configured = True
+
+        async def generate(self, prompt: str) -> str:
+            prompts.append(prompt)
+            return "general" if len(prompts) == 1 else "回答"
+
+    svc = lgs.LangGraphService(llm_provider=RecordingLLM())
+    first = await svc.process_query("sql: SELECT 1", thread_id="sess-memo")
+    assert "#1 でこの結果を参照できます" in first
+
+    await svc.process_query("#1 の結果を説明して", thread_id="sess-memo")
+    assert "[#1] sql: SELECT 1" in prompts[-1]
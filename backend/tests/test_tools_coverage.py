@@ -56,6 +56,14 @@ async def test_async_execute_tool_unknown_unsupported_success_and_coroutine():
         tr_async = await reg.async_execute_tool("asyncok", "A")
         assert tr_async.error is None
         assert tr_async.output == "ok:A"
+
+        # Runners that take `session_id` get the chat session; others are unaffected
+        def whoami(arg: str, session_id=None) -> str:
+            return f"{arg}@{session_id}"
+
+        reg.TOOL_RUNNERS["whoami"] = whoami  # type: ignore[assignment]
+        assert (await reg.async_execute_tool("whoami", "q", session_id="s-9")).output == "q@s-9"
+        assert (await reg.async_execute_tool("asyncok", "B", session_id="s-9")).output == "ok:B"
     finally:
         reg.TOOL_RUNNERS.clear()
         reg.TOOL_RUNNERS.update(original)
@@ -80,3 +88,129 @@ def test_detect_tool_request_prefixes_and_generic_forms():
 
     # Unknown subtool after generic prefix -> not detected
     assert detect.detect_tool_request("tool:unknown: arg") == (None, None)
+
+
+def test_detect_tool_plan_splits_lines_and_keeps_continuations():
+    plan = detect.detect_tool_plan(
+        "sql: SELECT line\nFROM downtime\nsearch: チョコ停 対策\ntool:web: 段取り"
+    )
+    assert [(c.tool, c.input) for c in plan] == [
+        ("sql", "SELECT line\nFROM downtime"),
+        ("web", "チョコ停 対策"),
+        ("web", "段取り"),
+    ]
+    # Only text that starts with a tool prefix is a plan
+    assert detect.detect_tool_plan("質問です\nsql: SELECT 1") == []
+    assert detect.detect_tool_plan("") == []
+
+
+def test_detect_tool_route_kinds_and_plugin_aliases():
+    from app.core.plugins import PluginSpec
+
+    route = detect.detect_tool_route("sql: SELECT 1\nweb: 点検")
+    assert (route.kind, route.tool, route.input, route.source) == ("tool", "sql", "SELECT 1", "prefix")
+    assert [c.tool for c in route.calls] == ["sql", "web"]
+    assert detect.detect_tool_route("tool: 何か").model_dump()["kind"] == "generic"
+    assert detect.detect_tool_route("tool: 何か").input == "何か"
+    assert detect.detect_tool_route("こんにちは").kind == "none"
+    # Unrelated "word:" prefixes are not tools
+    assert detect.detect_tool_route("note: sql: x").kind == "none"
+
+    original = reg.TOOL_RUNNERS.copy()
+    try:
+        # Many registered tools: aliases come from plugin specs, the table is rebuilt on change
+        for i in range(50):
+            reg.TOOL_RUNNERS[f"t{i}"] = lambda arg, i=i: f"{i}:{arg}"
+        reg.TOOL_RUNNERS._discovered()["dwh"] = PluginSpec(
+            name="dwh", target="x:y", aliases=("warehouse", "tool")
+        )
+        reg.TOOL_RUNNERS.version += 1
+        assert detect.detect_tool_request("t42: abc") == ("t42", "abc")
+        assert detect.detect_tool_request("Warehouse: q") == ("dwh", "q")
+        # "tool" stays reserved for the generic form
+        assert detect.detect_tool_route("tool: q").kind == "generic"
+        del reg.TOOL_RUNNERS["t42"]
+        assert detect.detect_tool_request("t42: abc") == (None, None)
+    finally:
+        reg.TOOL_RUNNERS.clear()
+        reg.TOOL_RUNNERS.update(original)
+    assert detect.detect_tool_request("t1: x") == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_async_execute_plan_runs_concurrently_under_shared_deadline():
+    import time
+
+    from app.services.tools.types import ToolCall
+
+    original = reg.TOOL_RUNNERS.copy()
+    try:
+        async def sleepy(arg: str) -> str:
+            await asyncio.sleep(float(arg))
+            return f"slept {arg}"
+
+        reg.TOOL_RUNNERS["sleepy"] = sleepy  # type: ignore[assignment]
+        calls = [ToolCall(tool="sleepy", input="0.2") for _ in range(3)]
+        start = time.perf_counter()
+        results = await reg.async_execute_plan(calls, deadline_s=2.0)
+        elapsed = time.perf_counter() - start
+        assert [tr.output for tr in results] == ["slept 0.2"] * 3
+        assert elapsed < 0.5  # ~max latency, not the sum
+
+        # The slow call hits the shared deadline; the fast one still succeeds
+        results = await reg.async_execute_plan(
+            [ToolCall(tool="sleepy", input="0.01"), ToolCall(tool="sleepy", input="5")],
+            deadline_s=0.2,
+        )
+        assert results[0].error is None
+        assert results[1].error and "timeout" in results[1].error
+    finally:
+        reg.TOOL_RUNNERS.clear()
+        reg.TOOL_RUNNERS.update(original)
+
+
+@pytest.mark.asyncio
+async def test_multi_tool_message_merges_results_and_traces_each_call():
+    from app.services.langgraph_service import LangGraphService
+
+    svc = LangGraphService()
+    state = {
+        "user_query": "sql: SELECT 1\nsearch: 設備 点検",
+        "debug": True,
+        "decision_trace": [],
+    }
+    state = await svc._analyze_query(state)
+    assert state["query_type"] == "tool"
+    assert [c["tool"] for c in state["routing"]["calls"]] == ["sql", "web"]
+
+    state = await svc._process_tool_query(state)
+    assert "[tool:sql] 実行結果" in state["response"]
+    assert "[tool:web] 実行結果" in state["response"]
+    invoked = [e for e in state["decision_trace"] if e["type"] == "tool_invoked"]
+    assert [e["name"] for e in invoked] == ["sql", "web"]
+    assert all(isinstance(e["took_ms"], int) for e in invoked)
+
+
+@pytest.mark.asyncio
+async def test_tool_route_is_detected_once_per_turn(monkeypatch):
+    from app.services.langgraph_service import LangGraphService
+    import app.services.langgraph_service as lg
+
+    calls = []
+    real = lg.detect_tool_route
+
+    def counting(text):
+        calls.append(text)
+        return real(text)
+
+    monkeypatch.setattr(lg, "detect_tool_route", counting)
+    svc = LangGraphService()
+    state = await svc._analyze_query({"user_query": "tool: 何か", "debug": False, "decision_trace": []})
+    assert state["query_type"] == "tool"
+    assert state["routing"]["kind"] == "generic"
+    assert state["tool_name"] is None and state["tool_input"] == "何か"
+
+    state = await svc._analyze_query({"user_query": "sql: SELECT 1", "debug": False, "decision_trace": []})
+    state = await svc._process_tool_query(state)
+    assert "[tool:sql] 実行結果" in state["response"]
+    assert len(calls) == 2  # one per analyzed message, none in the tool node
@@ -86,4 +86,25 @@ describe('mappers normalization utilities', () => {
     expect(info.size).toBe(0);
     expect(info.processed).toBe(false);
   });
+
+  test('normalizeFileInfo maps extraction status and preview', () => {
+    const raw = {
+      id: 'f3',
+      filename: 'f3.txt',
+      original_filename: 'manual.txt',
+      file_type: '.txt',
+      file_size: 12,
+      session_id: 's5',
+      upload_time: '2023-01-05T00:00:00Z',
+      content_preview: '段取り替え手順',
+      content_length: 21,
+      status: 'completed',
+    };
+    const info = normalizeFileInfo(raw);
+    expect(info.processed).toBe(true);
+    expect(info.extracted_text).toBe('段取り替え手順');
+
+    expect(normalizeFileInfo({ ...raw, status: 'processing', content_preview: null }).processed).toBe(false);
+    expect(normalizeFileInfo({ ...raw, status: 'failed' }).processed).toBe(false);
+  });
 });
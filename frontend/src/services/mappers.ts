@@ -76,7 +76,9 @@ export function normalizeFileInfo(raw: any): FileInfo {
     size: Number(f.file_size ?? f.size ?? 0),
     session_id: String(f.session_id ?? ''),
     uploaded_at: String(f.upload_time ?? f.uploaded_at ?? new Date().toISOString()),
-    processed: Boolean(f.content && String(f.content).length > 0),
-    extracted_text: f.content ?? f.extracted_text,
+    processed: f.status !== undefined
+      ? f.status === 'completed'
+      : Boolean(f.content && String(f.content).length > 0),
+    extracted_text: f.content_preview ?? f.content ?? f.extracted_text,
   };
 }
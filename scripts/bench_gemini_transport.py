@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Gemini REST transport against the local mock server.
+
+Usage:
+  python scripts/bench_gemini_transport.py [--requests 500] [--concurrency 50] [--latency-ms 50]
+  python scripts/bench_gemini_transport.py --base-url http://127.0.0.1:8765/v1beta  # external mock
+
+Modes:
+  pooled       GeminiProvider with GEMINI_TRANSPORT=rest (shared keep-alive pool)
+  per-request  a new HTTP client per call (the connection churn the pool avoids)
+
+Prints throughput, p50/p95 latency and the number of connections the mock
+server saw per mode. The mock speaks plain HTTP/1.1, so this measures
+pooling; HTTP/2 multiplexing and TLS savings only show against the real API.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+for path in (REPO_ROOT / "backend", REPO_ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import httpx  # noqa: E402
+import structlog  # noqa: E402
+
+from app.core.config import Settings  # noqa: E402
+from app.services.llm.gemini import GeminiProvider  # noqa: E402
+from app.services.llm.gemini_rest import GeminiRESTModel  # noqa: E402
+from app.services.llm.http import close_llm_http_client, open_llm_http_client  # noqa: E402
+
+
+def _start_mock(port: int, latency_ms: float) -> str:
+    import uvicorn
+    from gemini_mock_server import create_app
+
+    server = uvicorn.Server(uvicorn.Config(create_app(latency_ms), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1beta"
+
+
+async def _connections(base_url: str) -> int:
+    async with httpx.AsyncClient() as client:
+        response = await client.get(base_url.rsplit("/v1beta", 1)[0] + "/stats")
+        return int(response.json().get("connections", 0))
+
+
+async def _run(call: Callable[[str], Awaitable[str]], requests: int, concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call(f"質問{i}: 設備Aの停止時間を減らすには？")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    base_url = args.base_url or _start_mock(args.port, args.latency_ms)
+
+    settings = Settings(
+        gemini_api_key="dummy",
+        gemini_model="gemini-mock",
+        gemini_fallback_model=None,
+        gemini_transport="rest",
+        gemini_api_base_url=base_url,
+        llm_circuit_breaker=False,
+        llm_http_max_connections=args.concurrency,
+        llm_http_max_keepalive_connections=args.concurrency,
+    )
+    open_llm_http_client(settings)
+    provider = GeminiProvider(settings)
+
+    async def per_request(prompt: str) -> str:
+        async with httpx.AsyncClient(timeout=30) as client:
+            model = GeminiRESTModel("gemini-mock", "dummy", base_url, client=lambda: client)
+            return (await model.generate_content_async(prompt)).text
+
+    modes = {"pooled": provider.generate, "per-request": per_request}
+    print(f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'conns':>6}")
+    try:
+        for name, call in modes.items():
+            before = await _connections(base_url)
+            result = await _run(call, args.requests, args.concurrency)
+            used = await _connections(base_url) - before
+            print(f"{name:<12} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {used:>6}")
+    finally:
+        await close_llm_http_client()
+    return 0
+
+
+def main() -> int:
+    # Per-call usage logs would drown the table
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mock server latency")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--base-url", default=None, help="use an already running mock instead")
+    return asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Gemini REST API (`models/{model}:generateContent`) for benchmarks.
+
+Usage:
+  python scripts/gemini_mock_server.py --port 8765 --latency-ms 200 [--rate-limit-every 20]
+  GEMINI_TRANSPORT=rest GEMINI_API_BASE_URL=http://127.0.0.1:8765/v1beta GEMINI_API_KEY=dummy ...
+
+Answers after a fixed latency with a short text and usage metadata; with
+`--rate-limit-every N` every Nth request gets a 429 with a RetryInfo hint.
+Counts requests and distinct client connections (GET /stats).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+from typing import Any, Dict, Set, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 200.0, rate_limit_every: int = 0) -> FastAPI:
+    app = FastAPI(title="Gemini mock")
+    counter = itertools.count(1)
+    connections: Set[Tuple[str, int]] = set()
+    stats: Dict[str, int] = {"requests": 0, "rate_limited": 0}
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request) -> Any:
+        n = next(counter)
+        stats["requests"] += 1
+        if request.client is not None:
+            connections.add((request.client.host, request.client.port))
+        body = await request.json()
+        await asyncio.sleep(latency_ms / 1000)
+        if rate_limit_every and n % rate_limit_every == 0:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {
+                    "code": 429,
+                    "status": "RESOURCE_EXHAUSTED",
+                    "message": "Resource has been exhausted (e.g. check quota).",
+                    "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "1s"}],
+                }},
+            )
+        prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": f"[mock:{model}] {len(prompt)}文字の質問に回答します。"}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt), "candidatesTokenCount": 12, "totalTokenCount": len(prompt) + 12},
+        }
+
+    @app.get("/stats")
+    async def get_stats() -> Dict[str, int]:
+        return {**stats, "connections": len(connections)}
+
+    return app
+
+
+def main() -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.rate_limit_every), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())